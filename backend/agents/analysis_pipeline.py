@@ -0,0 +1,33 @@
+"""
+Fused analysis stage for PolicyValidatorAgent and RiskDriftAgent.
+
+Positions are normalized once (see agents/normalized_positions.py) and both agents
+are then fed from that structure in a single pass. Each agent's output is identical
+to running it on its own.
+"""
+import logging
+from typing import Optional, Tuple
+
+from agents.normalized_positions import normalize_positions
+from agents.policy_validator import PolicyValidatorAgent
+from agents.risk_drift import RiskDriftAgent
+from agents.rule_engine import CompiledRuleSet
+
+logger = logging.getLogger(__name__)
+
+
+def run_fused_analysis(positions: list, rule_set: Optional[CompiledRuleSet] = None) -> Tuple[list, list]:
+    """
+    Runs policy validation and risk drift analysis over the positions in one pass.
+    Returns (policy_violations, risk_drifts).
+    """
+    policy_validator = PolicyValidatorAgent(positions=positions, rule_set=rule_set)
+    risk_drift_analyzer = RiskDriftAgent(positions=positions)
+
+    policy_validator.begin()
+    risk_drift_analyzer.begin()
+    for normalized_position in normalize_positions(policy_validator.positions):
+        policy_validator.observe(normalized_position)
+        risk_drift_analyzer.observe(normalized_position)
+
+    return policy_validator.finish(), risk_drift_analyzer.finish()
@@ -8,8 +8,13 @@ MODEL_ALLOCATIONS = {
 # Threshold for detecting significant risk drifts (e.g., 0.1 for 10%)
 DRIFT_THRESHOLD = 0.1
 
-# Policy rules for policy validation (example - can be extended)
-# For more complex rules, consider a more structured format or a dedicated rules engine
+# Policy rules for policy validation, compiled once by agents/rule_engine.py.
+# Each rule has a 'violation_message', at most one selector ('sector', 'asset_class',
+# 'region' or 'instrument') and exactly one condition:
+#   - '<field>_gt' / '<field>_lt' on a position field (e.g. quantity_gt, esg_rating_lt)
+#   - 'weight_gt' / 'weight_lt' on the market-value weight of the selected group
+#   - 'min_<field>_count' on the number of distinct values held (e.g. min_sector_count)
+# The commented-out rule set below uses every supported rule shape.
 POLICY_RULES = [
     {"sector": "Technology", "quantity_gt": 90, "violation_message": "Overweight in Technology"}
 ]
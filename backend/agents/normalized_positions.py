@@ -0,0 +1,39 @@
+"""
+Compact, validated form of the raw position dicts shared by the analysis agents.
+
+Positions are validated and normalized once into NormalizedPosition tuples; the
+market value quantity * market_price is computed here, once per position.
+"""
+from typing import List, NamedTuple, Optional
+
+
+class NormalizedPosition(NamedTuple):
+    index: int
+    position: Optional[dict] # None if the raw entry was not a dict
+    raw_type: type
+    symbol: object
+    sector: object # As stored; None if missing (policy validation requires it)
+    quantity: object
+    drift_sector: object # Sector used for risk drift weights, "Unknown" if the key is absent
+    value: Optional[float] # quantity * market_price; None unless both are numeric
+
+
+def normalize_positions(positions: list) -> List[NormalizedPosition]:
+    """
+    Validates and normalizes raw position dicts once for all analysis agents.
+    """
+    normalized = []
+    for i, p in enumerate(positions):
+        if not isinstance(p, dict):
+            normalized.append(NormalizedPosition(i, None, type(p), None, None, None, None, None))
+            continue
+        quantity = p.get("quantity")
+        market_price = p.get("market_price")
+        if isinstance(quantity, (int, float)) and isinstance(market_price, (int, float)):
+            value = quantity * market_price
+        else:
+            value = None
+        normalized.append(NormalizedPosition(
+            i, p, dict, p.get("symbol", "N/A"), p.get("sector"), quantity, p.get("sector", "Unknown"), value
+        ))
+    return normalized
@@ -1,53 +1,64 @@
 import logging
+from typing import Optional
+
+from agents.normalized_positions import NormalizedPosition, normalize_positions
+from agents.rule_engine import CompiledRuleSet, get_default_rule_set
 
 logger = logging.getLogger(__name__)
 
 class PolicyValidatorAgent:
     """
-    Validates investment positions against predefined policy rules.
-    Currently checks for overweight in Technology sector.
+    Validates investment positions against policy rules.
+    Rules come from POLICY_RULES (agents/config.py), compiled once by the rule engine.
     """
-    def __init__(self, positions: list):
+    def __init__(self, positions: list, rule_set: Optional[CompiledRuleSet] = None):
         if not isinstance(positions, list):
             logger.warning(f"Expected positions to be a list, but got {type(positions)}")
             self.positions = []
         else:
             self.positions = positions
+        self.rule_set = rule_set if rule_set is not None else get_default_rule_set()
         logger.info("PolicyValidatorAgent initialized.")
 
     def run(self) -> list:
         """
         Executes policy validation rules against the provided positions.
+        Position rules are checked in a single pass; aggregate rules run once at the end.
         """
-        violations = []
-        logger.info(f"Starting policy validation for {len(self.positions)} positions.")
-
-        for i, pos in enumerate(self.positions):
-            if not isinstance(pos, dict):
-                violations.append(f"Invalid position data at index {i}: Expected dict, got {type(pos)}")
-                logger.warning(f"Skipping invalid position data at index {i}: {pos}")
-                continue
-
-            sector = pos.get("sector")
-            quantity = pos.get("quantity")
-            symbol = pos.get("symbol", "N/A") # Default symbol if not found
-
-            # Check for critical missing data
-            if sector is None or quantity is None:
-                violations.append(f"Missing 'sector' or 'quantity' for position '{symbol}' (index {i}).")
-                logger.warning(f"Missing critical data for position '{symbol}' at index {i}. Skipping policy check for this position.")
-                continue
-
-            # Policy Rule 1: Overweight in Technology
-            # This rule is hardcoded. For more flexibility, consider externalizing rules.
-            if sector == "Technology" and quantity > 90:
-                violation_message = f"Overweight in Technology: {symbol} (Quantity: {quantity})"
-                violations.append(violation_message)
-                logger.info(f"Policy violation detected: {violation_message}")
-
-            # Add more policy rules here as needed
-            # Example: if pos.get("risk_category") == "High" and pos.get("value") > 100000:
-            #     violations.append(f"High-value, high-risk asset: {symbol}")
+        self.begin()
+        for normalized_position in normalize_positions(self.positions):
+            self.observe(normalized_position)
+        return self.finish()
+
+    def begin(self):
+        """Starts a validation pass. Feed positions with observe(), then call finish()."""
+        logger.info(f"Starting policy validation for {len(self.positions)} positions against {self.rule_set.rule_count} rules.")
+        self._violations = []
+        self._evaluation = self.rule_set.new_evaluation()
+
+    def observe(self, pos: NormalizedPosition):
+        i = pos.index
+        if pos.position is None:
+            self._violations.append(f"Invalid position data at index {i}: Expected dict, got {pos.raw_type}")
+            logger.warning(f"Skipping invalid position data at index {i}: {self.positions[i]}")
+            return
+
+        # Check for critical missing data
+        if pos.sector is None or pos.quantity is None:
+            self._violations.append(f"Missing 'sector' or 'quantity' for position '{pos.symbol}' (index {i}).")
+            logger.warning(f"Missing critical data for position '{pos.symbol}' at index {i}. Skipping policy check for this position.")
+            return
+
+        position_violations = self._evaluation.observe(pos.position, pos.value)
+        for violation_message in position_violations:
+            logger.info(f"Policy violation detected: {violation_message}")
+        self._violations.extend(position_violations)
+
+    def finish(self) -> list:
+        aggregate_violations = self._evaluation.finish()
+        for violation_message in aggregate_violations:
+            logger.info(f"Policy violation detected: {violation_message}")
+        violations = self._violations + aggregate_violations
 
         logger.info(f"Finished policy validation. Found {len(violations)} violations.")
-        return violations
\ No newline at end of file
+        return violations
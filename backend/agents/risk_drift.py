@@ -5,6 +5,7 @@ and flags significant deviations (drifts) that exceed a configured threshold.
 """
 import logging
 from agents.config import MODEL_ALLOCATIONS, DRIFT_THRESHOLD
+from agents.normalized_positions import NormalizedPosition, normalize_positions
 
 logger = logging.getLogger(__name__)
 
@@ -21,35 +22,42 @@ class RiskDriftAgent:
         logger.info(f"RiskDriftAgent initialized with drift_threshold={self.drift_threshold}.")
 
     def run(self) -> list:
-        drifts = []
+        self.begin()
+        for normalized_position in normalize_positions(self.positions):
+            self.observe(normalized_position)
+        return self.finish()
+
+    def begin(self):
+        """Starts an analysis pass. Feed positions with observe(), then call finish()."""
+        self._valid_count = 0
+        self._total_value = 0
+        self._sector_values = {}
 
-        valid_positions = []
-        for i, p in enumerate(self.positions):
-            if not isinstance(p, dict):
-                logger.warning(f"Invalid position data at index {i}: Expected dict, got {type(p)}. Skipping.")
-                continue
-            quantity = p.get("quantity")
-            market_price = p.get("market_price")
-            if not isinstance(quantity, (int, float)) or not isinstance(market_price, (int, float)):
-                logger.warning(f"Missing or invalid 'quantity' or 'market_price' for position at index {i}. Skipping.")
-                continue
-            valid_positions.append(p)
+    def observe(self, p: NormalizedPosition):
+        i = p.index
+        if p.position is None:
+            logger.warning(f"Invalid position data at index {i}: Expected dict, got {p.raw_type}. Skipping.")
+            return
+        if p.value is None:
+            logger.warning(f"Missing or invalid 'quantity' or 'market_price' for position at index {i}. Skipping.")
+            return
+        self._valid_count += 1
+        self._total_value += p.value
+        self._sector_values[p.drift_sector] = self._sector_values.get(p.drift_sector, 0) + p.value
 
-        if not valid_positions:
+    def finish(self) -> list:
+        drifts = []
+
+        if not self._valid_count:
             logger.info("No valid positions found for risk drift analysis.")
             return []
 
-        total_value = sum(p["quantity"] * p["market_price"] for p in valid_positions)
+        total_value = self._total_value
         if total_value == 0:
             logger.warning("Total portfolio value is zero. Cannot calculate sector weights.")
             return []
 
-        sector_weights = {}
-        for p in valid_positions:
-            sector = p.get("sector", "Unknown")
-            value = p["quantity"] * p["market_price"]
-            sector_weights[sector] = sector_weights.get(sector, 0) + value
-
+        sector_weights = dict(self._sector_values)
         for sector in sector_weights:
             sector_weights[sector] /= total_value
 
@@ -0,0 +1,252 @@
+"""
+Compiled policy rule engine for PolicyValidatorAgent.
+
+Rule dicts (see POLICY_RULES in agents/config.py) are compiled once into predicate
+objects indexed by the field they test, so that evaluating any number of rules costs
+one pass over the positions:
+
+- Position rules ("<field>_gt" / "<field>_lt", e.g. quantity_gt, esg_rating_lt),
+  optionally scoped by a selector ("sector", "asset_class", "region", "instrument").
+  Rules sharing a selector value, field and operator are kept as a sorted threshold
+  list, so a position finds every rule it breaks with a dict lookup and a bisect.
+- Aggregate rules ("weight_gt" / "weight_lt" per selector value, "min_<field>_count")
+  are evaluated once at the end over group sums accumulated during the same pass.
+"""
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Optional
+
+from agents.config import POLICY_RULES
+
+logger = logging.getLogger(__name__)
+
+# Rule key -> position field it selects on
+SELECTOR_FIELDS = {
+    "sector": "sector",
+    "asset_class": "asset_class",
+    "region": "region",
+    "instrument": "symbol",
+}
+
+_THRESHOLD_KEY = re.compile(r"^(?P<field>\w+?)_(?P<op>gt|lt)$")
+_MIN_COUNT_KEY = re.compile(r"^min_(?P<field>\w+)_count$")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _field_label(field: str) -> str:
+    return field.replace("_", " ").title()
+
+
+class _ThresholdGroup:
+    """
+    All position rules sharing (selector, field, operator), sorted by threshold.
+    """
+    def __init__(self, field: str, op: str):
+        self.field = field
+        self.op = op
+        self._entries = [] # (threshold, rule_index, message)
+        self.thresholds = []
+        self.rules = []
+
+    def add(self, threshold: float, rule_index: int, message: str):
+        self._entries.append((threshold, rule_index, message))
+
+    def freeze(self):
+        self._entries.sort()
+        self.thresholds = [t for t, _, _ in self._entries]
+        self.rules = [(i, m) for _, i, m in self._entries]
+
+    def violated_by(self, value: float) -> list:
+        if self.op == "gt":
+            return self.rules[:bisect_left(self.thresholds, value)] # threshold < value
+        return self.rules[bisect_right(self.thresholds, value):] # threshold > value
+
+
+class CompiledRuleSet:
+    """
+    Policy rules compiled into field-indexed predicates. Build with compile_rules().
+    """
+    def __init__(self):
+        # selector position field -> selector value -> [_ThresholdGroup]
+        self.position_index: Dict[str, Dict[object, List[_ThresholdGroup]]] = {}
+        # Position rules without a selector apply to every position
+        self.global_groups: List[_ThresholdGroup] = []
+        # selector position field -> selector value -> [(rule_index, op, threshold, message)]
+        self.weight_rules: Dict[str, Dict[object, list]] = {}
+        # [(rule_index, position field, minimum, message)]
+        self.count_rules: List[tuple] = []
+        self.rule_count = 0
+
+    @property
+    def needs_values(self) -> bool:
+        return bool(self.weight_rules)
+
+    def new_evaluation(self) -> "RuleEvaluation":
+        return RuleEvaluation(self)
+
+
+def _compile_rule(rule_set: CompiledRuleSet, groups: dict, rule_index: int, rule: dict):
+    if not isinstance(rule, dict):
+        raise ValueError(f"Policy rule at index {rule_index} must be a dict, got {type(rule)}.")
+    rule = dict(rule)
+    message = rule.pop("violation_message", None)
+    if not message:
+        raise ValueError(f"Policy rule at index {rule_index} is missing 'violation_message'.")
+
+    selectors = [(key, rule.pop(key)) for key in list(rule) if key in SELECTOR_FIELDS]
+    if len(selectors) > 1:
+        raise ValueError(f"Policy rule at index {rule_index} has more than one selector: {selectors}.")
+    selector_field, selector_value = (SELECTOR_FIELDS[selectors[0][0]], selectors[0][1]) if selectors else (None, None)
+
+    if len(rule) != 1:
+        raise ValueError(f"Policy rule at index {rule_index} must have exactly one condition, got {list(rule)}.")
+    key, threshold = next(iter(rule.items()))
+    if not _is_number(threshold):
+        raise ValueError(f"Policy rule at index {rule_index}: threshold for '{key}' must be a number.")
+
+    count_match = _MIN_COUNT_KEY.match(key)
+    if count_match:
+        if selector_field is not None:
+            raise ValueError(f"Policy rule at index {rule_index}: '{key}' cannot be combined with a selector.")
+        count_field = SELECTOR_FIELDS.get(count_match.group("field"), count_match.group("field"))
+        rule_set.count_rules.append((rule_index, count_field, threshold, message))
+        return
+
+    threshold_match = _THRESHOLD_KEY.match(key)
+    if not threshold_match:
+        raise ValueError(f"Policy rule at index {rule_index} has an unsupported condition '{key}'.")
+    field, op = threshold_match.group("field"), threshold_match.group("op")
+
+    if field == "weight":
+        if selector_field is None:
+            raise ValueError(f"Policy rule at index {rule_index}: '{key}' requires a selector such as 'sector'.")
+        rule_set.weight_rules.setdefault(selector_field, {}).setdefault(selector_value, []).append(
+            (rule_index, op, threshold, message)
+        )
+        return
+
+    group_key = (selector_field, selector_value, field, op)
+    group = groups.get(group_key)
+    if group is None:
+        group = groups[group_key] = _ThresholdGroup(field, op)
+        if selector_field is None:
+            rule_set.global_groups.append(group)
+        else:
+            rule_set.position_index.setdefault(selector_field, {}).setdefault(selector_value, []).append(group)
+    group.add(threshold, rule_index, message)
+
+
+def compile_rules(rules: List[dict]) -> CompiledRuleSet:
+    """
+    Compiles a list of policy rule dicts. Raises ValueError on malformed rules.
+    """
+    rule_set = CompiledRuleSet()
+    groups = {}
+    for rule_index, rule in enumerate(rules):
+        _compile_rule(rule_set, groups, rule_index, rule)
+    for group in groups.values():
+        group.freeze()
+    rule_set.rule_count = len(rules)
+    logger.info(
+        f"Compiled {len(rules)} policy rules into {len(groups)} position predicate groups, "
+        f"{sum(len(v) for by_value in rule_set.weight_rules.values() for v in by_value.values())} weight rules "
+        f"and {len(rule_set.count_rules)} count rules."
+    )
+    return rule_set
+
+
+class RuleEvaluation:
+    """
+    Evaluates a CompiledRuleSet over positions in a single pass.
+    Call observe() once per validated position, then finish() for aggregate rules.
+    """
+    def __init__(self, rule_set: CompiledRuleSet):
+        self.rule_set = rule_set
+        self.total_value = 0.0
+        self.group_values = {field: {} for field in rule_set.weight_rules}
+        self.distinct_values = {field: set() for _, field, _, _ in rule_set.count_rules}
+
+    def observe(self, position: dict, value: Optional[float] = None) -> List[str]:
+        """
+        Checks position rules for one position and accumulates its aggregates.
+        `value` is the position's market value when already known (quantity * market_price).
+        Returns the violation messages for this position.
+        """
+        rule_set = self.rule_set
+        symbol = position.get("symbol", "N/A")
+
+        matched = []
+        for selector_field, by_value in rule_set.position_index.items():
+            selected = by_value.get(position.get(selector_field))
+            if selected:
+                matched.extend(selected)
+        matched.extend(rule_set.global_groups)
+
+        hits = []
+        for group in matched:
+            field_value = position.get(group.field)
+            if _is_number(field_value):
+                hits.extend((rule_index, message, group.field, field_value) for rule_index, message in group.violated_by(field_value))
+        if len(hits) > 1:
+            hits.sort(key=lambda hit: hit[0]) # Report in rule order
+        violations = [f"{message}: {symbol} ({_field_label(field)}: {field_value})" for _, message, field, field_value in hits]
+
+        if rule_set.needs_values:
+            if value is None:
+                quantity, market_price = position.get("quantity"), position.get("market_price")
+                if _is_number(quantity) and _is_number(market_price):
+                    value = quantity * market_price
+            if value is not None:
+                self.total_value += value
+                for field, sums in self.group_values.items():
+                    key = position.get(field)
+                    sums[key] = sums.get(key, 0) + value
+
+        for field, seen in self.distinct_values.items():
+            field_value = position.get(field)
+            if field_value is not None:
+                seen.add(field_value)
+
+        return violations
+
+    def finish(self) -> List[str]:
+        """
+        Evaluates aggregate (weight and count) rules over the accumulated group sums.
+        """
+        rule_set = self.rule_set
+        hits = []
+
+        if rule_set.weight_rules:
+            if self.total_value == 0:
+                logger.warning("Total portfolio value is zero. Skipping weight-based policy rules.")
+            else:
+                for field, by_value in rule_set.weight_rules.items():
+                    sums = self.group_values[field]
+                    for group_value, rules in by_value.items():
+                        weight = sums.get(group_value, 0) / self.total_value
+                        for rule_index, op, threshold, message in rules:
+                            if (op == "gt" and weight > threshold) or (op == "lt" and weight < threshold):
+                                hits.append((rule_index, f"{message}: {group_value} weight {weight:.2%} (limit {threshold:.2%})"))
+
+        for rule_index, field, minimum, message in rule_set.count_rules:
+            count = len(self.distinct_values[field])
+            if count < minimum:
+                hits.append((rule_index, f"{message}: {count} distinct {field} values (minimum {minimum})"))
+
+        hits.sort(key=lambda hit: hit[0])
+        return [message for _, message in hits]
+
+
+_default_rule_set: Optional[CompiledRuleSet] = None
+
+
+def get_default_rule_set() -> CompiledRuleSet:
+    """Returns POLICY_RULES compiled once per process."""
+    global _default_rule_set
+    if _default_rule_set is None:
+        _default_rule_set = compile_rules(POLICY_RULES)
+    return _default_rule_set
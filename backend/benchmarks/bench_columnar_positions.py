@@ -0,0 +1,57 @@
+# backend/benchmarks/bench_columnar_positions.py
+"""
+Throughput of the replay-based position calculation versus the columnar NumPy engine
+for bulk uploads.
+
+Run from the backend directory:
+    python -m benchmarks.bench_columnar_positions
+"""
+import random
+import time
+
+from services.columnar_positions import calculate_positions_columnar
+from services.position_ledger import build_ledger_from_trades, positions_from_ledger
+
+TRADE_COUNTS = [10_000, 100_000, 500_000]
+SYMBOL_COUNT = 2_000
+REPEATS = 5
+
+
+def _make_trades(n: int, rng: random.Random) -> list:
+    trades = []
+    for _ in range(n):
+        symbol = f"SYM{rng.randrange(SYMBOL_COUNT):05d}"
+        trades.append({
+            "symbol": symbol,
+            "quantity": rng.randint(1, 500),
+            "price": round(rng.uniform(5, 500), 2),
+            "type": "BUY" if rng.random() < 0.65 else "SELL",
+            "isin": f"ISIN{symbol}",
+            "sector": rng.choice(["Technology", "Consumer Discretionary", "Energy", "Financials"]),
+            "trade_date": "2025-06-06",
+        })
+    return trades
+
+
+def _throughput(fn, trades) -> float:
+    """Best of REPEATS runs, in trades per second."""
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(trades)
+        best = min(best, time.perf_counter() - start)
+    return len(trades) / best
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'trades':>10} {'replay (trades/s)':>20} {'columnar (trades/s)':>22} {'speedup':>9}")
+    for count in TRADE_COUNTS:
+        trades = _make_trades(count, rng)
+        replay = _throughput(lambda t: positions_from_ledger(build_ledger_from_trades(t)), trades)
+        columnar = _throughput(calculate_positions_columnar, trades)
+        print(f"{count:>10} {replay:>20,.0f} {columnar:>22,.0f} {columnar / replay:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
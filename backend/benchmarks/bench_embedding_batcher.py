@@ -0,0 +1,55 @@
+# backend/benchmarks/bench_embedding_batcher.py
+"""
+Throughput of concurrent single-text embedding requests with and without the
+micro-batcher. The model stand-in costs a fixed overhead per forward pass plus a
+small per-text cost, which is how a SentenceTransformer behaves on short texts.
+
+Run from the backend directory:
+    python -m benchmarks.bench_embedding_batcher
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.embedding_batcher import EmbeddingBatcher
+
+CONCURRENT_REQUESTS = [16, 64, 256]
+FORWARD_PASS_OVERHEAD_SECONDS = 0.004
+PER_TEXT_SECONDS = 0.0002
+WORKERS = 2
+
+
+def _model(texts):
+    time.sleep(FORWARD_PASS_OVERHEAD_SECONDS + PER_TEXT_SECONDS * len(texts))
+    return [[0.0] * 8 for _ in texts]
+
+
+async def _run(requests: int, batched: bool) -> float:
+    executor = ThreadPoolExecutor(max_workers=WORKERS)
+    loop = asyncio.get_running_loop()
+
+    async def embed_in_executor(texts):
+        return await loop.run_in_executor(executor, _model, texts)
+
+    batcher = EmbeddingBatcher(embed_in_executor, max_batch_size=64, window_ms=5)
+    embed = batcher.embed if batched else embed_in_executor
+    start = time.perf_counter()
+    await asyncio.gather(*(embed([f"question {i}"]) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+    return elapsed, batcher.metrics()
+
+
+async def main():
+    print(f"{'requests':>9} {'unbatched (ms)':>15} {'batched (ms)':>13} {'speedup':>8} {'fill rate':>10} {'p95 wait (ms)':>14}")
+    for requests in CONCURRENT_REQUESTS:
+        unbatched, _ = await _run(requests, batched=False)
+        batched, metrics = await _run(requests, batched=True)
+        print(
+            f"{requests:>9} {unbatched * 1000:>15.1f} {batched * 1000:>13.1f} {unbatched / batched:>7.1f}x"
+            f" {metrics['batch_fill_rate']:>10.2f} {metrics['queue_wait_ms']['p95']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
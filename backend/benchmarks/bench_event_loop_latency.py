@@ -0,0 +1,132 @@
+# backend/benchmarks/bench_event_loop_latency.py
+"""
+Load test: /portfolios latency while /rag/ask requests are in flight.
+
+The embedding model, ChromaDB and OpenAI are replaced by stand-ins with realistic
+latencies (blocking embedding/query calls, slow network-bound LLM call). Two modes:
+- "blocking": the previous execution model, with every call made inline on the event loop;
+- "async":    the current one, using thread pools for embedding/ChromaDB and the async OpenAI client.
+
+Run from the backend directory:
+    python -m benchmarks.bench_event_loop_latency
+"""
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import rag_service
+from routers import portfolio, rag
+
+CONCURRENT_ASKS = 20
+EMBEDDING_SECONDS = 0.02 # CPU-bound SentenceTransformer encode of one question
+CHROMA_QUERY_SECONDS = 0.01
+LLM_SECONDS = 0.5
+PROBE_INTERVAL_SECONDS = 0.02
+
+
+class _BlockingEmbeddingFunction:
+    def __call__(self, texts):
+        time.sleep(EMBEDDING_SECONDS)
+        return [[0.0] * 8 for _ in texts]
+
+
+class _BlockingCollection:
+    def query(self, query_embeddings, n_results, where):
+        time.sleep(CHROMA_QUERY_SECONDS)
+        return {"documents": [["Portfolio report context"]]}
+
+
+def _completion():
+    message = type("message", (object,), {"content": "Answer"})()
+    choice = type("choice", (object,), {"message": message})()
+    return type("completion", (object,), {"choices": [choice]})()
+
+
+class _LLMClient:
+    """Stand-in for the OpenAI client; blocking=True behaves like the synchronous client."""
+    def __init__(self, blocking: bool):
+        outer = self
+        self.blocking = blocking
+
+        class _Completions:
+            async def create(self, model, messages):
+                if outer.blocking:
+                    time.sleep(LLM_SECONDS)
+                else:
+                    await asyncio.sleep(LLM_SECONDS)
+                return _completion()
+
+        self.chat = type("chat", (object,), {"completions": _Completions()})()
+
+
+async def _inline_call(executor, fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def _fake_portfolio_summaries(after=None, limit=None):
+    for i in range(50):
+        yield {"client_id": f"C{i}", "portfolio_id": "P1"}
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    app.include_router(rag.router, prefix="/rag")
+    return app
+
+
+async def _measure(client: httpx.AsyncClient, with_load: bool) -> list:
+    latencies = []
+    asks = []
+    # Probes are scheduled at fixed intervals and timed from their scheduled start, so a
+    # stalled event loop shows up as latency instead of silently delaying the next probe
+    first = time.perf_counter()
+    if with_load:
+        asks = [
+            asyncio.create_task(client.post("/rag/ask/C1/P1", json={"question": f"Question {i}", "chat_history": []}))
+            for i in range(CONCURRENT_ASKS)
+        ]
+    for probe in range(int(LLM_SECONDS * 2 / PROBE_INTERVAL_SECONDS)):
+        scheduled = first + probe * PROBE_INTERVAL_SECONDS
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        response = await client.get("/portfolios")
+        latencies.append((time.perf_counter() - scheduled) * 1000)
+        assert response.status_code == 200
+    for response in await asyncio.gather(*asks):
+        assert response.status_code == 200
+    return latencies
+
+
+def _summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return f"{statistics.median(latencies):8.1f} {p95:8.1f} {latencies[-1]:8.1f} {len(latencies):>7}"
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    rag_service.settings.ANSWER_CACHE_ENABLED = False # Every ask must reach the LLM
+    portfolio.iter_portfolio_summaries = _fake_portfolio_summaries
+    ef = _BlockingEmbeddingFunction()
+    rag_service.set_rag_components(None, ef, _BlockingCollection())
+    run_in_executor = rag_service._run_in_executor
+
+    print(f"{'mode':<9} {'load':<22} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'probes':>7}")
+    for mode in ("blocking", "async"):
+        rag_service._run_in_executor = _inline_call if mode == "blocking" else run_in_executor
+        rag_service.set_openai_client(_LLMClient(blocking=mode == "blocking"))
+        transport = httpx.ASGITransport(app=_build_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for with_load in (False, True):
+                label = f"{CONCURRENT_ASKS} asks in flight" if with_load else "idle"
+                print(f"{mode:<9} {label:<22} {_summary(await _measure(client, with_load))}")
+    rag_service._run_in_executor = run_in_executor
+    rag_service.shutdown_rag_executors()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
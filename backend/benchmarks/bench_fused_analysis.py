@@ -0,0 +1,57 @@
+# backend/benchmarks/bench_fused_analysis.py
+"""
+Compares the fused analysis stage (normalize once, feed both agents in one pass)
+with running PolicyValidatorAgent and RiskDriftAgent as two separate passes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_fused_analysis
+"""
+import logging
+import random
+import time
+
+from agents.analysis_pipeline import run_fused_analysis
+from agents.policy_validator import PolicyValidatorAgent
+from agents.risk_drift import RiskDriftAgent
+
+POSITION_COUNTS = [1_000, 10_000, 100_000]
+SECTORS = ["Technology", "Consumer Discretionary", "Energy", "Financials", "Health Care"]
+REPEATS = 5
+
+
+def _make_positions(n: int, rng: random.Random) -> list:
+    return [
+        {
+            "symbol": f"SYM{i:06d}",
+            "isin": f"ISIN{i:08d}",
+            "sector": rng.choice(SECTORS),
+            "quantity": rng.randint(1, 90), # Below the Technology limit, so no per-violation logging
+            "avg_price": rng.uniform(5, 500),
+            "market_price": rng.uniform(5, 500),
+        }
+        for i in range(n)
+    ]
+
+
+def _best_ms(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    print(f"{'positions':>10} {'separate (ms)':>15} {'fused (ms)':>12} {'speedup':>9}")
+    for count in POSITION_COUNTS:
+        positions = _make_positions(count, rng)
+        separate = _best_ms(lambda: (PolicyValidatorAgent(positions).run(), RiskDriftAgent(positions).run()))
+        fused = _best_ms(lambda: run_fused_analysis(positions))
+        print(f"{count:>10} {separate:>15.2f} {fused:>12.2f} {separate / fused:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
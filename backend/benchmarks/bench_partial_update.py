@@ -0,0 +1,102 @@
+# backend/benchmarks/bench_partial_update.py
+"""
+Add-trade write of a portfolio with embedded trades: replace_one of the whole document
+(update_portfolio_doc, before) versus the diff-based update of update_portfolio_changes
+($push of the new trade, $set of the re-analyzed fields, version-checked filter).
+
+Always measured: the BSON bytes of the update command and the client time to build it
+(diff for the new path) and encode it. If a MongoDB server is reachable at MONGO_URI
+(default mongodb://localhost:27017), the round-trip latency of both writes is measured
+too, in a scratch database that is dropped afterwards.
+
+Run from the backend directory (trade counts as arguments):
+    python -m benchmarks.bench_partial_update [trades ...]
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import bson
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.bench_portfolio_reads import _portfolio
+from crud.portfolio_crud import PORTFOLIO_VERSION_FIELD, compute_portfolio_update
+from services.portfolio_service import _reanalyze_with_trades
+
+TRADE_COUNTS = [1_000, 10_000, 50_000]
+REPEATS = 10
+DATABASE = "bench_partial_update"
+
+
+async def _add_trade(doc: dict) -> dict:
+    """The document after one add-trade, built as the service does (new trades list, re-analysis)."""
+    trade = {**doc["trades"][0], "trade_id": str(uuid.uuid4())}
+    updated = {**doc, "trades": doc["trades"] + [trade]}
+    await _reanalyze_with_trades("C1", "P1", updated, [trade], None)
+    return updated
+
+
+def _client_ms(build) -> tuple:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        payload = bson.encode(build())
+    return len(payload), (time.perf_counter() - start) * 1000 / REPEATS
+
+
+async def _server_ms(write) -> float:
+    latencies = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        await write()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+async def _mongo_database():
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=3000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        print(f"MongoDB is not reachable ({e}); only the client-side numbers are measured.\n")
+        return client, None
+    await client.drop_database(DATABASE)
+    return client, client[DATABASE]
+
+
+async def main():
+    logging.disable(logging.INFO)
+    counts = [int(arg) for arg in sys.argv[1:]] or TRADE_COUNTS
+    client, db = await _mongo_database()
+    print(f"{'trades':>8} {'write':<8} {'command KB':>11} {'client ms':>10} {'server ms':>10}")
+    for trades_count in counts:
+        doc = _portfolio(trades_count)
+        updated = await _add_trade(doc)
+        filter = {"_id": doc["_id"], PORTFOLIO_VERSION_FIELD: doc[PORTFOLIO_VERSION_FIELD]}
+        replace_without_id = {field: value for field, value in updated.items() if field != "_id"}
+
+        rows = {
+            "replace": _client_ms(lambda: {"q": {"_id": doc["_id"]}, "u": replace_without_id}),
+            "diff": _client_ms(lambda: {"q": filter, "u": compute_portfolio_update(doc, updated)}),
+        }
+        server = {"replace": None, "diff": None}
+        if db is not None:
+            await db.portfolios.insert_one(doc)
+            server["replace"] = await _server_ms(lambda: db.portfolios.replace_one({"_id": doc["_id"]}, replace_without_id))
+            # Each repetition pushes one trade onto the same stored document, as successive add-trades would
+            update = compute_portfolio_update(doc, updated)
+            update["$set"].pop(PORTFOLIO_VERSION_FIELD, None)
+            server["diff"] = await _server_ms(lambda: db.portfolios.update_one({"_id": doc["_id"]}, update))
+            await db.portfolios.delete_many({})
+        for write, (size, client_ms) in rows.items():
+            server_ms = f"{server[write]:>10.2f}" if server[write] is not None else f"{'-':>10}"
+            print(f"{trades_count:>8,} {write:<8} {size / 1024:>11,.1f} {client_ms:>10.2f} {server_ms}")
+    if db is not None:
+        await client.drop_database(DATABASE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
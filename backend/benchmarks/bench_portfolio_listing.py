@@ -0,0 +1,143 @@
+# backend/benchmarks/bench_portfolio_listing.py
+"""
+/portfolios: the previous handler (every full document loaded with to_list, then patched
+and returned as one list) versus the streamed listing of summary fields.
+
+MongoDB is modeled by an in-memory collection that BSON-decodes every document it yields,
+as the driver does; for the new listing it decodes only the projected summary fields,
+as the server applies the projection. Measured through the ASGI app: total response time
+and the Python heap peak (tracemalloc) while serving.
+
+Run from the backend directory (portfolio counts as arguments):
+    python -m benchmarks.bench_portfolio_listing [portfolios ...]
+"""
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import bson
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+
+import crud.portfolio_crud as portfolio_crud
+from routers import portfolio
+
+PORTFOLIO_COUNTS = [1_000, 5_000]
+TRADES_PER_PORTFOLIO = 100
+
+
+def _full_doc() -> dict:
+    trades = [
+        {"trade_id": f"T{i:06d}", "symbol": f"SYM{i % 40:03d}", "isin": f"US{i % 40:010d}", "quantity": 10.0,
+         "price": 100.0, "trade_date": "2025-01-02", "type": "BUY", "sector": "Technology"}
+        for i in range(TRADES_PER_PORTFOLIO)
+    ]
+    positions = [{"symbol": f"SYM{i:03d}", "isin": f"US{i:010d}", "quantity": 25.0, "avg_price": 100.0, "market_price": 101.0, "sector": "Technology"} for i in range(40)]
+    return {
+        "client_id": "C1", "portfolio_id": "P1", "date": "2025-01-02", "uploaded_at": "2025-01-02T00:00:00",
+        "trades": trades, "positions": positions, "analysis": {"policy_violations": ["Technology over 30%"], "risk_drifts": []},
+        "compliance_report": "Compliance report " * 50,
+    }
+
+
+class _Cursor:
+    def __init__(self, collection, projected, start=0):
+        self.collection, self.projected, self.start, self.stop = collection, projected, start, collection.count
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def limit(self, n):
+        self.stop = min(self.stop, self.start + n)
+        return self
+
+    def _decode(self, index: int) -> dict:
+        doc = bson.decode(self.collection.summary_bson if self.projected else self.collection.full_bson)
+        doc["_id"], doc["client_id"] = self.collection.ids[index], f"C{index:07d}"
+        return doc
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for index in range(self.start, self.stop):
+            yield self._decode(index)
+            if index % 100 == 99:
+                await asyncio.sleep(0) # The driver yields to the event loop between batches
+
+    async def to_list(self, length=None):
+        return [self._decode(index) for index in range(self.start, self.stop)]
+
+
+class _SimulatedCollection:
+    def __init__(self, count: int):
+        self.count = count
+        self.ids = [ObjectId() for _ in range(count)]
+        full = _full_doc()
+        self.full_bson = bson.encode(full)
+        self.summary_bson = bson.encode({field: full[field] for field in portfolio_crud.SUMMARY_PROJECTION if field in full})
+
+    def find(self, filter, projection=None):
+        return _Cursor(self, projected=projection is not None)
+
+
+def _build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(portfolio.router)
+
+    @app.get("/portfolios-before", response_model=List[Dict[str, Any]])
+    async def get_all_portfolios_before():
+        # The previous handler, unchanged
+        portfolios_data = await portfolio_crud.get_all_portfolio_docs()
+        for portfolio_doc in portfolios_data:
+            if "_id" in portfolio_doc:
+                portfolio_doc["_id"] = str(portfolio_doc["_id"])
+            if isinstance(portfolio_doc.get("date"), date):
+                portfolio_doc["date"] = portfolio_doc["date"].isoformat()
+            if isinstance(portfolio_doc.get("uploaded_at"), datetime):
+                portfolio_doc["uploaded_at"] = portfolio_doc["uploaded_at"].isoformat()
+        return portfolios_data
+
+    return app
+
+
+async def _measure(client: httpx.AsyncClient, path: str, params: dict) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = await client.get(path, params=params)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert response.status_code == 200
+    return seconds, peak / 1024 / 1024, len(response.content) / 1024 / 1024
+
+
+async def main():
+    logging.disable(logging.INFO)
+    counts = [int(arg) for arg in sys.argv[1:]] or PORTFOLIO_COUNTS
+    app = _build_app()
+    print(f"{TRADES_PER_PORTFOLIO} trades per portfolio")
+    print(f"{'portfolios':>10} {'endpoint':<26} {'seconds':>8} {'heap peak MB':>13} {'response MB':>12}")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None) as client:
+        for count in counts:
+            portfolio_crud.portfolio_collection = _SimulatedCollection(count)
+            for label, path, params in (
+                ("before (full to_list)", "/portfolios-before", {}),
+                ("json stream", "/portfolios", {}),
+                ("ndjson stream", "/portfolios", {"format": "ndjson"}),
+                ("json page of 100", "/portfolios", {"limit": 100}),
+            ):
+                seconds, peak_mb, response_mb = await _measure(client, path, params)
+                print(f"{count:>10,} {label:<26} {seconds:>8.2f} {peak_mb:>13.1f} {response_mb:>12.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+# backend/benchmarks/bench_portfolio_lookup.py
+"""
+Latest-portfolio lookup latency against collection size:
+- scan:    find(client_id, portfolio_id).sort(uploaded_at desc).limit(1) without indexes (before),
+- indexed: the same query with the (client_id, portfolio_id, uploaded_at desc) index,
+- current: find_one on the portfolios_current collection (one document per portfolio).
+
+Needs a MongoDB server at MONGO_URI (default mongodb://localhost:27017); the data goes into
+a scratch database that is dropped afterwards. Each portfolio has VERSIONS_PER_PORTFOLIO
+stored documents.
+
+Run from the backend directory (document counts as arguments):
+    python -m benchmarks.bench_portfolio_lookup [documents ...]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+
+DOCUMENT_COUNTS = [10_000, 100_000, 1_000_000]
+VERSIONS_PER_PORTFOLIO = 4
+LOOKUPS = 200
+INSERT_CHUNK = 10_000
+DATABASE = "bench_portfolio_lookup"
+
+
+def _doc(portfolio: int, version: int) -> dict:
+    return {
+        "client_id": f"C{portfolio // 2:07d}",
+        "portfolio_id": f"P{portfolio:07d}",
+        "uploaded_at": f"2025-01-{version + 1:02d}T00:00:00",
+        "positions": [{"symbol": "AAPL", "quantity": 10, "market_price": 100.0, "sector": "Technology"}],
+        "analysis": {"policy_violations": [], "risk_drifts": []},
+    }
+
+
+async def _fill(db, documents: int):
+    portfolios = documents // VERSIONS_PER_PORTFOLIO
+    batch = []
+    for version in range(VERSIONS_PER_PORTFOLIO):
+        for portfolio in range(portfolios):
+            batch.append(_doc(portfolio, version))
+            if len(batch) == INSERT_CHUNK:
+                await db.portfolios.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        await db.portfolios.insert_many(batch, ordered=False)
+    # The current collection holds the latest version of each portfolio
+    latest = VERSIONS_PER_PORTFOLIO - 1
+    for start in range(0, portfolios, INSERT_CHUNK):
+        await db.portfolios_current.insert_many([_doc(p, latest) for p in range(start, min(start + INSERT_CHUNK, portfolios))], ordered=False)
+    await db.portfolios_current.create_index([("client_id", ASCENDING), ("portfolio_id", ASCENDING)], unique=True)
+    return portfolios
+
+
+async def _latencies(lookup, keys: list) -> list:
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        doc = await lookup(key)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert doc is not None and doc["uploaded_at"].startswith(f"2025-01-{VERSIONS_PER_PORTFOLIO:02d}")
+    return sorted(latencies)
+
+
+async def _docs_examined(db, key: dict) -> int:
+    explain = await db.command("explain", {"find": "portfolios", "filter": key, "sort": {"uploaded_at": -1}, "limit": 1}, verbosity="executionStats")
+    return explain["executionStats"]["totalDocsExamined"]
+
+
+async def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or DOCUMENT_COUNTS
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=3000)
+    try:
+        await client.admin.command("ping")
+    except Exception as e:
+        print(f"MongoDB is not reachable ({e}); set MONGO_URI to run this benchmark.")
+        return
+    db = client[DATABASE]
+    rng = random.Random(7)
+
+    print(f"{VERSIONS_PER_PORTFOLIO} versions per portfolio, {LOOKUPS} lookups of random portfolios")
+    print(f"{'documents':>10} {'method':<8} {'p50 ms':>8} {'p95 ms':>8} {'docs examined':>14}")
+    for count in counts:
+        await client.drop_database(DATABASE)
+        portfolios = await _fill(db, count)
+        keys = []
+        for _ in range(LOOKUPS):
+            portfolio = rng.randrange(portfolios)
+            keys.append({"client_id": f"C{portfolio // 2:07d}", "portfolio_id": f"P{portfolio:07d}"})
+
+        async def sorted_lookup(key):
+            docs = await db.portfolios.find(key).sort("uploaded_at", -1).limit(1).to_list(length=1)
+            return docs[0] if docs else None
+
+        async def current_lookup(key):
+            return await db.portfolios_current.find_one(key)
+
+        rows = [("scan", await _latencies(sorted_lookup, keys), await _docs_examined(db, keys[0]))]
+        await db.portfolios.create_index([("client_id", ASCENDING), ("portfolio_id", ASCENDING), ("uploaded_at", DESCENDING)])
+        rows.append(("indexed", await _latencies(sorted_lookup, keys), await _docs_examined(db, keys[0])))
+        rows.append(("current", await _latencies(current_lookup, keys), 1))
+        for method, latencies, examined in rows:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{count:>10,} {method:<8} {statistics.median(latencies):>8.2f} {p95:>8.2f} {examined:>14,}")
+    await client.drop_database(DATABASE)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+# backend/benchmarks/bench_portfolio_reads.py
+"""
+Bytes MongoDB sends per portfolio read endpoint: the full latest document (before) versus the
+projected fields each endpoint now reads (crud.portfolio_crud.get_portfolio_fields).
+
+The payload is the BSON encoding of the returned document, i.e. what crosses the wire and
+what the driver decodes; the decode time is measured with bson.decode as the driver does it.
+
+Run from the backend directory:
+    python -m benchmarks.bench_portfolio_reads [trades ...]
+"""
+import sys
+import time
+import uuid
+
+import bson
+from bson import ObjectId
+
+from crud.portfolio_crud import SUMMARY_PROJECTION, trades_projection
+from services.portfolio_analysis import analyze_positions, build_ledger
+from services.position_ledger import ledger_to_doc, positions_from_ledger
+
+TRADE_COUNTS = [1_000, 50_000]
+SYMBOLS = 500
+DECODES = 20
+
+
+def _portfolio(trades_count: int) -> dict:
+    trades = [
+        {
+            "trade_id": str(uuid.uuid4()), "symbol": f"SYM{i % SYMBOLS:04d}", "isin": f"US{i % SYMBOLS:010d}",
+            "quantity": 10.0, "price": 100.0 + i % 7, "market_price": 101.0, "trade_date": "2025-01-02",
+            "type": "BUY" if i % 3 else "SELL", "sector": ["Technology", "Healthcare", "Financials", "Energy"][i % 4],
+        }
+        for i in range(trades_count)
+    ]
+    ledger = build_ledger(trades)
+    positions = positions_from_ledger(ledger)
+    analysis, compliance_report = analyze_positions(positions)
+    return {
+        "_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "date": "2025-01-02", "uploaded_at": "2025-01-02T00:00:00",
+        "trades": trades, "positions": positions, "position_ledger": ledger_to_doc(ledger),
+        "analysis": analysis, "compliance_report": compliance_report, "analysis_version": 1,
+    }
+
+
+def _project(doc: dict, projection: dict) -> dict:
+    projected = {}
+    for field, spec in {"_id": 1, **projection}.items():
+        if field in doc:
+            if isinstance(spec, dict):
+                skip, limit = spec["$slice"]
+                projected[field] = doc[field][skip:skip + limit]
+            else:
+                projected[field] = doc[field]
+    return projected
+
+
+def _decode_ms(payload: bytes) -> float:
+    start = time.perf_counter()
+    for _ in range(DECODES):
+        bson.decode(payload)
+    return (time.perf_counter() - start) * 1000 / DECODES
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or TRADE_COUNTS
+    reads = [
+        ("summary", SUMMARY_PROJECTION),
+        ("positions", {"positions": 1}),
+        ("transactions", trades_projection()),
+        ("trades page 100", trades_projection(0, 100)),
+        ("upload version", {"analysis_version": 1}),
+    ]
+    print(f"{'trades':>8} {'read':<16} {'full KB':>10} {'projected KB':>13} {'full decode ms':>15} {'projected ms':>13}")
+    for trades_count in counts:
+        doc = _portfolio(trades_count)
+        full = bson.encode(doc)
+        full_ms = _decode_ms(full)
+        for name, projection in reads:
+            projected = bson.encode(_project(doc, projection))
+            print(f"{trades_count:>8,} {name:<16} {len(full) / 1024:>10,.1f} {len(projected) / 1024:>13,.1f} {full_ms:>15.2f} {_decode_ms(projected):>13.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# backend/benchmarks/bench_portfolio_seeding.py
+"""
+Startup seeding of clients.json portfolios: a find_one and an insert_one per portfolio
+(the previous startup loop) versus one key query plus one unordered bulk_write of upserts
+(services/portfolio_seeding.py).
+
+MongoDB is modeled by an in-memory collection that charges every request a network round
+trip (ROUND_TRIP_MS) plus SERVER_US_PER_DOCUMENT per document written or returned, since
+round trips are what the per-portfolio loop multiplies. Both paths run the same Python code
+they run against MongoDB.
+
+Run from the backend directory (accounts as arguments, default 100,000):
+    python -m benchmarks.bench_portfolio_seeding [accounts ...]
+"""
+import asyncio
+import logging
+import sys
+import time
+
+import crud.portfolio_crud as portfolio_crud
+from services.portfolio_seeding import new_portfolio_doc, seed_portfolios
+
+ACCOUNTS = [100_000]
+PORTFOLIOS_PER_CLIENT = 2
+ROUND_TRIP_MS = 0.5
+SERVER_US_PER_DOCUMENT = 10
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await _request(len(self.docs))
+        for doc in self.docs:
+            yield doc
+
+
+class _SimulatedCollection:
+    """Keyed by (client_id, portfolio_id), like the unique index; supports the calls seeding makes."""
+    def __init__(self):
+        self.docs = {}
+        self.requests = 0
+
+    async def create_index(self, keys, **kwargs):
+        self.requests += 1
+        await _request(0)
+
+    def find(self, filter, projection=None):
+        self.requests += 1
+        client_ids = set(filter["client_id"]["$in"])
+        return _Cursor([{"client_id": c, "portfolio_id": p} for c, p in self.docs if c in client_ids])
+
+    async def find_one(self, filter):
+        self.requests += 1
+        doc = self.docs.get((filter["client_id"], filter["portfolio_id"]))
+        await _request(1 if doc else 0)
+        return doc
+
+    async def insert_one(self, doc):
+        self.requests += 1
+        await _request(1)
+        self.docs[(doc["client_id"], doc["portfolio_id"])] = doc
+
+    async def bulk_write(self, operations, ordered=True):
+        self.requests += 1
+        await _request(len(operations))
+        upserted = 0
+        for operation in operations:
+            key = (operation._filter["client_id"], operation._filter["portfolio_id"])
+            if key not in self.docs:
+                self.docs[key] = {**operation._filter, **operation._doc["$setOnInsert"]}
+                upserted += 1
+        return type("result", (object,), {"upserted_count": upserted})()
+
+
+async def _request(documents: int):
+    await asyncio.sleep(ROUND_TRIP_MS / 1000 + documents * SERVER_US_PER_DOCUMENT / 1e6)
+
+
+async def _seed_one_by_one(collection, clients_data: list):
+    """The previous startup loop: one find_one, then one insert_one if missing, per portfolio."""
+    for client_info in clients_data:
+        for portfolio_info in client_info["portfolios"]:
+            key = {"client_id": client_info["client_id"], "portfolio_id": portfolio_info["portfolio_id"]}
+            if not await collection.find_one(key):
+                await collection.insert_one(new_portfolio_doc(key["client_id"], key["portfolio_id"], "2025-01-01T00:00:00"))
+
+
+async def _timed(coroutine) -> float:
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+async def main():
+    logging.disable(logging.INFO)
+    accounts_list = [int(arg) for arg in sys.argv[1:]] or ACCOUNTS
+    print(f"Round trip {ROUND_TRIP_MS} ms, {SERVER_US_PER_DOCUMENT} us per document, {PORTFOLIOS_PER_CLIENT} portfolios per client")
+    print(f"{'accounts':>9} {'method':<12} {'first run s':>12} {'rerun s':>9} {'requests':>9}")
+    for accounts in accounts_list:
+        clients_data = [
+            {"client_id": f"C{c:07d}", "portfolios": [{"portfolio_id": f"P{c:07d}-{p}"} for p in range(PORTFOLIOS_PER_CLIENT)]}
+            for c in range(accounts // PORTFOLIOS_PER_CLIENT)
+        ]
+
+        collection = _SimulatedCollection()
+        first = await _timed(_seed_one_by_one(collection, clients_data))
+        rerun = await _timed(_seed_one_by_one(collection, clients_data))
+        print(f"{accounts:>9,} {'one-by-one':<12} {first:>12.2f} {rerun:>9.2f} {collection.requests:>9,}")
+
+        collection = _SimulatedCollection()
+        portfolio_crud.portfolio_collection = collection
+        first = await _timed(seed_portfolios(clients_data))
+        rerun = await _timed(seed_portfolios(clients_data))
+        assert len(collection.docs) == accounts
+        print(f"{accounts:>9,} {'bulk':<12} {first:>12.2f} {rerun:>9.2f} {collection.requests:>9,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
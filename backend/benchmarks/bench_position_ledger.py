@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_position_ledger.py
+"""
+Compares add-trade position maintenance using the incremental ledger against
+replaying the full trade history, for growing trade history sizes.
+
+Run from the backend directory:
+    python -m benchmarks.bench_position_ledger
+"""
+import random
+import time
+
+from services.position_ledger import (
+    apply_trade_to_ledger,
+    build_ledger_from_trades,
+    positions_from_ledger,
+    ledger_to_doc,
+    ledger_from_doc,
+)
+
+HISTORY_SIZES = [1_000, 10_000, 50_000, 100_000]
+SYMBOL_COUNT = 200
+REPEATS = 20
+
+
+def _make_trade(rng: random.Random) -> dict:
+    symbol = f"SYM{rng.randrange(SYMBOL_COUNT):04d}"
+    return {
+        "symbol": symbol,
+        "quantity": rng.randint(1, 100),
+        "price": round(rng.uniform(5, 500), 2),
+        "type": "BUY" if rng.random() < 0.7 else "SELL",
+        "isin": f"ISIN{symbol}",
+        "sector": rng.choice(["Technology", "Consumer Discretionary", "Energy", "Financials"]),
+    }
+
+
+def _time_ms(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'trades':>10} {'replay (ms)':>14} {'incremental (ms)':>18}")
+    for size in HISTORY_SIZES:
+        trades = [_make_trade(rng) for _ in range(size)]
+        stored_ledger = ledger_to_doc(build_ledger_from_trades(trades))
+        new_trade = _make_trade(rng)
+
+        def replay():
+            positions_from_ledger(build_ledger_from_trades(trades + [new_trade]))
+
+        def incremental():
+            # Includes loading the stored ledger, as add-trade does
+            ledger = ledger_from_doc(stored_ledger)
+            apply_trade_to_ledger(ledger, new_trade)
+            positions_from_ledger(ledger)
+            ledger_to_doc(ledger)
+
+        print(f"{size:>10} {_time_ms(replay, REPEATS):>14.3f} {_time_ms(incremental, REPEATS):>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
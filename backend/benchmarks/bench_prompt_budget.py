@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_prompt_budget.py
+"""
+Prompt tokens per request as a conversation grows: the former prompt (all retrieved
+chunks plus the full chat history) versus the token-budgeted prompt builder.
+Tokens are counted with the builder's local approximation.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prompt_budget
+"""
+import logging
+import time
+
+from core.config import settings
+from services.prompt_builder import CONTEXT_HEADER, SYSTEM_PROMPT, build_prompt, count_prompt_tokens
+
+TURNS = [0, 10, 50, 200]
+CHUNK = "Portfolio C1/P1 positions in Technology (part 1 of 1):\n" + "\n".join(
+    f"SYM{i:03d} (ISIN US{i:010d}): quantity 120, average price 150.00, market price 170.00, market value 20,400.00" for i in range(20)
+)
+ANSWER = "Your Technology weight is 42.10% against a model weight of 30.00%, so the drift of 12.10% exceeds the 5.00% threshold. " * 3
+
+
+def _conversation(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}: how did the Technology drift change after the last trade?"})
+        history.append({"role": "assistant", "content": ANSWER})
+    return history
+
+
+def main():
+    logging.disable(logging.INFO)
+    chunks = [CHUNK.replace("part 1", f"part {i}") for i in range(settings.RAG_QUERY_TOP_K)]
+    print(f"budget {settings.PROMPT_TOKEN_BUDGET} tokens, {len(chunks)} retrieved chunks")
+    print(f"{'turns':>6} {'unbounded':>10} {'budgeted':>9} {'chunks':>7} {'recent':>7} {'summarized':>11} {'build ms':>9}")
+    for turns in TURNS:
+        history = _conversation(turns)
+        unbounded = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": CONTEXT_HEADER + "\n".join(chunks)},
+            *history,
+            {"role": "user", "content": "And now?"},
+        ]
+        start = time.perf_counter()
+        build = build_prompt(
+            "And now?", history, chunks,
+            token_budget=settings.PROMPT_TOKEN_BUDGET,
+            history_share=settings.PROMPT_HISTORY_SHARE,
+            recent_messages=settings.PROMPT_RECENT_HISTORY_MESSAGES,
+            summary_tokens=settings.PROMPT_HISTORY_SUMMARY_TOKENS,
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"{turns:>6} {count_prompt_tokens(unbounded):>10,} {build.prompt_tokens:>9,} {build.context_chunks:>7} "
+            f"{build.recent_messages:>7} {build.summarized_messages:>11} {build_ms:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
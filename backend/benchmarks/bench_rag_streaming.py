@@ -0,0 +1,112 @@
+# backend/benchmarks/bench_rag_streaming.py
+"""
+Time to first byte of /rag/ask (complete answer in one JSON response) versus
+/rag/ask/.../stream (Server-Sent Events forwarding tokens as they are produced).
+
+The LLM is a local fake that streams ANSWER_TOKENS tokens after FIRST_TOKEN_SECONDS,
+one every TOKEN_INTERVAL_SECONDS; retrieval runs against an in-memory ChromaDB.
+The app is driven at the ASGI level, so the time of every body chunk is observed
+(httpx's ASGI transport would buffer the whole response).
+
+Run from the backend directory:
+    python -m benchmarks.bench_rag_streaming
+"""
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+import chromadb
+from fastapi import FastAPI
+
+import rag_service
+from routers import rag
+
+FIRST_TOKEN_SECONDS = 0.4
+TOKEN_INTERVAL_SECONDS = 0.02
+ANSWER_TOKENS = 100
+REQUESTS = 5
+
+
+class _FakeStream:
+    async def __aiter__(self):
+        await asyncio.sleep(FIRST_TOKEN_SECONDS)
+        for index in range(ANSWER_TOKENS):
+            if index:
+                await asyncio.sleep(TOKEN_INTERVAL_SECONDS)
+            delta = type("delta", (object,), {"content": f" token{index}"})()
+            yield type("chunk", (object,), {"choices": [type("choice", (object,), {"delta": delta})()]})()
+
+    async def close(self):
+        pass
+
+
+class _FakeLLMClient:
+    def __init__(self):
+        self.chat = type("chat", (object,), {"completions": self})()
+
+    async def create(self, model, messages, stream=False):
+        if stream:
+            return _FakeStream()
+        # The complete response arrives once the last token has been generated
+        await asyncio.sleep(FIRST_TOKEN_SECONDS + (ANSWER_TOKENS - 1) * TOKEN_INTERVAL_SECONDS)
+        content = "".join(f" token{index}" for index in range(ANSWER_TOKENS))
+        message = type("message", (object,), {"content": content})()
+        return type("completion", (object,), {"choices": [type("choice", (object,), {"message": message})()]})()
+
+
+async def _request(app: FastAPI, path: str, question: str):
+    """Returns (ms to the first non-empty body chunk, ms to the end of the response)."""
+    body = json.dumps({"question": question, "chat_history": []}).encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    received = asyncio.Event()
+    first_byte = []
+
+    async def receive():
+        if not received.is_set():
+            received.set()
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait() # No disconnect while the response is sent
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            assert message["status"] == 200, message
+        elif message["type"] == "http.response.body" and message.get("body") and not first_byte:
+            first_byte.append(time.perf_counter())
+
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    return (first_byte[0] - start) * 1000, (time.perf_counter() - start) * 1000
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    rag_service.settings.ANSWER_CACHE_ENABLED = False # Every request must reach the LLM
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name="bench-rag-streaming", embedding_function=None)
+    rag_service.set_rag_components(client, lambda texts: [[float(len(t) % 7), 1.0, 0.5] for t in texts], collection)
+    rag_service.set_openai_client(_FakeLLMClient())
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "compliance_report": "ok", "positions": []}
+    await rag_service.ingest_portfolio_analysis("C1", portfolio, "No violations.", "P1")
+
+    app = FastAPI()
+    app.include_router(rag.router, prefix="/rag")
+    print(f"fake LLM: first token after {FIRST_TOKEN_SECONDS * 1000:.0f} ms, {ANSWER_TOKENS} tokens every {TOKEN_INTERVAL_SECONDS * 1000:.0f} ms")
+    print(f"{'endpoint':<12} {'TTFB p50 ms':>12} {'TTFB max ms':>12} {'total p50 ms':>13}")
+    for label, path in (("/ask", "/rag/ask/C1/P1"), ("/ask/stream", "/rag/ask/C1/P1/stream")):
+        timings = [await _request(app, path, f"Question {i}") for i in range(REQUESTS)]
+        ttfb = [t for t, _ in timings]
+        print(f"{label:<12} {statistics.median(ttfb):>12.1f} {max(ttfb):>12.1f} {statistics.median(t for _, t in timings):>13.1f}")
+
+    client.delete_collection(collection.name)
+    rag_service.shutdown_rag_executors()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+# backend/benchmarks/bench_rag_versioning.py
+"""
+Collection size and query latency after repeated re-analysis, for the previous
+append-per-analysis ingestion (timestamped ids) and the versioned upsert.
+Uses an in-memory ChromaDB client with random 384-dimensional embeddings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_rag_versioning
+"""
+import logging
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from rag_service import _IngestEntry, _portfolio_document_id, _replace_portfolio_documents
+from services.vector_store import ChromaVectorStore
+
+PORTFOLIOS = 50
+REANALYSES = [1, 10, 40]
+DIMENSIONS = 384
+QUERIES = 200
+
+
+def _ingest(collection, mode: str, round_number: int, rng: np.random.Generator):
+    embeddings = rng.random((PORTFOLIOS, DIMENSIONS), dtype=np.float32)
+    if mode == "append":
+        collection.add(
+            ids=[f"C{i}-P1-{round_number:06d}" for i in range(PORTFOLIOS)],
+            documents=[f"C{i} report {round_number}" for i in range(PORTFOLIOS)],
+            embeddings=embeddings,
+            metadatas=[{"client_id": f"C{i}", "portfolio_id": "P1"} for i in range(PORTFOLIOS)],
+        )
+    else:
+        _replace_portfolio_documents(ChromaVectorStore(collection), [
+            _IngestEntry(
+                client_id=f"C{i}", portfolio_id="P1", version=round_number,
+                ids=[_portfolio_document_id(f"C{i}", "P1", "summary")], documents=[f"C{i} report {round_number}"],
+                embeddings=[embeddings[i]], metadatas=[{"client_id": f"C{i}", "portfolio_id": "P1"}],
+            )
+            for i in range(PORTFOLIOS)
+        ])
+
+
+def _query_stats(collection, rounds: int, rng: np.random.Generator):
+    start = time.perf_counter()
+    current = 0
+    for q in range(QUERIES):
+        result = collection.query(
+            query_embeddings=[rng.random(DIMENSIONS, dtype=np.float32)],
+            n_results=5,
+            where={"$and": [{"client_id": f"C{q % PORTFOLIOS}"}, {"portfolio_id": "P1"}]},
+        )
+        documents = result["documents"][0]
+        current += sum(document.endswith(f"report {rounds}") for document in documents) / len(documents)
+    return (time.perf_counter() - start) / QUERIES * 1000, current / QUERIES
+
+
+def main():
+    logging.disable(logging.WARNING)
+    client = chromadb.EphemeralClient()
+    rng = np.random.default_rng(42)
+    print(f"{'re-analyses':>11} {'mode':>9} {'documents':>10} {'query (ms)':>11} {'current in top 5':>17}")
+    for rounds in REANALYSES:
+        for mode in ("append", "versioned"):
+            collection = client.create_collection(name=f"bench-{uuid.uuid4().hex}", embedding_function=None)
+            for round_number in range(1, rounds + 1):
+                _ingest(collection, mode, round_number, rng)
+            latency_ms, current_share = _query_stats(collection, rounds, rng)
+            print(f"{rounds:>11} {mode:>9} {collection.count():>10} {latency_ms:>11.2f} {current_share:>16.0%}")
+            client.delete_collection(collection.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_report_chunking.py
+"""
+Compares the LLM context size of the former single-document ingestion (whole report,
+positions list and analysis dict in one document) with section-level chunks, of which
+only the top RAG_QUERY_TOP_K are retrieved per question.
+
+Run from the backend directory:
+    python -m benchmarks.bench_report_chunking
+"""
+import logging
+import random
+import time
+
+from core.config import settings
+from services.portfolio_analysis import analyze_positions
+from services.report_chunker import chunk_portfolio_report
+
+POSITION_COUNTS = [10, 100, 1_000]
+SECTORS = ["Technology", "Consumer Discretionary", "Energy", "Financials", "Health Care"]
+
+
+def _make_portfolio(n: int, rng: random.Random):
+    positions = [
+        {
+            "symbol": f"SYM{i:05d}",
+            "isin": f"ISIN{i:08d}",
+            "sector": rng.choice(SECTORS),
+            "quantity": rng.randint(1, 150),
+            "avg_price": rng.uniform(5, 500),
+            "market_price": rng.uniform(5, 500),
+        }
+        for i in range(n)
+    ]
+    analysis, report = analyze_positions(positions)
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "positions": positions, "analysis": analysis, "compliance_report": report}
+    return portfolio, report
+
+
+def _single_document(portfolio: dict, report) -> str:
+    """The document built per portfolio before chunking."""
+    return f"Client ID: C1\n" \
+           f"Portfolio ID: P1\n" \
+           f"Compliance Report Summary: {report}\n" \
+           f"Portfolio Details: {portfolio.get('compliance_report', '')}\n" \
+           f"Positions: {portfolio.get('positions', [])}\n" \
+           f"Analysis: {portfolio.get('analysis', {})}"
+
+
+def main():
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    top_k = settings.RAG_QUERY_TOP_K
+    print(f"{'positions':>10} {'single doc (chars)':>19} {'chunks':>7} {f'top-{top_k} worst (chars)':>21} {'reduction':>10} {'chunk (ms)':>11}")
+    for count in POSITION_COUNTS:
+        portfolio, report = _make_portfolio(count, rng)
+        single = len(_single_document(portfolio, report))
+        start = time.perf_counter()
+        chunks = chunk_portfolio_report("C1", "P1", portfolio, report)
+        chunk_ms = (time.perf_counter() - start) * 1000
+        # Worst case: the largest top_k chunks are the ones retrieved
+        context = sum(sorted((len(c.text) for c in chunks), reverse=True)[:top_k])
+        print(f"{count:>10} {single:>19,} {len(chunks):>7} {context:>21,} {single / context:>9.1f}x {chunk_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# backend/benchmarks/bench_startup.py
+"""
+Cold start of the backend with eager versus lazy (background) loading of the RAG components.
+
+Starts `uvicorn main:app` in a subprocess per mode and reports:
+- serving: seconds until GET / answers (the app accepts traffic),
+- rag ready: seconds until /health reports the RAG components as loaded,
+- RSS: resident and peak resident memory of the server once ready (from /proc).
+
+Needs the full environment (sentence-transformers, MongoDB for the portfolio seeding at
+startup). To measure the code before a change, check it out elsewhere and pass its
+backend directory, e.g.:
+    git worktree add /tmp/before <commit>
+    python -m benchmarks.bench_startup --app-dir /tmp/before/backend
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+PORT = 8765
+TIMEOUT_SECONDS = 300
+POLL_SECONDS = 0.05
+
+
+def _memory_mb(pid: int) -> dict:
+    """VmRSS and VmHWM (peak RSS) of a process, in MB (Linux only)."""
+    memory = {}
+    with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "VmHWM"):
+                memory[name] = int(value.split()[0]) / 1024
+    return memory
+
+
+def _wait_for(client: httpx.Client, path: str, is_done, process: subprocess.Popen, start: float) -> float:
+    while time.perf_counter() - start < TIMEOUT_SECONDS:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before {path} was ready.")
+        try:
+            response = client.get(f"http://127.0.0.1:{PORT}{path}")
+            if is_done(response):
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_SECONDS)
+    raise TimeoutError(f"{path} not ready after {TIMEOUT_SECONDS} s.")
+
+
+def _rag_ready(response: httpx.Response) -> bool:
+    if response.status_code == 404:
+        return True # Code without /health: the RAG components are loaded before serving
+    rag = response.json()["rag"]
+    if rag["status"] == "failed":
+        raise RuntimeError(f"Loading the RAG components failed: {rag['error']}")
+    return rag["status"] == "ready"
+
+
+def measure(app_dir: str, lazy: bool) -> dict:
+    env = {**os.environ, "RAG_LAZY_INIT": str(lazy).lower(), "RAG_COMPACT_ON_STARTUP": "false"}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(timeout=5) as client:
+            serving = _wait_for(client, "/", lambda r: r.status_code == 200, process, start)
+            ready = _wait_for(client, "/health", _rag_ready, process, start)
+        return {"serving": serving, "ready": ready, **_memory_mb(process.pid)}
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'serving s':>10} {'rag ready s':>12} {'RSS MB':>8} {'peak MB':>8}")
+    for lazy in (False, True):
+        result = measure(args.app_dir, lazy)
+        print(f"{'lazy' if lazy else 'eager':<8} {result['serving']:>10.2f} {result['ready']:>12.2f} {result['VmRSS']:>8.0f} {result['VmHWM']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
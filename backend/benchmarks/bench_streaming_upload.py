@@ -0,0 +1,106 @@
+# backend/benchmarks/bench_streaming_upload.py
+"""
+Peak RSS (and wall time) of a portfolio upload, by file size, for the whole-file
+path (/upload: read + json.loads + aggregate) and the streaming path (/upload/stream).
+
+Each measurement runs in a fresh subprocess, since peak RSS never goes down.
+Run from the backend directory:
+    python -m benchmarks.bench_streaming_upload
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+TRADE_COUNTS = [50_000, 200_000, 500_000]
+SYMBOLS = [f"SYM{i:04d}" for i in range(2_000)]
+SECTORS = ["Technology", "Consumer Discretionary", "Energy", "Financials", "Health Care"]
+CHUNK_SIZE = 64 * 1024
+
+
+class _AsyncFile:
+    """Async read(size) over a binary file, like FastAPI's UploadFile."""
+    def __init__(self, f):
+        self._f = f
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._f.read(size)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _write_upload(path: str, trade_count: int):
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"client_id": "BENCH", "portfolio_id": "P1", "trades": [')
+        for i in range(trade_count):
+            trade = {
+                "trade_id": f"T{i}",
+                "symbol": rng.choice(SYMBOLS),
+                "sector": rng.choice(SECTORS),
+                "type": "BUY" if rng.random() < 0.7 else "SELL",
+                "quantity": rng.randint(1, 500),
+                "price": round(rng.uniform(5, 500), 2),
+                "trade_date": "2024-01-02",
+            }
+            f.write(("," if i else "") + json.dumps(trade))
+        f.write("]}")
+
+
+def _run_child(mode: str, path: str):
+    logging.disable(logging.INFO)
+    from services.portfolio_analysis import aggregate_streamed_portfolio, prepare_uploaded_portfolio
+    from utils.upload_parsing import iter_portfolio_upload
+
+    baseline_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        if mode == "whole":
+            portfolio = prepare_uploaded_portfolio(json.loads(f.read()))
+        else:
+            portfolio = asyncio.run(aggregate_streamed_portfolio(iter_portfolio_upload(_AsyncFile(f), CHUNK_SIZE)))
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "peak_mb": _peak_rss_mb(), "baseline_mb": baseline_mb, "seconds": seconds, "positions": len(portfolio["positions"]),
+    }))
+
+
+def _measure(mode: str, path: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_streaming_upload", "--child", mode, path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print(f"{'trades':>8} {'file (MB)':>10} {'whole peak (MB)':>16} {'stream peak (MB)':>17} {'saved':>7} {'whole (s)':>10} {'stream (s)':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in TRADE_COUNTS:
+            path = os.path.join(tmp, f"upload_{count}.json")
+            _write_upload(path, count)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            whole = _measure("whole", path)
+            stream = _measure("stream", path)
+            assert whole["positions"] == stream["positions"]
+            saved = 1 - (stream["peak_mb"] - stream["baseline_mb"]) / (whole["peak_mb"] - whole["baseline_mb"])
+            print(
+                f"{count:>8} {size_mb:>10.1f} {whole['peak_mb']:>16.1f} {stream['peak_mb']:>17.1f} {saved:>6.0%}"
+                f" {whole['seconds']:>10.2f} {stream['seconds']:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        _run_child(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,144 @@
+# backend/benchmarks/bench_trade_coalescing.py
+"""
+A burst of fills for one portfolio: synchronous add-trade (one re-analysis, portfolio write
+and RAG ingest per trade) versus write-behind (services.trade_coalescer), which acknowledges
+each trade at once and applies the buffered trades as one batch per window.
+
+The portfolio analysis runs for real. MongoDB is an in-memory collection with a simulated
+round trip of ROUND_TRIP_SECONDS per call, and the RAG ingest (chunking, embedding, Chroma
+upsert) is modeled as INGEST_SECONDS. Fills arrive every ARRIVAL_SECONDS. Reported:
+acknowledgement latency, the time until the last trade is durable, and the work done.
+
+Run from the backend directory (fill counts as arguments):
+    python -m benchmarks.bench_trade_coalescing [fills ...]
+"""
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+from bson import ObjectId
+
+import crud.portfolio_crud as portfolio_crud
+import services.portfolio_service as portfolio_service
+from core.config import settings
+from schemas.portfolio_models import TradeIn
+from services.portfolio_analysis import build_ledger
+from services.position_ledger import ledger_to_doc, positions_from_ledger
+
+FILL_COUNTS = [200, 1_000]
+SYMBOLS = 200
+ARRIVAL_SECONDS = 0.005
+ROUND_TRIP_SECONDS = 0.001
+INGEST_SECONDS = 0.05
+WINDOW_SECONDS = 0.25
+
+_counts = {"writes": 0, "ingests": 0}
+
+
+class _Result:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args):
+        return self
+
+    def limit(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        return [dict(doc) for doc in self.docs]
+
+
+class _SimulatedCollection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+
+    def find(self, filter, projection=None):
+        return _Cursor([d for d in self.docs if all(d.get(k) == v for k, v in filter.items())])
+
+    async def insert_many(self, docs):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        self.docs.extend(docs)
+
+    async def update_one(self, filter, update):
+        await asyncio.sleep(ROUND_TRIP_SECONDS)
+        _counts["writes"] += 1
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in filter.items()):
+                doc.update(update.get("$set", {}))
+                return _Result(1)
+        return _Result(0)
+
+
+async def _simulated_ingest(*args, **kwargs):
+    _counts["ingests"] += 1
+    await asyncio.sleep(INGEST_SECONDS)
+
+
+def _setup():
+    trades = [{"symbol": f"SYM{i:03d}", "isin": f"US{i:010d}", "quantity": 100.0, "price": 50.0, "type": "BUY",
+               "sector": ["Technology", "Healthcare", "Financials", "Energy"][i % 4]} for i in range(SYMBOLS)]
+    ledger = build_ledger(trades)
+    portfolio = {"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-01", "trades_externalized": True,
+                 "trade_count": SYMBOLS, "position_ledger": ledger_to_doc(ledger), "positions": positions_from_ledger(ledger), "analysis_version": 1}
+    portfolio_crud.portfolio_collection = _SimulatedCollection([portfolio])
+    portfolio_crud.trade_collection = _SimulatedCollection()
+    portfolio_service.ingest_portfolio_analysis = _simulated_ingest
+    portfolio_service._trade_coalescer = None
+    _counts.update(writes=0, ingests=0)
+
+
+def _fill(i: int) -> TradeIn:
+    return TradeIn(symbol=f"SYM{i % SYMBOLS:03d}", isin=f"US{i % SYMBOLS:010d}", quantity=1.0, price=51.0, sector="Technology")
+
+
+async def _run(fills: int, write_behind: bool) -> tuple:
+    _setup()
+    ack_ms = []
+
+    async def submit(i: int):
+        start = time.perf_counter()
+        if write_behind:
+            portfolio_service.enqueue_trade("C1", "P1", _fill(i))
+        else:
+            await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", _fill(i))
+        ack_ms.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    tasks = []
+    for i in range(fills):
+        tasks.append(asyncio.create_task(submit(i)))
+        await asyncio.sleep(ARRIVAL_SECONDS)
+    await asyncio.gather(*tasks)
+    if write_behind:
+        await portfolio_service.wait_for_trade_durability("C1", "P1", fills, timeout=None)
+    durable_seconds = time.perf_counter() - start
+    ack_ms.sort()
+    return statistics.median(ack_ms), ack_ms[int(len(ack_ms) * 0.99) - 1], durable_seconds
+
+
+async def main():
+    logging.disable(logging.WARNING)
+    settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED = False
+    settings.TRADE_COLLECTION_ENABLED = True
+    settings.ADD_TRADE_COALESCE_WINDOW_SECONDS = WINDOW_SECONDS
+    counts = [int(arg) for arg in sys.argv[1:]] or FILL_COUNTS
+    print(f"{SYMBOLS} positions, a fill every {ARRIVAL_SECONDS * 1000:.0f} ms, {ROUND_TRIP_SECONDS * 1000:.0f} ms round trip, "
+          f"{INGEST_SECONDS * 1000:.0f} ms ingest, {WINDOW_SECONDS * 1000:.0f} ms window")
+    print(f"{'fills':>6} {'mode':<13} {'ack p50 ms':>11} {'ack p99 ms':>11} {'all durable s':>14} {'writes':>7} {'ingests':>8}")
+    for fills in counts:
+        for label, write_behind in (("synchronous", False), ("write-behind", True)):
+            p50, p99, durable = await _run(fills, write_behind)
+            print(f"{fills:>6,} {label:<13} {p50:>11.2f} {p99:>11.2f} {durable:>14.2f} {_counts['writes']:>7,} {_counts['ingests']:>8,}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+# backend/benchmarks/bench_trade_storage.py
+"""
+Bytes written to MongoDB per add-trade: replacing the whole portfolio document with its
+embedded trades (before) versus inserting one trade document into the trades collection
+plus an update of the changed fields (crud.portfolio_crud.update_portfolio_changes).
+
+The payload is the BSON encoding of the command documents the driver sends; the encode
+time is measured with bson.encode as the driver does it. The server additionally rewrites
+the whole stored document (and its oplog entry) on a replace, so the gap on disk is larger.
+
+Run from the backend directory (trade counts as arguments):
+    python -m benchmarks.bench_trade_storage [trades ...]
+"""
+import asyncio
+import logging
+import sys
+import time
+import uuid
+
+import bson
+
+from benchmarks.bench_portfolio_reads import _portfolio
+from crud.portfolio_crud import compute_portfolio_update
+from services.portfolio_service import _reanalyze_with_trades
+
+TRADE_COUNTS = [100, 10_000, 100_000]
+ENCODES = 20
+
+
+def _encode_ms(document: dict) -> tuple:
+    start = time.perf_counter()
+    for _ in range(ENCODES):
+        payload = bson.encode(document)
+    return len(payload), (time.perf_counter() - start) * 1000 / ENCODES
+
+
+def main():
+    logging.disable(logging.INFO)
+    counts = [int(arg) for arg in sys.argv[1:]] or TRADE_COUNTS
+    print(f"{'trades':>8} {'replace KB':>11} {'replace ms':>11} {'insert+$set KB':>15} {'insert+$set ms':>15} {'ratio':>7}")
+    for trades_count in counts:
+        doc = _portfolio(trades_count)
+        trade = {**doc["trades"][0], "trade_id": str(uuid.uuid4())}
+        original = {field: value for field, value in doc.items() if field != "trades"}
+        updated = dict(original)
+        asyncio.run(_reanalyze_with_trades("C1", "P1", updated, [trade], None))
+        updated["trade_count"] = trades_count + 1
+        doc["trades"].append(trade)
+        doc.update(updated)
+
+        replace_bytes, replace_ms = _encode_ms({"q": {"_id": doc["_id"]}, "u": doc})
+        insert_bytes, insert_ms = _encode_ms({"documents": [{**trade, "client_id": "C1", "portfolio_id": "P1"}]})
+        set_bytes, set_ms = _encode_ms({"q": {"_id": doc["_id"]}, "u": compute_portfolio_update(original, updated)})
+        after_bytes = insert_bytes + set_bytes
+        print(f"{trades_count:>8,} {replace_bytes / 1024:>11,.1f} {replace_ms:>11.2f} {after_bytes / 1024:>15,.1f} "
+              f"{insert_ms + set_ms:>15.2f} {replace_bytes / after_bytes:>6.0f}x")
+
+
+if __name__ == "__main__":
+    main()
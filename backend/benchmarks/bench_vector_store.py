@@ -0,0 +1,105 @@
+# backend/benchmarks/bench_vector_store.py
+"""
+Per-portfolio top-k query latency of the ChromaDB backend (one global collection with a
+client_id/portfolio_id metadata filter) versus the partitioned local backend (one NumPy
+matrix per portfolio, exact cosine top-k), as the total number of documents grows.
+
+Pass document counts as arguments to override the defaults, e.g. for 1M documents:
+    python -m benchmarks.bench_vector_store 1000000
+(about 1.5 GB of vectors per backend at 384 dimensions, and a ChromaDB insert of roughly
+half an hour on one core). --skip-chroma measures the local backend alone.
+
+Run from the backend directory:
+    python -m benchmarks.bench_vector_store
+"""
+import argparse
+import logging
+import statistics
+import time
+import uuid
+
+import chromadb
+import numpy as np
+
+from services.vector_store import ChromaVectorStore, PartitionedVectorStore
+
+DOCUMENT_COUNTS = [10_000, 100_000]
+DIMENSIONS = 384 # all-MiniLM-L6-v2
+CHUNKS_PER_PORTFOLIO = 20
+QUERIES = 200
+TOP_K = 5
+INSERT_BATCH = 5000 # Below ChromaDB's maximum batch size
+
+
+def _batches(count: int, rng: np.random.Generator):
+    """Yields (ids, documents, embeddings, metadatas) batches of documents for count // CHUNKS_PER_PORTFOLIO portfolios."""
+    for start in range(0, count, INSERT_BATCH):
+        rows = range(start, min(start + INSERT_BATCH, count))
+        keys = [(f"C{row // CHUNKS_PER_PORTFOLIO:07d}", "P1") for row in rows]
+        yield (
+            [f"{c}|{p}#{row % CHUNKS_PER_PORTFOLIO}" for (c, p), row in zip(keys, rows)],
+            [f"document {row}" for row in rows],
+            rng.normal(size=(len(rows), DIMENSIONS)).astype(np.float32),
+            [{"client_id": c, "portfolio_id": p, "analysis_version": 1} for c, p in keys],
+        )
+
+
+def _fill(store, count: int) -> float:
+    rng = np.random.default_rng(7) # Same documents for both backends
+    start = time.perf_counter()
+    for ids, documents, embeddings, metadatas in _batches(count, rng):
+        store.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+    return time.perf_counter() - start
+
+
+def _query_latencies(store, queries: list) -> tuple:
+    latencies, results = [], []
+    for client_id, embedding in queries:
+        start = time.perf_counter()
+        documents, _ = store.query(client_id, "P1", embedding, TOP_K)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(documents)
+    latencies.sort()
+    return latencies, results
+
+
+def main():
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("counts", nargs="*", type=int, default=DOCUMENT_COUNTS)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+    print(f"{DIMENSIONS} dimensions, {CHUNKS_PER_PORTFOLIO} documents per portfolio, top {TOP_K} of one portfolio per query")
+    print(f"{'documents':>10} {'backend':<12} {'insert s':>9} {'p50 ms':>8} {'p95 ms':>8} {'agreement':>10}")
+    for count in args.counts:
+        rng = np.random.default_rng(11)
+        portfolios = count // CHUNKS_PER_PORTFOLIO
+        queries = [(f"C{rng.integers(portfolios):07d}", rng.normal(size=DIMENSIONS).astype(np.float32).tolist()) for _ in range(QUERIES)]
+
+        local = PartitionedVectorStore()
+        local_insert = _fill(local, count)
+        local_latencies, exact = _query_latencies(local, queries)
+        rows = [("local", local_insert, local_latencies, "exact")]
+
+        if not args.skip_chroma:
+            rows.insert(0, _run_chroma(count, queries, exact))
+        for backend, insert, latencies, overlap in rows:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{count:>10,} {backend:<12} {insert:>9.1f} {statistics.median(latencies):>8.2f} {p95:>8.2f} {overlap:>10}")
+        del local
+
+
+def _run_chroma(count: int, queries: list, exact: list) -> tuple:
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"bench-{uuid.uuid4().hex}", embedding_function=None, metadata={"hnsw:space": "cosine"})
+    chroma = ChromaVectorStore(collection)
+    chroma_insert = _fill(chroma, count)
+    chroma_latencies, approximate = _query_latencies(chroma, queries)
+    # Share of the exact top-k documents that ChromaDB returned as well
+    agreement = statistics.mean(len(set(a) & set(e)) / len(e) for a, e in zip(approximate, exact))
+    client.delete_collection(collection.name)
+    return "chroma", chroma_insert, chroma_latencies, f"{agreement:.1%}"
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,97 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str # This should be set in your .env or environment variables
     ENV: str = "development" # Added ENV setting with a default value
 
+    # Replay the full trade history on every add-trade and compare it with the incremental ledger
+    POSITION_LEDGER_VERIFY: bool = False
+    # Trade count from which uploads are aggregated with the columnar NumPy engine
+    COLUMNAR_AGGREGATION_MIN_TRADES: int = 5000
+
+    # Create the MongoDB indexes (latest-portfolio lookups, unique portfolio keys) at startup
+    MONGO_CREATE_INDEXES_ON_STARTUP: bool = True
+    # Keep the latest document of each portfolio in a "portfolios_current" collection as well,
+    # so latest-state reads are single-key lookups instead of a sorted query on all versions
+    PORTFOLIO_CURRENT_COLLECTION_ENABLED: bool = False
+    # Store trades in the "trades" collection (one document each) instead of an embedded array
+    # that is rewritten on every add-trade; portfolios stored with embedded trades are moved
+    # over on their next add-trade
+    TRADE_COLLECTION_ENABLED: bool = True
+
+    # Add-trade: attempts when the portfolio was written concurrently (by another process; calls
+    # within one process are serialized per portfolio), with a random backoff of up to
+    # attempt * ADD_TRADE_RETRY_BACKOFF_SECONDS between them
+    ADD_TRADE_MAX_ATTEMPTS: int = 5
+    ADD_TRADE_RETRY_BACKOFF_SECONDS: float = 0.05
+
+    # Write-behind add-trade: trades are acknowledged with a sequence number right away and
+    # buffered per portfolio; each portfolio's buffer is applied with one re-analysis, write and
+    # RAG ingest after the window, or as soon as it holds ADD_TRADE_COALESCE_MAX_TRADES trades
+    ADD_TRADE_WRITE_BEHIND: bool = False
+    ADD_TRADE_COALESCE_WINDOW_SECONDS: float = 0.25
+    ADD_TRADE_COALESCE_MAX_TRADES: int = 500
+    # How long the durability status of a write-behind trade is kept once resolved, and at most
+    # how many statuses are kept per portfolio (older ones are dropped first)
+    ADD_TRADE_STATUS_RETENTION_SECONDS: float = 3600.0
+    ADD_TRADE_STATUS_MAX_PER_PORTFOLIO: int = 10_000
+
+    # /portfolios listing: largest page size, and documents fetched per cursor batch while streaming
+    PORTFOLIO_LIST_MAX_LIMIT: int = 1000
+    PORTFOLIO_LIST_BATCH_SIZE: int = 500
+
+    # Batch uploads: worker processes for the CPU-bound analysis (1 runs it in-process)
+    BATCH_UPLOAD_PROCESS_WORKERS: int = 4
+    # Maximum number of documents per ChromaDB collection.add call
+    RAG_INGEST_BATCH_SIZE: int = 256
+
+    # Bytes read per chunk when a portfolio upload is parsed incrementally
+    UPLOAD_STREAM_CHUNK_SIZE: int = 64 * 1024
+
+    # RAG concurrency: thread pool sizes for the blocking embedding and ChromaDB calls,
+    # and the maximum number of OpenAI requests in flight per worker
+    RAG_EMBEDDING_WORKERS: int = 2
+    RAG_CHROMA_WORKERS: int = 4
+    OPENAI_MAX_CONCURRENT_REQUESTS: int = 8
+
+    # Embedding micro-batching: concurrent requests are grouped for up to this many
+    # milliseconds, or until this many texts are waiting, and embedded in one forward pass
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0
+    EMBEDDING_BATCH_MAX_SIZE: int = 64
+
+    # Embedding cache keyed by sha256(model name + text): an in-memory LRU tier and,
+    # if a path is set (e.g. "./embedding_cache.sqlite3"), a persistent SQLite tier
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_DB_PATH: str = ""
+
+    # Remove superseded RAG analysis documents in the background at startup
+    RAG_COMPACT_ON_STARTUP: bool = True
+
+    # Load the ChromaDB client, embedding model and collection in the background after startup,
+    # so non-RAG routes are served right away; RAG questions wait at most
+    # RAG_WARMUP_QUERY_WAIT_SECONDS for them and get a 503 after that
+    RAG_LAZY_INIT: bool = True
+    RAG_WARMUP_QUERY_WAIT_SECONDS: float = 2.0
+
+    # Vector store for RAG documents: "chroma" (one global ChromaDB collection filtered by
+    # metadata) or "local" (NumPy partitions per portfolio, saved under RAG_LOCAL_INDEX_PATH
+    # if set; see services/vector_store.py)
+    RAG_VECTOR_BACKEND: str = "chroma"
+    RAG_LOCAL_INDEX_PATH: str = "./vector_index"
+
+    # Number of report chunks retrieved as context for a RAG question
+    RAG_QUERY_TOP_K: int = 5
+
+    # Cache of RAG answers keyed by portfolio analysis version, normalized question and chat history
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+
+    # LLM prompt token budget (question, context chunks and chat history); the most recent
+    # messages are kept verbatim within a share of it, older ones are shortened into a summary
+    PROMPT_TOKEN_BUDGET: int = 3000
+    PROMPT_HISTORY_SHARE: float = 0.3
+    PROMPT_RECENT_HISTORY_MESSAGES: int = 6
+    PROMPT_HISTORY_SUMMARY_TOKENS: int = 40
+
     # CORS settings - Consider making these more restrictive in production
     CORS_ALLOW_ORIGINS: list[str] = ["*"]
     CORS_ALLOW_CREDENTIALS: bool = True
@@ -1,11 +1,288 @@
 # crud/portfolio_crud.py
 import logging
 from bson import ObjectId
-from db.mongo import portfolio_collection
-from typing import List, Dict, Optional
+from pymongo import ASCENDING, DESCENDING, DeleteMany, InsertOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from core.config import settings
+from db.mongo import portfolio_collection, portfolio_current_collection, trade_collection
+from typing import AsyncIterator, List, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+PORTFOLIO_KEY_INDEX = "client_id_portfolio_id_unique"
+PORTFOLIO_LOOKUP_INDEX = "client_id_portfolio_id_uploaded_at"
+TRADE_LOOKUP_INDEX = "client_id_portfolio_id_trade_date"
+TRADE_SEQUENCE_INDEX = "client_id_portfolio_id_seq"
+# Position of each stored trade in its portfolio's history (0, 1, ...): the order trades were added in
+TRADE_SEQUENCE_FIELD = "seq"
+# Set on portfolio documents whose trades are in the trades collection rather than embedded
+TRADES_EXTERNALIZED = "trades_externalized"
+_TRADE_INSERT_CHUNK = 10_000
+_DUPLICATE_KEY_ERROR = 11000
+# Incremented by every write of a portfolio's analysis; partial updates only apply on the version they read
+PORTFOLIO_VERSION_FIELD = "analysis_version"
+
+# Fields of the summary endpoint; reading only these skips the trades, positions and analysis
+SUMMARY_PROJECTION = {"_id": 1, "client_id": 1, "portfolio_id": 1, "date": 1, "uploaded_at": 1}
+_MAX_SLICE = 2**31 - 1
+
+# --- Current-state collection (settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED) ---
+
+async def _sync_current_docs(docs: list[dict]):
+    """
+    Makes each written document (which must have its _id) the current one of its portfolio,
+    unless the current document has a newer analysis_version: syncs of concurrent writes may
+    run in either order, and the newest version wins. If that fails, the portfolio's current
+    document is removed, so reads fall back to the portfolios collection instead of serving a stale one.
+    """
+    if not settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED or not docs:
+        return
+    operations = []
+    for doc in docs:
+        key = {"client_id": doc["client_id"], "portfolio_id": doc["portfolio_id"]}
+        # Matches current documents of the same or an older version (or none)
+        not_newer = {PORTFOLIO_VERSION_FIELD: {"$not": {"$gt": doc.get(PORTFOLIO_VERSION_FIELD, 0)}}}
+        # A new document of the portfolio replaces the current one, which has another _id
+        operations.append(DeleteMany({**key, "_id": {"$ne": doc["_id"]}, **not_newer}))
+        # With a newer current document, the upsert hits the _id or unique key index instead
+        operations.append(ReplaceOne({"_id": doc["_id"], **not_newer}, doc, upsert=True))
+    try:
+        while operations:
+            try:
+                await portfolio_current_collection.bulk_write(operations, ordered=True)
+                break
+            except BulkWriteError as e:
+                error = e.details["writeErrors"][0]
+                if error.get("code") != _DUPLICATE_KEY_ERROR:
+                    raise
+                # The current document is newer than this one: keep it and sync the rest
+                operations = operations[error["index"] + 1:]
+    except Exception as e:
+        logger.error(f"Failed to update the current documents of {len(docs)} portfolios: {e}", exc_info=True)
+        keys = [{"client_id": doc["client_id"], "portfolio_id": doc["portfolio_id"]} for doc in docs]
+        try:
+            await portfolio_current_collection.delete_many({"$or": keys})
+        except Exception as cleanup_error:
+            logger.error(f"Failed to remove the stale current documents: {cleanup_error}")
+
+async def _find_latest_portfolio_doc(client_id: str, portfolio_id: str, projection: Optional[dict] = None) -> dict | None:
+    """
+    The latest document of a portfolio: a single-key lookup in the current collection if enabled,
+    falling back to the newest version in the portfolios collection (which then fills the
+    current collection for full-document reads).
+    """
+    key = {"client_id": client_id, "portfolio_id": portfolio_id}
+    if settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED:
+        doc = await portfolio_current_collection.find_one(key, projection)
+        if doc is not None:
+            return doc
+    docs = await portfolio_collection.find(key, projection).sort("uploaded_at", -1).limit(1).to_list(length=1)
+    doc = docs[0] if docs else None
+    if doc is not None and projection is None and settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED:
+        try:
+            # $setOnInsert never overwrites a newer document synced meanwhile
+            await portfolio_current_collection.update_one({"_id": doc["_id"]}, {"$setOnInsert": doc}, upsert=True)
+        except Exception as e:
+            logger.warning(f"Could not backfill the current document of {client_id}/{portfolio_id}: {e}")
+    return doc
+
+# --- Trades collection (settings.TRADE_COLLECTION_ENABLED) ---
+
+def _portfolio_key(doc: dict) -> dict:
+    return {"client_id": doc["client_id"], "portfolio_id": doc["portfolio_id"]}
+
+def _stored_trade(trade: dict, key: dict, seq: int) -> dict:
+    return {**{field: value for field, value in trade.items() if field != "_id"}, **key, TRADE_SEQUENCE_FIELD: seq}
+
+async def _replace_trades(docs: list[dict]):
+    """Replaces the stored trades of each portfolio document by its "trades" list, in the trades collection."""
+    if not docs:
+        return
+    await trade_collection.delete_many({"$or": [_portfolio_key(doc) for doc in docs]})
+    trade_docs = [
+        _stored_trade(trade, _portfolio_key(doc), seq)
+        for doc in docs for seq, trade in enumerate(doc["trades"])
+    ]
+    for start in range(0, len(trade_docs), _TRADE_INSERT_CHUNK):
+        await trade_collection.insert_many(trade_docs[start:start + _TRADE_INSERT_CHUNK], ordered=False)
+
+async def _externalize_trades(docs: list[dict]) -> list[dict]:
+    """
+    Writes the trades of the documents to the trades collection and returns copies of the
+    documents without them (with the trades_externalized flag and a trade_count).
+    Documents are returned unchanged if the trades collection is disabled or they carry no trades list.
+    """
+    if not settings.TRADE_COLLECTION_ENABLED:
+        return docs
+    with_trades = [doc for doc in docs if isinstance(doc.get("trades"), list)]
+    # Trades first: a stored document never points at trades that are not written yet
+    await _replace_trades(with_trades)
+    return [
+        {**{field: value for field, value in doc.items() if field != "trades"}, TRADES_EXTERNALIZED: True, "trade_count": len(doc["trades"])}
+        if isinstance(doc.get("trades"), list) else doc
+        for doc in docs
+    ]
+
+_TRADE_PROJECTION = {"_id": 0, "client_id": 0, "portfolio_id": 0, TRADE_SEQUENCE_FIELD: 0}
+
+def _trades_sort():
+    return [("trade_date", ASCENDING), ("_id", ASCENDING)]
+
+async def list_portfolio_trades(client_id: str, portfolio_id: str, skip: int = 0, limit: Optional[int] = None) -> list:
+    """Trades of the portfolio from the trades collection, by trade date (then insertion order)."""
+    cursor = trade_collection.find(
+        {"client_id": client_id, "portfolio_id": portfolio_id}, _TRADE_PROJECTION
+    ).sort(_trades_sort()).skip(skip)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=None)
+
+async def get_trade_history(client_id: str, portfolio_id: str) -> list:
+    """
+    All trades of the portfolio from the trades collection in the order they were added, which
+    the position ledger depends on (average cost, latest price): for replaying positions.
+    """
+    cursor = trade_collection.find(
+        {"client_id": client_id, "portfolio_id": portfolio_id}, _TRADE_PROJECTION
+    ).sort([(TRADE_SEQUENCE_FIELD, ASCENDING), ("_id", ASCENDING)])
+    return await cursor.to_list(length=None)
+
+async def get_trades_page(client_id: str, portfolio_id: str, skip: int = 0, limit: Optional[int] = None) -> list | None:
+    """
+    trades[skip:skip + limit] of the portfolio (all by default), or None if it does not exist.
+    Reads the trades collection for migrated portfolios, else the embedded array, sliced with $slice.
+    """
+    doc = await get_portfolio_fields(client_id, portfolio_id, {TRADES_EXTERNALIZED: 1, **trades_projection(skip, limit)})
+    if doc is None:
+        return None
+    if doc.get(TRADES_EXTERNALIZED):
+        return await list_portfolio_trades(client_id, portfolio_id, skip, limit)
+    return doc.get("trades") or []
+
+async def get_portfolio_without_trades(client_id: str, portfolio_id: str) -> dict | None:
+    """Retrieves the latest portfolio document without its embedded trades (if it still has them)."""
+    return await _find_latest_portfolio_doc(client_id, portfolio_id, {"trades": 0})
+
+async def migrate_embedded_trades(client_id: str, portfolio_id: str, mongo_id: ObjectId) -> int:
+    """
+    Moves a portfolio's embedded trades to the trades collection and removes the array from
+    its document. Safe to repeat if interrupted: the stored trades are replaced each time.
+    Returns the number of trades moved.
+    """
+    docs = await portfolio_collection.find({"_id": mongo_id}, {"trades": 1, "client_id": 1, "portfolio_id": 1}).to_list(length=1)
+    if not docs:
+        return 0
+    trades = docs[0].get("trades") or []
+    await _replace_trades([{"client_id": client_id, "portfolio_id": portfolio_id, "trades": trades}])
+    update = {"$unset": {"trades": ""}, "$set": {TRADES_EXTERNALIZED: True, "trade_count": len(trades)}}
+    await portfolio_collection.update_one({"_id": mongo_id}, update)
+    await _update_current_doc(mongo_id, update)
+    logger.info(f"Moved {len(trades)} embedded trades of {client_id}/{portfolio_id} to the trades collection.")
+    return len(trades)
+
+async def insert_portfolio_trades(client_id: str, portfolio_id: str, trades: list[dict], first_seq: int):
+    """
+    Appends trades to the trades collection in one write, numbered from first_seq (the number
+    of trades already stored). The trade dicts themselves are not modified.
+    """
+    key = {"client_id": client_id, "portfolio_id": portfolio_id}
+    await trade_collection.insert_many([_stored_trade(trade, key, first_seq + index) for index, trade in enumerate(trades)])
+
+async def delete_portfolio_trades(client_id: str, portfolio_id: str, trade_ids: list[str]):
+    await trade_collection.delete_many({"client_id": client_id, "portfolio_id": portfolio_id, "trade_id": {"$in": trade_ids}})
+
+async def _update_current_doc(mongo_id: ObjectId, update: dict, expected: Optional[dict] = None):
+    """
+    Applies an update to the portfolio's current document too. With expected (e.g. the
+    analysis_version the update was made on), a current document that does not match it is
+    stale and is dropped rather than updated, as it is on failure.
+    """
+    if not settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED:
+        return
+    try:
+        result = await portfolio_current_collection.update_one({"_id": mongo_id, **(expected or {})}, update)
+        if expected and not result.matched_count:
+            # Stale or missing: reads fall back to the portfolios collection and backfill it
+            await portfolio_current_collection.delete_one({"_id": mongo_id})
+    except Exception as e:
+        logger.error(f"Failed to update the current document {mongo_id}: {e}", exc_info=True)
+        await portfolio_current_collection.delete_one({"_id": mongo_id})
+
+def _is_appended(original, updated) -> bool:
+    return (
+        isinstance(original, list) and isinstance(updated, list)
+        and len(updated) > len(original) and updated[:len(original)] == original
+    )
+
+def compute_portfolio_update(original: dict, updated: dict) -> dict:
+    """
+    The minimal update turning the original document into the updated one, by top-level field:
+    $push for lists that only had items appended, $set for other changed fields and $unset
+    for removed ones. _id is never part of it. An empty dict means nothing changed.
+    """
+    update: dict = {}
+    for field, value in updated.items():
+        if field == "_id" or (field in original and original[field] == value):
+            continue
+        if _is_appended(original.get(field), value):
+            update.setdefault("$push", {})[field] = {"$each": value[len(original[field]):]}
+        else:
+            update.setdefault("$set", {})[field] = value
+    removed = [field for field in original if field not in updated and field != "_id"]
+    if removed:
+        update["$unset"] = {field: "" for field in removed}
+    return update
+
+async def update_portfolio_changes(mongo_id: str | ObjectId, original: dict, updated: dict) -> bool:
+    """
+    Writes only what changed between the loaded document and its updated copy (see
+    compute_portfolio_update) instead of replacing the document. The update applies only if
+    the stored analysis_version is still the one that was loaded, so a concurrent write is
+    not overwritten; the version is incremented if the update does not already change it.
+    Returns False if the portfolio is gone or was written in the meantime.
+    """
+    try:
+        object_id = ObjectId(mongo_id)
+    except Exception:
+        logger.warning(f"Invalid ID format for MongoDB update: {mongo_id}. Must be a valid ObjectId string.")
+        return False
+    update = compute_portfolio_update(original, updated)
+    if not update:
+        return True
+    version = original.get(PORTFOLIO_VERSION_FIELD)
+    if PORTFOLIO_VERSION_FIELD not in update.get("$set", {}):
+        update.setdefault("$set", {})[PORTFOLIO_VERSION_FIELD] = (version or 0) + 1
+    # A missing version matches null, i.e. documents stored before versioning
+    result = await portfolio_collection.update_one({"_id": object_id, PORTFOLIO_VERSION_FIELD: version}, update)
+    if not result.matched_count:
+        logger.warning(f"Portfolio {mongo_id} was not updated: it no longer exists or is no longer at version {version}.")
+        return False
+    await _update_current_doc(object_id, update, {PORTFOLIO_VERSION_FIELD: version})
+    return True
+
+async def ensure_portfolio_indexes():
+    """
+    Creates the indexes the queries rely on, if they do not exist: the latest-version lookup
+    index on (client_id, portfolio_id, uploaded_at desc), the unique portfolio key index, the
+    trades lookup index on (client_id, portfolio_id, trade_date), the trade history index on
+    (client_id, portfolio_id, seq) and, with the current collection enabled, its unique key index.
+    """
+    await portfolio_collection.create_index(
+        [("client_id", ASCENDING), ("portfolio_id", ASCENDING), ("uploaded_at", DESCENDING)], name=PORTFOLIO_LOOKUP_INDEX
+    )
+    await ensure_portfolio_key_index()
+    await trade_collection.create_index(
+        [("client_id", ASCENDING), ("portfolio_id", ASCENDING), ("trade_date", ASCENDING), ("_id", ASCENDING)], name=TRADE_LOOKUP_INDEX
+    )
+    await trade_collection.create_index(
+        [("client_id", ASCENDING), ("portfolio_id", ASCENDING), (TRADE_SEQUENCE_FIELD, ASCENDING), ("_id", ASCENDING)], name=TRADE_SEQUENCE_INDEX
+    )
+    if settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED:
+        await portfolio_current_collection.create_index(
+            [("client_id", ASCENDING), ("portfolio_id", ASCENDING)], unique=True, name=PORTFOLIO_KEY_INDEX
+        )
+    logger.info("MongoDB portfolio indexes are in place.")
+
 async def create_portfolio_doc(portfolio_data: dict) -> str:
     """Inserts a new portfolio document into the database."""
     # Ensure client_id and portfolio_id are present for unique identification later
@@ -23,7 +300,10 @@ async def create_portfolio_doc(portfolio_data: dict) -> str:
     #     # You might want to return existing ID or raise an error
     #     return str(existing_portfolio["_id"])
 
-    result = await portfolio_collection.insert_one(portfolio_data)
+    doc = (await _externalize_trades([portfolio_data]))[0]
+    result = await portfolio_collection.insert_one(doc)
+    portfolio_data["_id"] = result.inserted_id
+    await _sync_current_docs([{**doc, "_id": result.inserted_id}])
     return str(result.inserted_id)
 
 async def get_portfolio_doc_by_mongodb_id(mongo_id: str) -> dict | None:
@@ -43,17 +323,25 @@ async def get_portfolio_by_client_and_portfolio_id(client_id: str, portfolio_id:
     ordered by 'uploaded_at' in descending order.
     """
     logger.info(f"Attempting to retrieve portfolio for client '{client_id}', portfolio '{portfolio_id}'")
-    doc = await portfolio_collection.find(
-        {"client_id": client_id, "portfolio_id": portfolio_id}
-    ).sort("uploaded_at", -1).limit(1).to_list(length=1) # Get the latest one
+    doc = await _find_latest_portfolio_doc(client_id, portfolio_id)
 
     if doc:
         logger.info(f"Portfolio found for client '{client_id}', portfolio '{portfolio_id}'.")
-        return doc[0]
+        return doc
     else:
         logger.info(f"No portfolio found for client '{client_id}', portfolio '{portfolio_id}'.")
         return None
 
+async def get_portfolio_analysis_doc(client_id: str, portfolio_id: str) -> dict | None:
+    """
+    Retrieves the analysis, compliance report, analysis version and position values of the latest portfolio document,
+    without trades or other position fields.
+    """
+    return await _find_latest_portfolio_doc(client_id, portfolio_id, {
+        "analysis": 1, "compliance_report": 1, "analysis_version": 1, "_id": 0,
+        "positions.sector": 1, "positions.quantity": 1, "positions.market_price": 1,
+    })
+
 async def update_portfolio_doc(mongo_id: str, update_data: dict) -> bool:
     """
     Updates an existing portfolio document identified by its MongoDB ObjectId.
@@ -67,27 +355,109 @@ async def update_portfolio_doc(mongo_id: str, update_data: dict) -> bool:
     # Ensure _id is not in update_data if it's coming from an external source to prevent replacing it
     update_data_copy = update_data.copy()
     update_data_copy.pop("_id", None) # Remove _id if present in the data to be replaced
+    update_data_copy = (await _externalize_trades([update_data_copy]))[0]
     result = await portfolio_collection.replace_one({"_id": object_id}, update_data_copy)
+    if result.matched_count:
+        await _sync_current_docs([{**update_data_copy, "_id": object_id}])
     return result.modified_count > 0
 
+async def get_latest_portfolio_versions(keys: list[tuple[str, str]]) -> dict[tuple[str, str], tuple[ObjectId, int]]:
+    """
+    Looks up the MongoDB ObjectId and analysis_version of the latest document for many
+    (client_id, portfolio_id) keys with a single query.
+    """
+    if not keys:
+        return {}
+    cursor = portfolio_collection.find(
+        {"$or": [{"client_id": c, "portfolio_id": p} for c, p in set(keys)]},
+        {"_id": 1, "client_id": 1, "portfolio_id": 1, "uploaded_at": 1, "analysis_version": 1}
+    ).sort("uploaded_at", -1)
+
+    latest = {}
+    async for doc in cursor:
+        # Sorted latest first, so the first document seen per key wins
+        latest.setdefault((doc["client_id"], doc["portfolio_id"]), (doc["_id"], doc.get("analysis_version", 0)))
+    return latest
+
+async def bulk_save_portfolio_docs(writes: list[tuple[ObjectId, dict, bool]]) -> dict[int, str]:
+    """
+    Saves many portfolio documents with one unordered bulk_write.
+    Each write is (mongo_id, document, exists): existing documents are replaced,
+    new ones are inserted with the given _id.
+    Returns error messages keyed by the index of each write that failed.
+    """
+    if not writes:
+        return {}
+    operations = []
+    written_docs = []
+    docs = await _externalize_trades([doc for _, doc, _ in writes])
+    for (mongo_id, _, exists), doc in zip(writes, docs):
+        doc_copy = doc.copy()
+        doc_copy.pop("_id", None)
+        written_docs.append({"_id": mongo_id, **doc_copy})
+        if exists:
+            operations.append(ReplaceOne({"_id": mongo_id}, doc_copy))
+        else:
+            operations.append(InsertOne({"_id": mongo_id, **doc_copy}))
+    errors = {}
+    try:
+        await portfolio_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        write_errors = e.details.get("writeErrors", [])
+        logger.error(f"Bulk write of {len(operations)} portfolio documents had {len(write_errors)} errors.")
+        errors = {error["index"]: error.get("errmsg", "Write failed") for error in write_errors}
+    await _sync_current_docs([doc for index, doc in enumerate(written_docs) if index not in errors])
+    return errors
+
+async def iter_portfolio_summaries(after: Optional[ObjectId] = None, limit: Optional[int] = None) -> AsyncIterator[dict]:
+    """
+    Yields the summary fields of the portfolio documents in _id order, fetched from the
+    cursor in batches. Keyset pagination: pass the _id of the last document of the previous
+    page as after (no skip, so every page is an index range scan).
+    """
+    cursor = portfolio_collection.find(
+        {"_id": {"$gt": after}} if after is not None else {}, SUMMARY_PROJECTION
+    ).sort("_id", ASCENDING).batch_size(settings.PORTFOLIO_LIST_BATCH_SIZE)
+    if limit is not None:
+        cursor = cursor.limit(limit)
+    async for doc in cursor:
+        yield doc
+
 async def get_all_portfolio_docs() -> list:
     """Retrieves all portfolio documents."""
     cursor = portfolio_collection.find({})
     return await cursor.to_list(length=None)
 
+async def get_portfolio_fields(client_id: str, portfolio_id: str, projection: dict) -> dict | None:
+    """
+    Retrieves only the projected fields of the latest portfolio document, or None if the
+    portfolio does not exist (an empty dict never comes back: _id is always included).
+    """
+    return await _find_latest_portfolio_doc(client_id, portfolio_id, {"_id": 1, **projection})
+
+async def get_portfolio_summary_doc(client_id: str, portfolio_id: str) -> dict | None:
+    """Retrieves the summary fields (ids and dates) of the latest portfolio document."""
+    return await get_portfolio_fields(client_id, portfolio_id, SUMMARY_PROJECTION)
+
+def trades_projection(skip: int = 0, limit: Optional[int] = None) -> dict:
+    """Projection of the trades array, sliced with $slice to trades[skip:skip + limit] if paged."""
+    if not skip and limit is None:
+        return {"trades": 1}
+    return {"trades": {"$slice": [skip, limit if limit is not None else _MAX_SLICE]}}
+
 async def get_positions_from_portfolio_doc(client_id: str, portfolio_id: str) -> list:
     """
     Retrieves positions for a given portfolio using client_id and portfolio_id.
     """
-    doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
+    doc = await get_portfolio_fields(client_id, portfolio_id, {"positions": 1})
     return doc.get("positions", []) if doc else []
 
-async def get_trades_from_portfolio_doc(client_id: str, portfolio_id: str) -> list:
+async def get_trades_from_portfolio_doc(client_id: str, portfolio_id: str, skip: int = 0, limit: Optional[int] = None) -> list:
     """
-    Retrieves trades for a given portfolio using client_id and portfolio_id.
+    Retrieves trades for a given portfolio using client_id and portfolio_id,
+    optionally only trades[skip:skip + limit] (paged by MongoDB, not in Python).
     """
-    doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
-    return doc.get("trades", []) if doc else []
+    return await get_trades_page(client_id, portfolio_id, skip, limit) or []
 
 async def get_historical_portfolio_data(client_id: str, portfolio_id: str) -> list[dict]:
     """
@@ -102,4 +472,58 @@ async def get_historical_portfolio_data(client_id: str, portfolio_id: str) -> li
 
     historical_data = await cursor.to_list(length=None)
     logger.info(f"Retrieved {len(historical_data)} historical records for {client_id}/{portfolio_id}.")
-    return historical_data
\ No newline at end of file
+    return historical_data
+
+async def ensure_portfolio_key_index() -> bool:
+    """
+    Creates the unique (client_id, portfolio_id) index if it does not exist yet.
+    Returns False (and logs a warning) if existing duplicate documents prevent it.
+    """
+    try:
+        await portfolio_collection.create_index(
+            [("client_id", ASCENDING), ("portfolio_id", ASCENDING)], unique=True, name=PORTFOLIO_KEY_INDEX
+        )
+        return True
+    except OperationFailure as e:
+        logger.warning(f"Could not create the unique portfolio key index (duplicate portfolios stored?): {e}")
+        return False
+
+async def get_existing_portfolio_keys(client_ids: list[str]) -> set[tuple[str, str]]:
+    """Returns the (client_id, portfolio_id) keys stored for the given clients, with a single query."""
+    if not client_ids:
+        return set()
+    cursor = portfolio_collection.find(
+        {"client_id": {"$in": list(set(client_ids))}}, {"client_id": 1, "portfolio_id": 1, "_id": 0}
+    )
+    return {(doc.get("client_id"), doc.get("portfolio_id")) async for doc in cursor}
+
+async def bulk_insert_missing_portfolio_docs(docs: list[dict]) -> tuple[int, dict[int, str]]:
+    """
+    Inserts portfolio documents whose (client_id, portfolio_id) is not stored yet, with one
+    unordered bulk_write of $setOnInsert upserts: documents that exist are left untouched.
+    Duplicate key errors (a concurrent insert of the same key) count as already stored.
+    Returns (number inserted, error messages keyed by the index of each doc that failed).
+    """
+    if not docs:
+        return 0, {}
+    docs = [{field: value for field, value in doc.items() if field != "_id"} for doc in docs]
+    operations = [
+        UpdateOne(
+            {"client_id": doc["client_id"], "portfolio_id": doc["portfolio_id"]},
+            # The key fields come from the filter on insert
+            {"$setOnInsert": {field: value for field, value in doc.items() if field not in ("client_id", "portfolio_id", "_id")}},
+            upsert=True,
+        )
+        for doc in docs
+    ]
+    try:
+        result = await portfolio_collection.bulk_write(operations, ordered=False)
+        upserted_ids, errors = result.upserted_ids or {}, {}
+    except BulkWriteError as e:
+        write_errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != _DUPLICATE_KEY_ERROR]
+        if write_errors:
+            logger.error(f"Bulk insert of {len(operations)} portfolio documents had {len(write_errors)} errors.")
+        upserted_ids = {upserted["index"]: upserted["_id"] for upserted in e.details.get("upserted", [])}
+        errors = {error["index"]: error.get("errmsg", "Write failed") for error in write_errors}
+    await _sync_current_docs([{**docs[index], "_id": mongo_id} for index, mongo_id in upserted_ids.items()])
+    return len(upserted_ids), errors
@@ -6,3 +6,7 @@ client = AsyncIOMotorClient(MONGO_URI)
 
 db = client["post_trade_db"]
 portfolio_collection = db["portfolios"]
+# Latest document per (client_id, portfolio_id), kept in sync on write (settings.PORTFOLIO_CURRENT_COLLECTION_ENABLED)
+portfolio_current_collection = db["portfolios_current"]
+# One document per trade, for portfolios whose trades are not embedded (settings.TRADE_COLLECTION_ENABLED)
+trade_collection = db["trades"]
@@ -1,20 +1,33 @@
 # backend/main.py
+import asyncio
 import logging
-import json
 import os
-from datetime import datetime
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routers import static_data
 from routers import portfolio
 from routers import rag
 import chromadb
 from chromadb.utils import embedding_functions
-from sentence_transformers import SentenceTransformer
-from rag_service import set_rag_components, set_openai_client # Import set_openai_client
-from openai import OpenAI # Import OpenAI
-from db.mongo import portfolio_collection
+from rag_service import (
+    set_rag_components,
+    set_vector_store,
+    set_rag_warmup,
+    get_rag_status,
+    set_openai_client,
+    shutdown_rag_executors,
+    close_embedding_cache,
+    compact_rag_collection,
+)
+from openai import AsyncOpenAI # Async client, so LLM calls don't block the event loop
 from core.config import settings # Import the settings object
+from services.batch_upload_service import shutdown_batch_upload_pool
+from services.vector_store import PartitionedVectorStore
+from services.rag_warmup import RagWarmup, READY
+from services.portfolio_seeding import seed_portfolios_from_file
+from services.portfolio_service import drain_trade_queue
+from crud.portfolio_crud import ensure_portfolio_indexes
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -33,33 +46,78 @@ app.add_middleware(
 )
 
 
+async def _compact_rag_collection_in_background():
+    try:
+        await compact_rag_collection()
+    except Exception as e:
+        logger.error(f"Background compaction of the RAG collection failed: {e}", exc_info=True)
+
+
+def _load_rag_components():
+    """
+    Creates the ChromaDB client, the embedding function (which loads the SentenceTransformer
+    model, once) and the collection, plus the local vector store if configured. Blocking.
+    """
+    # Initialize ChromaDB PersistentClient using settings
+    chroma_client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
+    logger.info(f"Initialized ChromaDB PersistentClient at {settings.CHROMA_DB_PATH}")
+
+    # Loads the SentenceTransformer model; the embedding function is the only user of it
+    ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=settings.EMBEDDING_MODEL_NAME)
+    logger.info(f"Loaded SentenceTransformer model '{settings.EMBEDDING_MODEL_NAME}' and created embedding function.")
+
+    # Get or create the collection for portfolio analysis using settings
+    collection = chroma_client.get_or_create_collection(
+        name=settings.CHROMA_COLLECTION_NAME,
+        embedding_function=ef,
+    )
+    logger.info(
+        f"Successfully got or created ChromaDB collection: {settings.CHROMA_COLLECTION_NAME}"
+    )
+
+    if settings.RAG_VECTOR_BACKEND == "local":
+        # Loading the saved partitions reads every .npz file
+        store = PartitionedVectorStore(settings.RAG_LOCAL_INDEX_PATH)
+        set_vector_store(store)
+        logger.info(f"Using the partitioned local vector store ({store.count()} documents).")
+
+    # Set the global RAG components in rag_service last, so they only appear once all are loaded
+    set_rag_components(chroma_client, ef, collection)
+    logger.info("RAG components passed to rag_service.")
+
+
+async def _prepare_portfolio_collections(clients_file_path: str):
+    """Creates the MongoDB indexes, then seeds the clients.json portfolios. Runs in the background."""
+    if settings.MONGO_CREATE_INDEXES_ON_STARTUP:
+        try:
+            await ensure_portfolio_indexes()
+        except Exception as e:
+            logger.error(f"Creating the MongoDB portfolio indexes failed: {e}", exc_info=True)
+    await seed_portfolios_from_file(clients_file_path)
+
+
 # Lifespan events for initializing and cleaning up resources
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup: Initializing RAG components...")
     try:
-        # Initialize ChromaDB PersistentClient using settings
-        chroma_client = chromadb.PersistentClient(path=settings.CHROMA_DB_PATH)
-        logger.info(f"Initialized ChromaDB PersistentClient at {settings.CHROMA_DB_PATH}")
-
-        # Initialize the SentenceTransformer model for embeddings using settings
-        embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL_NAME)
-        logger.info(f"Loaded SentenceTransformer model '{settings.EMBEDDING_MODEL_NAME}' and created embedding function.")
-
-        ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=settings.EMBEDDING_MODEL_NAME)
-
-        # Get or create the collection for portfolio analysis using settings
-        collection = chroma_client.get_or_create_collection(
-            name=settings.CHROMA_COLLECTION_NAME,
-            embedding_function=ef,
-        )
-        logger.info(
-            f"Successfully got or created ChromaDB collection: {settings.CHROMA_COLLECTION_NAME}"
-        )
+        if settings.RAG_VECTOR_BACKEND not in ("chroma", "local"):
+            raise ValueError(f"Unknown RAG_VECTOR_BACKEND '{settings.RAG_VECTOR_BACKEND}'; expected 'chroma' or 'local'.")
+
+        if settings.RAG_LAZY_INIT:
+            # Serve requests right away; RAG readiness is reported by /health
+            warmup = RagWarmup(_load_rag_components)
+            set_rag_warmup(warmup)
+            app.state.rag_warmup_task = warmup.start()
+            logger.info("Loading RAG components in the background.")
+        else:
+            # Loading the model and the saved partitions is blocking, so keep it off the event loop
+            await asyncio.to_thread(_load_rag_components)
 
-        # Set the global RAG components in rag_service
-        set_rag_components(chroma_client, ef, collection)
-        logger.info("RAG components passed to rag_service.")
+        # Remove analysis documents superseded before versioned ingestion, without delaying startup
+        # (compaction waits for a background warm-up itself)
+        if settings.RAG_COMPACT_ON_STARTUP:
+            app.state.rag_compaction_task = asyncio.create_task(_compact_rag_collection_in_background())
 
         # New: Initialize and set the OpenAI client
         openai_api_key = settings.OPENAI_API_KEY
@@ -70,7 +128,7 @@ async def startup_event():
             # For now, we'll let rag_service's get_openai_client handle the missing key error if accessed.
             pass
         else:
-            openai_client = OpenAI(api_key=openai_api_key)
+            openai_client = AsyncOpenAI(api_key=openai_api_key)
             set_openai_client(openai_client)
             logger.info("OpenAI client initialized and passed to rag_service.")
 
@@ -80,68 +138,18 @@ async def startup_event():
         )
         raise
 
-    # --- New: Initialize portfolios from clients.json at startup ---
-    logger.info("Initializing portfolios from clients.json if they don't exist...")
-    current_dir = os.path.dirname(__file__)
-    clients_file_path = os.path.join(current_dir, 'data', 'clients.json')
-
-    try:
-        with open(clients_file_path, "r", encoding="utf-8") as f:
-            clients_data = json.load(f)
-
-        for client_info in clients_data:
-            client_id = client_info.get("client_id")
-            portfolios = client_info.get("portfolios", [])
-
-            if not client_id:
-                logger.warning(f"Skipping client with missing 'client_id': {client_info}")
-                continue
-
-            for portfolio_info in portfolios:
-                portfolio_id = portfolio_info.get("portfolio_id")
-                if not portfolio_id:
-                    logger.warning(f"Skipping portfolio with missing 'portfolio_id' for client {client_id}: {portfolio_info}")
-                    continue
-
-                # Check if portfolio already exists in MongoDB
-                existing_portfolio = await portfolio_collection.find_one({
-                    "client_id": client_id,
-                    "portfolio_id": portfolio_id
-                })
-
-                if existing_portfolio:
-                    logger.info(f"Portfolio {client_id}/{portfolio_id} already exists. Skipping initialization.")
-                else:
-                    # Create a new empty portfolio document
-                    new_portfolio_doc = {
-                        "client_id": client_id,
-                        "portfolio_id": portfolio_id,
-                        "date": datetime.now().isoformat(),
-                        "uploaded_at": datetime.now().isoformat(),
-                        "positions": [],
-                        "trades": [],
-                        "analysis": {
-                            "policy_violations": ["No policy data available for analysis yet."],
-                            "risk_drifts": ["No risk data available for analysis yet."]
-                        }
-                    }
-                    try:
-                        result = await portfolio_collection.insert_one(new_portfolio_doc)
-                        logger.info(f"Initialized empty portfolio {client_id}/{portfolio_id} with ID: {result.inserted_id}")
-                    except Exception as e:
-                        logger.error(f"Error inserting portfolio {client_id}/{portfolio_id} at startup: {e}", exc_info=True)
-
-    except FileNotFoundError:
-        logger.error(f"Clients file not found at {clients_file_path}. Skipping portfolio initialization from JSON.")
-    except json.JSONDecodeError as e:
-        logger.error(f"Error decoding clients.json at startup: {e}. Please check file format.")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during portfolio initialization from clients.json: {e}", exc_info=True)
+    # --- Create indexes and initialize portfolios from clients.json, in the background so startup is not delayed ---
+    clients_file_path = os.path.join(os.path.dirname(__file__), 'data', 'clients.json')
+    app.state.portfolio_seeding_task = asyncio.create_task(_prepare_portfolio_collections(clients_file_path))
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown: Cleaning up resources (if any)..")
+    await drain_trade_queue()
+    shutdown_batch_upload_pool()
+    shutdown_rag_executors()
+    close_embedding_cache()
 
 
 # Include routers
@@ -155,4 +163,22 @@ def read_root():
     """
     Root endpoint to confirm the backend is running.
     """
-    return {"message": "Post-Trade Compliance Analyzer backend is running"}
\ No newline at end of file
+    return {"message": "Post-Trade Compliance Analyzer backend is running"}
+
+
+@app.get("/health")
+def health():
+    """
+    Liveness and readiness: the backend is up as soon as this responds; "rag" tells whether
+    the RAG components are loaded yet ("loading", "ready" or "failed", with the load time).
+    """
+    rag_status = get_rag_status()
+    return {"status": "ok", "ready": rag_status["status"] == READY, "rag": rag_status}
+
+
+@app.get("/health/ready")
+def readiness():
+    """Readiness probe: 200 once the RAG components are loaded, 503 before (or if loading failed)."""
+    rag_status = get_rag_status()
+    ready = rag_status["status"] == READY
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "rag": rag_status})
\ No newline at end of file
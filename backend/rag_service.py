@@ -1,14 +1,26 @@
 # backend/rag_service.py
 import chromadb
 from chromadb.utils import embedding_functions
-from openai import OpenAI
+from openai import AsyncOpenAI
+import asyncio
+import functools
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, NamedTuple, Optional
 from bson import ObjectId
 from chromadb.api import models
-from datetime import datetime
 from fastapi import HTTPException
 from core.config import settings
+from services.embedding_batcher import EmbeddingBatcher
+from services.answer_cache import AnswerCache
+from services.embedding_cache import EmbeddingCache
+from services.prompt_builder import SYSTEM_PROMPT, PromptTokenStats, build_prompt
+from services.rag_warmup import NOT_STARTED, READY
+from services.report_chunker import chunk_portfolio_report
+from services.vector_store import ChromaVectorStore
 
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,7 +30,24 @@ logger = logging.getLogger(__name__)
 _chroma_client = None
 _embedding_function = None
 _rag_collection = None
+_vector_store = None # Overrides the ChromaDB collection as the store of RAG documents (see set_vector_store)
 _openai_client = None # Global variable for OpenAI client
+_rag_warmup = None # Background loading of the components above (settings.RAG_LAZY_INIT), see set_rag_warmup
+
+# Embedding and ChromaDB calls are synchronous, so they run in bounded thread pools;
+# LLM calls go through the async OpenAI client, limited by a per-event-loop semaphore
+_embedding_executor = None
+_chroma_executor = None
+_llm_semaphores = {}
+_embedding_batcher = None
+_embedding_cache = None
+_answer_cache = None
+_prompt_stats = PromptTokenStats()
+
+# Serializes the read-check-write of versioned ingestion and compaction within this process
+_ingest_lock = threading.Lock()
+
+NO_CONTEXT_ANSWER = "No relevant information found for this portfolio and question."
 
 def set_rag_components(client: chromadb.PersistentClient, ef: embedding_functions.SentenceTransformerEmbeddingFunction, collection: models.Collection):
     """Sets the global ChromaDB client, embedding function, and collection."""
@@ -28,7 +57,7 @@ def set_rag_components(client: chromadb.PersistentClient, ef: embedding_function
     _rag_collection = collection
     logger.info("RAG components (ChromaDB client, embedding function, collection) have been set.")
 
-def set_openai_client(client: OpenAI):
+def set_openai_client(client: AsyncOpenAI):
     """Sets the global OpenAI client."""
     global _openai_client
     _openai_client = client
@@ -49,6 +78,48 @@ def get_rag_collection():
         raise RuntimeError("RAG collection not initialized. Ensure app startup event ran.")
     return _rag_collection
 
+def set_vector_store(store):
+    """Sets the vector store backend (e.g. a PartitionedVectorStore); None reverts to the ChromaDB collection."""
+    global _vector_store
+    _vector_store = store
+    logger.info(f"RAG vector store set to {type(store).__name__ if store is not None else 'the ChromaDB collection'}.")
+
+def get_vector_store():
+    """Returns the vector store holding the RAG documents (see services/vector_store.py)."""
+    if _vector_store is not None:
+        return _vector_store
+    return ChromaVectorStore(get_rag_collection())
+
+def set_rag_warmup(warmup):
+    """Sets the RagWarmup that loads the RAG components in the background (see services/rag_warmup.py)."""
+    global _rag_warmup
+    _rag_warmup = warmup
+
+def get_rag_status() -> dict:
+    """Returns whether the RAG components are loaded, for /health."""
+    if _rag_warmup is not None:
+        return _rag_warmup.status()
+    loaded = _rag_collection is not None or _vector_store is not None
+    return {"status": READY if loaded else NOT_STARTED, "seconds": None, "error": None}
+
+async def wait_for_rag_components(timeout: Optional[float] = None) -> bool:
+    """Waits up to timeout seconds (None: until done) for a background warm-up. Returns whether the components are loaded."""
+    if _rag_warmup is None:
+        return True # Loaded at startup (or set directly, e.g. in tests)
+    return await _rag_warmup.wait(timeout)
+
+async def _require_rag_components():
+    """Raises a 503 if the RAG components are still loading (or failed to load) after a short wait."""
+    if not await wait_for_rag_components(settings.RAG_WARMUP_QUERY_WAIT_SECONDS):
+        status = get_rag_status()
+        detail = "RAG components are still loading." if status["error"] is None else f"RAG components failed to load: {status['error']}"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+
+async def _wait_for_rag_ingestion():
+    """Ingestion waits for the warm-up rather than dropping an analysis."""
+    if not await wait_for_rag_components():
+        raise RuntimeError(f"RAG components failed to load: {get_rag_status()['error']}")
+
 def get_openai_client():
     global _openai_client # <--- ADDED THIS LINE
     if _openai_client is None:
@@ -58,128 +129,450 @@ def get_openai_client():
         if not openai_api_key:
             logger.error("OPENAI_API_KEY environment variable not set in settings.")
             raise Exception("OpenAI API key is not configured. Please set OPENAI_API_KEY in your environment or .env file.")
-        _openai_client = OpenAI(api_key=openai_api_key)
+        _openai_client = AsyncOpenAI(api_key=openai_api_key)
     return _openai_client
 
+def _get_embedding_executor() -> ThreadPoolExecutor:
+    global _embedding_executor
+    if _embedding_executor is None:
+        _embedding_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_EMBEDDING_WORKERS, thread_name_prefix="rag-embedding"
+        )
+    return _embedding_executor
+
+def _get_chroma_executor() -> ThreadPoolExecutor:
+    global _chroma_executor
+    if _chroma_executor is None:
+        _chroma_executor = ThreadPoolExecutor(
+            max_workers=settings.RAG_CHROMA_WORKERS, thread_name_prefix="rag-chroma"
+        )
+    return _chroma_executor
+
+def shutdown_rag_executors():
+    """Stops the embedding and ChromaDB thread pools, if they were started."""
+    global _embedding_executor, _chroma_executor
+    for executor in (_embedding_executor, _chroma_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _embedding_executor = None
+    _chroma_executor = None
+    logger.info("RAG thread pools shut down.")
+
+async def _run_in_executor(executor: ThreadPoolExecutor, fn, *args, **kwargs):
+    """Runs a blocking call in the given thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+async def _embed_in_executor(texts: list) -> list:
+    """Computes embeddings for one batch of texts in the embedding thread pool."""
+    return await _run_in_executor(_get_embedding_executor(), get_embedding_function(), texts)
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Returns the shared batcher that groups concurrent embedding requests into one forward pass."""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher(
+            _embed_in_executor,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            window_ms=settings.EMBEDDING_BATCH_WINDOW_MS,
+        )
+    return _embedding_batcher
+
+def get_embedding_cache():
+    """Returns the shared embedding cache, or None if it is disabled in settings."""
+    global _embedding_cache
+    if _embedding_cache is None and settings.EMBEDDING_CACHE_ENABLED:
+        _embedding_cache = EmbeddingCache(
+            model_name=settings.EMBEDDING_MODEL_NAME,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            db_path=settings.EMBEDDING_CACHE_DB_PATH,
+        )
+    return _embedding_cache
+
+def close_embedding_cache():
+    """Closes the persistent tier of the embedding cache, if it was opened."""
+    global _embedding_cache
+    if _embedding_cache is not None:
+        _embedding_cache.close()
+        _embedding_cache = None
+
+def get_answer_cache():
+    """Returns the shared RAG answer cache, or None if it is disabled in settings."""
+    global _answer_cache
+    if _answer_cache is None and settings.ANSWER_CACHE_ENABLED:
+        _answer_cache = AnswerCache(
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+        )
+    return _answer_cache
+
+def get_prompt_stats() -> PromptTokenStats:
+    """Returns the running prompt size statistics of this process."""
+    return _prompt_stats
+
+def _invalidate_cached_answers(entries: list):
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        for entry in entries:
+            answer_cache.invalidate_portfolio(entry.client_id.strip().upper(), entry.portfolio_id.strip().upper())
+
+async def _cache_call(cache: EmbeddingCache, fn, *args):
+    # The memory tier is cheap enough for the event loop; SQLite I/O goes to the default thread pool
+    if cache.persistent:
+        return await _run_in_executor(None, fn, *args)
+    return fn(*args)
+
+async def _embed_uncached(texts: list) -> list:
+    """Embeds texts through the batcher, split into batch-sized requests (e.g. the chunks of a large report)."""
+    batcher = get_embedding_batcher()
+    size = batcher.max_batch_size
+    if len(texts) <= size:
+        return await batcher.embed(texts)
+    parts = await asyncio.gather(*(batcher.embed(texts[start:start + size]) for start in range(0, len(texts), size)))
+    return [embedding for part in parts for embedding in part]
+
+async def _embed(texts: list) -> list:
+    """
+    Computes embeddings for the texts. Cached embeddings are reused; the rest are
+    computed in a batch with concurrent requests and added to the cache.
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return await _embed_uncached(texts)
+
+    embeddings = await _cache_call(cache, cache.lookup, texts)
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if missing:
+        computed = dict(zip(missing, await _embed_uncached(missing)))
+        await _cache_call(cache, cache.store, missing, [computed[text] for text in missing])
+        embeddings = [computed[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+    return embeddings
+
+async def _vector_store_call(fn, *args, **kwargs):
+    """Runs a blocking vector store (ChromaDB) call in the ChromaDB thread pool."""
+    return await _run_in_executor(_get_chroma_executor(), fn, *args, **kwargs)
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    # asyncio primitives belong to one event loop, so keep one semaphore per loop
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        _llm_semaphores.clear() # Drop semaphores of closed loops (e.g. between tests)
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENT_REQUESTS)
+    return semaphore
+
+async def _create_chat_completion(messages: list) -> str:
+    """Calls the chat completions API with the async client, within the concurrency limit."""
+    client = get_openai_client()
+    async with _get_llm_semaphore():
+        response = await client.chat.completions.create(
+            model="gpt-4",
+            messages=messages
+        )
+    return response.choices[0].message.content.strip()
+
+async def _stream_chat_completion(messages: list) -> AsyncIterator[str]:
+    """Streams the chat completion's content tokens; the request holds a concurrency slot until it ends."""
+    client = get_openai_client()
+    async with _get_llm_semaphore():
+        stream = await client.chat.completions.create(
+            model="gpt-4",
+            messages=messages,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Releases the HTTP connection if the consumer stops early
+            await stream.close()
+
+class _IngestEntry(NamedTuple):
+    """The documents of one portfolio analysis, ready to be written to ChromaDB."""
+    client_id: str
+    portfolio_id: str
+    version: Optional[int] # None: one above the stored version
+    ids: list
+    documents: list
+    embeddings: list
+    metadatas: list
+
+def _portfolio_document_id(client_id: str, portfolio_id: str, chunk_id: str) -> str:
+    """Stable ChromaDB id of one chunk of a portfolio's analysis; re-analysis upserts it."""
+    return f"{client_id}|{portfolio_id}#{chunk_id}"
+
+def _replace_portfolio_documents(store, entries: list) -> list:
+    """
+    Upserts the documents of each portfolio analysis under its version and deletes the
+    portfolio's superseded documents, so each portfolio keeps only its latest analysis.
+    An entry older than the stored version is skipped. Blocking; runs in the vector store pool.
+    Returns the version stored for each entry (None where it was skipped).
+    """
+    with _ingest_lock:
+        stored = store.get_stored_documents([(e.client_id, e.portfolio_id) for e in entries])
+        versions, pending, stale_ids = [], {}, []
+        for entry in entries:
+            key = (entry.client_id, entry.portfolio_id)
+            existing = stored.get(key, [])
+            current = max((version for _, version in existing), default=0)
+            version = current + 1 if entry.version is None else entry.version
+            if version < current:
+                logger.warning(
+                    f"Skipping RAG ingestion of {entry.client_id}/{entry.portfolio_id} version {version}: "
+                    f"version {current} is already stored."
+                )
+                versions.append(None)
+                continue
+            new_ids = set(entry.ids)
+            stale_ids.extend(doc_id for doc_id, _ in existing if doc_id not in new_ids)
+            metadatas = [{**metadata, "analysis_version": version} for metadata in entry.metadatas]
+            pending[key] = entry._replace(version=version, metadatas=metadatas) # A later entry for the same portfolio wins
+            stored[key] = [(doc_id, version) for doc_id in entry.ids]
+            versions.append(version)
+
+        if pending:
+            store.upsert(
+                ids=[doc_id for entry in pending.values() for doc_id in entry.ids],
+                documents=[document for entry in pending.values() for document in entry.documents],
+                embeddings=[embedding for entry in pending.values() for embedding in entry.embeddings],
+                metadatas=[metadata for entry in pending.values() for metadata in entry.metadatas],
+            )
+        upserted_ids = {doc_id for entry in pending.values() for doc_id in entry.ids}
+        stale_ids = list(dict.fromkeys(doc_id for doc_id in stale_ids if doc_id not in upserted_ids))
+        if stale_ids:
+            store.delete(stale_ids)
+        return versions
+
+def _build_ingest_entry(portfolio_data: dict, analysis_report) -> _IngestEntry:
+    """Chunks one analyzed portfolio into (not yet embedded) RAG documents."""
+    client_id = portfolio_data["client_id"]
+    portfolio_id = portfolio_data["portfolio_id"]
+    chunks = chunk_portfolio_report(client_id, portfolio_id, portfolio_data, analysis_report)
+    return _IngestEntry(
+        client_id=client_id,
+        portfolio_id=portfolio_id,
+        version=portfolio_data.get("analysis_version"),
+        ids=[_portfolio_document_id(client_id, portfolio_id, chunk.chunk_id) for chunk in chunks],
+        documents=[chunk.text for chunk in chunks],
+        embeddings=[],
+        metadatas=[{"client_id": client_id, "portfolio_id": portfolio_id, **chunk.metadata} for chunk in chunks],
+    )
+
+async def _store_ingest_entries(store, entries: list) -> list:
+    """Embeds the entries' documents in one request and writes them. Returns the stored versions."""
+    # Embed through the batcher, then write the documents with their precomputed embeddings
+    embeddings = await _embed([document for entry in entries for document in entry.documents])
+    offset = 0
+    for index, entry in enumerate(entries):
+        entries[index] = entry._replace(embeddings=list(embeddings[offset:offset + len(entry.documents)]))
+        offset += len(entry.documents)
+    versions = await _vector_store_call(_replace_portfolio_documents, store, entries)
+    # Answers about the previous analysis must not be served any more
+    _invalidate_cached_answers(entries)
+    return versions
+
 async def ingest_portfolio_analysis(client_id: str, portfolio_data: dict, analysis_report: str, portfolio_id: str):
     """
     Ingests portfolio analysis and report into ChromaDB for RAG.
-    Each portfolio document is ingested with metadata including client_id and portfolio_id.
+    The analysis is split into section chunks (see services/report_chunker.py) with stable ids,
+    upserted with the analysis version (portfolio_data["analysis_version"], or one above the
+    stored version) in their metadata; chunks of older versions are deleted.
     """
     logger.info(f"Ingesting analysis for portfolio {client_id}/{portfolio_id} into ChromaDB...")
     try:
-        collection = get_rag_collection()
+        await _wait_for_rag_ingestion()
+        store = get_vector_store()
 
         # Ensure _id is a string if it's an ObjectId for metadata
         if "_id" in portfolio_data and isinstance(portfolio_data["_id"], ObjectId):
             portfolio_data["_id"] = str(portfolio_data["_id"])
 
-        # Create a unique ID for the document in ChromaDB
-        doc_id = f"{client_id}-{portfolio_id}-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-
-        # Combine relevant data into a single string for embedding
-        document_content = f"Client ID: {client_id}\n" \
-                           f"Portfolio ID: {portfolio_id}\n" \
-                           f"Compliance Report Summary: {analysis_report}\n" \
-                           f"Portfolio Details: {portfolio_data.get('compliance_report', '')}\n" \
-                           f"Positions: {portfolio_data.get('positions', [])}\n" \
-                           f"Analysis: {portfolio_data.get('analysis', {})}"
-
-
-        # Add the document to the collection
-        collection.add(
-            documents=[document_content],
-            metadatas=[{"client_id": client_id, "portfolio_id": portfolio_id}],
-            ids=[doc_id]
-        )
-        logger.info(f"Successfully ingested analysis for portfolio {client_id}/{portfolio_id} into ChromaDB.")
+        entry = _build_ingest_entry({**portfolio_data, "client_id": client_id, "portfolio_id": portfolio_id}, analysis_report)
+        versions = await _store_ingest_entries(store, [entry])
+        if versions[0] is not None:
+            logger.info(f"Successfully ingested analysis version {versions[0]} for portfolio {client_id}/{portfolio_id} into ChromaDB.")
     except Exception as e:
         logger.error(f"Error ingesting portfolio analysis for {client_id}/{portfolio_id}: {e}", exc_info=True)
         raise
 
+async def ingest_portfolio_analyses(portfolios: list[dict]) -> dict[int, str]:
+    """
+    Ingests the analyses of many portfolios in batches of at most settings.RAG_INGEST_BATCH_SIZE
+    (one embedding request and one upsert per batch), with the same versioning as ingest_portfolio_analysis.
+    Each portfolio dict must contain client_id, portfolio_id and compliance_report.
+    Returns error messages keyed by the index of each portfolio that failed.
+    """
+    errors = {}
+    try:
+        await _wait_for_rag_ingestion()
+        store = get_vector_store()
+    except RuntimeError as e:
+        logger.error(f"Cannot ingest {len(portfolios)} portfolio analyses: {e}")
+        return {index: f"RAG ingestion failed: {e}" for index in range(len(portfolios))}
+    batch_size = max(1, settings.RAG_INGEST_BATCH_SIZE)
+
+    for start in range(0, len(portfolios), batch_size):
+        batch = portfolios[start:start + batch_size]
+        try:
+            entries = [_build_ingest_entry(portfolio_data, portfolio_data.get("compliance_report")) for portfolio_data in batch]
+            await _store_ingest_entries(store, entries)
+            logger.info(f"Ingested a batch of {len(batch)} portfolio analyses into ChromaDB.")
+        except Exception as e:
+            logger.error(f"Error ingesting a batch of {len(batch)} portfolio analyses: {e}", exc_info=True)
+            for offset in range(len(batch)):
+                errors[start + offset] = f"RAG ingestion failed: {e}"
+    return errors
+
+def _compact_store(store) -> dict:
+    """Deletes superseded documents, serialized with versioned ingestion. Blocking."""
+    with _ingest_lock:
+        return store.compact()
+
+async def compact_rag_collection() -> dict:
+    """Removes superseded analysis documents from the RAG collection and returns what was done."""
+    await _wait_for_rag_ingestion()
+    store = get_vector_store()
+    result = await _vector_store_call(_compact_store, store)
+    logger.info(
+        f"Compacted RAG collection: deleted {result['deleted']} of {result['documents_before']} documents "
+        f"across {result['portfolios']} portfolios."
+    )
+    return result
+
+async def _cached_answer_lookup(store, client_id_norm: str, portfolio_id_norm: str, question: str, chat_history: list):
+    """Returns (answer cache, cache key, cached answer or None); the cache is None if disabled in settings."""
+    answer_cache = get_answer_cache()
+    if answer_cache is None:
+        return None, None, None
+    version = await _vector_store_call(store.get_portfolio_version, client_id_norm, portfolio_id_norm)
+    cache_key = answer_cache.key(client_id_norm, portfolio_id_norm, version, question, chat_history)
+    answer = answer_cache.get(cache_key)
+    if answer is not None:
+        logger.info(f"Answered question for portfolio {portfolio_id_norm} (version {version}) from the answer cache.")
+    return answer_cache, cache_key, answer
+
+
 async def query_portfolio(client_id: str, portfolio_id: str, question: str, chat_history: list = None) -> str:
     """
     Queries the ChromaDB for information about a specific portfolio
     and uses an LLM to answer a question based on the retrieved context and chat history.
+    Answers are cached per analysis version (see services/answer_cache.py).
     """
     if chat_history is None:
         chat_history = []
+    await _require_rag_components()
 
     try:
-        collection = get_rag_collection()
-        embedding_function = get_embedding_function()
+        store = get_vector_store()
 
         # Normalize client_id and portfolio_id for consistent filtering
         client_id_norm = client_id.strip().upper()
         portfolio_id_norm = portfolio_id.strip().upper()
 
-        # Generate embedding for the *current question only* for retrieval, as history is handled by LLM context
-        query_embedding = embedding_function([question])[0]
-
-        logger.info(f"Querying ChromaDB for portfolio {portfolio_id_norm} with current question.")
-
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=5,
-            where={
-                "$and": [
-                    {"client_id": client_id_norm},
-                    {"portfolio_id": portfolio_id_norm}
-                ]
-            }
-        )
-
-        context = ""
-        if results and results["documents"]:
-            context = "\n".join(results["documents"][0])
-
-        logger.debug(f"Context retrieved from ChromaDB for portfolio {portfolio_id_norm}: {context}")
-
-        if not context:
-            logger.warning(f"No relevant context found for portfolio {portfolio_id_norm} and question.")
-            # If no relevant context from RAG, try to answer based on chat history if available
-            if chat_history:
-                client = get_openai_client() # Use the new getter
-                logger.info(f"Calling OpenAI GPT-4 with chat history for portfolio {portfolio_id_norm} (no RAG context).")
-                messages = [{"role": m["role"], "content": m["content"]} for m in chat_history]
-                messages.append({"role": "user", "content": question})
-                response = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=messages
-                )
-                answer = response.choices[0].message.content.strip()
-                logger.info(f"Successfully received answer from OpenAI (no RAG context) for portfolio {portfolio_id_norm}.")
-                return answer
-            else:
-                return "No relevant information found for this portfolio and question."
-
-        # Prepare messages for OpenAI, including context and chat history
-        messages = [{"role": "system", "content": "You are a compliance assistant. Use the provided portfolio report and conversation history to answer the user's questions concisely and accurately."}]
-
-        # Add retrieved context as part of the system message or as a separate message
-        messages.append({"role": "system", "content": f"Here is the relevant portfolio report information:\n{context}"})
-
-        # Append previous chat history
-        for message in chat_history:
-            messages.append({"role": message["role"], "content": message["content"]})
-
-        # Append the current question
-        messages.append({"role": "user", "content": question})
-
-        logger.debug(f"Generated messages for LLM:\n{messages}")
-
-        client = get_openai_client() # Use the new getter
-
-        logger.info(f"Calling OpenAI GPT-4 for portfolio {portfolio_id_norm} with RAG context and chat history...")
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages
-        )
-
-        answer = response.choices[0].message.content.strip()
-        logger.info(f"Successfully received answer from OpenAI for portfolio {portfolio_id_norm}.")
+        answer_cache, cache_key, answer = await _cached_answer_lookup(store, client_id_norm, portfolio_id_norm, question, chat_history)
+        if answer is not None:
+            return answer
+
+        start = time.perf_counter()
+        messages = await _build_llm_messages(store, client_id_norm, portfolio_id_norm, question, chat_history)
+        if messages is None:
+            answer = NO_CONTEXT_ANSWER
+        else:
+            logger.info(f"Calling OpenAI GPT-4 for portfolio {portfolio_id_norm}...")
+            answer = await _create_chat_completion(messages)
+            logger.info(f"Successfully received answer from OpenAI for portfolio {portfolio_id_norm}.")
+        if answer_cache is not None:
+            answer_cache.put(cache_key, answer, time.perf_counter() - start)
         return answer
 
     except Exception as e:
         logger.error(f"Error during RAG query or OpenAI call for portfolio {client_id}/{portfolio_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error processing RAG query: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing RAG query: {e}")
+
+
+async def stream_portfolio_answer(client_id: str, portfolio_id: str, question: str, chat_history: list = None) -> AsyncIterator[str]:
+    """
+    Streaming variant of query_portfolio: same retrieval, context and answer cache, but yields
+    the answer's tokens as the LLM produces them. A cached or no-context answer is yielded whole.
+    Errors are raised to the caller (routers/rag.py turns them into an HTTP 500 or an SSE error event).
+    """
+    chat_history = chat_history or []
+    await _require_rag_components()
+    store = get_vector_store()
+    client_id_norm = client_id.strip().upper()
+    portfolio_id_norm = portfolio_id.strip().upper()
+
+    answer_cache, cache_key, answer = await _cached_answer_lookup(store, client_id_norm, portfolio_id_norm, question, chat_history)
+    if answer is not None:
+        yield answer
+        return
+
+    start = time.perf_counter()
+    messages = await _build_llm_messages(store, client_id_norm, portfolio_id_norm, question, chat_history)
+    if messages is None:
+        answer = NO_CONTEXT_ANSWER
+        yield answer
+    else:
+        logger.info(f"Streaming OpenAI GPT-4 answer for portfolio {portfolio_id_norm}...")
+        parts = []
+        async for token in _stream_chat_completion(messages):
+            if not parts:
+                # Match the stripped answer of the non-streaming path
+                token = token.lstrip()
+                if not token:
+                    continue
+            parts.append(token)
+            yield token
+        answer = "".join(parts).strip()
+        logger.info(f"Finished streaming answer from OpenAI for portfolio {portfolio_id_norm}.")
+    # Only a completely streamed answer is cached; a disconnected client closes this generator before
+    if answer_cache is not None:
+        answer_cache.put(cache_key, answer, time.perf_counter() - start)
+
+
+async def _build_llm_messages(store, client_id_norm: str, portfolio_id_norm: str, question: str, chat_history: list) -> Optional[list]:
+    """
+    Retrieves the portfolio's most relevant report chunks and builds the LLM messages.
+    Returns None if there is neither context nor chat history to answer from.
+    """
+    # Generate embedding for the *current question only* for retrieval, as history is handled by LLM context
+    query_embedding = (await _embed([question]))[0]
+
+    logger.info(f"Querying the vector store for portfolio {portfolio_id_norm} with current question.")
+
+    documents, distances = await _vector_store_call(
+        store.query, client_id_norm, portfolio_id_norm, query_embedding, settings.RAG_QUERY_TOP_K
+    )
+
+    logger.debug(f"Context retrieved from the vector store for portfolio {portfolio_id_norm}: {documents}")
+
+    if not documents:
+        logger.warning(f"No relevant context found for portfolio {portfolio_id_norm} and question.")
+        # If no relevant context from RAG, try to answer based on chat history if available
+        if not chat_history:
+            return None
+        logger.info(f"Answering from chat history only for portfolio {portfolio_id_norm} (no RAG context).")
+
+    # Context chunks, chat history and the question, within the prompt token budget
+    build = build_prompt(
+        question,
+        chat_history,
+        documents,
+        distances,
+        system_prompt=SYSTEM_PROMPT if documents else None,
+        token_budget=settings.PROMPT_TOKEN_BUDGET,
+        history_share=settings.PROMPT_HISTORY_SHARE,
+        recent_messages=settings.PROMPT_RECENT_HISTORY_MESSAGES,
+        summary_tokens=settings.PROMPT_HISTORY_SUMMARY_TOKENS,
+    )
+    _prompt_stats.record(build)
+    logger.info(
+        f"Prompt for portfolio {portfolio_id_norm}: {build.prompt_tokens} tokens (budget {settings.PROMPT_TOKEN_BUDGET}), "
+        f"{build.context_chunks} context chunks ({build.dropped_chunks} dropped, {build.duplicate_chunks} duplicates), "
+        f"{build.recent_messages} recent and {build.summarized_messages} summarized history messages ({build.dropped_messages} dropped)."
+    )
+    messages = build.messages
+
+    logger.debug(f"Generated messages for LLM:\n{messages}")
+    return messages
@@ -1,22 +1,35 @@
 # routers/portfolio.py
+import json
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List, Dict, Any # Added 'Dict', 'Any' for historical data response
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Dict, Any, AsyncIterator, Optional # Added 'Dict', 'Any' for historical data response
 
 from schemas.portfolio_models import TradeIn, Position, Trade # Import models
 from services.portfolio_service import ( # Import service functions
     process_uploaded_portfolio_data,
-    add_trade_and_reanalyze_portfolio
+    process_streamed_portfolio_upload,
+    add_trade_and_reanalyze_portfolio,
+    enqueue_trade,
+    wait_for_trade_durability,
 )
+from services.batch_upload_service import process_portfolio_batch
+from utils.upload_parsing import parse_portfolio_batch, iter_portfolio_upload
+from core.config import settings
 from crud.portfolio_crud import ( # Import CRUD functions for direct data retrieval
     get_portfolio_by_client_and_portfolio_id, # Corrected import name
     get_portfolio_doc_by_mongodb_id,
-    get_all_portfolio_docs, # NEW: Import for listing all portfolios
-    get_positions_from_portfolio_doc,
-    get_trades_from_portfolio_doc,
+    iter_portfolio_summaries, # Keyset-paginated listing of all portfolios
+    get_portfolio_fields,
+    get_portfolio_summary_doc,
+    get_trades_page,
+    list_portfolio_trades,
+    TRADES_EXTERNALIZED,
     get_historical_portfolio_data # Import for historical data
 )
-from utils.serializers import serialize_portfolio_summary, serialize_portfolio_detail # For response serialization
+from utils.serializers import serialize_portfolio_summary, serialize_portfolio_detail, serialize_portfolio_list_item # For response serialization
 from datetime import datetime, date # Import datetime and date for type checking
 
 router = APIRouter()
@@ -56,10 +69,65 @@ async def upload_portfolio(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 
+@router.post("/upload/stream")
+async def upload_portfolio_stream(file: UploadFile = File(...)):
+    """
+    Uploads a portfolio like /upload, but parses the file incrementally: a portfolio JSON
+    object whose trades array is streamed, or NDJSON with the portfolio object on the first
+    line and one trade per following line. Suited to large trade blotters.
+    """
+    logger.info(f"Endpoint: Received streaming upload request for file: {file.filename}")
+    try:
+        records = iter_portfolio_upload(file, settings.UPLOAD_STREAM_CHUNK_SIZE)
+        result = await process_streamed_portfolio_upload(records)
+        logger.info(f"Successfully processed streamed portfolio for {result['client_id']}/{result['portfolio_id']}")
+        return {"message": "Portfolio uploaded and processed successfully", "data": result}
+    except ValueError as e:
+        logger.error(f"Validation error processing streamed portfolio: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        logger.error(f"Runtime error processing streamed portfolio: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error processing streamed portfolio: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+
+@router.post("/upload/batch")
+async def upload_portfolio_batch(file: UploadFile = File(...)):
+    """
+    Uploads many portfolios at once, as a JSON array or NDJSON (one portfolio per line).
+    Reports a result or an error for each portfolio instead of failing the whole batch.
+    """
+    logger.info(f"Endpoint: Received batch upload request for file: {file.filename}")
+    file_content = await file.read()
+    try:
+        entries = parse_portfolio_batch(file_content)
+    except ValueError as e:
+        logger.error(f"Batch upload could not be parsed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    if not entries:
+        raise HTTPException(status_code=400, detail="Batch upload contains no portfolios.")
+
+    try:
+        results = await process_portfolio_batch(entries)
+    except Exception as e:
+        logger.error(f"Unexpected error processing batch upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    return {
+        "message": f"Processed {succeeded} of {len(results)} portfolios successfully",
+        "summary": {"total": len(results), "succeeded": succeeded, "failed": len(results) - succeeded},
+        "results": results,
+    }
+
+
 @router.get("/portfolio/{client_id}/{portfolio_id}/summary")
 async def get_portfolio_summary(client_id: str, portfolio_id: str):
     logger.info(f"Endpoint: Fetching summary for portfolio {client_id}/{portfolio_id}")
-    portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
+    # Only the summary fields are read, not the trades, positions and analysis
+    portfolio_doc = await get_portfolio_summary_doc(client_id, portfolio_id)
     if not portfolio_doc:
         logger.warning(f"Portfolio {client_id}/{portfolio_id} not found.")
         raise HTTPException(status_code=404, detail="Portfolio not found")
@@ -74,13 +142,23 @@ async def get_portfolio_detail(client_id: str, portfolio_id: str):
     portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
     if not portfolio_doc:
         raise HTTPException(status_code=404, detail="Portfolio not found")
+    if portfolio_doc.get(TRADES_EXTERNALIZED):
+        portfolio_doc["trades"] = await list_portfolio_trades(client_id, portfolio_id)
     
     detail_data = serialize_portfolio_detail(portfolio_doc)
     return detail_data
 
 @router.post("/portfolio/{client_id}/{portfolio_id}/add-trade")
 async def add_trade(client_id: str, portfolio_id: str, trade: TradeIn):
+    """
+    Adds the trade and re-analyzes the portfolio. In write-behind mode (ADD_TRADE_WRITE_BEHIND)
+    the trade is only accepted (202) with a sequence number; GET .../trades/{sequence}/durability
+    tells when it is written.
+    """
     logger.info(f"Endpoint: Adding trade to portfolio {client_id}/{portfolio_id}.")
+    if settings.ADD_TRADE_WRITE_BEHIND:
+        accepted = enqueue_trade(client_id, portfolio_id, trade)
+        return JSONResponse(status_code=202, content={"message": "Trade accepted; it is written with the next batch", "data": accepted})
     try:
         result = await add_trade_and_reanalyze_portfolio(client_id, portfolio_id, trade)
         logger.info(f"Successfully added trade to portfolio {client_id}/{portfolio_id}.")
@@ -95,47 +173,101 @@ async def add_trade(client_id: str, portfolio_id: str, trade: TradeIn):
         logger.error(f"Unexpected error adding trade: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
+@router.get("/portfolio/{client_id}/{portfolio_id}/trades/{sequence}/durability")
+async def get_trade_durability(
+    client_id: str,
+    portfolio_id: str,
+    sequence: int,
+    timeout: float = Query(10.0, ge=0, le=60, description="Seconds to wait for the trade to be written"),
+):
+    """Waits until a write-behind trade is written (or failed) and returns its status: durable, failed or pending."""
+    try:
+        return await wait_for_trade_durability(client_id, portfolio_id, sequence, timeout)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.get("/portfolio/{client_id}/{portfolio_id}/positions", response_model=List[Position])
 async def get_portfolio_positions(client_id: str, portfolio_id: str):
     logger.info(f"Endpoint: Fetching positions for portfolio {client_id}/{portfolio_id}")
-    positions_data = await get_positions_from_portfolio_doc(client_id, portfolio_id)
-    if not positions_data:
-        # Check if the portfolio exists at all, even if it has no positions
-        portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
-        if not portfolio_doc:
-            raise HTTPException(status_code=404, detail="Portfolio not found")
-        return []
-    return [Position(**pos) for pos in positions_data]
+    # One projected read: the positions, and whether the portfolio exists at all
+    portfolio_doc = await get_portfolio_fields(client_id, portfolio_id, {"positions": 1})
+    if not portfolio_doc:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return [Position(**pos) for pos in portfolio_doc.get("positions") or []]
 
 @router.get("/portfolio/{client_id}/{portfolio_id}/transactions", response_model=List[Trade])
-async def get_portfolio_transactions(client_id: str, portfolio_id: str):
+async def get_portfolio_transactions(
+    client_id: str,
+    portfolio_id: str,
+    skip: int = Query(0, ge=0, description="Number of trades to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of trades to return (all by default)"),
+):
+    """
+    Returns the portfolio's trades, optionally one page of them (paged by MongoDB): by trade
+    date from the trades collection, or in stored order for trades still embedded in the document.
+    """
     logger.info(f"Endpoint: Fetching transactions (trades) for portfolio {client_id}/{portfolio_id}")
-    trades_data = await get_trades_from_portfolio_doc(client_id, portfolio_id)
-    if not trades_data:
-        # Check if the portfolio exists at all, even if it has no trades
-        portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
-        if not portfolio_doc:
-            raise HTTPException(status_code=404, detail="Portfolio not found")
-        return []
-    return [Trade(**trade) for trade in trades_data]
+    trades = await get_trades_page(client_id, portfolio_id, skip, limit)
+    if trades is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    return [Trade(**trade) for trade in trades]
+
+async def _json_array(items: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Serializes the items as one JSON array, element by element as they arrive."""
+    yield "["
+    first = True
+    async for item in items:
+        yield ("" if first else ",") + json.dumps(item)
+        first = False
+    yield "]"
+
+
+async def _ndjson_lines(items: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for item in items:
+        yield json.dumps(item) + "\n"
+
+
+async def _serialized_summaries(after: Optional[ObjectId], limit: Optional[int]) -> AsyncIterator[dict]:
+    count = 0
+    try:
+        async for doc in iter_portfolio_summaries(after, limit):
+            count += 1
+            yield serialize_portfolio_list_item(doc)
+    except Exception as e:
+        # The response has started, so the error can only end the stream early
+        logger.error(f"Error streaming the portfolio listing after {count} portfolios: {e}", exc_info=True)
+        raise
+    logger.info(f"Streamed {count} portfolios.")
+
 
 # Endpoint to get all portfolios (for the Home page)
 @router.get("/portfolios", response_model=List[Dict[str, Any]]) # Using Dict[str, Any] as the schema might vary
-async def get_all_portfolios():
-    logger.info("Endpoint: Fetching all portfolios.")
-    portfolios_data = await get_all_portfolio_docs()
-    
-    # Serialize ObjectId to string for all documents
-    for portfolio_doc in portfolios_data:
-        if "_id" in portfolio_doc:
-            portfolio_doc["_id"] = str(portfolio_doc["_id"])
-        # Ensure 'date' and 'uploaded_at' are ISO format strings if they are datetime objects
-        if isinstance(portfolio_doc.get("date"), date):
-            portfolio_doc["date"] = portfolio_doc["date"].isoformat()
-        if isinstance(portfolio_doc.get("uploaded_at"), datetime):
-            portfolio_doc["uploaded_at"] = portfolio_doc["uploaded_at"].isoformat()
-            
-    return portfolios_data
+async def get_all_portfolios(
+    limit: Optional[int] = Query(None, ge=1, le=settings.PORTFOLIO_LIST_MAX_LIMIT, description="Page size; all portfolios if omitted"),
+    after: Optional[str] = Query(None, description="Cursor: the _id of the last portfolio of the previous page"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json (an array) or ndjson (one portfolio per line)"),
+):
+    """
+    Lists the portfolios' summary fields (_id, client_id, portfolio_id, date, uploaded_at) in _id order.
+    Without limit, every portfolio is streamed as the database cursor yields it. With limit, one page
+    is returned; for json, the X-Next-Cursor header holds the after value of the next page (absent on
+    the last page), for ndjson the next cursor is the _id of the last line.
+    """
+    logger.info(f"Endpoint: Fetching portfolios (limit={limit}, after={after}, format={format}).")
+    try:
+        after_id = ObjectId(after) if after else None
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {after}")
+
+    items = _serialized_summaries(after_id, limit)
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_lines(items), media_type="application/x-ndjson")
+    if limit is None:
+        return StreamingResponse(_json_array(items), media_type="application/json")
+
+    page = [item async for item in items]
+    headers = {"X-Next-Cursor": page[-1]["_id"]} if len(page) == limit else {}
+    return JSONResponse(content=page, headers=headers)
 
 # Get Historical Portfolio Data
 @router.get("/portfolio/{client_id}/{portfolio_id}/history", response_model=List[Dict[str, Any]])
@@ -144,7 +276,7 @@ async def get_portfolio_history(client_id: str, portfolio_id: str):
     historical_data = await get_historical_portfolio_data(client_id, portfolio_id)
     if not historical_data:
         # Optionally, check if portfolio exists at all to differentiate 404 from empty history
-        portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
+        portfolio_doc = await get_portfolio_summary_doc(client_id, portfolio_id)
         if not portfolio_doc:
             raise HTTPException(status_code=404, detail="Portfolio not found")
         return []
@@ -1,8 +1,11 @@
 # backend/routers/rag.py
+import json
 import logging
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel # Import BaseModel for request body validation
-from rag_service import query_portfolio
+from rag_service import query_portfolio, stream_portfolio_answer, get_embedding_batcher, get_embedding_cache, get_answer_cache, get_prompt_stats, compact_rag_collection
+from services.structured_answers import answer_structured_question
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG) 
@@ -21,6 +24,8 @@ async def ask_question(client_id: str, portfolio_id: str, request: ChatRequest):
     """
     Answers a question about a specific portfolio using the RAG service, identified by client_id and portfolio_id,
     and supports conversation history for contextual answers.
+    Structured questions (violation counts, drifted sectors, sector weights) are answered
+    directly from the stored analysis.
     """
     print(f"DEBUG: Entering ask_question for {client_id}/{portfolio_id} with question: {request.question}")
     logger.info(f"Received question for portfolio {client_id}/{portfolio_id}: '{request.question}'")
@@ -30,11 +35,109 @@ async def ask_question(client_id: str, portfolio_id: str, request: ChatRequest):
     if not request.question:
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
 
+    structured = await answer_structured_question(client_id, portfolio_id, request.question)
+    if structured is not None:
+        logger.info(f"Answered question for portfolio {client_id}/{portfolio_id} via structured path (intent: {structured.intent}).")
+        return {"answer": structured.answer}
+    logger.info(f"Answering question for portfolio {client_id}/{portfolio_id} via RAG + LLM path.")
+
     try:
         # Pass both client_id, portfolio_id, current question, and chat_history to query_portfolio
         answer = await query_portfolio(client_id, portfolio_id, request.question, request.chat_history)
         logger.info(f"Successfully answered question for portfolio {client_id}/{portfolio_id}.")
         return {"answer": answer}
+    except HTTPException:
+        raise # e.g. a 503 while the RAG components are loading
     except Exception as e:
         logger.error(f"Error answering question for portfolio {client_id}/{portfolio_id}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error processing question: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing question: {e}")
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _single_token(answer: str):
+    yield answer
+
+
+@router.post("/ask/{client_id}/{portfolio_id}/stream")
+async def ask_question_stream(client_id: str, portfolio_id: str, request: ChatRequest):
+    """
+    Streaming variant of /ask: answers as Server-Sent Events, forwarding the LLM's tokens as they
+    are produced. Events: "token" ({"token": ...}), then "done" ({}), or "error" ({"detail": ...})
+    if the answer fails after streaming has started.
+    """
+    logger.info(f"Received streaming question for portfolio {client_id}/{portfolio_id}: '{request.question}'")
+
+    if not client_id or not portfolio_id:
+        raise HTTPException(status_code=400, detail="Client ID and Portfolio ID must be provided.")
+    if not request.question:
+        raise HTTPException(status_code=400, detail="Question cannot be empty.")
+
+    structured = await answer_structured_question(client_id, portfolio_id, request.question)
+    if structured is not None:
+        logger.info(f"Answered question for portfolio {client_id}/{portfolio_id} via structured path (intent: {structured.intent}).")
+        tokens = _single_token(structured.answer)
+    else:
+        logger.info(f"Streaming answer for portfolio {client_id}/{portfolio_id} via RAG + LLM path.")
+        tokens = stream_portfolio_answer(client_id, portfolio_id, request.question, request.chat_history)
+    # Wait for the first token, so retrieval and LLM errors still get a proper HTTP status
+    try:
+        first_token = await tokens.__anext__()
+    except StopAsyncIteration:
+        first_token = None
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error answering question for portfolio {client_id}/{portfolio_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing question: {e}")
+
+    async def events():
+        try:
+            if first_token is not None:
+                yield _sse_event("token", {"token": first_token})
+                async for token in tokens:
+                    yield _sse_event("token", {"token": token})
+            yield _sse_event("done", {})
+            logger.info(f"Successfully streamed answer for portfolio {client_id}/{portfolio_id}.")
+        except Exception as e:
+            logger.error(f"Error streaming answer for portfolio {client_id}/{portfolio_id}: {e}", exc_info=True)
+            yield _sse_event("error", {"detail": f"Error processing question: {e}"})
+        finally:
+            await tokens.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # No proxy buffering of the tokens
+    )
+
+
+@router.get("/metrics")
+async def get_rag_metrics():
+    """
+    Returns RAG runtime metrics: embedding batch fill rate and queue wait time,
+    embedding cache hits and misses, answer cache hit rate and saved latency, and prompt token counts.
+    """
+    embedding_cache = get_embedding_cache()
+    answer_cache = get_answer_cache()
+    return {
+        "embedding_batcher": get_embedding_batcher().metrics(),
+        "embedding_cache": embedding_cache.metrics() if embedding_cache else None,
+        "answer_cache": answer_cache.metrics() if answer_cache else None,
+        "prompts": get_prompt_stats().metrics(),
+    }
+
+
+
+@router.post("/compact")
+async def compact_collection():
+    """
+    Removes superseded analysis documents, keeping only the latest version of each portfolio.
+    """
+    try:
+        return await compact_rag_collection()
+    except Exception as e:
+        logger.error(f"Error compacting the RAG collection: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error compacting the RAG collection: {e}")
@@ -0,0 +1,108 @@
+"""
+Cache of RAG answers for repeated questions about an unchanged portfolio.
+
+Entries are keyed by (client_id, portfolio_id, analysis version, normalized question,
+chat-history hash), so a re-analysis changes the key. Ingesting a new analysis also
+drops the portfolio's entries right away (see rag_service._store_ingest_entries).
+Entries expire after a TTL and the least recently used entry is evicted when full.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _CachedAnswer(NamedTuple):
+    answer: str
+    expires_at: float
+    latency_seconds: float # Time it took to compute the answer, saved on every hit
+
+
+def normalize_question(question: str) -> str:
+    """Case-folds the question, collapses whitespace and drops trailing punctuation."""
+    return _WHITESPACE.sub(" ", question).strip().casefold().rstrip("?!. ")
+
+
+def hash_chat_history(chat_history: Optional[list]) -> str:
+    """Hashes the role and content of each message; other message fields do not affect the answer."""
+    messages = [[m.get("role"), m.get("content")] for m in chat_history or [] if isinstance(m, dict)]
+    return hashlib.sha256(json.dumps(messages, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    In-process TTL + LRU cache of answers. Used from the event loop only, so not locked.
+    """
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+        self._saved_seconds = 0.0
+
+    @staticmethod
+    def key(client_id: str, portfolio_id: str, version, question: str, chat_history: Optional[list]) -> tuple:
+        return (client_id, portfolio_id, version, normalize_question(question), hash_chat_history(chat_history))
+
+    def get(self, key: tuple) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self._expirations += 1
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        self._saved_seconds += entry.latency_seconds
+        return entry.answer
+
+    def put(self, key: tuple, answer: str, latency_seconds: float):
+        self._entries[key] = _CachedAnswer(answer, time.monotonic() + self.ttl_seconds, latency_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def invalidate_portfolio(self, client_id: str, portfolio_id: str) -> int:
+        """Drops all cached answers about a portfolio, whatever their version. Returns the count."""
+        stale = [key for key in self._entries if key[0] == client_id and key[1] == portfolio_id]
+        for key in stale:
+            del self._entries[key]
+        self._invalidations += len(stale)
+        if stale:
+            logger.debug(f"Invalidated {len(stale)} cached answers for portfolio {client_id}/{portfolio_id}.")
+        return len(stale)
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self) -> dict:
+        """Returns hit and miss counters and the LLM latency saved by hits."""
+        lookups = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "invalidations": self._invalidations,
+            "saved_latency_ms": self._saved_seconds * 1000,
+            "avg_saved_latency_ms": self._saved_seconds * 1000 / self._hits if self._hits else 0.0,
+        }
@@ -0,0 +1,141 @@
+"""
+Batch upload of many portfolios in one request.
+
+The CPU-bound analysis runs in a process pool, all MongoDB writes go out as one
+unordered bulk_write, and RAG ingestion uses batched collection.add calls.
+Every portfolio gets its own result entry, so one bad portfolio does not fail the batch.
+"""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from bson import ObjectId
+
+from core.config import settings
+from crud.portfolio_crud import get_latest_portfolio_versions, bulk_save_portfolio_docs
+from rag_service import ingest_portfolio_analyses
+from services.portfolio_analysis import prepare_uploaded_portfolio
+from utils.upload_parsing import ParsedEntry
+
+logger = logging.getLogger(__name__)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """Returns the shared analysis process pool, or None to analyze in a thread of this process."""
+    global _process_pool
+    if settings.BATCH_UPLOAD_PROCESS_WORKERS <= 1:
+        return None
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=settings.BATCH_UPLOAD_PROCESS_WORKERS)
+        logger.info(f"Started batch upload process pool with {settings.BATCH_UPLOAD_PROCESS_WORKERS} workers.")
+    return _process_pool
+
+
+def shutdown_batch_upload_pool():
+    """Stops the analysis process pool, if it was started."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+        logger.info("Batch upload process pool shut down.")
+
+
+def _error_result(index: int, error: str, portfolio_data: Optional[dict] = None) -> dict:
+    portfolio_data = portfolio_data or {}
+    return {
+        "index": index,
+        "status": "error",
+        "client_id": portfolio_data.get("client_id"),
+        "portfolio_id": portfolio_data.get("portfolio_id"),
+        "error": error,
+    }
+
+
+async def process_portfolio_batch(entries: List[ParsedEntry]) -> List[dict]:
+    """
+    Analyzes, stores and ingests a batch of uploaded portfolios.
+    Returns one result dict per entry, in input order.
+    """
+    results: List[Optional[dict]] = [None] * len(entries)
+    logger.info(f"Service: Processing batch upload of {len(entries)} portfolios.")
+
+    # 1. Run the CPU-bound analysis for every parsed portfolio in the process pool
+    loop = asyncio.get_running_loop()
+    pool = _get_process_pool()
+    pending = {}
+    for index, (portfolio_data, parse_error) in enumerate(entries):
+        if parse_error is not None:
+            results[index] = _error_result(index, parse_error)
+        else:
+            pending[index] = loop.run_in_executor(pool, prepare_uploaded_portfolio, portfolio_data)
+    outcomes = await asyncio.gather(*pending.values(), return_exceptions=True)
+
+    analyzed = {}
+    for index, outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Analysis failed for batch entry {index}: {outcome}")
+            results[index] = _error_result(index, str(outcome), entries[index][0])
+        else:
+            analyzed[index] = outcome
+
+    # 2. Resolve MongoDB ids with one query. If a key appears more than once in the batch,
+    #    the last entry is the one stored, as if the entries had been uploaded in order.
+    last_index_by_key = {}
+    for index, portfolio_data in analyzed.items():
+        last_index_by_key[(portfolio_data["client_id"], portfolio_data["portfolio_id"])] = index
+    existing = await get_latest_portfolio_versions(list(last_index_by_key))
+
+    writes, write_indexes, mongo_ids = [], [], {}
+    for key, index in last_index_by_key.items():
+        existing_id, previous_version = existing.get(key, (None, 0))
+        mongo_id = existing_id if existing_id is not None else ObjectId()
+        mongo_ids[key] = mongo_id
+        analyzed[index]["analysis_version"] = previous_version + 1
+        writes.append((mongo_id, analyzed[index], existing_id is not None))
+        write_indexes.append(index)
+
+    # 3. Store everything with a single unordered bulk_write
+    write_errors = await bulk_save_portfolio_docs(writes)
+    stored_indexes = []
+    for write_position, index in enumerate(write_indexes):
+        if write_position in write_errors:
+            results[index] = _error_result(index, f"Database write failed: {write_errors[write_position]}", analyzed[index])
+        else:
+            stored_indexes.append(index)
+
+    # 4. Ingest the stored analyses into RAG with batched collection.add calls
+    ingest_errors = await ingest_portfolio_analyses([analyzed[index] for index in stored_indexes])
+    failed_keys = set()
+    for position, index in enumerate(stored_indexes):
+        if position in ingest_errors:
+            results[index] = _error_result(index, ingest_errors[position], analyzed[index])
+            results[index]["mongo_id"] = str(mongo_ids[(analyzed[index]["client_id"], analyzed[index]["portfolio_id"])])
+    for index in write_indexes:
+        if results[index] is not None:
+            portfolio_data = analyzed[index]
+            failed_keys.add((portfolio_data["client_id"], portfolio_data["portfolio_id"]))
+
+    # 5. Report every analyzed entry; superseded duplicates share the outcome of the stored entry
+    for index, portfolio_data in analyzed.items():
+        if results[index] is not None:
+            continue
+        key = (portfolio_data["client_id"], portfolio_data["portfolio_id"])
+        if key in failed_keys:
+            results[index] = _error_result(index, "Not stored: a later entry for the same portfolio failed.", portfolio_data)
+            continue
+        results[index] = {
+            "index": index,
+            "status": "ok",
+            "mongo_id": str(mongo_ids[key]),
+            "client_id": portfolio_data["client_id"],
+            "portfolio_id": portfolio_data["portfolio_id"],
+            "superseded": index != last_index_by_key[key],
+            "analysis": portfolio_data["analysis"],
+        }
+
+    succeeded = sum(1 for result in results if result["status"] == "ok")
+    logger.info(f"Batch upload finished: {succeeded} of {len(entries)} portfolios processed successfully.")
+    return results
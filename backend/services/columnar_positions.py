@@ -0,0 +1,217 @@
+"""
+NumPy-backed columnar aggregation of trades into a position ledger.
+
+Produces the same ledger as services.position_ledger.build_ledger_from_trades, but
+instead of walking the trades one by one it extracts each field into a column once
+and aggregates per symbol with array operations. Intended for bulk uploads with
+hundreds of thousands of trades.
+
+The weighted-average cost reduction on sells is path dependent: every sell scales
+the running total cost by (1 - sold / held). For each trade, the final total cost
+therefore receives that trade's cost contribution multiplied by the product of all
+later scaling factors for the same symbol. Those suffix products are computed from
+grouped cumulative sums of log|factor| (plus counts of zero and negative factors),
+so no per-row Python loop and no division by a running product is needed.
+"""
+import logging
+from itertools import compress
+from operator import itemgetter
+from typing import List, Dict
+
+import numpy as np
+
+from services.position_ledger import UNKNOWN, positions_from_ledger
+
+logger = logging.getLogger(__name__)
+
+_BUY, _SELL, _OTHER, _MISSING = 0, 1, 2, -1
+
+
+def _type_code(trade_type) -> int:
+    if not trade_type:
+        return _MISSING
+    normalized = str(trade_type).upper()
+    return _BUY if normalized == "BUY" else _SELL if normalized == "SELL" else _OTHER
+
+
+def _type_codes(types: list) -> np.ndarray:
+    """Maps raw trade type values to BUY/SELL/OTHER codes, calling upper() once per distinct value."""
+    mapping = {trade_type: _type_code(trade_type) for trade_type in set(types)}
+    return np.array(list(map(mapping.__getitem__, types)), dtype=np.int8)
+
+
+def _grouped_inclusive_cumsum(values: np.ndarray, group_starts: np.ndarray, group_of_row: np.ndarray) -> np.ndarray:
+    """Cumulative sum restarting at every group, for rows already sorted by group."""
+    cumulative = np.cumsum(values)
+    offsets = cumulative[group_starts] - values[group_starts]
+    return cumulative - offsets[group_of_row]
+
+
+def _masked_rows_per_group(mask: np.ndarray, groups_sorted: np.ndarray, n_groups: int, last: bool) -> np.ndarray:
+    """
+    Index (into the rows sorted by group) of the first or last row where mask is set,
+    for every group; -1 if the group has no such row.
+    """
+    result = np.full(n_groups, -1, dtype=np.int64)
+    rows = np.flatnonzero(mask)
+    if rows.size:
+        groups = groups_sorted[rows]
+        boundary = groups[1:] != groups[:-1]
+        selected = rows[np.r_[boundary, True]] if last else rows[np.r_[True, boundary]]
+        result[groups_sorted[selected]] = selected
+    return result
+
+
+def _column(trades: List[Dict], field: str) -> list:
+    """Extracts one field from every trade; itemgetter runs at C speed when the key is always present."""
+    try:
+        return list(map(itemgetter(field), trades))
+    except KeyError:
+        return [t.get(field) for t in trades]
+
+
+def _first_known_per_group(
+    trades: List[Dict], field: str, sorted_rows: list, group_starts: np.ndarray, group_ends: np.ndarray
+) -> List[str]:
+    """
+    First truthy value other than UNKNOWN per group, mirroring the replay's first-one-wins rule.
+    Usually the first trade of a symbol already carries it, so only groups where it
+    does not are scanned further.
+    """
+    result = []
+    for start, end in zip(group_starts.tolist(), group_ends.tolist()):
+        value = trades[sorted_rows[start]].get(field)
+        if not value or value == UNKNOWN:
+            value = next(
+                (v for v in (trades[i].get(field) for i in sorted_rows[start + 1:end]) if v and v != UNKNOWN),
+                UNKNOWN
+            )
+        result.append(value)
+    return result
+
+
+def build_ledger_columnar(trades: List[Dict]) -> Dict[str, dict]:
+    """
+    Builds the per-symbol ledger from a list of trades using columnar NumPy aggregation.
+    The result matches build_ledger_from_trades (float fields up to rounding).
+    """
+    if not trades:
+        return {}
+
+    # 1. Extract the columns needed for every row (ISIN/Sector are only looked up per symbol)
+    symbols = _column(trades, "symbol")
+    quantities = _column(trades, "quantity")
+    prices = _column(trades, "price")
+    type_codes = _type_codes(_column(trades, "type"))
+
+    quantity_types = set(map(type, quantities))
+    if quantity_types <= {int, float} and all(symbols) and not (type_codes == _MISSING).any():
+        valid = None # Fast path: every trade is well formed
+    else:
+        valid = np.fromiter(
+            (bool(s) and isinstance(q, (int, float)) for s, q in zip(symbols, quantities)),
+            dtype=bool, count=len(trades)
+        ) & (type_codes != _MISSING)
+        logger.warning(f"Skipping {len(trades) - int(valid.sum())} malformed trades during columnar aggregation.")
+        mask = valid.tolist()
+        trades, symbols, quantities, prices = (
+            list(compress(column, mask)) for column in (trades, symbols, quantities, prices)
+        )
+        type_codes = type_codes[valid]
+        quantity_types = set(map(type, quantities))
+        if not symbols:
+            return {}
+
+    n_rows = len(symbols)
+    unknown_types = int((type_codes == _OTHER).sum())
+    if unknown_types:
+        logger.warning(f"Ignoring quantity/price of {unknown_types} trades with unknown trade type.")
+
+    # 2. Factorize symbols in first-appearance order (matches dict insertion order of the replay)
+    symbol_index = {symbol: code for code, symbol in enumerate(dict.fromkeys(symbols))}
+    n_groups = len(symbol_index)
+    # Small code dtypes let NumPy use a radix sort for the stable argsort below
+    code_dtype = np.uint16 if n_groups <= np.iinfo(np.uint16).max else np.int64
+    group = np.array(list(map(symbol_index.__getitem__, symbols)), dtype=code_dtype)
+
+    quantity = np.array(quantities, dtype=np.float64)
+    if None in prices:
+        price = np.array([np.nan if p is None else p for p in prices], dtype=np.float64)
+    else:
+        price = np.array(prices, dtype=np.float64)
+
+    is_buy = type_codes == _BUY
+    is_sell = type_codes == _SELL
+    is_trade = is_buy | is_sell
+    has_price = ~np.isnan(price)
+    signed_quantity = np.where(is_buy, quantity, np.where(is_sell, -quantity, 0.0))
+
+    # Final quantity: bincount accumulates in trade order, exactly like the replay
+    total_quantity = np.bincount(group, weights=signed_quantity, minlength=n_groups)
+    if float not in quantity_types:
+        has_float_quantity = np.zeros(n_groups, dtype=bool)
+    else:
+        is_float = np.fromiter(map(float.__instancecheck__, quantities), dtype=bool, count=n_rows)
+        has_float_quantity = np.bincount(group, weights=is_float & is_trade, minlength=n_groups) > 0
+
+    # 3. Sort rows by symbol (stable, so trade order is kept within each symbol)
+    order = np.argsort(group, kind="stable")
+    group = group.astype(np.intp)
+    g = group[order]
+    group_starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    group_ends = np.r_[group_starts[1:], g.size]
+
+    s_signed = signed_quantity[order]
+    held_before = _grouped_inclusive_cumsum(s_signed, group_starts, g) - s_signed
+
+    s_quantity = quantity[order]
+    reduces_cost = is_sell[order] & (held_before > 0)
+    factor = np.ones(n_rows)
+    factor[reduces_cost] = 1.0 - s_quantity[reduces_cost] / held_before[reduces_cost]
+    contribution = np.where(is_buy[order] & has_price[order], s_quantity * np.nan_to_num(price[order]), 0.0)
+
+    if reduces_cost.any():
+        # Suffix product of the factors after each row, within its group
+        is_zero = factor == 0.0
+        log_abs = np.log(np.abs(np.where(is_zero, 1.0, factor)))
+        is_negative = (factor < 0.0).astype(np.float64)
+        suffix_values = []
+        for values in (log_abs, is_zero.astype(np.float64), is_negative):
+            inclusive = _grouped_inclusive_cumsum(values, group_starts, g)
+            group_totals = np.bincount(g, weights=values, minlength=n_groups)
+            suffix_values.append(group_totals[g] - inclusive)
+        log_after, zeros_after, negatives_after = suffix_values
+
+        suffix_product = np.where(np.rint(zeros_after) > 0, 0.0, np.exp(log_after))
+        suffix_product = np.where(np.rint(negatives_after) % 2 == 1, -suffix_product, suffix_product)
+        contribution = contribution * suffix_product
+    total_cost = np.bincount(g, weights=contribution, minlength=n_groups)
+
+    # 4. Latest price and first known ISIN/Sector per symbol
+    latest_row = _masked_rows_per_group(is_trade[order] & has_price[order], g, n_groups, last=True)
+    sorted_rows = order.tolist()
+    latest_prices = [prices[sorted_rows[r]] if r >= 0 else 0.0 for r in latest_row.tolist()]
+    first_isins = _first_known_per_group(trades, "isin", sorted_rows, group_starts, group_ends)
+    first_sectors = _first_known_per_group(trades, "sector", sorted_rows, group_starts, group_ends)
+
+    ledger = {}
+    quantity_values = total_quantity.tolist()
+    total_costs = total_cost.tolist()
+    float_flags = has_float_quantity.tolist()
+    for code, symbol in enumerate(symbol_index):
+        ledger[symbol] = {
+            "quantity": quantity_values[code] if float_flags[code] else int(quantity_values[code]),
+            "total_cost": total_costs[code],
+            "isin": first_isins[code],
+            "sector": first_sectors[code],
+            # Keep the original price object (int or float) from the latest trade
+            "latest_price": latest_prices[code]
+        }
+    return ledger
+
+
+def calculate_positions_columnar(trades: List[Dict]) -> List[Dict]:
+    """
+    Columnar equivalent of the replay-based position calculation.
+    """
+    return positions_from_ledger(build_ledger_columnar(trades))
@@ -0,0 +1,134 @@
+"""
+Micro-batching for embedding requests.
+
+Concurrent embed calls (RAG queries, ingestion) are collected for a short window,
+or until a maximum batch size is reached, and embedded with one model forward pass.
+Each caller gets back the embeddings for its own texts.
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Number of recent queue waits kept for the percentile metrics
+_WAIT_SAMPLE_SIZE = 1000
+
+
+class _PendingRequest(NamedTuple):
+    texts: list
+    future: asyncio.Future
+    enqueued_at: float
+
+
+class EmbeddingBatcher:
+    """
+    Groups concurrent embed() calls into batches of at most max_batch_size texts.
+    A batch is started when it is full or window_ms after its first request arrived.
+    embed_batch is the coroutine function that embeds one batch of texts.
+    """
+    def __init__(self, embed_batch: Callable[[list], Awaitable[list]], max_batch_size: int, window_ms: float):
+        self._embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window_ms = max(0.0, window_ms)
+        self._pending = deque()
+        self._pending_texts = 0
+        self._window_handle = None
+        self._running = set() # Keeps references to in-flight batch tasks
+
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._failed_batches = 0
+        self._queue_waits_ms = deque(maxlen=_WAIT_SAMPLE_SIZE)
+        self._max_queue_wait_ms = 0.0
+
+    async def embed(self, texts: List[str]) -> list:
+        """Embeds the texts as part of the next batch and returns one embedding per text."""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_PendingRequest(list(texts), future, time.perf_counter()))
+        self._pending_texts += len(texts)
+
+        if self._pending_texts >= self.max_batch_size:
+            self._flush(only_full=True)
+        if self._pending and self._window_handle is None:
+            self._window_handle = loop.call_later(self.window_ms / 1000, self._on_window_elapsed)
+        return await future
+
+    def _on_window_elapsed(self):
+        self._window_handle = None
+        self._flush(only_full=False)
+
+    def _flush(self, only_full: bool):
+        """Starts batches from the pending requests (only full batches if only_full)."""
+        while self._pending and (not only_full or self._pending_texts >= self.max_batch_size):
+            batch, size = [], 0
+            # A single request larger than max_batch_size becomes a batch of its own
+            while self._pending and (not batch or size + len(self._pending[0].texts) <= self.max_batch_size):
+                request = self._pending.popleft()
+                batch.append(request)
+                size += len(request.texts)
+            self._pending_texts -= size
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        if not self._pending and self._window_handle is not None:
+            self._window_handle.cancel()
+            self._window_handle = None
+
+    async def _run_batch(self, batch: List[_PendingRequest]):
+        started = time.perf_counter()
+        texts = [text for request in batch for text in request.texts]
+        self._batches += 1
+        self._requests += len(batch)
+        self._texts += len(texts)
+        for request in batch:
+            wait_ms = (started - request.enqueued_at) * 1000
+            self._queue_waits_ms.append(wait_ms)
+            self._max_queue_wait_ms = max(self._max_queue_wait_ms, wait_ms)
+
+        try:
+            embeddings = await self._embed_batch(texts)
+        except Exception as e:
+            self._failed_batches += 1
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        logger.debug(f"Embedded a batch of {len(texts)} texts for {len(batch)} requests.")
+        offset = 0
+        for request in batch:
+            if not request.future.done(): # The caller may have been cancelled
+                request.future.set_result(list(embeddings[offset:offset + len(request.texts)]))
+            offset += len(request.texts)
+
+    def metrics(self) -> dict:
+        """Returns batch fill rate and queue wait statistics since the batcher was created."""
+        waits = sorted(self._queue_waits_ms)
+        average_batch_size = self._texts / self._batches if self._batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window_ms,
+            "batches": self._batches,
+            "failed_batches": self._failed_batches,
+            "requests": self._requests,
+            "texts": self._texts,
+            "average_batch_size": average_batch_size,
+            "batch_fill_rate": min(1.0, average_batch_size / self.max_batch_size),
+            "pending_requests": len(self._pending),
+            "queue_wait_ms": {
+                "average": statistics.fmean(waits) if waits else 0.0,
+                "p50": waits[len(waits) // 2] if waits else 0.0,
+                "p95": waits[max(0, int(len(waits) * 0.95) - 1)] if waits else 0.0,
+                "max": self._max_queue_wait_ms,
+            },
+        }
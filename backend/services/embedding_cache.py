@@ -0,0 +1,130 @@
+"""
+Content-addressed cache for embeddings.
+
+Entries are keyed by sha256(model name + text), so a repeated report document or
+question skips the embedding model. There is an in-process LRU tier and an optional
+persistent SQLite tier that survives restarts and is shared between workers.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of parameters per statement
+_SQLITE_LOOKUP_CHUNK = 500
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an LRU of at most max_entries vectors in memory, backed
+    by a SQLite database when db_path is given. Vectors are stored as float32.
+    Thread-safe, so the SQLite tier can be used from a thread pool.
+    """
+    def __init__(self, model_name: str, max_entries: int, db_path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_entries = max(1, max_entries)
+        self.db_path = db_path or None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+    @property
+    def persistent(self) -> bool:
+        return self.db_path is not None
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._connection.commit()
+            logger.info(f"Opened persistent embedding cache at {self.db_path}")
+        return self._connection
+
+    def _remember(self, key: str, vector: np.ndarray):
+        """Adds a vector to the memory tier, evicting the least recently used entries. Caller holds the lock."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached embedding of each text, or None where it is not cached."""
+        keys = [self.key(text) for text in texts]
+        results = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for index, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    results[index] = vector
+                    self._memory_hits += 1
+                else:
+                    missing.setdefault(key, []).append(index)
+
+            if missing and self.persistent:
+                connection = self._get_connection()
+                missing_keys = list(missing)
+                for start in range(0, len(missing_keys), _SQLITE_LOOKUP_CHUNK):
+                    chunk = missing_keys[start:start + _SQLITE_LOOKUP_CHUNK]
+                    rows = connection.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector) # Promote to the memory tier
+                        for index in missing.pop(key):
+                            results[index] = vector
+                            self._disk_hits += 1
+
+            self._misses += sum(len(indexes) for indexes in missing.values())
+        return results
+
+    def store(self, texts: List[str], embeddings: list):
+        """Caches the embedding computed for each text."""
+        entries = [(self.key(text), np.asarray(embedding, dtype=np.float32)) for text, embedding in zip(texts, embeddings)]
+        with self._lock:
+            for key, vector in entries:
+                self._remember(key, vector)
+            if self.persistent:
+                connection = self._get_connection()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in entries],
+                )
+                connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def metrics(self) -> dict:
+        """Returns hit and miss counters for both tiers."""
+        lookups = self._memory_hits + self._disk_hits + self._misses
+        return {
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "persistent": self.persistent,
+        }
@@ -0,0 +1,135 @@
+"""
+CPU-bound portfolio analysis, kept free of database and RAG dependencies.
+
+Everything here works on plain dicts, so it can run in the request's event loop
+for single uploads or in a worker process for batch uploads.
+"""
+import logging
+import uuid
+from datetime import datetime, date
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+
+from agents.analysis_pipeline import run_fused_analysis
+from agents.breach_reporter import BreachReporterAgent
+from services.position_ledger import apply_trade_to_ledger, build_ledger_from_trades, positions_from_ledger, ledger_to_doc
+from services.columnar_positions import build_ledger_columnar
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_ledger(trades: List[Dict]) -> Dict[str, dict]:
+    """
+    Builds the position ledger for a full list of trades, switching to the columnar
+    NumPy engine for large uploads where the per-trade Python loop dominates.
+    """
+    if len(trades) >= settings.COLUMNAR_AGGREGATION_MIN_TRADES:
+        logger.info(f"Using columnar aggregation for {len(trades)} trades.")
+        return build_ledger_columnar(trades)
+    return build_ledger_from_trades(trades)
+
+
+def analyze_positions(positions: list) -> Tuple[dict, dict]:
+    """
+    Runs policy validation and risk drift analysis and builds the breach report.
+    Returns (analysis, compliance_report).
+    """
+    policy_violations, risk_drifts = run_fused_analysis(positions)
+    compliance_report = BreachReporterAgent(
+        policy_violations=policy_violations, risk_drifts=risk_drifts
+    ).generate_report()
+    analysis = {
+        "policy_violations": policy_violations,
+        "risk_drifts": risk_drifts,
+    }
+    return analysis, compliance_report
+
+
+def normalize_uploaded_trade(trade: dict) -> dict:
+    """Assigns a trade_id if the trade has none and converts a date trade_date to ISO 8601."""
+    # Ensure all trades have a trade_id, especially for uploaded data
+    if "trade_id" not in trade:
+        trade["trade_id"] = str(uuid.uuid4()) # Assign a unique ID
+    # Convert datetime.date to ISO 8601 string for MongoDB compatibility
+    if isinstance(trade.get('trade_date'), date):
+        trade['trade_date'] = trade['trade_date'].isoformat()
+    return trade
+
+
+def prepare_uploaded_portfolio(portfolio_data: dict, ledger: Optional[Dict[str, dict]] = None) -> dict:
+    """
+    Recalculates positions from the uploaded trades (if any), runs the compliance
+    analysis and adds the results to portfolio_data, which is returned.
+    A ledger already aggregated from the trades (e.g. while streaming the upload) is used as is.
+    Raises ValueError if client_id or portfolio_id is missing.
+    """
+    # 1. Extract positions and basic info
+    if ledger is not None:
+        # Trades were normalized and aggregated as they were read
+        portfolio_data["position_ledger"] = ledger_to_doc(ledger)
+        portfolio_data["positions"] = positions_from_ledger(ledger)
+        logger.info(f"Using {len(portfolio_data['positions'])} positions aggregated from {len(portfolio_data.get('trades', []))} streamed trades.")
+    # For uploaded data, if trades are present, recalculate positions
+    elif "trades" in portfolio_data and isinstance(portfolio_data["trades"], list):
+        for trade in portfolio_data["trades"]:
+            normalize_uploaded_trade(trade)
+
+        # Calculate positions from the provided trades and persist the running ledger
+        ledger = build_ledger(portfolio_data["trades"])
+        portfolio_data["position_ledger"] = ledger_to_doc(ledger)
+        portfolio_data["positions"] = positions_from_ledger(ledger)
+        logger.info(f"Recalculated {len(portfolio_data['positions'])} positions for uploaded portfolio based on {len(portfolio_data['trades'])} trades.")
+    else:
+        # If no trades, use existing positions or default to empty list
+        portfolio_data["positions"] = portfolio_data.get("positions", [])
+        logger.info(f"Using {len(portfolio_data['positions'])} provided positions for uploaded portfolio.")
+
+    client_id = portfolio_data.get("client_id")
+    portfolio_id = portfolio_data.get("portfolio_id")
+
+    if not client_id or not portfolio_id:
+        logger.error("Uploaded portfolio data missing 'client_id' or 'portfolio_id'.")
+        raise ValueError("Portfolio data must contain 'client_id' or 'portfolio_id'.")
+
+    # 2. - 4. Policy validation and risk drift analysis (one fused pass), then the breach report
+    analysis, compliance_report = analyze_positions(portfolio_data["positions"])
+    logger.info(
+        f"Analysis completed for {client_id}/{portfolio_id}. "
+        f"Violations: {len(analysis['policy_violations'])}, Drifts: {len(analysis['risk_drifts'])}"
+    )
+
+    # 5. Add analysis results and timestamp to the portfolio data
+    portfolio_data["analysis"] = analysis
+    portfolio_data["compliance_report"] = compliance_report
+    portfolio_data["uploaded_at"] = datetime.now().isoformat() # Timestamp when uploaded/processed
+    return portfolio_data
+
+
+async def aggregate_streamed_portfolio(records: AsyncIterator[Tuple[str, Any]]) -> dict:
+    """
+    Builds and analyzes a portfolio from (field, value) records of a streamed upload
+    (see utils/upload_parsing.iter_portfolio_upload). Each trade record is applied to
+    the position ledger as it arrives, so the upload is never held in memory as a whole.
+    """
+    portfolio_data = {}
+    trades = []
+    ledger = {}
+    streamed_trades = False
+    async for key, value in records:
+        # A non-list "trades" value (e.g. null) is no trades list: kept as is, like a regular upload does
+        if key != "trades" or not isinstance(value, list):
+            portfolio_data[key] = value
+            continue
+        # A trades record carries a list of trades (possibly empty)
+        streamed_trades = True
+        for trade in value:
+            if not isinstance(trade, dict):
+                raise ValueError(f"Invalid trade at index {len(trades)}: Expected an object, got {type(trade).__name__}.")
+            apply_trade_to_ledger(ledger, normalize_uploaded_trade(trade))
+            trades.append(trade)
+
+    if not streamed_trades:
+        # No trades in the upload: analyze the provided positions, as for a regular upload
+        return prepare_uploaded_portfolio(portfolio_data)
+    portfolio_data["trades"] = trades
+    return prepare_uploaded_portfolio(portfolio_data, ledger)
@@ -0,0 +1,34 @@
+"""
+In-process serialization of read-modify-write operations on one portfolio.
+
+Add-trade reads a portfolio, re-analyzes it and writes it back; two of them on the same
+portfolio must not interleave or one trade is lost. KeyedLocks hands out one asyncio.Lock
+per key, so writes to the same portfolio queue up while different portfolios proceed in
+parallel. Locks exist only while a task holds or waits for them. Other processes are not
+covered: the version-checked update (crud.portfolio_crud.update_portfolio_changes) and its
+retry handle those.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLocks:
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {} # key -> [lock, number of holders and waiters]
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        """Holds the lock of the key for the duration of the block (FIFO among waiters)."""
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
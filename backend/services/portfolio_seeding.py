@@ -0,0 +1,93 @@
+"""
+Seeding of the portfolios listed in data/clients.json, run in the background at startup.
+
+Instead of a find_one and an insert_one per portfolio, seeding makes one query for the
+keys already stored and one unordered bulk_write of $setOnInsert upserts for the rest,
+guarded by the unique (client_id, portfolio_id) index. Running it again (or on several
+instances at once) inserts nothing twice and never overwrites a stored portfolio.
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from typing import List
+
+from crud.portfolio_crud import bulk_insert_missing_portfolio_docs, ensure_portfolio_key_index, get_existing_portfolio_keys
+
+logger = logging.getLogger(__name__)
+
+
+def new_portfolio_doc(client_id: str, portfolio_id: str, now: str) -> dict:
+    """An empty portfolio document, as created for a portfolio nobody has uploaded yet."""
+    return {
+        "client_id": client_id,
+        "portfolio_id": portfolio_id,
+        "date": now,
+        "uploaded_at": now,
+        "positions": [],
+        "trades": [],
+        "analysis": {
+            "policy_violations": ["No policy data available for analysis yet."],
+            "risk_drifts": ["No risk data available for analysis yet."]
+        }
+    }
+
+
+def seed_portfolio_docs(clients_data: list) -> List[dict]:
+    """Builds the seed documents from parsed clients.json, skipping entries without ids and duplicates."""
+    now = datetime.now().isoformat()
+    docs, seen = [], set()
+    for client_info in clients_data:
+        client_id = client_info.get("client_id")
+        if not client_id:
+            logger.warning(f"Skipping client with missing 'client_id': {client_info}")
+            continue
+        for portfolio_info in client_info.get("portfolios", []):
+            portfolio_id = portfolio_info.get("portfolio_id")
+            if not portfolio_id:
+                logger.warning(f"Skipping portfolio with missing 'portfolio_id' for client {client_id}: {portfolio_info}")
+                continue
+            if (client_id, portfolio_id) not in seen:
+                seen.add((client_id, portfolio_id))
+                docs.append(new_portfolio_doc(client_id, portfolio_id, now))
+    return docs
+
+
+async def seed_portfolios(clients_data: list) -> dict:
+    """Inserts the portfolios of clients_data that are not stored yet. Returns counts and the time taken."""
+    start = time.perf_counter()
+    docs = seed_portfolio_docs(clients_data)
+    await ensure_portfolio_key_index()
+    existing = await get_existing_portfolio_keys([doc["client_id"] for doc in docs])
+    missing = [doc for doc in docs if (doc["client_id"], doc["portfolio_id"]) not in existing]
+    inserted, errors = await bulk_insert_missing_portfolio_docs(missing)
+    for index, error in errors.items():
+        logger.error(f"Error inserting portfolio {missing[index]['client_id']}/{missing[index]['portfolio_id']} at startup: {error}")
+    return {
+        "portfolios": len(docs),
+        "existing": len(docs) - len(missing),
+        "inserted": inserted,
+        "errors": len(errors),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+async def seed_portfolios_from_file(clients_file_path: str) -> dict:
+    """Seeds the portfolios listed in a clients.json file; errors are logged, not raised."""
+    logger.info("Initializing portfolios from clients.json if they don't exist...")
+    try:
+        with open(clients_file_path, "r", encoding="utf-8") as f:
+            clients_data = json.load(f)
+        result = await seed_portfolios(clients_data)
+        logger.info(
+            f"Seeded portfolios from clients.json in {result['seconds']:.2f} s: {result['inserted']} inserted, "
+            f"{result['existing']} already stored, {result['errors']} errors."
+        )
+        return result
+    except FileNotFoundError:
+        logger.error(f"Clients file not found at {clients_file_path}. Skipping portfolio initialization from JSON.")
+    except json.JSONDecodeError as e:
+        logger.error(f"Error decoding clients.json at startup: {e}. Please check file format.")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during portfolio initialization from clients.json: {e}", exc_info=True)
+    return {}
@@ -1,116 +1,68 @@
+import asyncio
 import logging
+import random
 from datetime import datetime, date
 from bson import ObjectId
 import uuid
-from typing import List, Dict, Optional
-
-from crud.portfolio_crud import create_portfolio_doc, get_portfolio_by_client_and_portfolio_id, update_portfolio_doc
-from agents.policy_validator import PolicyValidatorAgent
-from agents.risk_drift import RiskDriftAgent
-from agents.breach_reporter import BreachReporterAgent
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+
+from crud.portfolio_crud import (
+    TRADES_EXTERNALIZED,
+    create_portfolio_doc,
+    delete_portfolio_trades,
+    get_portfolio_by_client_and_portfolio_id,
+    get_portfolio_fields,
+    get_portfolio_without_trades,
+    get_trade_history,
+    insert_portfolio_trades,
+    migrate_embedded_trades,
+    update_portfolio_changes,
+    update_portfolio_doc,
+)
 from rag_service import ingest_portfolio_analysis
 from schemas.portfolio_models import TradeIn, Position # Assuming TradeIn and Position are Pydantic models
+from services.position_ledger import (
+    apply_trade_to_ledger,
+    build_ledger_from_trades,
+    positions_from_ledger,
+    ledger_to_doc,
+    ledger_from_doc,
+    ledgers_match,
+)
+from services.portfolio_locks import KeyedLocks
+from services.trade_coalescer import TradeCoalescer
+from services.portfolio_analysis import (
+    build_ledger,
+    analyze_positions,
+    prepare_uploaded_portfolio,
+    aggregate_streamed_portfolio,
+)
+from core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Add-trades on the same portfolio run one at a time in this process
+_portfolio_locks = KeyedLocks()
+# Buffers trades per portfolio in write-behind mode (settings.ADD_TRADE_WRITE_BEHIND), created on first use
+_trade_coalescer: Optional[TradeCoalescer] = None
+
+
+class _PortfolioWriteConflict(Exception):
+    """The portfolio was written by someone else between our read and our update."""
+
 # Helper function to convert ObjectId fields to strings in a dictionary
 def _convert_objectid_to_str(doc: dict) -> dict:
     if "_id" in doc and isinstance(doc["_id"], ObjectId):
         doc["_id"] = str(doc["_id"])
     return doc
 
-# NEW HELPER FUNCTION: Calculate positions from trades
+# Calculate positions from trades by replaying the full trade history
 def _calculate_positions_from_trades(trades: List[Dict]) -> List[Dict]:
     """
     Calculates current positions based on a list of trades.
     Aggregates quantities for each symbol and adds placeholder/derived values for other fields.
     """
-    symbol_data = {} # To store aggregated quantity, and placeholder for other details
-
-    for trade in trades:
-        symbol = trade.get("symbol")
-        quantity = trade.get("quantity")
-        trade_type = trade.get("type") # 'BUY' or 'SELL'
-        trade_price = trade.get("price") # Get the price from the trade
-        
-        # Extract ISIN and Sector from the trade, if provided
-        trade_isin = trade.get("isin")
-        trade_sector = trade.get("sector")
-        # Capture the latest trade price as a potential market price placeholder
-        latest_trade_price = trade.get("price")
-
-
-        if not all([symbol, isinstance(quantity, (int, float)), trade_type]):
-            logger.warning(f"Skipping malformed trade data: {trade}")
-            continue
-
-        if symbol not in symbol_data:
-            symbol_data[symbol] = {
-                "quantity": 0,
-                "total_cost": 0.0, # Initialize total cost for weighted average
-                "isin": "UNKNOWN", # Default placeholder
-                "sector": "UNKNOWN", # Default placeholder
-                "latest_price": 0.0 # Initialize latest_price for market_price placeholder
-            }
-            # If this is the first trade for the symbol, use ISIN/Sector from it if available
-            if trade_isin:
-                symbol_data[symbol]["isin"] = trade_isin
-            if trade_sector:
-                symbol_data[symbol]["sector"] = trade_sector
-        else:
-            # If symbol already exists, and the new trade has ISIN/Sector, update if currently UNKNOWN
-            # Or implement a policy for consistent data (e.g., first one wins, or raise warning on mismatch)
-            if symbol_data[symbol]["isin"] == "UNKNOWN" and trade_isin:
-                symbol_data[symbol]["isin"] = trade_isin
-            if symbol_data[symbol]["sector"] == "UNKNOWN" and trade_sector:
-                symbol_data[symbol]["sector"] = trade_sector
-
-        # Calculate weighted average cost
-        current_quantity = symbol_data[symbol]["quantity"]
-        current_total_cost = symbol_data[symbol]["total_cost"]
-
-        if trade_type.upper() == "BUY":
-            symbol_data[symbol]["quantity"] += quantity
-            if trade_price is not None:
-                symbol_data[symbol]["total_cost"] += (quantity * trade_price)
-                symbol_data[symbol]["latest_price"] = trade_price # Update latest price on BUY
-        elif trade_type.upper() == "SELL":
-            # For SELL, reduce quantity. For average cost, we need to adjust total cost.
-            # A common approach is to reduce cost proportionally.
-            # This simplified model assumes selling reduces the average cost basis.
-            # In real systems, FIFO/LIFO/Specific ID might be used.
-            if current_quantity > 0:
-                cost_reduction = (quantity / current_quantity) * current_total_cost
-                symbol_data[symbol]["total_cost"] -= cost_reduction
-            symbol_data[symbol]["quantity"] -= quantity
-            if trade_price is not None:
-                symbol_data[symbol]["latest_price"] = trade_price # Update latest price on SELL too, if desired
-        else:
-            logger.warning(f"Unknown trade type '{trade_type}' for symbol {symbol}. Skipping.")
-
-    # Convert aggregated quantities and collected data into a list of position dictionaries
-    positions = []
-    for symbol, data in symbol_data.items():
-        total_quantity = data["quantity"]
-        total_cost = data["total_cost"]
-        
-        if total_quantity != 0: # Only include positions with non-zero quantity
-            # Calculate average price based on total_cost and total_quantity
-            avg_price = total_cost / total_quantity if total_quantity > 0 else 0.0
-            
-            # Use the latest_price captured from trades as a placeholder for market_price
-            market_price = data["latest_price"] if data["latest_price"] != 0.0 else avg_price
-
-            positions.append({
-                "symbol": symbol,
-                "quantity": total_quantity,
-                "isin": data["isin"], # Use provided ISIN or default
-                "avg_price": avg_price,
-                "market_price": market_price, # Now uses latest trade price or avg if no trades with price
-                "sector": data["sector"] # Use provided Sector or default
-            })
-
-    return positions
+    return positions_from_ledger(build_ledger_from_trades(trades))
 
 async def process_uploaded_portfolio_data(portfolio_data: dict) -> dict:
     """
@@ -119,64 +71,34 @@ async def process_uploaded_portfolio_data(portfolio_data: dict) -> dict:
     """
     logger.info("Service: Starting to process uploaded portfolio data.")
 
-    # 1. Extract positions and basic info
-    # For uploaded data, if trades are present, recalculate positions
-    if "trades" in portfolio_data and isinstance(portfolio_data["trades"], list):
-        # Ensure all trades have a trade_id, especially for uploaded data
-        for trade in portfolio_data["trades"]:
-            if "trade_id" not in trade:
-                trade["trade_id"] = str(uuid.uuid4()) # Assign a unique ID
-            # Convert datetime.date to ISO 8601 string for MongoDB compatibility
-            if isinstance(trade.get('trade_date'), date):
-                trade['trade_date'] = trade['trade_date'].isoformat()
-        
-        # Calculate positions from the provided trades
-        portfolio_data["positions"] = _calculate_positions_from_trades(portfolio_data["trades"])
-        logger.info(f"Recalculated positions for uploaded portfolio based on trades: {portfolio_data['positions']}")
-    else:
-        # If no trades, use existing positions or default to empty list
-        portfolio_data["positions"] = portfolio_data.get("positions", [])
-        logger.info(f"Using provided positions for uploaded portfolio: {portfolio_data['positions']}")
-
-
-    positions = portfolio_data.get("positions", [])
-    client_id = portfolio_data.get("client_id")
-    portfolio_id = portfolio_data.get("portfolio_id")
-
-    if not client_id or not portfolio_id:
-        logger.error("Uploaded portfolio data missing 'client_id' or 'portfolio_id'.")
-        raise ValueError("Portfolio data must contain 'client_id' or 'portfolio_id'.")
-
-    # 2. Run Policy Validation
-    policy_validator = PolicyValidatorAgent(positions=positions)
-    policy_violations = policy_validator.run()
-    logger.info(f"Policy validation completed for {client_id}/{portfolio_id}. Violations: {len(policy_violations)}")
-
-    # 3. Run Risk Drift Analysis
-    risk_drift_analyzer = RiskDriftAgent(positions=positions)
-    risk_drifts = risk_drift_analyzer.run()
-    logger.info(f"Risk drift analysis completed for {client_id}/{portfolio_id}. Drifts: {len(risk_drifts)}")
+    # 1. - 5. Recalculate positions, run the compliance analysis and timestamp the data
+    prepare_uploaded_portfolio(portfolio_data)
+    return await _store_and_ingest_uploaded_portfolio(portfolio_data)
 
-    # 4. Generate Breach Report
-    breach_reporter = BreachReporterAgent(
-        policy_violations=policy_violations, risk_drifts=risk_drifts
-    )
-    compliance_report = breach_reporter.generate_report()
-    logger.info(f"Breach report generated for {client_id}/{portfolio_id}.")
-
-    # 5. Prepare data for storage and ingest
-    # Add analysis results and timestamp to the portfolio data
-    portfolio_data["analysis"] = {
-        "policy_violations": policy_violations,
-        "risk_drifts": risk_drifts,
-    }
-    portfolio_data["compliance_report"] = compliance_report
-    portfolio_data["uploaded_at"] = datetime.now().isoformat() # Timestamp when uploaded/processed
+async def process_streamed_portfolio_upload(records: AsyncIterator[Tuple[str, Any]]) -> dict:
+    """
+    Processes a portfolio upload parsed incrementally (see utils/upload_parsing.iter_portfolio_upload):
+    trades are aggregated as they are read, then the portfolio is analyzed, stored and ingested
+    exactly like a regular upload.
+    """
+    logger.info("Service: Starting to process streamed portfolio upload.")
+    portfolio_data = await aggregate_streamed_portfolio(records)
+    return await _store_and_ingest_uploaded_portfolio(portfolio_data)
 
+async def _store_and_ingest_uploaded_portfolio(portfolio_data: dict) -> dict:
+    """Stores an analyzed upload in MongoDB (create or update) and ingests its analysis into RAG."""
+    client_id = portfolio_data["client_id"]
+    portfolio_id = portfolio_data["portfolio_id"]
+    compliance_report = portfolio_data["compliance_report"]
 
     # 6. Store portfolio data in MongoDB (create or update)
     # Check if a portfolio with the same client_id and portfolio_id already exists
-    existing_portfolio_doc = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
+    # (only its _id and version are needed: the upload replaces the whole document)
+    existing_portfolio_doc = await get_portfolio_fields(client_id, portfolio_id, {"analysis_version": 1})
+
+    # Each stored analysis gets the next version; RAG ingestion uses it to replace older documents
+    previous_version = existing_portfolio_doc.get("analysis_version", 0) if existing_portfolio_doc else 0
+    portfolio_data["analysis_version"] = previous_version + 1
 
     if existing_portfolio_doc:
         logger.info(f"Existing portfolio found for {client_id}/{portfolio_id}. Updating document.")
@@ -220,9 +142,190 @@ async def process_uploaded_portfolio_data(portfolio_data: dict) -> dict:
         "compliance_report": compliance_report,
     }
 
+def _new_trade_data(trade_in: TradeIn) -> dict:
+    trade_data = trade_in.dict()
+    # Generate a unique trade_id
+    trade_data["trade_id"] = str(uuid.uuid4()) # Add a unique trade_id
+
+    # Convert datetime.date to ISO 8601 string for MongoDB compatibility
+    if isinstance(trade_data.get('trade_date'), date):
+        trade_data['trade_date'] = trade_data['trade_date'].isoformat()
+    return trade_data
+
+async def _reanalyze_with_trades(client_id: str, portfolio_id: str, portfolio: dict, trades: List[dict], load_trades) -> str:
+    """
+    Applies the new trades to the portfolio's positions and analysis (in place) and returns the
+    compliance report. load_trades() returns the full trade history including the new trades;
+    it is only awaited when the history has to be replayed.
+    """
+    # Update the persisted per-symbol ledger with the new trades only (O(1) per trade).
+    # Portfolios stored before the ledger existed are replayed once to build it.
+    ledger = ledger_from_doc(portfolio.get("position_ledger"))
+    if ledger is None:
+        logger.info(f"No position ledger stored for {client_id}/{portfolio_id}. Building it from trade history.")
+        ledger = build_ledger(await load_trades())
+    else:
+        for trade_data in trades:
+            apply_trade_to_ledger(ledger, trade_data)
+        if settings.POSITION_LEDGER_VERIFY:
+            reference = build_ledger_from_trades(await load_trades())
+            if not ledgers_match(ledger, reference):
+                logger.error(f"Position ledger for {client_id}/{portfolio_id} diverged from trade replay. Using replayed ledger.")
+                ledger = reference
+
+    portfolio["position_ledger"] = ledger_to_doc(ledger)
+    portfolio["positions"] = positions_from_ledger(ledger)
+    logger.info(f"Recalculated positions after trade addition: {portfolio['positions']}")
+
+    # Re-run policy validation and risk drift analysis with updated positions
+    analysis, compliance_report = analyze_positions(portfolio["positions"])
+
+    portfolio["analysis"] = analysis
+    portfolio["compliance_report"] = compliance_report
+    portfolio["last_reanalyzed_at"] = datetime.now().isoformat()
+    portfolio["analysis_version"] = portfolio.get("analysis_version", 0) + 1
+    return compliance_report
+
 async def add_trade_and_reanalyze_portfolio(client_id: str, portfolio_id: str, trade_in: TradeIn):
     logger.info(f"Service: Adding trade to portfolio {client_id}/{portfolio_id} and re-analyzing.")
+    trade_data = _new_trade_data(trade_in)
+    existing_portfolio, compliance_report = await _add_trades_and_reanalyze(client_id, portfolio_id, [trade_data])
+    
+    # Return the updated compliance report and other relevant info
+    return {
+        "client_id": client_id,
+        "portfolio_id": portfolio_id,
+        "trade_added": trade_data,
+        "analysis": existing_portfolio["analysis"],
+        "compliance_report": compliance_report,
+    }
+
+async def _apply_trade_batch(key: Tuple[str, str], trades: List[dict]) -> Tuple[dict, str]:
+    client_id, portfolio_id = key
+    return await _write_trades(client_id, portfolio_id, trades)
+
+async def _ingest_trade_batch(key: Tuple[str, str], written: Tuple[dict, str]):
+    # Runs once the batch is durable: an ingest error does not make the written trades fail
+    client_id, portfolio_id = key
+    portfolio, compliance_report = written
+    await _ingest_reanalyzed_portfolio(client_id, portfolio_id, portfolio, compliance_report)
+
+def _get_trade_coalescer() -> TradeCoalescer:
+    global _trade_coalescer
+    if _trade_coalescer is None:
+        _trade_coalescer = TradeCoalescer(
+            _apply_trade_batch, settings.ADD_TRADE_COALESCE_WINDOW_SECONDS, settings.ADD_TRADE_COALESCE_MAX_TRADES,
+            after_batch=_ingest_trade_batch,
+            retention_seconds=settings.ADD_TRADE_STATUS_RETENTION_SECONDS,
+            max_statuses=settings.ADD_TRADE_STATUS_MAX_PER_PORTFOLIO,
+        )
+    return _trade_coalescer
+
+def enqueue_trade(client_id: str, portfolio_id: str, trade_in: TradeIn) -> dict:
+    """
+    Write-behind add-trade: buffers the trade for the portfolio's next coalesced batch and
+    returns its trade_id and sequence number without waiting for the write. Failures (an
+    unknown portfolio, a database error) are reported by wait_for_trade_durability; RAG
+    ingest errors after the write are only logged.
+    """
+    trade_data = _new_trade_data(trade_in)
+    sequence = _get_trade_coalescer().submit((client_id, portfolio_id), trade_data)
+    logger.info(f"Service: Trade {trade_data['trade_id']} for {client_id}/{portfolio_id} accepted with sequence {sequence}.")
+    return {"client_id": client_id, "portfolio_id": portfolio_id, "trade_id": trade_data["trade_id"], "sequence": sequence}
+
+async def wait_for_trade_durability(client_id: str, portfolio_id: str, sequence: int, timeout: float) -> dict:
+    """Waits up to timeout seconds for an enqueued trade to be written; returns its status (durable, failed or pending)."""
+    try:
+        return await _get_trade_coalescer().wait((client_id, portfolio_id), sequence, timeout)
+    except KeyError:
+        raise ValueError(f"No trade with sequence {sequence} was accepted for portfolio {client_id}/{portfolio_id}, or its status has expired.")
+
+async def drain_trade_queue():
+    """Writes every buffered write-behind trade; called on shutdown."""
+    if _trade_coalescer is not None and _trade_coalescer.pending_count():
+        logger.info(f"Writing {_trade_coalescer.pending_count()} buffered trades before shutdown.")
+    if _trade_coalescer is not None:
+        await _trade_coalescer.drain()
+
+async def _add_trades_and_reanalyze(client_id: str, portfolio_id: str, trades: List[dict]) -> Tuple[dict, str]:
+    """
+    Adds the trades to the portfolio with one re-analysis, one portfolio write and one RAG
+    ingest. Returns the updated portfolio and its compliance report.
+    """
+    existing_portfolio, compliance_report = await _write_trades(client_id, portfolio_id, trades)
+    await _ingest_reanalyzed_portfolio(client_id, portfolio_id, existing_portfolio, compliance_report)
+    logger.info(f"Successfully re-analyzed and ingested updated portfolio {client_id}/{portfolio_id} ({len(trades)} trades added).")
+    return existing_portfolio, compliance_report
+
+async def _write_trades(client_id: str, portfolio_id: str, trades: List[dict]) -> Tuple[dict, str]:
+    """
+    Adds the trades to the portfolio with one re-analysis and one version-checked portfolio
+    write, retried on concurrent writes. Returns the updated portfolio and its compliance report.
+    """
+    add_trades = _add_trades_to_trade_collection if settings.TRADE_COLLECTION_ENABLED else _add_trades_to_embedded_trades
+    async with _portfolio_locks.hold((client_id, portfolio_id)):
+        for attempt in range(1, settings.ADD_TRADE_MAX_ATTEMPTS + 1):
+            try:
+                existing_portfolio, compliance_report = await add_trades(client_id, portfolio_id, trades)
+                break
+            except _PortfolioWriteConflict:
+                logger.warning(f"Portfolio {client_id}/{portfolio_id} was written concurrently (attempt {attempt}). Retrying.")
+                if attempt < settings.ADD_TRADE_MAX_ATTEMPTS:
+                    await asyncio.sleep(random.uniform(0, attempt * settings.ADD_TRADE_RETRY_BACKOFF_SECONDS))
+        else:
+            raise RuntimeError(f"Portfolio {client_id}/{portfolio_id} kept changing concurrently; the trade was not added.")
+    logger.info(f"Wrote {len(trades)} trades to portfolio {client_id}/{portfolio_id}.")
+    return existing_portfolio, compliance_report
+
+async def _ingest_reanalyzed_portfolio(client_id: str, portfolio_id: str, portfolio: dict, compliance_report: str):
+    # Ingest the updated analysis into RAG
+    await ingest_portfolio_analysis(
+        client_id, # New positional argument
+        portfolio, # This dict now has _id as str
+        analysis_report=compliance_report,
+        portfolio_id=portfolio_id
+    )
+
+async def _add_trades_to_trade_collection(client_id: str, portfolio_id: str, trades: List[dict]) -> Tuple[dict, str]:
+    """
+    Appends the trades to the trades collection and writes only the changed fields of the
+    portfolio document, which is read without its trades. Embedded trades of older documents
+    are moved to the trades collection first.
+    """
+    existing_portfolio = await get_portfolio_without_trades(client_id, portfolio_id)
+    if not existing_portfolio:
+        logger.warning(f"Portfolio {client_id}/{portfolio_id} not found for trade addition.")
+        raise ValueError(f"Portfolio {client_id}/{portfolio_id} not found.")
+    mongo_id = existing_portfolio["_id"]
+    if not existing_portfolio.get(TRADES_EXTERNALIZED):
+        existing_portfolio["trade_count"] = await migrate_embedded_trades(client_id, portfolio_id, mongo_id)
+    existing_portfolio.setdefault("positions", [])
+    original_portfolio = dict(existing_portfolio)
+
+    async def load_trades() -> list:
+        # In the order the trades were added, like the incremental ledger applies them
+        return await get_trade_history(client_id, portfolio_id) + trades
+
+    compliance_report = await _reanalyze_with_trades(client_id, portfolio_id, existing_portfolio, trades, load_trades)
+
+    existing_portfolio["trade_count"] = existing_portfolio.get("trade_count", 0) + len(trades)
+
+    await insert_portfolio_trades(client_id, portfolio_id, trades, original_portfolio.get("trade_count", 0))
+    trade_ids = [trade["trade_id"] for trade in trades]
+    try:
+        success = await update_portfolio_changes(mongo_id, original_portfolio, existing_portfolio)
+    except Exception:
+        # Keep the trades consistent with the stored positions
+        await delete_portfolio_trades(client_id, portfolio_id, trade_ids)
+        raise
+    if not success:
+        await delete_portfolio_trades(client_id, portfolio_id, trade_ids)
+        raise _PortfolioWriteConflict()
+    _convert_objectid_to_str(existing_portfolio)
+    return existing_portfolio, compliance_report
 
+async def _add_trades_to_embedded_trades(client_id: str, portfolio_id: str, trades: List[dict]) -> Tuple[dict, str]:
+    """Appends the trades to the document's embedded trades ($push) and writes the changed fields."""
     existing_portfolio = await get_portfolio_by_client_and_portfolio_id(client_id, portfolio_id)
     if not existing_portfolio:
         logger.warning(f"Portfolio {client_id}/{portfolio_id} not found for trade addition.")
@@ -230,6 +333,7 @@ async def add_trade_and_reanalyze_portfolio(client_id: str, portfolio_id: str, t
 
     # Convert ObjectId to string for JSON serialization before further processing
     _convert_objectid_to_str(existing_portfolio)
+    original_portfolio = dict(existing_portfolio)
 
     # Ensure positions and trades lists exist
     if "positions" not in existing_portfolio or existing_portfolio["positions"] is None:
@@ -237,40 +341,13 @@ async def add_trade_and_reanalyze_portfolio(client_id: str, portfolio_id: str, t
     if "trades" not in existing_portfolio or existing_portfolio["trades"] is None:
         existing_portfolio["trades"] = []
 
-    # Add the new trade
-    trade_data = trade_in.dict()
-    # Generate a unique trade_id
-    trade_data["trade_id"] = str(uuid.uuid4()) # Add a unique trade_id
+    # Add the new trades (to a new list: the original one is compared against to find the change)
+    existing_portfolio["trades"] = existing_portfolio["trades"] + trades
 
-    # Convert datetime.date to ISO 8601 string for MongoDB compatibility
-    if isinstance(trade_data.get('trade_date'), date):
-        trade_data['trade_date'] = trade_data['trade_date'].isoformat()
-    existing_portfolio["trades"].append(trade_data)
+    async def load_trades() -> list:
+        return existing_portfolio["trades"]
 
-    # NEW: Recalculate positions based on the updated list of trades
-    existing_portfolio["positions"] = _calculate_positions_from_trades(existing_portfolio["trades"])
-    logger.info(f"Recalculated positions after trade addition: {existing_portfolio['positions']}")
-
-    # Re-run policy validation and risk drift analysis with updated positions
-    updated_positions = existing_portfolio.get("positions", []) # Use the newly calculated positions
-    
-    policy_validator = PolicyValidatorAgent(positions=updated_positions)
-    policy_violations = policy_validator.run()
-
-    risk_drift_analyzer = RiskDriftAgent(positions=updated_positions)
-    risk_drifts = risk_drift_analyzer.run()
-
-    breach_reporter = BreachReporterAgent(
-        policy_violations=policy_violations, risk_drifts=risk_drifts
-    )
-    compliance_report = breach_reporter.generate_report()
-
-    existing_portfolio["analysis"] = {
-        "policy_violations": policy_violations,
-        "risk_drifts": risk_drifts,
-    }
-    existing_portfolio["compliance_report"] = compliance_report
-    existing_portfolio["last_reanalyzed_at"] = datetime.now().isoformat()
+    compliance_report = await _reanalyze_with_trades(client_id, portfolio_id, existing_portfolio, trades, load_trades)
 
     # Get the MongoDB _id from the existing_portfolio
     mongo_id = existing_portfolio.pop("id", None) or existing_portfolio.get("_id")
@@ -278,30 +355,9 @@ async def add_trade_and_reanalyze_portfolio(client_id: str, portfolio_id: str, t
         logger.error(f"MongoDB ID not found for portfolio {client_id}/{portfolio_id}.")
         raise ValueError("Portfolio ID missing for update.")
     
-    # Update the document in MongoDB
-    # Ensure mongo_id is str for update_portfolio_doc
-    if isinstance(mongo_id, ObjectId):
-        mongo_id = str(mongo_id)
-    success = await update_portfolio_doc(mongo_id, existing_portfolio)
+    # Update the changed fields in MongoDB, if no other write happened since the read
+    success = await update_portfolio_changes(mongo_id, original_portfolio, existing_portfolio)
 
     if not success:
-        logger.error(f"Failed to update portfolio {client_id}/{portfolio_id} after trade addition.")
-        raise RuntimeError("Failed to update portfolio in database.")
-
-    # Ingest the updated analysis into RAG
-    await ingest_portfolio_analysis(
-        client_id, # New positional argument
-        existing_portfolio, # This dict now has _id as str
-        analysis_report=compliance_report,
-        portfolio_id=portfolio_id
-    )
-    logger.info(f"Successfully re-analyzed and ingested updated portfolio {client_id}/{portfolio_id}.")
-    
-    # Return the updated compliance report and other relevant info
-    return {
-        "client_id": client_id,
-        "portfolio_id": portfolio_id,
-        "trade_added": trade_data,
-        "analysis": existing_portfolio["analysis"],
-        "compliance_report": compliance_report,
-    }
\ No newline at end of file
+        raise _PortfolioWriteConflict()
+    return existing_portfolio, compliance_report
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Per-symbol running position state ("ledger") for a portfolio.
+
+The ledger holds, for every symbol ever traded, the aggregated quantity, total cost,
+latest trade price, ISIN and sector. Applying one trade to it is O(1), so adding a
+trade no longer requires replaying the full trade history. Replaying every trade
+through the same code path (build_ledger_from_trades) is kept for verification.
+"""
+import logging
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = "UNKNOWN"
+
+
+def _new_symbol_state(trade_isin: Optional[str], trade_sector: Optional[str]) -> dict:
+    return {
+        "quantity": 0,
+        "total_cost": 0.0, # Initialize total cost for weighted average
+        "isin": trade_isin if trade_isin else UNKNOWN, # Use ISIN from the first trade if available
+        "sector": trade_sector if trade_sector else UNKNOWN, # Use Sector from the first trade if available
+        "latest_price": 0.0 # Latest trade price, used as market_price placeholder
+    }
+
+
+def apply_trade_to_ledger(ledger: Dict[str, dict], trade: dict) -> bool:
+    """
+    Applies a single trade to the ledger in place.
+    Returns False if the trade was skipped as malformed.
+    """
+    symbol = trade.get("symbol")
+    quantity = trade.get("quantity")
+    trade_type = trade.get("type") # 'BUY' or 'SELL'
+    trade_price = trade.get("price")
+    trade_isin = trade.get("isin")
+    trade_sector = trade.get("sector")
+
+    if not all([symbol, isinstance(quantity, (int, float)), trade_type]):
+        logger.warning(f"Skipping malformed trade data: {trade}")
+        return False
+
+    state = ledger.get(symbol)
+    if state is None:
+        state = ledger[symbol] = _new_symbol_state(trade_isin, trade_sector)
+    else:
+        # First one wins: only fill in ISIN/Sector while they are still UNKNOWN
+        if state["isin"] == UNKNOWN and trade_isin:
+            state["isin"] = trade_isin
+        if state["sector"] == UNKNOWN and trade_sector:
+            state["sector"] = trade_sector
+
+    current_quantity = state["quantity"]
+    normalized_type = trade_type.upper()
+
+    if normalized_type == "BUY":
+        state["quantity"] += quantity
+        if trade_price is not None:
+            state["total_cost"] += (quantity * trade_price)
+            state["latest_price"] = trade_price
+    elif normalized_type == "SELL":
+        # Selling reduces the cost basis proportionally (weighted average cost).
+        # In real systems, FIFO/LIFO/Specific ID might be used.
+        if current_quantity > 0:
+            cost_reduction = (quantity / current_quantity) * state["total_cost"]
+            state["total_cost"] -= cost_reduction
+        state["quantity"] -= quantity
+        if trade_price is not None:
+            state["latest_price"] = trade_price
+    else:
+        logger.warning(f"Unknown trade type '{trade_type}' for symbol {symbol}. Skipping.")
+
+    return True
+
+
+def build_ledger_from_trades(trades: List[Dict]) -> Dict[str, dict]:
+    """
+    Replays the full trade history from scratch into a new ledger.
+    This is the reference path used to verify the incrementally maintained ledger.
+    """
+    ledger = {}
+    for trade in trades:
+        apply_trade_to_ledger(ledger, trade)
+    return ledger
+
+
+def positions_from_ledger(ledger: Dict[str, dict]) -> List[Dict]:
+    """
+    Converts the ledger into a list of position dictionaries, skipping flat positions.
+    """
+    positions = []
+    for symbol, data in ledger.items():
+        total_quantity = data["quantity"]
+        total_cost = data["total_cost"]
+
+        if total_quantity != 0: # Only include positions with non-zero quantity
+            avg_price = total_cost / total_quantity if total_quantity > 0 else 0.0
+
+            # Use the latest trade price as a placeholder for market_price
+            market_price = data["latest_price"] if data["latest_price"] != 0.0 else avg_price
+
+            positions.append({
+                "symbol": symbol,
+                "quantity": total_quantity,
+                "isin": data["isin"],
+                "avg_price": avg_price,
+                "market_price": market_price,
+                "sector": data["sector"]
+            })
+
+    return positions
+
+
+def ledger_to_doc(ledger: Dict[str, dict]) -> List[Dict]:
+    """
+    Serializes the ledger for MongoDB storage.
+    Stored as a list rather than a dict keyed by symbol, since symbols such as
+    'BRK.B' are not safe to use as MongoDB field names.
+    """
+    return [{"symbol": symbol, **state} for symbol, state in ledger.items()]
+
+
+def ledger_from_doc(ledger_doc: Optional[List[Dict]]) -> Optional[Dict[str, dict]]:
+    """
+    Deserializes a stored ledger. Returns None if the document has no ledger yet.
+    """
+    if not isinstance(ledger_doc, list):
+        return None
+    ledger = {}
+    for entry in ledger_doc:
+        state = dict(entry)
+        symbol = state.pop("symbol", None)
+        if symbol is None:
+            logger.warning(f"Skipping stored ledger entry without symbol: {entry}")
+            continue
+        ledger[symbol] = state
+    return ledger
+
+
+def ledgers_match(ledger: Dict[str, dict], reference: Dict[str, dict], rel_tol: float = 1e-9) -> bool:
+    """
+    Compares an incrementally maintained ledger against a replayed reference ledger.
+    Float fields are compared with a relative tolerance.
+    """
+    if list(ledger.keys()) != list(reference.keys()):
+        return False
+    for symbol, state in ledger.items():
+        ref = reference[symbol]
+        if state["isin"] != ref["isin"] or state["sector"] != ref["sector"]:
+            return False
+        for field in ("quantity", "total_cost", "latest_price"):
+            a, b = state[field], ref[field]
+            if abs(a - b) > rel_tol * max(1.0, abs(a), abs(b)):
+                return False
+    return True
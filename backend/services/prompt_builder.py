@@ -0,0 +1,213 @@
+"""
+Token-budgeted assembly of the LLM prompt for RAG questions.
+
+The system instructions and the question are always sent. The rest of the budget is
+shared out in this order:
+1. the most recent chat messages, verbatim, up to history_share of the budget (all of it without context);
+2. the retrieved context chunks, deduplicated and ranked by similarity (smallest distance first);
+3. a compacted summary of older messages (each truncated to summary_tokens), newest first.
+Whatever does not fit is dropped and reported in the returned PromptBuild.
+
+Token counts come from a pluggable counter. tiktoken is not a dependency, so the default
+is a local approximation that errs on the high side (see approximate_token_count).
+"""
+import logging
+import math
+import re
+from typing import Callable, List, NamedTuple, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a compliance assistant. Use the provided portfolio report and conversation history to answer the user's questions concisely and accurately."
+CONTEXT_HEADER = "Here is the relevant portfolio report information:\n"
+HISTORY_SUMMARY_HEADER = "Summary of earlier conversation (older messages shortened or omitted):\n"
+
+# Chat format overhead per message, and for priming the assistant's reply (as counted by OpenAI)
+_MESSAGE_OVERHEAD_TOKENS = 4
+_REPLY_PRIMING_TOKENS = 3
+# A recent message is truncated to fit only if at least this many tokens of it can be kept
+_MIN_TRUNCATED_TOKENS = 16
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Approximates BPE token counts: one token per punctuation mark and per started
+    four characters of a word. Slightly overestimates English text, so the budget holds.
+    """
+    return sum(math.ceil(len(token) / 4) for token in _TOKEN_PATTERN.findall(text))
+
+
+class PromptBuild(NamedTuple):
+    messages: list
+    prompt_tokens: int
+    context_chunks: int # Chunks included
+    dropped_chunks: int # Chunks left out for lack of budget
+    duplicate_chunks: int
+    recent_messages: int # History messages included verbatim (the oldest of them possibly truncated)
+    summarized_messages: int # Older history messages included in the summary
+    dropped_messages: int # History messages left out entirely
+
+
+def _message_tokens(content: str, count_tokens: Callable[[str], int]) -> int:
+    return count_tokens(content) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def count_prompt_tokens(messages: list, count_tokens: Callable[[str], int] = approximate_token_count) -> int:
+    return sum(_message_tokens(m["content"], count_tokens) for m in messages) + _REPLY_PRIMING_TOKENS
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count_tokens: Callable[[str], int] = approximate_token_count) -> str:
+    """Keeps the longest word prefix of text (plus "...") within max_tokens."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    # Binary search for the number of words that fits, counting the ellipsis
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + "...") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "..." if low else ""
+
+
+def _rank_and_dedupe(chunks: Sequence[str], distances: Optional[Sequence[float]]):
+    """Returns (unique chunks, most similar first; number of duplicates)."""
+    order = range(len(chunks))
+    if distances is not None and len(distances) == len(chunks):
+        order = sorted(order, key=lambda i: distances[i]) # Stable, so retrieval order breaks ties
+    unique, seen = [], set()
+    for i in order:
+        key = _WHITESPACE.sub(" ", chunks[i]).strip().casefold()
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(chunks[i])
+    return unique, len(chunks) - len(unique)
+
+
+def build_prompt(
+    question: str,
+    chat_history: Optional[list] = None,
+    context_chunks: Sequence[str] = (),
+    distances: Optional[Sequence[float]] = None,
+    system_prompt: Optional[str] = SYSTEM_PROMPT,
+    *,
+    token_budget: int,
+    history_share: float,
+    recent_messages: int,
+    summary_tokens: int,
+    count_tokens: Callable[[str], int] = approximate_token_count,
+) -> PromptBuild:
+    """
+    Builds the chat messages for a question within token_budget (see the module docstring).
+    Pass system_prompt=None to send no system instructions (e.g. when there is no context).
+    """
+    history = [
+        {"role": m["role"], "content": str(m.get("content") or "")}
+        for m in chat_history or [] if isinstance(m, dict) and m.get("role")
+    ]
+    question_message = {"role": "user", "content": question}
+    system_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    used = count_prompt_tokens(system_messages + [question_message], count_tokens)
+    if used > token_budget:
+        logger.warning(f"Question and instructions alone take {used} tokens, over the budget of {token_budget}.")
+    available = max(0, token_budget - used)
+
+    # 1. Recent messages, newest first, within their share of the budget
+    older = history[:-recent_messages] if recent_messages > 0 else history
+    candidates = history[len(older):]
+    # Without context there is nothing else to spend the budget on
+    history_allowance = int(available * history_share) if context_chunks else available
+    recent: List[dict] = []
+    for index in range(len(candidates) - 1, -1, -1):
+        message = candidates[index]
+        tokens = _message_tokens(message["content"], count_tokens)
+        if tokens <= history_allowance:
+            recent.append(message)
+            history_allowance -= tokens
+            continue
+        # The first message that does not fit is truncated if enough room is left; it and all
+        # messages before it otherwise go to the summary, so the verbatim part stays contiguous
+        split = index + 1
+        if history_allowance - _MESSAGE_OVERHEAD_TOKENS >= _MIN_TRUNCATED_TOKENS:
+            content = truncate_to_tokens(message["content"], history_allowance - _MESSAGE_OVERHEAD_TOKENS, count_tokens)
+            recent.append({"role": message["role"], "content": content})
+            split = index
+        older = older + candidates[:split]
+        break
+    recent.reverse()
+    available -= sum(_message_tokens(m["content"], count_tokens) for m in recent)
+
+    # 2. Context chunks by similarity, skipping any that no longer fit
+    chunks, duplicates = _rank_and_dedupe(context_chunks, distances)
+    included = []
+    context_tokens = _message_tokens(CONTEXT_HEADER, count_tokens)
+    if chunks and context_tokens < available:
+        for chunk in chunks:
+            chunk_tokens = count_tokens(chunk) + 1 # Plus the joining newline
+            if context_tokens + chunk_tokens <= available:
+                included.append(chunk)
+                context_tokens += chunk_tokens
+    context_messages = [{"role": "system", "content": CONTEXT_HEADER + "\n".join(included)}] if included else []
+    available -= context_tokens if included else 0
+
+    # 3. Older messages, each shortened, newest first while they fit
+    summary_lines = []
+    summary_tokens_used = _message_tokens(HISTORY_SUMMARY_HEADER, count_tokens)
+    for message in reversed(older):
+        line = f"{message['role']}: {truncate_to_tokens(message['content'], summary_tokens, count_tokens)}"
+        line_tokens = count_tokens(line) + 1
+        if summary_tokens_used + line_tokens > available:
+            break
+        summary_lines.append(line)
+        summary_tokens_used += line_tokens
+    summary_lines.reverse()
+    summary_messages = [{"role": "system", "content": HISTORY_SUMMARY_HEADER + "\n".join(summary_lines)}] if summary_lines else []
+
+    messages = system_messages + context_messages + summary_messages + recent + [question_message]
+    return PromptBuild(
+        messages=messages,
+        prompt_tokens=count_prompt_tokens(messages, count_tokens),
+        context_chunks=len(included),
+        dropped_chunks=len(chunks) - len(included),
+        duplicate_chunks=duplicates,
+        recent_messages=len(recent),
+        summarized_messages=len(summary_lines),
+        dropped_messages=len(history) - len(recent) - len(summary_lines),
+    )
+
+
+class PromptTokenStats:
+    """Running prompt size statistics, reported by /rag/metrics."""
+    def __init__(self):
+        self._requests = 0
+        self._total_tokens = 0
+        self._max_tokens = 0
+        self._dropped_chunks = 0
+        self._duplicate_chunks = 0
+        self._summarized_messages = 0
+        self._dropped_messages = 0
+
+    def record(self, build: PromptBuild):
+        self._requests += 1
+        self._total_tokens += build.prompt_tokens
+        self._max_tokens = max(self._max_tokens, build.prompt_tokens)
+        self._dropped_chunks += build.dropped_chunks
+        self._duplicate_chunks += build.duplicate_chunks
+        self._summarized_messages += build.summarized_messages
+        self._dropped_messages += build.dropped_messages
+
+    def metrics(self) -> dict:
+        return {
+            "requests": self._requests,
+            "avg_prompt_tokens": self._total_tokens / self._requests if self._requests else 0.0,
+            "max_prompt_tokens": self._max_tokens,
+            "dropped_chunks": self._dropped_chunks,
+            "duplicate_chunks": self._duplicate_chunks,
+            "summarized_messages": self._summarized_messages,
+            "dropped_messages": self._dropped_messages,
+        }
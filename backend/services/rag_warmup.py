@@ -0,0 +1,67 @@
+"""
+Background loading of the RAG components (ChromaDB client, embedding model, collection).
+
+With settings.RAG_LAZY_INIT, main.py starts a RagWarmup at startup instead of loading the
+components before serving: non-RAG routes answer right away, RAG questions get a 503
+until the warm-up is done, and ingestion waits for it (see rag_service.wait_for_rag_components).
+/health reports the progress.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+NOT_STARTED = "not_started"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class RagWarmup:
+    """Runs a blocking initializer once, in a worker thread, and tracks its state."""
+    def __init__(self, initializer: Callable[[], None]):
+        self._initializer = initializer
+        self._task: Optional[asyncio.Task] = None
+        self.state = NOT_STARTED
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def start(self) -> asyncio.Task:
+        """Starts the initializer in the background (once) and returns its task."""
+        if self._task is None:
+            self.state = LOADING
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def _run(self):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._initializer)
+        except Exception as e:
+            self.state, self.error = FAILED, str(e)
+            logger.error(f"Loading the RAG components failed: {e}", exc_info=True)
+        else:
+            self.state = READY
+            logger.info(f"RAG components loaded in the background in {time.perf_counter() - start:.1f} s.")
+        finally:
+            self.seconds = time.perf_counter() - start
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits up to timeout seconds (None: until done) for the warm-up. Returns whether it succeeded."""
+        if self._task is None:
+            return self.ready
+        try:
+            # Shielded, so a timed-out wait does not cancel the warm-up itself
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    def status(self) -> dict:
+        return {"status": self.state, "seconds": self.seconds, "error": self.error}
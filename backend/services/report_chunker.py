@@ -0,0 +1,134 @@
+"""
+Section-level chunking of a portfolio analysis for RAG ingestion.
+
+Instead of one document holding the whole report, positions list and analysis dict,
+a portfolio is split into small documents: a summary, one per policy violation,
+one per risk drift and one per group of positions in a sector. Each chunk carries
+metadata (chunk_type, sector, symbol) so retrieval returns only the relevant pieces.
+"""
+import logging
+import re
+from typing import List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Positions per "positions" chunk; keeps each chunk well within the embedding model's input length
+POSITIONS_PER_CHUNK = 20
+# Longest report summary text kept in the summary chunk
+SUMMARY_MAX_CHARS = 1000
+
+# Violation formats produced by the policy rule engine and PolicyValidatorAgent
+_POSITION_VIOLATION = re.compile(r": (?P<symbol>[^\s:]+) \([^:()]+: [^()]*\)$")
+_MISSING_FIELD_VIOLATION = re.compile(r"for position '(?P<symbol>[^']+)'")
+_WEIGHT_VIOLATION = re.compile(r": (?P<group>.+) weight [\d.]+% \(limit [\d.]+%\)$")
+
+
+class ReportChunk(NamedTuple):
+    chunk_id: str # Unique within the portfolio, stable across re-analysis where possible
+    text: str
+    metadata: dict # chunk_type, plus sector / symbol when the chunk is about one
+
+
+def _summary_text(analysis_report) -> str:
+    if isinstance(analysis_report, dict):
+        text = " ".join(
+            str(analysis_report[key]) for key in ("policy_violations_summary", "risk_drifts_summary") if analysis_report.get(key)
+        )
+    else:
+        text = str(analysis_report or "")
+    return text if len(text) <= SUMMARY_MAX_CHARS else text[:SUMMARY_MAX_CHARS].rstrip() + "..."
+
+
+def _violation_metadata(violation: str, sector_by_symbol: dict) -> dict:
+    """Extracts the symbol (and its sector) or the sector a violation refers to, where recognizable."""
+    metadata = {}
+    match = _POSITION_VIOLATION.search(violation) or _MISSING_FIELD_VIOLATION.search(violation)
+    if match and match.group("symbol") in sector_by_symbol:
+        metadata["symbol"] = match.group("symbol")
+        if sector_by_symbol[metadata["symbol"]]:
+            metadata["sector"] = sector_by_symbol[metadata["symbol"]]
+        return metadata
+    match = _WEIGHT_VIOLATION.search(violation)
+    if match and match.group("group") in set(sector_by_symbol.values()):
+        metadata["sector"] = match.group("group")
+    return metadata
+
+
+def _format_number(value, pattern: str = "{:,.2f}") -> str:
+    return pattern.format(value) if isinstance(value, (int, float)) else "n/a"
+
+
+def _position_line(position: dict) -> str:
+    quantity = position.get("quantity")
+    market_price = position.get("market_price")
+    market_value = quantity * market_price if isinstance(quantity, (int, float)) and isinstance(market_price, (int, float)) else None
+    return (
+        f"{position.get('symbol', 'UNKNOWN')} (ISIN {position.get('isin', 'UNKNOWN')}): "
+        f"quantity {_format_number(quantity, '{:g}')}, average price {_format_number(position.get('avg_price'))}, "
+        f"market price {_format_number(market_price)}, market value {_format_number(market_value)}"
+    )
+
+
+def chunk_portfolio_report(client_id: str, portfolio_id: str, portfolio_data: dict, analysis_report) -> List[ReportChunk]:
+    """
+    Splits a portfolio's analysis into RAG chunks. The summary chunk always comes first.
+    Malformed positions, violations or drifts are skipped rather than failing ingestion.
+    """
+    header = f"Portfolio {client_id}/{portfolio_id}"
+    positions = [p for p in portfolio_data.get("positions") or [] if isinstance(p, dict)]
+    analysis = portfolio_data.get("analysis") if isinstance(portfolio_data.get("analysis"), dict) else {}
+    violations = [v for v in analysis.get("policy_violations") or [] if isinstance(v, str)]
+    drifts = [d for d in analysis.get("risk_drifts") or [] if isinstance(d, dict) and d.get("sector") is not None]
+
+    positions_by_sector = {}
+    for position in positions:
+        positions_by_sector.setdefault(position.get("sector") or "Unknown", []).append(position)
+    sector_by_symbol = {p.get("symbol"): p.get("sector") for p in positions if p.get("symbol")}
+
+    chunks = [ReportChunk(
+        chunk_id="summary",
+        text=(
+            f"Client ID: {client_id}\n"
+            f"Portfolio ID: {portfolio_id}\n"
+            f"Compliance Report Summary: {_summary_text(analysis_report)}\n"
+            f"Positions: {len(positions)} across sectors: {', '.join(sorted(positions_by_sector)) or 'none'}\n"
+            f"Policy violations: {len(violations)}; significant risk drifts: {len(drifts)}"
+        ),
+        metadata={"chunk_type": "summary"},
+    )]
+
+    for index, violation in enumerate(violations):
+        chunks.append(ReportChunk(
+            chunk_id=f"violation-{index}",
+            text=f"{header} policy violation: {violation}",
+            metadata={"chunk_type": "violation", **_violation_metadata(violation, sector_by_symbol)},
+        ))
+
+    for drift in drifts:
+        sector = str(drift["sector"])
+        chunks.append(ReportChunk(
+            chunk_id=f"risk_drift-{sector}",
+            text=(
+                f"{header} risk drift in {sector}: actual weight {_format_number(drift.get('actual'))}, "
+                f"model weight {_format_number(drift.get('model'))}, drift {_format_number(drift.get('drift'))} "
+                f"(threshold {_format_number(drift.get('threshold'))})"
+            ),
+            metadata={"chunk_type": "risk_drift", "sector": sector},
+        ))
+
+    for sector, sector_positions in sorted(positions_by_sector.items()):
+        parts = range(0, len(sector_positions), POSITIONS_PER_CHUNK)
+        for part, start in enumerate(parts, start=1):
+            group = sector_positions[start:start + POSITIONS_PER_CHUNK]
+            symbols = [str(p.get("symbol", "UNKNOWN")) for p in group]
+            metadata = {"chunk_type": "positions", "sector": sector, "symbols": ",".join(symbols)}
+            if len(group) == 1:
+                metadata["symbol"] = symbols[0]
+            chunks.append(ReportChunk(
+                chunk_id=f"positions-{sector}-{part}",
+                text=f"{header} positions in {sector} (part {part} of {len(parts)}):\n" + "\n".join(_position_line(p) for p in group),
+                metadata=metadata,
+            ))
+
+    logger.debug(f"Split analysis of {client_id}/{portfolio_id} into {len(chunks)} chunks.")
+    return chunks
@@ -0,0 +1,142 @@
+"""
+Deterministic answers to structured compliance questions.
+
+Questions such as "how many violations", "which sectors drifted" or "what is my
+Technology weight" are answered straight from the stored analysis and positions,
+without retrieval or an LLM call. classify_question is deliberately strict: any
+question it does not recognize (or that asks why / what if) goes to RAG + LLM.
+"""
+import logging
+import re
+from typing import NamedTuple, Optional
+
+from crud.portfolio_crud import get_portfolio_analysis_doc
+from services.answer_cache import normalize_question
+
+logger = logging.getLogger(__name__)
+
+VIOLATION_COUNT = "violation_count"
+VIOLATION_LIST = "violation_list"
+DRIFTED_SECTORS = "drifted_sectors"
+SECTOR_WEIGHT = "sector_weight"
+POSITION_COUNT = "position_count"
+
+# Hypothetical, causal or advisory questions need the LLM even if they mention violations or weights
+_OPEN_ENDED = re.compile(r"\b(why|if|would|should|could|explain|fix|resolve|avoid|reduce|increase|recommend|suggest|compare|trend)\b")
+_VIOLATIONS = r"(?:policy |compliance )?(?:violations?|breach(?:es)?)"
+_INTENT_PATTERNS = [
+    (VIOLATION_COUNT, re.compile(rf"^(?:how many|what is the number of|number of|count of)(?: \w+){{0,3}}? {_VIOLATIONS}\b")),
+    (VIOLATION_LIST, re.compile(rf"^(?:(?:what|which) (?:are|were)|list|show(?: me)?|are there|do i have|any)(?: any| the| my| all)* {_VIOLATIONS}(?: (?:are there|do i have|were (?:detected|found)))?$")),
+    (DRIFTED_SECTORS, re.compile(r"^(?:(?:what|which) sectors?\b.*\bdrift\w*|(?:what|which) (?:are|were)(?: the| my)* (?:risk )?drifts|(?:list|show(?: me)?|are there|any)(?: any| the| my| all)* (?:risk |sector )?drifts?)$")),
+    (SECTOR_WEIGHT, re.compile(r"^(?:what(?:'s| is) (?:my|the) (?P<sector>[a-z][a-z &/-]*?) (?:weight|allocation|exposure)|(?:what(?:'s| is) )?(?:my |the )?(?:weight|allocation|exposure) (?:of|in|to) (?P<sector_after>[a-z][a-z &/-]*?))(?: in (?:my|the) portfolio)?$")),
+    (POSITION_COUNT, re.compile(r"^(?:how many|number of) (?:positions|holdings)\b")),
+]
+
+
+class StructuredAnswer(NamedTuple):
+    intent: str
+    answer: str
+
+
+def classify_question(question: str):
+    """Returns (intent, regex match) for a structured question, or None for an open-ended one."""
+    normalized = normalize_question(question)
+    if _OPEN_ENDED.search(normalized):
+        return None
+    for intent, pattern in _INTENT_PATTERNS:
+        match = pattern.search(normalized)
+        if match:
+            return intent, match
+    return None
+
+
+def _percent(value) -> str:
+    return f"{value:.2%}" if isinstance(value, (int, float)) else "n/a"
+
+
+def _stored_violations_and_drifts(portfolio_doc: dict):
+    """Policy violations and risk drifts from the analysis, or from the compliance report's raw fields."""
+    analysis = portfolio_doc.get("analysis") if isinstance(portfolio_doc.get("analysis"), dict) else {}
+    report = portfolio_doc.get("compliance_report") if isinstance(portfolio_doc.get("compliance_report"), dict) else {}
+    violations = analysis.get("policy_violations", report.get("raw_policy_violations"))
+    drifts = analysis.get("risk_drifts", report.get("raw_risk_drifts"))
+    return violations, drifts
+
+
+def _sector_weight_answer(portfolio_doc: dict, sector_name: str) -> Optional[str]:
+    values_by_sector = {}
+    for position in portfolio_doc.get("positions") or []:
+        if not isinstance(position, dict):
+            continue
+        quantity, market_price = position.get("quantity"), position.get("market_price")
+        if isinstance(quantity, (int, float)) and isinstance(market_price, (int, float)):
+            sector = position.get("sector") or "Unknown"
+            values_by_sector[sector] = values_by_sector.get(sector, 0.0) + quantity * market_price
+    total = sum(values_by_sector.values())
+    sector = next((s for s in values_by_sector if s.casefold() == sector_name.strip()), None)
+    if sector is None or not total:
+        # Not a sector of this portfolio (e.g. a typo or an asset class): let the LLM handle it
+        return None
+    return (
+        f"Your {sector} weight is {_percent(values_by_sector[sector] / total)} of the portfolio's market value "
+        f"({values_by_sector[sector]:,.2f} of {total:,.2f})."
+    )
+
+
+def build_structured_answer(intent: str, match, portfolio_doc: dict) -> Optional[str]:
+    """Formats the answer for a classified question, or returns None if the stored data cannot answer it."""
+    if "compliance_report" not in portfolio_doc and "analysis_version" not in portfolio_doc:
+        # Never analyzed (e.g. seeded from clients.json): its analysis only holds placeholder text
+        return None
+    violations, drifts = _stored_violations_and_drifts(portfolio_doc)
+
+    if intent in (VIOLATION_COUNT, VIOLATION_LIST):
+        if not isinstance(violations, list):
+            return None
+        if not violations:
+            return "No policy violations detected."
+        if intent == VIOLATION_COUNT:
+            return f"{len(violations)} policy violation{'s' if len(violations) != 1 else ''} detected."
+        return f"The following {len(violations)} policy violations were detected:\n" + "\n".join(f"- {v}" for v in violations)
+
+    if intent == DRIFTED_SECTORS:
+        if not isinstance(drifts, list):
+            return None
+        drifts = [d for d in drifts if isinstance(d, dict) and d.get("sector")]
+        if not drifts:
+            return "No significant risk drifts detected."
+        return "Significant risk drifts were identified in:\n" + "\n".join(
+            f"- {d['sector']}: actual {_percent(d.get('actual'))}, model {_percent(d.get('model'))}, "
+            f"drift {_percent(d.get('drift'))} (threshold {_percent(d.get('threshold'))})"
+            for d in drifts
+        )
+
+    if intent == SECTOR_WEIGHT:
+        return _sector_weight_answer(portfolio_doc, match.group("sector") or match.group("sector_after"))
+
+    if intent == POSITION_COUNT:
+        positions = portfolio_doc.get("positions")
+        return f"The portfolio holds {len(positions)} positions." if isinstance(positions, list) else None
+
+    return None
+
+
+async def answer_structured_question(client_id: str, portfolio_id: str, question: str) -> Optional[StructuredAnswer]:
+    """
+    Answers the question from the portfolio's stored analysis if it is a structured one.
+    Returns None if it should go to RAG + LLM instead (open-ended question, unknown portfolio,
+    data that cannot answer it, or a database error).
+    """
+    classified = classify_question(question)
+    if classified is None:
+        return None
+    intent, match = classified
+    try:
+        portfolio_doc = await get_portfolio_analysis_doc(client_id, portfolio_id)
+    except Exception as e:
+        logger.warning(f"Could not load analysis of {client_id}/{portfolio_id} for a structured answer: {e}")
+        return None
+    if not portfolio_doc:
+        return None
+    answer = build_structured_answer(intent, match, portfolio_doc)
+    return StructuredAnswer(intent, answer) if answer is not None else None
@@ -0,0 +1,168 @@
+"""
+Write-behind buffering of add-trade bursts.
+
+Trades submitted for a portfolio are acknowledged at once with a sequence number and
+buffered. Sequence numbers are unique within the process and increase per portfolio. A
+flush task per portfolio waits for the coalescing window (or until the batch is full), then
+applies all buffered trades with a single call, so a burst of fills costs one re-analysis,
+one portfolio write and one RAG ingest. Batches of a portfolio are applied one after another
+in sequence order, so "sequence N is resolved" means every trade of the portfolio up to N
+was either written or failed. Follow-up work on a written batch (the RAG ingest) runs after
+its sequences are resolved: its errors are logged, they do not make trades that are already
+written look failed. Buffered trades live in this process only: they are lost if it dies
+before a flush, which is why drain() runs on shutdown.
+
+Resolved statuses are kept for retention_seconds, and at most max_statuses per portfolio;
+a portfolio's buffer is dropped once it has no trades in flight and no statuses left.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DURABLE = "durable"
+PENDING = "pending"
+FAILED = "failed"
+
+
+class _PortfolioBuffer:
+    def __init__(self):
+        self.pending: List[Tuple[int, Any]] = []
+        self.unresolved: Set[int] = set() # Buffered or being applied
+        # sequence -> (status, error, resolved at), oldest first
+        self.statuses: "OrderedDict[int, Tuple[str, Optional[str], float]]" = OrderedDict()
+        self.resolved = asyncio.Condition()
+        self.full = asyncio.Event()
+        self.flusher: Optional[asyncio.Task] = None
+
+
+class TradeCoalescer:
+    def __init__(
+        self,
+        apply_batch: Callable[[Hashable, List[Any]], Awaitable[Any]],
+        window_seconds: float,
+        max_batch: int,
+        after_batch: Optional[Callable[[Hashable, Any], Awaitable[Any]]] = None,
+        retention_seconds: float = 3600.0,
+        max_statuses: int = 10_000,
+    ):
+        """
+        apply_batch(key, items) writes a batch; once it returns, the batch's sequences are durable.
+        after_batch(key, result of apply_batch), if given, then runs before the key's next batch.
+        """
+        self._apply_batch = apply_batch
+        self._after_batch = after_batch
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.retention_seconds = retention_seconds
+        self.max_statuses = max_statuses
+        self._buffers: Dict[Hashable, _PortfolioBuffer] = {}
+        self._sequences = itertools.count(1)
+        self._last_prune = time.monotonic()
+        self._draining = False
+
+    def submit(self, key: Hashable, item: Any) -> int:
+        """Buffers the item for the key and returns its sequence number."""
+        self._prune()
+        buffer = self._buffers.setdefault(key, _PortfolioBuffer())
+        sequence = next(self._sequences)
+        buffer.pending.append((sequence, item))
+        buffer.unresolved.add(sequence)
+        if len(buffer.pending) >= self.max_batch:
+            buffer.full.set()
+        if buffer.flusher is None:
+            buffer.flusher = asyncio.create_task(self._flush(key, buffer))
+        return sequence
+
+    async def _flush(self, key: Hashable, buffer: _PortfolioBuffer):
+        while buffer.pending:
+            if not self._draining:
+                try:
+                    await asyncio.wait_for(buffer.full.wait(), self.window_seconds)
+                except asyncio.TimeoutError:
+                    pass
+            batch, buffer.pending = buffer.pending[:self.max_batch], buffer.pending[self.max_batch:]
+            if len(buffer.pending) < self.max_batch:
+                buffer.full.clear()
+            status, error = DURABLE, None
+            try:
+                result = await self._apply_batch(key, [item for _, item in batch])
+            except Exception as e:
+                logger.error(f"Write-behind batch of {len(batch)} trades for {key} failed: {e}", exc_info=True)
+                status, error = FAILED, str(e)
+            async with buffer.resolved:
+                self._resolve(buffer, [sequence for sequence, _ in batch], status, error)
+                buffer.resolved.notify_all()
+            if status == DURABLE and self._after_batch is not None:
+                try:
+                    await self._after_batch(key, result)
+                except Exception as e:
+                    logger.error(f"Follow-up of the written batch of {len(batch)} trades for {key} failed: {e}", exc_info=True)
+        buffer.flusher = None
+
+    def _resolve(self, buffer: _PortfolioBuffer, sequences: List[int], status: str, error: Optional[str]):
+        resolved_at = time.monotonic()
+        for sequence in sequences:
+            buffer.unresolved.discard(sequence)
+            buffer.statuses[sequence] = (status, error, resolved_at)
+        while len(buffer.statuses) > self.max_statuses:
+            buffer.statuses.popitem(last=False)
+
+    def _prune(self):
+        """Drops statuses older than the retention window, then idle buffers; at most twice per window."""
+        now = time.monotonic()
+        if now - self._last_prune < self.retention_seconds / 2:
+            return
+        self._last_prune = now
+        for key, buffer in list(self._buffers.items()):
+            while buffer.statuses and next(iter(buffer.statuses.values()))[2] < now - self.retention_seconds:
+                buffer.statuses.popitem(last=False)
+            if not buffer.statuses and not buffer.unresolved and buffer.flusher is None:
+                del self._buffers[key]
+
+    async def wait(self, key: Hashable, sequence: int, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Waits up to timeout seconds until the trade with this sequence number is written or
+        failed, and returns its status (durable, failed with the error, or still pending).
+        Raises KeyError for a sequence number that was not issued for the key, or whose
+        status is no longer kept.
+        """
+        self._prune()
+        buffer = self._buffers.get(key)
+        if buffer is None or (sequence not in buffer.unresolved and sequence not in buffer.statuses):
+            raise KeyError(f"No trade with sequence {sequence} was submitted for {key}, or its status has expired.")
+        async with buffer.resolved:
+            try:
+                await asyncio.wait_for(buffer.resolved.wait_for(lambda: sequence not in buffer.unresolved), timeout)
+            except asyncio.TimeoutError:
+                pass
+        if sequence in buffer.unresolved:
+            return {"sequence": sequence, "status": PENDING}
+        if sequence not in buffer.statuses:
+            raise KeyError(f"The status of the trade with sequence {sequence} for {key} has expired.")
+        status, error, _ = buffer.statuses[sequence]
+        if status == FAILED:
+            return {"sequence": sequence, "status": FAILED, "error": error}
+        return {"sequence": sequence, "status": status}
+
+    def pending_count(self) -> int:
+        return sum(len(buffer.pending) for buffer in self._buffers.values())
+
+    def __len__(self) -> int:
+        """Number of portfolios with buffered trades or kept statuses."""
+        return len(self._buffers)
+
+    async def drain(self):
+        """Applies every buffered trade now, without waiting for the window, and waits until done."""
+        self._draining = True
+        try:
+            while flushers := [buffer.flusher for buffer in self._buffers.values() if buffer.flusher is not None]:
+                for buffer in self._buffers.values():
+                    buffer.full.set() # Wakes flushers waiting for the window
+                await asyncio.gather(*flushers, return_exceptions=True)
+        finally:
+            self._draining = False
@@ -0,0 +1,258 @@
+"""
+Vector store backends for RAG documents.
+
+Both backends offer the operations rag_service needs: versioned upserts and deletes,
+stored-version lookups, per-portfolio top-k queries and compaction. All methods are
+blocking; rag_service runs them in its vector store thread pool.
+
+- ChromaVectorStore: one global ChromaDB collection, filtered by client_id/portfolio_id
+  metadata (the default, settings.RAG_VECTOR_BACKEND = "chroma").
+- PartitionedVectorStore: one NumPy matrix per (client_id, portfolio_id) with exact cosine
+  top-k, so a query only touches that portfolio's vectors ("local"). Partitions can be
+  persisted to a directory, one .npz file each.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of portfolios per metadata lookup, and of ids per delete call
+_VERSION_LOOKUP_CHUNK = 100
+_DELETE_CHUNK = 5000
+_COMPACTION_PAGE_SIZE = 10_000
+
+
+def _portfolio_where(client_id: str, portfolio_id: str) -> dict:
+    return {"$and": [{"client_id": client_id}, {"portfolio_id": portfolio_id}]}
+
+
+def _metadata_key(metadata: Optional[dict]) -> Tuple[str, str]:
+    metadata = metadata or {}
+    return metadata.get("client_id"), metadata.get("portfolio_id")
+
+
+class ChromaVectorStore:
+    """Vector store on a ChromaDB collection; portfolio queries use a metadata filter."""
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_stored_documents(self, keys: list) -> dict:
+        """Returns [(doc id, analysis_version)] per (client_id, portfolio_id); documents without a version count as 0."""
+        stored = {}
+        keys = list(dict.fromkeys(keys))
+        for start in range(0, len(keys), _VERSION_LOOKUP_CHUNK):
+            conditions = [_portfolio_where(c, p) for c, p in keys[start:start + _VERSION_LOOKUP_CHUNK]]
+            where = conditions[0] if len(conditions) == 1 else {"$or": conditions}
+            result = self.collection.get(where=where, include=["metadatas"])
+            for doc_id, metadata in zip(result["ids"], result["metadatas"]):
+                stored.setdefault(_metadata_key(metadata), []).append((doc_id, (metadata or {}).get("analysis_version", 0)))
+        return stored
+
+    def get_portfolio_version(self, client_id: str, portfolio_id: str):
+        """Returns the analysis_version of the portfolio's stored documents, or None if none are stored."""
+        result = self.collection.get(where=_portfolio_where(client_id, portfolio_id), limit=1, include=["metadatas"])
+        metadatas = result.get("metadatas") or []
+        return (metadatas[0] or {}).get("analysis_version") if metadatas else None
+
+    def upsert(self, ids: list, documents: list, embeddings: list, metadatas: list):
+        self.collection.upsert(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+
+    def delete(self, ids: list):
+        for start in range(0, len(ids), _DELETE_CHUNK):
+            self.collection.delete(ids=ids[start:start + _DELETE_CHUNK])
+
+    def query(self, client_id: str, portfolio_id: str, embedding, n_results: int) -> Tuple[list, Optional[list]]:
+        """Returns (documents, distances) of the portfolio's n_results nearest documents."""
+        results = self.collection.query(
+            query_embeddings=[embedding],
+            n_results=n_results,
+            where=_portfolio_where(client_id, portfolio_id),
+        )
+        documents = results["documents"][0] if results and results.get("documents") else []
+        distances = results["distances"][0] if results and results.get("distances") else None
+        return documents, distances
+
+    def compact(self) -> dict:
+        """
+        Deletes superseded documents: per portfolio, only the documents of the highest
+        analysis_version are kept. Portfolios with only unversioned documents (written with
+        timestamped ids before versioning) keep their most recent one.
+        """
+        documents_by_portfolio = {}
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=_COMPACTION_PAGE_SIZE, offset=offset)
+            for doc_id, metadata in zip(page["ids"], page["metadatas"]):
+                documents_by_portfolio.setdefault(_metadata_key(metadata), []).append(((metadata or {}).get("analysis_version", 0), doc_id))
+            if len(page["ids"]) < _COMPACTION_PAGE_SIZE:
+                break
+            offset += _COMPACTION_PAGE_SIZE
+
+        stale_ids = []
+        for documents in documents_by_portfolio.values():
+            latest = max(version for version, _ in documents)
+            if latest > 0:
+                stale_ids.extend(doc_id for version, doc_id in documents if version < latest)
+            else:
+                # Legacy ids end with a timestamp, so the greatest id is the most recent
+                newest_id = max(doc_id for _, doc_id in documents)
+                stale_ids.extend(doc_id for _, doc_id in documents if doc_id != newest_id)
+        self.delete(stale_ids)
+
+        document_count = sum(len(documents) for documents in documents_by_portfolio.values())
+        return {"portfolios": len(documents_by_portfolio), "documents_before": document_count, "deleted": len(stale_ids)}
+
+
+class _Partition(NamedTuple):
+    """The documents of one portfolio. Replaced as a whole on every write, so readers need no lock."""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[dict]
+    vectors: np.ndarray # (n, dimensions) float32, rows L2-normalized
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class PartitionedVectorStore:
+    """
+    In-process vector store partitioned by (client_id, portfolio_id), with exact cosine
+    top-k per partition. Distances are cosine distances (1 - cosine similarity).
+    With persist_dir, every written partition is saved to its own file and all partitions
+    are loaded back when the store is created.
+    """
+    def __init__(self, persist_dir: str = ""):
+        self.persist_dir = persist_dir or None
+        self._partitions: Dict[Tuple[str, str], _Partition] = {}
+        self._key_by_id: Dict[str, Tuple[str, str]] = {}
+        self._write_lock = threading.Lock()
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+            self._load()
+
+    # --- Persistence ---
+
+    def _partition_path(self, key: Tuple[str, str]) -> str:
+        name = hashlib.sha256(json.dumps(list(key)).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.persist_dir, f"{name}.npz")
+
+    def _save(self, key: Tuple[str, str], partition: Optional[_Partition]):
+        if not self.persist_dir:
+            return
+        path = self._partition_path(key)
+        if partition is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        header = json.dumps({"key": list(key), "ids": partition.ids, "documents": partition.documents, "metadatas": partition.metadatas})
+        temporary_path = f"{path}.tmp.npz"
+        np.savez(temporary_path, vectors=partition.vectors, header=np.array(header))
+        os.replace(temporary_path, path) # Readers never see a partially written partition
+
+    def _load(self):
+        for name in os.listdir(self.persist_dir):
+            if not name.endswith(".npz") or ".tmp." in name:
+                continue
+            with np.load(os.path.join(self.persist_dir, name)) as data:
+                header = json.loads(str(data["header"]))
+                key = tuple(header["key"])
+                self._partitions[key] = _Partition(header["ids"], header["documents"], header["metadatas"], data["vectors"])
+            for doc_id in header["ids"]:
+                self._key_by_id[doc_id] = key
+        logger.info(f"Loaded {len(self._partitions)} vector index partitions ({len(self._key_by_id)} documents) from {self.persist_dir}.")
+
+    # --- Store operations ---
+
+    def get_stored_documents(self, keys: list) -> dict:
+        stored = {}
+        for key in dict.fromkeys(keys):
+            partition = self._partitions.get(key)
+            if partition is not None:
+                stored[key] = [(doc_id, metadata.get("analysis_version", 0)) for doc_id, metadata in zip(partition.ids, partition.metadatas)]
+        return stored
+
+    def get_portfolio_version(self, client_id: str, portfolio_id: str):
+        partition = self._partitions.get((client_id, portfolio_id))
+        return partition.metadatas[0].get("analysis_version") if partition is not None else None
+
+    def upsert(self, ids: list, documents: list, embeddings: list, metadatas: list):
+        rows_by_key = {}
+        for row, metadata in enumerate(metadatas):
+            rows_by_key.setdefault(_metadata_key(metadata), []).append(row)
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if ids else None
+
+        with self._write_lock:
+            for key, rows in rows_by_key.items():
+                partition = self._partitions.get(key)
+                new_ids, new_documents, new_metadatas = (list(partition.ids), list(partition.documents), list(partition.metadatas)) if partition else ([], [], [])
+                new_vectors = [partition.vectors] if partition else []
+                row_by_id = {doc_id: index for index, doc_id in enumerate(new_ids)}
+                replaced, appended = {}, []
+                for row in rows:
+                    if ids[row] in row_by_id:
+                        replaced[row_by_id[ids[row]]] = row
+                    else:
+                        row_by_id[ids[row]] = len(new_ids)
+                        new_ids.append(ids[row])
+                        new_documents.append(documents[row])
+                        new_metadatas.append(metadatas[row])
+                        appended.append(row)
+                for index, row in replaced.items():
+                    new_documents[index], new_metadatas[index] = documents[row], metadatas[row]
+                matrix = np.concatenate(new_vectors + [_normalize_rows(vectors[appended])]) if appended else partition.vectors.copy()
+                if replaced:
+                    matrix[list(replaced)] = _normalize_rows(vectors[list(replaced.values())])
+                self._partitions[key] = _Partition(new_ids, new_documents, new_metadatas, matrix)
+                for doc_id in new_ids:
+                    self._key_by_id[doc_id] = key
+                self._save(key, self._partitions[key])
+
+    def delete(self, ids: list):
+        with self._write_lock:
+            ids_by_key = {}
+            for doc_id in ids:
+                key = self._key_by_id.pop(doc_id, None)
+                if key is not None:
+                    ids_by_key.setdefault(key, set()).add(doc_id)
+            for key, deleted in ids_by_key.items():
+                partition = self._partitions[key]
+                keep = [index for index, doc_id in enumerate(partition.ids) if doc_id not in deleted]
+                if not keep:
+                    del self._partitions[key]
+                    self._save(key, None)
+                    continue
+                self._partitions[key] = _Partition(
+                    [partition.ids[i] for i in keep],
+                    [partition.documents[i] for i in keep],
+                    [partition.metadatas[i] for i in keep],
+                    partition.vectors[keep],
+                )
+                self._save(key, self._partitions[key])
+
+    def query(self, client_id: str, portfolio_id: str, embedding, n_results: int) -> Tuple[list, Optional[list]]:
+        partition = self._partitions.get((client_id, portfolio_id))
+        if partition is None or n_results <= 0:
+            return [], []
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        similarities = partition.vectors @ (query / norm if norm else query)
+        k = min(n_results, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(k)
+        top = top[np.argsort(-similarities[top], kind="stable")]
+        return [partition.documents[i] for i in top], [float(1.0 - similarities[i]) for i in top]
+
+    def compact(self) -> dict:
+        """Nothing to compact: upserts replace documents in place and stale ones are deleted."""
+        return {"portfolios": len(self._partitions), "documents_before": len(self._key_by_id), "deleted": 0}
+
+    def count(self) -> int:
+        return len(self._key_by_id)
@@ -0,0 +1,263 @@
+# backend/test/unit/conftest.py
+import asyncio
+import copy
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+_DUPLICATE_KEY_ERROR = 11000
+
+
+def _compare(value, operator: str, operand) -> bool:
+    if operator == "$in":
+        return value in operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$not":
+        return not _satisfies(value, operand)
+    if value is None:
+        return False # Range operators never match missing fields
+    try:
+        return {"$gt": value > operand, "$gte": value >= operand, "$lt": value < operand, "$lte": value <= operand}[operator]
+    except TypeError:
+        return False
+
+
+def _satisfies(value, condition: dict) -> bool:
+    return all(_compare(value, operator, operand) for operator, operand in condition.items())
+
+
+def _is_operator_condition(condition) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def matches(doc: dict, filter: dict) -> bool:
+    """Whether the document matches the filter: equality, $or, $in, $ne, $not and the range operators."""
+    for field, condition in filter.items():
+        if field == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif _is_operator_condition(condition):
+            if not _satisfies(doc.get(field), condition):
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+def _include(result: dict, doc: dict, path: str, spec):
+    field, _, rest = path.partition(".")
+    if field not in doc:
+        return
+    value = doc[field]
+    if rest and isinstance(value, list):
+        # "positions.sector": the field of every item of the array
+        items = result.setdefault(field, [{} for _ in value])
+        for item, source in zip(items, value):
+            if isinstance(source, dict):
+                _include(item, source, rest, spec)
+    elif rest and isinstance(value, dict):
+        _include(result.setdefault(field, {}), value, rest, spec)
+    elif isinstance(spec, dict):
+        skip, limit = spec["$slice"]
+        result[field] = copy.deepcopy(value[skip:skip + limit])
+    else:
+        result[field] = copy.deepcopy(value)
+
+
+def project(doc: dict, projection: dict | None) -> dict:
+    """Applies an inclusion projection (dotted paths, $slice: [skip, limit]) or an exclusion projection."""
+    if not projection:
+        return copy.deepcopy(doc)
+    if all(spec == 0 for spec in projection.values()):
+        return {field: copy.deepcopy(value) for field, value in doc.items() if field not in projection}
+    result = {"_id": doc["_id"]} if projection.get("_id", 1) and "_id" in doc else {}
+    for path, spec in projection.items():
+        if path != "_id" and spec:
+            _include(result, doc, path, spec)
+    return result
+
+
+class _Result:
+    def __init__(self, matched_count=0, modified_count=0, inserted_id=None, upserted_id=None, upserted_ids=None):
+        self.matched_count, self.modified_count = matched_count, modified_count
+        self.inserted_id, self.upserted_id, self.upserted_ids = inserted_id, upserted_id, upserted_ids or {}
+
+
+class _Cursor:
+    """Evaluated when read, after a round trip: writes made meanwhile by other tasks are seen."""
+    def __init__(self, collection, filter, projection):
+        self.collection, self.filter, self.projection = collection, filter, projection
+        self.sort_keys, self.skipped, self.limited = [], 0, None
+
+    def sort(self, keys, direction=None):
+        self.sort_keys = [(keys, direction)] if isinstance(keys, str) else keys
+        return self
+
+    def skip(self, n):
+        self.skipped = n
+        return self
+
+    def limit(self, n):
+        self.limited = n
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0) # A round trip: other tasks run before the result arrives
+        docs = [doc for doc in self.collection.docs if matches(doc, self.filter)]
+        for field, order in reversed(self.sort_keys):
+            docs.sort(key=lambda d: (field in d, d.get(field)), reverse=order == -1)
+        end = None if self.limited is None else self.skipped + self.limited
+        return [project(doc, self.projection) for doc in docs[self.skipped:end]]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in await self.to_list():
+            yield doc
+
+
+class FakeCollection:
+    """
+    In-memory stand-in for the Motor collection calls made by the CRUD layer. Every call
+    yields to the event loop like a round trip would. Records the name of each write
+    (writes), the filter and update of each update_one (updates), the projection of each
+    read (projections) and the number of find_one calls. _id and the unique field tuples
+    raise DuplicateKeyError on conflicting inserts and upserts.
+    """
+    def __init__(self, docs=(), unique=()):
+        self.docs = [copy.deepcopy(doc) for doc in docs]
+        self.unique = [tuple(fields) for fields in unique]
+        self.writes = []
+        self.updates = []
+        self.projections = []
+        self.find_one_calls = 0
+
+    def _check_unique(self, new_doc: dict, replacing: dict | None = None):
+        for fields in [("_id",)] + self.unique:
+            if any(
+                doc is not replacing and all(doc.get(field) == new_doc.get(field) for field in fields)
+                for doc in self.docs
+            ):
+                raise DuplicateKeyError(f"E11000 duplicate key error on {fields}", _DUPLICATE_KEY_ERROR)
+
+    def _upsert(self, filter: dict, doc: dict) -> ObjectId:
+        new_doc = {field: value for field, value in filter.items() if not field.startswith("$") and not _is_operator_condition(value)}
+        new_doc.update(copy.deepcopy(doc))
+        new_doc.setdefault("_id", ObjectId())
+        self._check_unique(new_doc)
+        self.docs.append(new_doc)
+        return new_doc["_id"]
+
+    def find(self, filter, projection=None):
+        self.projections.append(projection)
+        return _Cursor(self, filter, projection)
+
+    async def find_one(self, filter, projection=None):
+        await asyncio.sleep(0)
+        self.find_one_calls += 1
+        self.projections.append(projection)
+        return next((project(doc, projection) for doc in self.docs if matches(doc, filter)), None)
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        self.writes.append("insert_one")
+        doc.setdefault("_id", ObjectId())
+        self._check_unique(doc)
+        self.docs.append(copy.deepcopy(doc))
+        return _Result(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(0)
+        self.writes.append("insert_many")
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            self._check_unique(doc)
+            self.docs.append(copy.deepcopy(doc))
+
+    async def replace_one(self, filter, replacement, upsert=False):
+        await asyncio.sleep(0)
+        self.writes.append("replace_one")
+        return self._replace_one(filter, replacement, upsert)
+
+    def _replace_one(self, filter, replacement, upsert=False) -> _Result:
+        for index, doc in enumerate(self.docs):
+            if matches(doc, filter):
+                new_doc = {"_id": doc["_id"], **copy.deepcopy(replacement)}
+                self._check_unique(new_doc, replacing=doc)
+                self.docs[index] = new_doc
+                return _Result(matched_count=1, modified_count=1)
+        if upsert:
+            return _Result(upserted_id=self._upsert(filter, replacement))
+        return _Result()
+
+    async def update_one(self, filter, update, upsert=False):
+        await asyncio.sleep(0)
+        self.writes.append("update_one")
+        self.updates.append((filter, update))
+        return self._update_one(filter, update, upsert)
+
+    def _update_one(self, filter, update, upsert=False) -> _Result:
+        for doc in self.docs:
+            if matches(doc, filter):
+                doc.update(copy.deepcopy(update.get("$set", {})))
+                for field, amount in update.get("$inc", {}).items():
+                    doc[field] = doc.get(field, 0) + amount
+                for field in update.get("$unset", {}):
+                    doc.pop(field, None)
+                for field, push in update.get("$push", {}).items():
+                    doc[field] = doc.get(field, []) + copy.deepcopy(push["$each"])
+                return _Result(matched_count=1, modified_count=1)
+        if upsert:
+            return _Result(upserted_id=self._upsert(filter, {**update.get("$setOnInsert", {}), **update.get("$set", {})}))
+        return _Result()
+
+    async def delete_one(self, filter):
+        await asyncio.sleep(0)
+        self.writes.append("delete_one")
+        index = next((index for index, doc in enumerate(self.docs) if matches(doc, filter)), None)
+        if index is not None:
+            del self.docs[index]
+
+    async def delete_many(self, filter):
+        await asyncio.sleep(0)
+        self.writes.append("delete_many")
+        self.docs = [doc for doc in self.docs if not matches(doc, filter)]
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(0)
+        self.writes.append("bulk_write")
+        upserted, errors = {}, []
+        for index, operation in enumerate(operations):
+            kind = type(operation).__name__
+            try:
+                if kind == "DeleteMany":
+                    self.docs = [doc for doc in self.docs if not matches(doc, operation._filter)]
+                elif kind == "InsertOne":
+                    doc = {"_id": ObjectId(), **copy.deepcopy(operation._doc)}
+                    self._check_unique(doc)
+                    self.docs.append(doc)
+                elif kind == "ReplaceOne":
+                    result = self._replace_one(operation._filter, operation._doc, operation._upsert)
+                else:
+                    result = self._update_one(operation._filter, operation._doc, operation._upsert)
+                if kind in ("ReplaceOne", "UpdateOne") and result.upserted_id is not None:
+                    upserted[index] = result.upserted_id
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": _DUPLICATE_KEY_ERROR, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "upserted": [{"index": i, "_id": _id} for i, _id in upserted.items()]})
+        return _Result(upserted_ids=upserted)
+
+
+@pytest.fixture
+def fake_collection():
+    """Factory for in-memory collections: fake_collection(docs=(), unique=())."""
+    return FakeCollection
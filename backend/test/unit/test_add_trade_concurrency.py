@@ -0,0 +1,104 @@
+# backend/test/unit/test_add_trade_concurrency.py
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from bson import ObjectId
+
+import crud.portfolio_crud as portfolio_crud
+import services.portfolio_service as portfolio_service
+from core.config import settings
+from schemas.portfolio_models import TradeIn
+from services.portfolio_locks import KeyedLocks
+
+
+class _NoLocks:
+    """Stands in for writers in separate processes: nothing serializes them but the version check."""
+    @asynccontextmanager
+    async def hold(self, key):
+        yield
+
+
+@pytest.fixture
+def store(monkeypatch, fake_collection):
+    portfolios, trades = fake_collection(), fake_collection()
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", portfolios)
+    monkeypatch.setattr(portfolio_crud, "trade_collection", trades)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+
+    async def fake_ingest(*args, **kwargs):
+        return None
+    monkeypatch.setattr(portfolio_service, "ingest_portfolio_analysis", fake_ingest)
+    return portfolios, trades
+
+
+def _add_portfolio(portfolios, portfolio_id: str, embedded: bool):
+    doc = {"_id": ObjectId(), "client_id": "C1", "portfolio_id": portfolio_id, "uploaded_at": "2025-01-01", "positions": []}
+    doc.update({"trades": []} if embedded else {"trades_externalized": True, "trade_count": 0})
+    portfolios.docs.append(doc)
+    return doc
+
+
+def _trade(quantity: float) -> TradeIn:
+    return TradeIn(symbol="AAPL", isin="US0378331005", quantity=quantity, price=100.0, sector="Technology")
+
+
+# --- Test Case 1: Concurrent add-trades on one portfolio all land, one write each ---
+@pytest.mark.asyncio
+async def test_same_portfolio_is_serialized(store, monkeypatch):
+    portfolios, trades = store
+    monkeypatch.setattr(settings, "TRADE_COLLECTION_ENABLED", True)
+    doc = _add_portfolio(portfolios, "P1", embedded=False)
+
+    await asyncio.gather(*(portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", _trade(1.0)) for _ in range(40)))
+
+    assert len(trades.docs) == 40 and doc["trade_count"] == 40 and doc["analysis_version"] == 40
+    assert doc["positions"][0]["quantity"] == 40.0
+    assert len(portfolios.updates) == 40 # No conflicts: the lock queued them
+    assert len(portfolio_service._portfolio_locks) == 0
+
+
+# --- Test Case 2: Without the in-process lock (several processes), the version check and retry lose nothing ---
+@pytest.mark.asyncio
+async def test_concurrent_writers_are_retried(store, monkeypatch):
+    portfolios, trades = store
+    monkeypatch.setattr(portfolio_service, "_portfolio_locks", _NoLocks())
+    monkeypatch.setattr(settings, "ADD_TRADE_MAX_ATTEMPTS", 25)
+    monkeypatch.setattr(settings, "ADD_TRADE_RETRY_BACKOFF_SECONDS", 0.0)
+
+    for trade_collection_enabled in (False, True):
+        monkeypatch.setattr(settings, "TRADE_COLLECTION_ENABLED", trade_collection_enabled)
+        portfolio_id = f"P-{trade_collection_enabled}"
+        doc = _add_portfolio(portfolios, portfolio_id, embedded=not trade_collection_enabled)
+        portfolios.updates.clear()
+
+        await asyncio.gather(*(portfolio_service.add_trade_and_reanalyze_portfolio("C1", portfolio_id, _trade(float(i + 1))) for i in range(20)))
+
+        stored_trades = doc["trades"] if not trade_collection_enabled else [t for t in trades.docs if t["portfolio_id"] == portfolio_id]
+        assert len(stored_trades) == 20 and len({t["trade_id"] for t in stored_trades}) == 20
+        assert doc["positions"][0]["quantity"] == sum(range(1, 21)) and doc["analysis_version"] == 20
+        assert len(portfolios.updates) > 20 # Some writes hit a newer version and were retried
+
+
+# --- Test Case 3: Different portfolios do not wait for each other ---
+@pytest.mark.asyncio
+async def test_different_portfolios_run_in_parallel(store, monkeypatch):
+    portfolios, trades = store
+    monkeypatch.setattr(settings, "TRADE_COLLECTION_ENABLED", True)
+    docs = [_add_portfolio(portfolios, f"P{i}", embedded=False) for i in range(10)]
+
+    await asyncio.gather(*(
+        portfolio_service.add_trade_and_reanalyze_portfolio("C1", doc["portfolio_id"], _trade(2.0))
+        for doc in docs for _ in range(5)
+    ))
+    assert all(doc["trade_count"] == 5 and doc["positions"][0]["quantity"] == 10.0 for doc in docs)
+
+    locks = KeyedLocks()
+
+    async def hold_b():
+        async with locks.hold("B"):
+            return len(locks)
+    async with locks.hold("A"):
+        # Another key is free while A is held
+        assert await asyncio.wait_for(hold_b(), timeout=1) == 2
+    assert len(locks) == 0
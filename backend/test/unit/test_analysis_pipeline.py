@@ -0,0 +1,66 @@
+# backend/test/unit/test_analysis_pipeline.py
+import random
+import pytest
+
+from agents.analysis_pipeline import run_fused_analysis
+from agents.normalized_positions import normalize_positions
+from agents.policy_validator import PolicyValidatorAgent
+from agents.risk_drift import RiskDriftAgent
+from agents.rule_engine import compile_rules
+
+MIXED_POSITIONS = [
+    {"symbol": "AAPL", "sector": "Technology", "quantity": 100, "market_price": 170.0},
+    {"symbol": "AMZN", "sector": "Consumer Discretionary", "quantity": 50, "market_price": 3250.0},
+    {"symbol": "XOM", "quantity": 10, "market_price": 100.0}, # No sector: policy error, drift "Unknown"
+    {"symbol": "BND", "sector": "Fixed Income", "quantity": 20}, # No market price: skipped by drift
+    {"symbol": "GLD", "sector": None, "quantity": 5, "market_price": 180.0}, # Sector None for both
+    ["not", "a", "dict"],
+]
+
+
+def _separate(positions, rule_set=None):
+    return PolicyValidatorAgent(positions, rule_set=rule_set).run(), RiskDriftAgent(positions).run()
+
+
+# --- Test Case 1: Fused output equals the two agents run separately ---
+def test_fused_matches_separate_agents():
+    assert run_fused_analysis(MIXED_POSITIONS) == _separate(MIXED_POSITIONS)
+
+
+def test_fused_matches_separate_agents_with_aggregate_rules():
+    rule_set = compile_rules([
+        {"sector": "Technology", "quantity_gt": 10, "violation_message": "Tech"},
+        {"sector": "Consumer Discretionary", "weight_gt": 0.5, "violation_message": "Too much CD"},
+        {"min_sector_count": 5, "violation_message": "Diversify"},
+    ])
+    rng = random.Random(3)
+    positions = [
+        {"symbol": f"S{i}", "sector": rng.choice(["Technology", "Consumer Discretionary", "Energy"]),
+         "quantity": rng.randint(1, 50), "market_price": rng.uniform(1, 100)}
+        for i in range(300)
+    ]
+    assert run_fused_analysis(positions, rule_set) == _separate(positions, rule_set)
+
+
+# --- Test Case 2: Risk drift values are unchanged by the refactor ---
+def test_risk_drift_values():
+    _, drifts = run_fused_analysis(MIXED_POSITIONS)
+    total = 100 * 170.0 + 50 * 3250.0 + 10 * 100.0 + 5 * 180.0
+    by_sector = {d["sector"]: d for d in drifts}
+    assert by_sector["Technology"]["actual"] == pytest.approx(17000.0 / total)
+    assert by_sector["Consumer Discretionary"]["actual"] == pytest.approx(162500.0 / total)
+    assert by_sector["Others"]["actual"] == 0.0
+    assert None not in by_sector # GLD weight (0.5%) is below the drift threshold
+
+
+# --- Test Case 3: Normalization computes each market value once ---
+def test_normalize_positions():
+    normalized = normalize_positions(MIXED_POSITIONS)
+    assert [n.value for n in normalized] == [17000.0, 162500.0, 1000.0, None, 900.0, None]
+    assert normalized[2].sector is None and normalized[2].drift_sector == "Unknown"
+    assert normalized[5].position is None and normalized[5].raw_type is list
+
+
+def test_empty_and_invalid_inputs():
+    assert run_fused_analysis([]) == ([], [])
+    assert run_fused_analysis("not a list") == ([], [])
@@ -0,0 +1,72 @@
+# backend/test/unit/test_answer_cache.py
+import uuid
+import chromadb
+import pytest
+
+import rag_service
+from rag_service import ingest_portfolio_analysis, query_portfolio, set_rag_components
+from services.answer_cache import AnswerCache, normalize_question
+
+
+# --- Test Case 1: Keys, TTL and LRU eviction ---
+def test_key_normalizes_question_and_hashes_history():
+    history = [{"role": "user", "content": "Hi", "timestamp": "ignored"}]
+    assert normalize_question("  Any   VIOLATIONS?? ") == "any violations"
+    assert AnswerCache.key("C1", "P1", 2, "Any violations?", history) == AnswerCache.key("C1", "P1", 2, "any violations", [{"role": "user", "content": "Hi"}])
+    assert AnswerCache.key("C1", "P1", 2, "Any violations?", history) != AnswerCache.key("C1", "P1", 3, "Any violations?", history)
+    assert AnswerCache.key("C1", "P1", 2, "Any violations?", []) != AnswerCache.key("C1", "P1", 2, "Any violations?", history)
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.answer_cache.time.monotonic", lambda: now[0])
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", "answer a", 1.5)
+    cache.put("b", "answer b", 1.0)
+    assert cache.get("a") == "answer a" # "a" is now most recently used
+    cache.put("c", "answer c", 1.0) # Evicts "b"
+    assert (cache.get("b"), cache.get("c")) == (None, "answer c")
+
+    now[0] += 61
+    assert cache.get("a") is None
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["evictions"], metrics["expirations"]) == (2, 2, 1, 1)
+    assert metrics["saved_latency_ms"] == pytest.approx(2500.0)
+
+
+# --- Test Case 2: Repeated questions skip retrieval and the LLM until the portfolio is re-analyzed ---
+@pytest.mark.asyncio
+async def test_query_portfolio_uses_cache_until_reingestion(monkeypatch):
+    llm_calls = []
+
+    class CountingOpenAIClient:
+        class Chat:
+            class Completions:
+                async def create(self, model, messages):
+                    llm_calls.append(messages)
+                    message = type('message', (object,), {'content': f"Answer {len(llm_calls)}"})()
+                    return type('obj', (object,), {'choices': [type('choice', (object,), {'message': message})()]})()
+            completions = Completions()
+        chat = Chat()
+
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"test-{uuid.uuid4().hex}", embedding_function=None)
+    set_rag_components(client, lambda texts: [[float(len(t) % 5), 1.0, 0.5] for t in texts], collection)
+    monkeypatch.setattr("rag_service._openai_client", CountingOpenAIClient())
+    monkeypatch.setattr(rag_service.settings, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr("rag_service._answer_cache", None)
+
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "compliance_report": "ok", "positions": []}
+    await ingest_portfolio_analysis("C1", portfolio, "No violations.", "P1")
+
+    assert await query_portfolio("c1", "p1", "Any violations?") == "Answer 1"
+    assert await query_portfolio("C1", "P1", "  any violations ") == "Answer 1"
+    assert await query_portfolio("C1", "P1", "Any violations?", [{"role": "user", "content": "Hi"}]) == "Answer 2"
+    assert len(llm_calls) == 2
+
+    await ingest_portfolio_analysis("C1", portfolio, "One violation.", "P1")
+    assert rag_service.get_answer_cache().metrics()["invalidations"] == 2
+    assert await query_portfolio("C1", "P1", "Any violations?") == "Answer 3"
+    assert rag_service.get_answer_cache().metrics()["hits"] == 1
+
+    client.delete_collection(collection.name)
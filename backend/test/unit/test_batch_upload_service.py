@@ -0,0 +1,113 @@
+# backend/test/unit/test_batch_upload_service.py
+import json
+import pytest
+from bson import ObjectId
+
+import services.batch_upload_service as batch_upload_service
+from core.config import settings
+from utils.upload_parsing import parse_portfolio_batch
+
+TRADES = [
+    {"symbol": "AAPL", "isin": "US0378331005", "sector": "Technology", "type": "BUY", "quantity": 100, "price": 150.0, "trade_date": "2024-01-01"},
+    {"symbol": "AAPL", "isin": "US0378331005", "sector": "Technology", "type": "SELL", "quantity": 20, "price": 160.0, "trade_date": "2024-01-02"},
+]
+
+
+def _portfolio(client_id, portfolio_id, trades=TRADES):
+    return {"client_id": client_id, "portfolio_id": portfolio_id, "trades": [dict(t) for t in trades]}
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """In-memory stand-ins for the bulk MongoDB and RAG helpers."""
+    state = {"existing": {}, "bulk_calls": [], "ingest_calls": [], "write_errors": {}, "ingest_errors": {}}
+
+    async def fake_get_latest_portfolio_versions(keys):
+        return {key: state["existing"][key] for key in keys if key in state["existing"]}
+
+    async def fake_bulk_save_portfolio_docs(writes):
+        state["bulk_calls"].append(writes)
+        return state["write_errors"]
+
+    async def fake_ingest_portfolio_analyses(portfolios):
+        state["ingest_calls"].append(portfolios)
+        return state["ingest_errors"]
+
+    monkeypatch.setattr(batch_upload_service, "get_latest_portfolio_versions", fake_get_latest_portfolio_versions)
+    monkeypatch.setattr(batch_upload_service, "bulk_save_portfolio_docs", fake_bulk_save_portfolio_docs)
+    monkeypatch.setattr(batch_upload_service, "ingest_portfolio_analyses", fake_ingest_portfolio_analyses)
+    monkeypatch.setattr(settings, "BATCH_UPLOAD_PROCESS_WORKERS", 1)
+    return state
+
+
+# --- Test Case 1: Parsing JSON arrays and NDJSON ---
+def test_parse_json_array():
+    content = json.dumps([_portfolio("C1", "P1"), 42]).encode()
+    entries = parse_portfolio_batch(content)
+    assert entries[0][0]["client_id"] == "C1" and entries[0][1] is None
+    assert entries[1][0] is None and "int" in entries[1][1]
+
+
+def test_parse_ndjson_reports_bad_lines():
+    content = (json.dumps(_portfolio("C1", "P1")) + "\n\n{not json}\n" + json.dumps(_portfolio("C2", "P2")) + "\n").encode()
+    entries = parse_portfolio_batch(content)
+    assert len(entries) == 3
+    assert entries[1][0] is None and "line 3" in entries[1][1]
+    assert entries[2][0]["portfolio_id"] == "P2"
+
+
+def test_parse_invalid_json_array_raises():
+    with pytest.raises(ValueError):
+        parse_portfolio_batch(b"[{\"client_id\": ")
+
+
+# --- Test Case 2: One bulk write and one ingestion batch for the whole upload ---
+@pytest.mark.asyncio
+async def test_batch_processes_all_portfolios(fake_backends):
+    existing_id = ObjectId()
+    fake_backends["existing"][("C1", "P1")] = (existing_id, 3)
+    entries = [(_portfolio("C1", "P1"), None), (_portfolio("C2", "P2"), None)]
+
+    results = await batch_upload_service.process_portfolio_batch(entries)
+
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    assert results[0]["mongo_id"] == str(existing_id)
+    assert len(fake_backends["bulk_calls"]) == 1
+    writes = fake_backends["bulk_calls"][0]
+    assert [(mongo_id == existing_id, exists) for mongo_id, _, exists in writes] == [(True, True), (False, False)]
+    assert writes[1][1]["positions"][0]["quantity"] == 80
+    assert [doc["analysis_version"] for _, doc, _ in writes] == [4, 1]
+    assert len(fake_backends["ingest_calls"]) == 1 and len(fake_backends["ingest_calls"][0]) == 2
+
+
+# --- Test Case 3: Errors are reported per portfolio ---
+@pytest.mark.asyncio
+async def test_batch_reports_errors_per_portfolio(fake_backends):
+    fake_backends["write_errors"] = {1: "duplicate key"}
+    entries = [
+        (_portfolio("C1", "P1"), None),
+        (None, "Invalid JSON on line 2"),
+        ({"portfolio_id": "P3", "trades": []}, None), # Missing client_id
+        (_portfolio("C4", "P4"), None),
+    ]
+
+    results = await batch_upload_service.process_portfolio_batch(entries)
+
+    assert [r["status"] for r in results] == ["ok", "error", "error", "error"]
+    assert results[1]["error"] == "Invalid JSON on line 2"
+    assert "client_id" in results[2]["error"]
+    assert "duplicate key" in results[3]["error"]
+    # Only the stored portfolio is ingested
+    assert [p["client_id"] for p in fake_backends["ingest_calls"][0]] == ["C1"]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_keys_store_the_last_entry(fake_backends):
+    entries = [(_portfolio("C1", "P1", TRADES[:1]), None), (_portfolio("C1", "P1"), None)]
+
+    results = await batch_upload_service.process_portfolio_batch(entries)
+
+    writes = fake_backends["bulk_calls"][0]
+    assert len(writes) == 1 and writes[0][1]["positions"][0]["quantity"] == 80
+    assert results[0]["mongo_id"] == results[1]["mongo_id"]
+    assert results[0]["superseded"] and not results[1]["superseded"]
@@ -0,0 +1,91 @@
+# backend/test/unit/test_columnar_positions.py
+import random
+import pytest
+
+from services.columnar_positions import build_ledger_columnar, calculate_positions_columnar
+from services.portfolio_service import _calculate_positions_from_trades
+from services.position_ledger import build_ledger_from_trades
+
+
+def _assert_positions_match(actual, expected):
+    assert [p["symbol"] for p in actual] == [p["symbol"] for p in expected]
+    for a, e in zip(actual, expected):
+        assert a["quantity"] == e["quantity"]
+        assert type(a["quantity"]) is type(e["quantity"])
+        assert a["isin"] == e["isin"]
+        assert a["sector"] == e["sector"]
+        assert a["avg_price"] == pytest.approx(e["avg_price"], rel=1e-9, abs=1e-9)
+        assert a["market_price"] == pytest.approx(e["market_price"], rel=1e-9, abs=1e-9)
+
+
+def _random_trades(n, seed, symbols=20):
+    rng = random.Random(seed)
+    trades = []
+    for _ in range(n):
+        symbol = f"SYM{rng.randrange(symbols)}"
+        trades.append({
+            "symbol": symbol,
+            "quantity": rng.randint(1, 100),
+            "price": round(rng.uniform(1, 1000), 2),
+            "type": rng.choice(["BUY", "BUY", "SELL", "sell"]),
+            "isin": rng.choice([None, "", f"ISIN{symbol}"]),
+            "sector": rng.choice([None, "UNKNOWN", "Technology", "Energy"]),
+        })
+    return trades
+
+
+# --- Test Case 1: Parity with the replay implementation on random blotters ---
+@pytest.mark.parametrize("seed", range(5))
+def test_parity_random_trades(seed):
+    trades = _random_trades(2000, seed)
+    _assert_positions_match(calculate_positions_columnar(trades), _calculate_positions_from_trades(trades))
+
+
+# --- Test Case 2: Oversold positions, full closes and re-opens ---
+def test_parity_oversell_close_and_reopen():
+    trades = [
+        {"symbol": "AAPL", "quantity": 100, "price": 10.0, "type": "BUY"},
+        {"symbol": "AAPL", "quantity": 100, "price": 12.0, "type": "SELL"}, # Fully closed
+        {"symbol": "AAPL", "quantity": 40, "price": 11.0, "type": "BUY"},
+        {"symbol": "MSFT", "quantity": 10, "price": 50.0, "type": "BUY"},
+        {"symbol": "MSFT", "quantity": 30, "price": 55.0, "type": "SELL"}, # Oversold, cost turns negative
+        {"symbol": "MSFT", "quantity": 5, "price": 52.0, "type": "SELL"}, # Short, no further cost change
+        {"symbol": "MSFT", "quantity": 50, "price": 51.0, "type": "BUY"},
+        {"symbol": "XOM", "quantity": 7, "price": None, "type": "BUY"}, # No price
+    ]
+    _assert_positions_match(calculate_positions_columnar(trades), _calculate_positions_from_trades(trades))
+
+
+# --- Test Case 3: Malformed rows, unknown types and float quantities ---
+def test_parity_malformed_and_mixed_types():
+    trades = [
+        {"symbol": "AAPL", "quantity": 10, "price": 100, "type": "BUY"}, # Integer price is kept as int
+        {"symbol": "", "quantity": 10, "price": 1.0, "type": "BUY"},
+        {"symbol": "AAPL", "quantity": "5", "price": 1.0, "type": "BUY"},
+        {"symbol": "AAPL", "quantity": 5, "price": 1.0},
+        {"symbol": "TSLA", "quantity": 5, "price": 200.0, "type": "HOLD", "sector": "Autos"},
+        {"symbol": "TSLA", "quantity": 2.5, "price": 210.0, "type": "BUY"},
+        {"symbol": "AMZN", "quantity": 0.5, "price": 1.0, "type": "BUY"},
+        {"symbol": "AMZN", "quantity": 0.25, "price": 2.0, "type": "BUY"},
+        {"symbol": "AMZN", "quantity": 0.125, "price": 3.0, "type": "SELL"},
+    ]
+    expected = _calculate_positions_from_trades(trades)
+    actual = calculate_positions_columnar(trades)
+    _assert_positions_match(actual, expected)
+    assert type(actual[0]["market_price"]) is int
+
+
+# --- Test Case 4: The ledger itself matches the replayed ledger ---
+def test_ledger_parity():
+    trades = _random_trades(500, seed=11, symbols=5)
+    columnar = build_ledger_columnar(trades)
+    replayed = build_ledger_from_trades(trades)
+    assert list(columnar) == list(replayed)
+    for symbol, state in columnar.items():
+        assert state["latest_price"] == replayed[symbol]["latest_price"]
+        assert state["total_cost"] == pytest.approx(replayed[symbol]["total_cost"], rel=1e-9, abs=1e-6)
+
+
+def test_empty_input():
+    assert build_ledger_columnar([]) == {}
+    assert calculate_positions_columnar([{"symbol": None, "quantity": 1, "type": "BUY"}]) == []
@@ -0,0 +1,77 @@
+# backend/test/unit/test_embedding_batcher.py
+import asyncio
+import pytest
+
+from services.embedding_batcher import EmbeddingBatcher
+
+
+class RecordingModel:
+    """Embeds each text as [len(text)] and records the batches it was called with."""
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return [[float(len(text))] for text in texts]
+
+
+# --- Test Case 1: Concurrent requests share one forward pass, each gets its own result ---
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_batched():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=64, window_ms=20)
+
+    results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["bb", "ccc"]), batcher.embed(["dddd"]))
+
+    assert results == [[[1.0]], [[2.0], [3.0]], [[4.0]]]
+    assert model.batches == [["a", "bb", "ccc", "dddd"]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_starts_without_waiting_for_the_window():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=2, window_ms=60_000)
+
+    results = await asyncio.wait_for(asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"])), timeout=1)
+
+    assert results == [[[1.0]], [[1.0]]]
+    assert model.batches == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_batches_never_exceed_max_size():
+    model = RecordingModel()
+    batcher = EmbeddingBatcher(model, max_batch_size=3, window_ms=5)
+
+    texts = [f"t{i}" for i in range(8)]
+    results = await asyncio.gather(*(batcher.embed([text]) for text in texts), batcher.embed(["x" * 10] * 5))
+
+    assert results[-1] == [[10.0]] * 5
+    assert sorted(len(batch) for batch in model.batches) == [2, 3, 3, 5] # The oversized request runs alone
+
+
+# --- Test Case 2: Errors reach every caller of the failed batch ---
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_callers():
+    batcher = EmbeddingBatcher(RecordingModel(fail=True), max_batch_size=8, window_ms=1)
+    results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert batcher.metrics()["failed_batches"] == 1
+
+
+# --- Test Case 3: Metrics report fill rate and queue wait ---
+@pytest.mark.asyncio
+async def test_metrics():
+    batcher = EmbeddingBatcher(RecordingModel(), max_batch_size=4, window_ms=10)
+    await asyncio.gather(batcher.embed(["a"]), batcher.embed(["b"]))
+    await batcher.embed([])
+
+    metrics = batcher.metrics()
+    assert metrics["batches"] == 1 and metrics["requests"] == 2 and metrics["texts"] == 2
+    assert metrics["batch_fill_rate"] == pytest.approx(0.5)
+    assert metrics["queue_wait_ms"]["max"] >= 5 # Both requests waited for the window
+    assert metrics["pending_requests"] == 0
@@ -0,0 +1,63 @@
+# backend/test/unit/test_embedding_cache.py
+import numpy as np
+import pytest
+
+import rag_service
+from core.config import settings
+from services.embedding_cache import EmbeddingCache
+
+
+# --- Test Case 1: Memory tier hits, misses and LRU eviction ---
+def test_memory_tier_and_lru_eviction():
+    cache = EmbeddingCache("model-a", max_entries=2)
+    cache.store(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+    assert cache.lookup(["a"])[0].tolist() == [1.0, 0.0] # "a" is now most recently used
+
+    cache.store(["c"], [[0.5, 0.5]]) # Evicts "b"
+    assert [v is not None for v in cache.lookup(["a", "b", "c"])] == [True, False, True]
+
+    metrics = cache.metrics()
+    assert (metrics["memory_hits"], metrics["disk_hits"], metrics["misses"]) == (3, 0, 1)
+    assert metrics["memory_entries"] == 2
+
+
+def test_key_includes_model_name():
+    assert EmbeddingCache("model-a", 10).key("text") != EmbeddingCache("model-b", 10).key("text")
+    assert EmbeddingCache("model-a", 10).key("text") == EmbeddingCache("model-a", 10).key("text")
+
+
+# --- Test Case 2: The SQLite tier persists across instances ---
+def test_disk_tier_persists(tmp_path):
+    db_path = str(tmp_path / "embeddings.sqlite3")
+    writer = EmbeddingCache("model-a", max_entries=10, db_path=db_path)
+    writer.store(["question"], [np.array([0.25, 0.5, 0.75])])
+    writer.close()
+
+    reader = EmbeddingCache("model-a", max_entries=10, db_path=db_path)
+    assert reader.lookup(["question"])[0].tolist() == [0.25, 0.5, 0.75]
+    assert reader.lookup(["question"])[0] is not None # Promoted to memory
+    assert (reader.metrics()["disk_hits"], reader.metrics()["memory_hits"]) == (1, 1)
+    assert EmbeddingCache("model-b", 10, db_path).lookup(["question"]) == [None]
+
+
+# --- Test Case 3: rag_service skips the model for repeated texts ---
+@pytest.mark.asyncio
+async def test_repeated_texts_skip_the_model(monkeypatch):
+    calls = []
+
+    def counting_embedding_function(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", True)
+    monkeypatch.setattr("rag_service._embedding_cache", None)
+    monkeypatch.setattr("rag_service._embedding_function", counting_embedding_function)
+
+    first = await rag_service._embed(["any violations?", "any violations?", "risk drift?"])
+    second = await rag_service._embed(["risk drift?", "any violations?"])
+
+    assert calls == [["any violations?", "risk drift?"]]
+    assert [list(v) for v in first] == [[15.0, 1.0], [15.0, 1.0], [11.0, 1.0]]
+    assert [list(v) for v in second] == [[11.0, 1.0], [15.0, 1.0]]
+    assert rag_service.get_embedding_cache().metrics()["memory_hits"] == 2
+    rag_service.close_embedding_cache()
@@ -0,0 +1,95 @@
+# backend/test/unit/test_portfolio_current.py
+import pytest
+from bson import ObjectId
+
+import crud.portfolio_crud as portfolio_crud
+from core.config import settings
+
+
+@pytest.fixture
+def collections(monkeypatch, fake_collection):
+    portfolios, current = fake_collection(), fake_collection(unique=[("client_id", "portfolio_id")])
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", portfolios)
+    monkeypatch.setattr(portfolio_crud, "portfolio_current_collection", current)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", True)
+    return portfolios, current
+
+
+# --- Test Case 1: Writes keep the current collection in sync ---
+@pytest.mark.asyncio
+async def test_writes_update_current_document(collections):
+    portfolios, current = collections
+    mongo_id = await portfolio_crud.create_portfolio_doc({"client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-01", "positions": []})
+    assert [d["_id"] for d in current.docs] == [ObjectId(mongo_id)]
+
+    await portfolio_crud.update_portfolio_doc(mongo_id, {"client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-02", "positions": [{"symbol": "AAPL"}]})
+    doc = await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P1")
+    assert doc["positions"] == [{"symbol": "AAPL"}] and doc["_id"] == ObjectId(mongo_id)
+    assert current.find_one_calls == 1 and len(current.docs) == 1
+
+    # A newer document of the same portfolio replaces the current one
+    new_id = ObjectId()
+    assert await portfolio_crud.bulk_save_portfolio_docs([(new_id, {"client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-03"}, False)]) == {}
+    assert [d["_id"] for d in current.docs] == [new_id]
+    assert (await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P1"))["_id"] == new_id
+
+
+# --- Test Case 2: Portfolios stored before the current collection are read from history and backfilled ---
+@pytest.mark.asyncio
+async def test_fallback_and_backfill(collections):
+    portfolios, current = collections
+    portfolios.docs = [
+        {"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-01", "analysis": {"policy_violations": ["old"]}},
+        {"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-02-01", "analysis": {"policy_violations": []}},
+    ]
+    doc = await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P1")
+    assert doc["uploaded_at"] == "2025-02-01"
+    assert [d["_id"] for d in current.docs] == [portfolios.docs[1]["_id"]]
+
+    analysis_doc = await portfolio_crud.get_portfolio_analysis_doc("C1", "P1")
+    assert analysis_doc["analysis"] == {"policy_violations": []}
+    assert await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P2") is None
+
+
+# --- Test Case 3: Disabled, the current collection is neither read nor written ---
+@pytest.mark.asyncio
+async def test_current_collection_disabled(collections, monkeypatch):
+    portfolios, current = collections
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+    await portfolio_crud.create_portfolio_doc({"client_id": "C1", "portfolio_id": "P1", "uploaded_at": "2025-01-01"})
+    assert (await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P1"))["client_id"] == "C1"
+    assert current.docs == [] and current.find_one_calls == 0
+
+
+# --- Test Case 4: Syncs of concurrent writes never replace a newer current document ---
+@pytest.mark.asyncio
+async def test_out_of_order_syncs_keep_the_newest_version(collections):
+    portfolios, current = collections
+    mongo_id, other_id = ObjectId(), ObjectId()
+    key = {"client_id": "C1", "portfolio_id": "P1"}
+
+    # The sync of version 3 ran first; the late sync of version 2 is ignored
+    await portfolio_crud._sync_current_docs([{"_id": mongo_id, **key, "analysis_version": 3, "positions": ["new"]}])
+    await portfolio_crud._sync_current_docs([{"_id": mongo_id, **key, "analysis_version": 2, "positions": ["old"]}])
+    # Also for an older document with another _id, and the other portfolios of the batch are still synced
+    await portfolio_crud._sync_current_docs([
+        {"_id": other_id, **key, "analysis_version": 1, "positions": ["older"]},
+        {"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P2", "analysis_version": 1},
+    ])
+    assert [(d["_id"], d["positions"]) for d in current.docs if d["portfolio_id"] == "P1"] == [(mongo_id, ["new"])]
+    assert [d["portfolio_id"] for d in current.docs] == ["P1", "P2"]
+
+
+# --- Test Case 5: A partial update is not applied to a stale current document, which is dropped ---
+@pytest.mark.asyncio
+async def test_partial_update_drops_stale_current_document(collections):
+    portfolios, current = collections
+    stored = {"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "analysis_version": 2, "trade_count": 2}
+    portfolios.docs.append(dict(stored))
+    current.docs.append({**stored, "analysis_version": 1, "trade_count": 1})
+
+    assert await portfolio_crud.update_portfolio_changes(stored["_id"], stored, {**stored, "trade_count": 3})
+    assert current.docs == []
+    doc = await portfolio_crud.get_portfolio_by_client_and_portfolio_id("C1", "P1")
+    assert doc["trade_count"] == 3 and doc["analysis_version"] == 3
+    assert current.docs[0]["trade_count"] == 3 # Backfilled from the portfolios collection
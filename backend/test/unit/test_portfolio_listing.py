@@ -0,0 +1,66 @@
+# backend/test/unit/test_portfolio_listing.py
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import crud.portfolio_crud as portfolio_crud
+import routers.portfolio as portfolio_router
+
+
+def _portfolio_docs(count: int) -> list:
+    return [
+        {"_id": ObjectId(), "client_id": f"C{i}", "portfolio_id": "P1", "date": "2025-01-01",
+         "uploaded_at": datetime(2025, 1, 2, 3, 4, 5), "trades": [{"trade_id": "T"}] * 100}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def listing(monkeypatch, fake_collection):
+    collection = fake_collection(_portfolio_docs(5))
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+    app = FastAPI()
+    app.include_router(portfolio_router.router)
+    return TestClient(app), collection
+
+
+# --- Test Case 1: Without parameters, all summaries come back as one JSON array ---
+def test_list_all_portfolios(listing):
+    client, collection = listing
+    response = client.get("/portfolios")
+    assert response.status_code == 200 and response.headers["content-type"] == "application/json"
+    portfolios = response.json()
+    assert [p["client_id"] for p in portfolios] == [f"C{i}" for i in range(5)]
+    assert portfolios[0] == {
+        "_id": str(collection.docs[0]["_id"]), "client_id": "C0", "portfolio_id": "P1",
+        "date": "2025-01-01", "uploaded_at": "2025-01-02T03:04:05",
+    }
+    assert "trades" not in collection.projections[-1]
+
+
+# --- Test Case 2: Keyset pages follow X-Next-Cursor to the end ---
+def test_keyset_pagination(listing):
+    client, collection = listing
+    seen, after = [], None
+    while True:
+        response = client.get("/portfolios", params={"limit": 2, **({"after": after} if after else {})})
+        seen.extend(p["client_id"] for p in response.json())
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+    assert seen == [f"C{i}" for i in range(5)]
+    assert client.get("/portfolios", params={"after": "not-an-id"}).status_code == 400
+    assert client.get("/portfolios", params={"limit": 0}).status_code == 422
+
+
+# --- Test Case 3: NDJSON streams one portfolio per line ---
+def test_ndjson_listing(listing):
+    client, collection = listing
+    response = client.get("/portfolios", params={"format": "ndjson", "after": str(collection.docs[1]["_id"])})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert [json.loads(line)["client_id"] for line in lines] == ["C2", "C3", "C4"]
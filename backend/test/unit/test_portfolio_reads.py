@@ -0,0 +1,63 @@
+# backend/test/unit/test_portfolio_reads.py
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import crud.portfolio_crud as portfolio_crud
+import routers.portfolio as portfolio_router
+from core.config import settings
+
+TRADES = [
+    {"trade_id": f"T{i}", "symbol": "AAPL", "quantity": 1.0, "price": 100.0, "trade_date": "2025-01-02", "type": "BUY"}
+    for i in range(5)
+]
+PORTFOLIO = {
+    "_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "date": "2025-01-01", "uploaded_at": "2025-01-02",
+    "positions": [{"symbol": "AAPL", "quantity": 5.0, "isin": "US0378331005", "sector": "Technology"}],
+    "trades": TRADES, "analysis": {"policy_violations": []},
+}
+
+
+@pytest.fixture
+def client(monkeypatch, fake_collection):
+    collection = fake_collection([PORTFOLIO])
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+    app = FastAPI()
+    app.include_router(portfolio_router.router)
+    return TestClient(app), collection
+
+
+# --- Test Case 1: Summary, positions and transactions read only the fields they return ---
+def test_endpoints_use_projections(client):
+    client, collection = client
+    summary = client.get("/portfolio/C1/P1/summary").json()
+    assert summary == {"id": str(PORTFOLIO["_id"]), "client_id": "C1", "portfolio_id": "P1", "date": "2025-01-01", "uploaded_at": "2025-01-02"}
+    assert "trades" not in collection.projections[-1] and "positions" not in collection.projections[-1]
+
+    positions = client.get("/portfolio/C1/P1/positions").json()
+    assert [p["symbol"] for p in positions] == ["AAPL"]
+    assert collection.projections[-1] == {"_id": 1, "positions": 1}
+
+    assert len(client.get("/portfolio/C1/P1/transactions").json()) == 5
+    assert collection.projections[-1] == {"_id": 1, "trades_externalized": 1, "trades": 1}
+    assert len(collection.projections) == 3 # One read per request
+
+
+# --- Test Case 2: Trades are paged with $slice ---
+def test_transactions_paging(client):
+    client, collection = client
+    page = client.get("/portfolio/C1/P1/transactions", params={"skip": 1, "limit": 2}).json()
+    assert [t["trade_id"] for t in page] == ["T1", "T2"]
+    assert collection.projections[-1] == {"_id": 1, "trades_externalized": 1, "trades": {"$slice": [1, 2]}}
+    assert [t["trade_id"] for t in client.get("/portfolio/C1/P1/transactions", params={"skip": 4}).json()] == ["T4"]
+    assert client.get("/portfolio/C1/P1/transactions", params={"limit": 0}).status_code == 422
+
+
+# --- Test Case 3: Unknown portfolios are a 404 after a single read ---
+def test_missing_portfolio(client):
+    client, collection = client
+    for path in ("summary", "positions", "transactions"):
+        assert client.get(f"/portfolio/C1/UNKNOWN/{path}").status_code == 404
+    assert len(collection.projections) == 3
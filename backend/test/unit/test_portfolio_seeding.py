@@ -0,0 +1,87 @@
+# backend/test/unit/test_portfolio_seeding.py
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+import crud.portfolio_crud as portfolio_crud
+import services.portfolio_seeding as portfolio_seeding
+from services.portfolio_seeding import seed_portfolio_docs, seed_portfolios
+
+CLIENTS = [
+    {"client_id": "C1", "portfolios": [{"portfolio_id": "P1"}, {"portfolio_id": "P2"}, {"portfolio_id": "P1"}]},
+    {"client_id": "C2", "portfolios": [{"portfolio_id": "P3"}, {"name": "no id"}]},
+    {"name": "no client id", "portfolios": [{"portfolio_id": "P4"}]},
+]
+
+
+class FakeBulkCollection:
+    """Records bulk_write calls; raises the given write errors as a BulkWriteError."""
+    def __init__(self, write_errors=()):
+        self.write_errors = list(write_errors)
+        self.calls = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append((operations, ordered))
+        failed = {error["index"] for error in self.write_errors}
+        upserted = {index: ObjectId() for index in range(len(operations)) if index not in failed}
+        if self.write_errors:
+            raise BulkWriteError({"writeErrors": self.write_errors, "upserted": [{"index": i, "_id": _id} for i, _id in upserted.items()]})
+        return type("result", (object,), {"upserted_ids": upserted})()
+
+
+# --- Test Case 1: Seed documents skip entries without ids and duplicates ---
+def test_seed_portfolio_docs():
+    docs = seed_portfolio_docs(CLIENTS)
+    assert [(d["client_id"], d["portfolio_id"]) for d in docs] == [("C1", "P1"), ("C1", "P2"), ("C2", "P3")]
+    assert docs[0]["positions"] == [] and docs[0]["trades"] == []
+    assert docs[0]["uploaded_at"] == docs[-1]["uploaded_at"]
+
+
+# --- Test Case 2: One key lookup, then one bulk insert of the missing portfolios ---
+@pytest.mark.asyncio
+async def test_seed_portfolios_inserts_only_missing(monkeypatch):
+    calls = []
+
+    async def fake_ensure_index():
+        calls.append("index")
+        return True
+
+    async def fake_existing_keys(client_ids):
+        calls.append(("existing", sorted(set(client_ids))))
+        return {("C1", "P2")}
+
+    async def fake_bulk_insert(docs):
+        calls.append(("insert", [(d["client_id"], d["portfolio_id"]) for d in docs]))
+        return len(docs), {}
+
+    monkeypatch.setattr(portfolio_seeding, "ensure_portfolio_key_index", fake_ensure_index)
+    monkeypatch.setattr(portfolio_seeding, "get_existing_portfolio_keys", fake_existing_keys)
+    monkeypatch.setattr(portfolio_seeding, "bulk_insert_missing_portfolio_docs", fake_bulk_insert)
+
+    result = await seed_portfolios(CLIENTS)
+    assert calls == ["index", ("existing", ["C1", "C2"]), ("insert", [("C1", "P1"), ("C2", "P3")])]
+    assert {k: result[k] for k in ("portfolios", "existing", "inserted", "errors")} == {"portfolios": 3, "existing": 1, "inserted": 2, "errors": 0}
+
+
+# --- Test Case 3: The bulk write upserts with $setOnInsert and tolerates concurrent inserts ---
+@pytest.mark.asyncio
+async def test_bulk_insert_missing_portfolio_docs(monkeypatch):
+    docs = seed_portfolio_docs(CLIENTS)
+    collection = FakeBulkCollection()
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+
+    assert await portfolio_crud.bulk_insert_missing_portfolio_docs(docs) == (3, {})
+    operations, ordered = collection.calls[0]
+    assert ordered is False and len(operations) == 3
+    operation = operations[0]._doc
+    assert operations[0]._filter == {"client_id": "C1", "portfolio_id": "P1"} and operations[0]._upsert
+    assert set(operation) == {"$setOnInsert"} and "client_id" not in operation["$setOnInsert"]
+
+    # A duplicate key error means another instance seeded the portfolio first: not an error
+    collection = FakeBulkCollection([
+        {"index": 0, "code": 11000, "errmsg": "E11000 duplicate key error"},
+        {"index": 2, "code": 2, "errmsg": "bad value"},
+    ])
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+    assert await portfolio_crud.bulk_insert_missing_portfolio_docs(docs) == (1, {2: "bad value"})
+    assert await portfolio_crud.bulk_insert_missing_portfolio_docs([]) == (0, {})
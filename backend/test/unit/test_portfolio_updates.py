@@ -0,0 +1,69 @@
+# backend/test/unit/test_portfolio_updates.py
+from datetime import date
+
+import pytest
+from bson import ObjectId
+
+import crud.portfolio_crud as portfolio_crud
+import services.portfolio_service as portfolio_service
+from core.config import settings
+from crud.portfolio_crud import compute_portfolio_update
+from schemas.portfolio_models import TradeIn
+
+
+# --- Test Case 1: Only changed top-level fields are written, appended lists are pushed ---
+def test_compute_portfolio_update():
+    trades = [{"trade_id": "T1"}, {"trade_id": "T2"}]
+    original = {"_id": "x", "trades": trades, "positions": [{"symbol": "A"}], "analysis": {"v": 1}, "date": "2025-01-01", "old": 1}
+    updated = {"_id": "y", "trades": trades + [{"trade_id": "T3"}], "positions": [{"symbol": "B"}], "analysis": {"v": 1}, "date": "2025-01-01", "new": 2}
+    assert compute_portfolio_update(original, updated) == {
+        "$push": {"trades": {"$each": [{"trade_id": "T3"}]}},
+        "$set": {"positions": [{"symbol": "B"}], "new": 2},
+        "$unset": {"old": ""},
+    }
+    assert compute_portfolio_update(original, dict(original)) == {}
+    # A list that changed other than at its end is set as a whole
+    assert compute_portfolio_update({"trades": trades}, {"trades": trades[1:] + trades[:1]}) == {"$set": {"trades": trades[1:] + trades[:1]}}
+
+
+# --- Test Case 2: The update only applies on the version that was read ---
+@pytest.mark.asyncio
+async def test_update_is_version_checked(monkeypatch, fake_collection):
+    collection = fake_collection([{"_id": ObjectId(), "analysis_version": 3, "positions": []}])
+    stored = collection.docs[0]
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+
+    stale = {**stored, "analysis_version": 2}
+    assert not await portfolio_crud.update_portfolio_changes(stored["_id"], stale, {**stale, "positions": [{"symbol": "A"}]})
+    assert stored["positions"] == []
+
+    # The version is bumped when the caller did not change it
+    assert await portfolio_crud.update_portfolio_changes(str(stored["_id"]), dict(stored), {**stored, "positions": [{"symbol": "A"}]})
+    assert stored["analysis_version"] == 4 and stored["positions"] == [{"symbol": "A"}]
+    assert collection.updates[-1][0] == {"_id": stored["_id"], "analysis_version": 3}
+
+
+# --- Test Case 3: Adding a trade to embedded trades pushes it instead of replacing the document ---
+@pytest.mark.asyncio
+async def test_embedded_add_trade_pushes_the_trade(monkeypatch, fake_collection):
+    trades = [{"trade_id": f"T{i}", "symbol": "AAPL", "isin": "US0378331005", "quantity": 1.0, "price": 100.0,
+               "trade_date": "2025-01-01", "type": "BUY", "sector": "Technology"} for i in range(3)]
+    collection = fake_collection([{"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "trades": trades, "analysis_version": 1}])
+    stored = collection.docs[0]
+
+    async def fake_ingest(*args, **kwargs):
+        return None
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", collection)
+    monkeypatch.setattr(portfolio_service, "ingest_portfolio_analysis", fake_ingest)
+    monkeypatch.setattr(settings, "TRADE_COLLECTION_ENABLED", False)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+
+    trade = TradeIn(symbol="AAPL", isin="US0378331005", quantity=2.0, price=100.0, trade_date=date(2025, 1, 2), sector="Technology")
+    await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", trade)
+
+    filter, update = collection.updates[-1]
+    assert filter["analysis_version"] == 1 and len(update["$push"]["trades"]["$each"]) == 1
+    assert "trades" not in update["$set"] and update["$set"]["analysis_version"] == 2
+    assert len(stored["trades"]) == 4 and stored["positions"][0]["quantity"] == 5.0
+    assert collection.writes == ["update_one"] # Not a replace_one of the whole document
@@ -0,0 +1,94 @@
+# backend/test/unit/test_position_ledger.py
+import random
+import pytest
+
+from services.position_ledger import (
+    apply_trade_to_ledger,
+    build_ledger_from_trades,
+    positions_from_ledger,
+    ledger_to_doc,
+    ledger_from_doc,
+    ledgers_match,
+)
+
+
+def _random_trades(n, seed=7):
+    rng = random.Random(seed)
+    symbols = ["AAPL", "MSFT", "AMZN", "BRK.B", "XOM"]
+    trades = []
+    for _ in range(n):
+        symbol = rng.choice(symbols)
+        trades.append({
+            "symbol": symbol,
+            "quantity": rng.randint(1, 50),
+            "price": round(rng.uniform(10, 500), 2),
+            "type": rng.choice(["BUY", "BUY", "SELL", "buy"]),
+            "isin": f"ISIN-{symbol}",
+            "sector": "Technology" if symbol in ("AAPL", "MSFT") else "Others",
+        })
+    return trades
+
+
+# --- Test Case 1: Incremental updates match a full replay ---
+def test_incremental_ledger_matches_replay():
+    trades = _random_trades(500)
+    ledger = build_ledger_from_trades(trades[:100])
+    for trade in trades[100:]:
+        apply_trade_to_ledger(ledger, trade)
+
+    reference = build_ledger_from_trades(trades)
+    assert ledgers_match(ledger, reference)
+    assert positions_from_ledger(ledger) == positions_from_ledger(reference)
+
+
+# --- Test Case 2: Ledger survives a round-trip through its stored form ---
+def test_ledger_doc_round_trip():
+    ledger = build_ledger_from_trades(_random_trades(50))
+    stored = ledger_to_doc(ledger)
+    assert all("symbol" in entry for entry in stored)
+    assert ledger_from_doc(stored) == ledger
+    assert ledger_from_doc(None) is None
+
+
+# --- Test Case 3: Weighted average cost, latest price and first-wins ISIN/Sector ---
+def test_weighted_average_cost_and_metadata():
+    ledger = {}
+    apply_trade_to_ledger(ledger, {"symbol": "AAPL", "quantity": 100, "price": 10.0, "type": "BUY"})
+    apply_trade_to_ledger(ledger, {"symbol": "AAPL", "quantity": 100, "price": 20.0, "type": "BUY",
+                                   "isin": "US0378331005", "sector": "Technology"})
+    apply_trade_to_ledger(ledger, {"symbol": "AAPL", "quantity": 50, "price": 30.0, "type": "SELL",
+                                   "isin": "OTHER", "sector": "Other"})
+
+    state = ledger["AAPL"]
+    assert state["quantity"] == 150
+    assert state["total_cost"] == pytest.approx(2250.0)
+    assert state["latest_price"] == 30.0
+    assert state["isin"] == "US0378331005"
+    assert state["sector"] == "Technology"
+
+    [position] = positions_from_ledger(ledger)
+    assert position["avg_price"] == pytest.approx(15.0)
+    assert position["market_price"] == 30.0
+
+
+# --- Test Case 4: Malformed trades are skipped and flat positions are dropped ---
+def test_malformed_trades_and_flat_positions():
+    ledger = {}
+    assert apply_trade_to_ledger(ledger, {"symbol": "AAPL", "quantity": "10", "type": "BUY"}) is False
+    assert apply_trade_to_ledger(ledger, {"quantity": 10, "type": "BUY"}) is False
+    assert ledger == {}
+
+    apply_trade_to_ledger(ledger, {"symbol": "XOM", "quantity": 10, "price": 5.0, "type": "BUY"})
+    apply_trade_to_ledger(ledger, {"symbol": "XOM", "quantity": 10, "price": 6.0, "type": "SELL"})
+    assert "XOM" in ledger
+    assert positions_from_ledger(ledger) == []
+
+
+# --- Test Case 5: Divergence is detected ---
+def test_ledgers_match_detects_divergence():
+    trades = _random_trades(20)
+    ledger = build_ledger_from_trades(trades)
+    reference = build_ledger_from_trades(trades)
+    symbol = next(iter(ledger))
+    ledger[symbol]["quantity"] += 1
+    assert not ledgers_match(ledger, reference)
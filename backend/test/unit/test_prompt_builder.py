@@ -0,0 +1,105 @@
+# backend/test/unit/test_prompt_builder.py
+import random
+import pytest
+
+from services.prompt_builder import (
+    CONTEXT_HEADER, HISTORY_SUMMARY_HEADER, SYSTEM_PROMPT,
+    approximate_token_count, build_prompt, count_prompt_tokens, truncate_to_tokens,
+)
+
+
+def whitespace_tokens(text: str) -> int:
+    """Local test tokenizer: one token per whitespace-separated word."""
+    return len(text.split())
+
+
+def _build(question, history=None, chunks=(), distances=None, budget=1000, **overrides):
+    options = dict(token_budget=budget, history_share=0.3, recent_messages=4, summary_tokens=5, count_tokens=whitespace_tokens)
+    options.update(overrides)
+    return build_prompt(question, history, chunks, distances, **options)
+
+
+def _history(turns: int, words: int = 10) -> list:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": " ".join(f"m{i}w{j}" for j in range(words))}
+        for i in range(turns)
+    ]
+
+
+# --- Test Case 1: Within budget the prompt has the usual layout ---
+def test_everything_fits():
+    history = _history(2)
+    build = _build("Any violations?", history, ["chunk one", "chunk two"])
+    assert build.messages == [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": CONTEXT_HEADER + "chunk one\nchunk two"},
+        *history,
+        {"role": "user", "content": "Any violations?"},
+    ]
+    assert build.prompt_tokens == count_prompt_tokens(build.messages, whitespace_tokens)
+    assert (build.dropped_chunks, build.summarized_messages, build.dropped_messages) == (0, 0, 0)
+
+
+# --- Test Case 2: Context is ranked by similarity and deduplicated ---
+def test_context_ranked_and_deduplicated():
+    chunks = ["far chunk words here", "near chunk", "Near   CHUNK", "middle chunk words"]
+    fixed = count_prompt_tokens([{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": "q"}], whitespace_tokens)
+    # Room for the header and the two closest unique chunks only
+    budget = fixed + whitespace_tokens(CONTEXT_HEADER) + 4 + (2 + 1) + (3 + 1)
+    build = _build("q", chunks=chunks, distances=[0.9, 0.1, 0.1, 0.5], budget=budget)
+    assert build.messages[1]["content"] == CONTEXT_HEADER + "near chunk\nmiddle chunk words"
+    assert (build.context_chunks, build.dropped_chunks, build.duplicate_chunks) == (2, 1, 1)
+    assert build.prompt_tokens <= budget
+
+
+# --- Test Case 3: Older history is compacted, recent messages are kept verbatim ---
+def test_history_compaction():
+    history = _history(12)
+    build = _build("Next question?", history, ["context"], budget=400)
+    recent = [m for m in build.messages if m["role"] != "system"][:-1]
+    assert recent == history[-4:]
+    summary = next(m["content"] for m in build.messages if m["content"].startswith(HISTORY_SUMMARY_HEADER))
+    assert summary.splitlines()[1:] == [f"{m['role']}: {' '.join(m['content'].split()[:5])}..." for m in history[:-4]]
+    assert (build.recent_messages, build.summarized_messages, build.dropped_messages) == (4, 8, 0)
+
+
+def test_prompt_size_stops_growing_with_conversation_length():
+    sizes = [_build("q", _history(turns, words=50), ["context " * 20], budget=300).prompt_tokens for turns in (10, 100, 1000)]
+    assert max(sizes) <= 300
+    assert sizes[1] == sizes[2]
+
+
+def test_long_recent_message_is_truncated():
+    history = _history(1, words=500)
+    build = _build("q", history, ["context"], budget=200)
+    message = build.messages[-2]
+    assert message["content"].endswith("...") and whitespace_tokens(message["content"]) < 500
+    assert build.prompt_tokens <= 200
+
+
+# --- Test Case 4: The budget holds for arbitrary inputs ---
+def test_budget_is_never_exceeded():
+    rng = random.Random(11)
+    for _ in range(200):
+        history = _history(rng.randint(0, 30), words=rng.randint(1, 80))
+        chunks = [" ".join(["w"] * rng.randint(1, 120)) + str(i) for i in range(rng.randint(0, 8))]
+        budget = rng.randint(60, 1500)
+        build = _build("What changed?", history, chunks, [rng.random() for _ in chunks], budget=budget,
+                       history_share=rng.random(), recent_messages=rng.randint(0, 8))
+        assert build.prompt_tokens <= budget
+        assert build.messages[-1] == {"role": "user", "content": "What changed?"}
+        assert build.recent_messages + build.summarized_messages + build.dropped_messages == len(history)
+
+
+def test_no_context_gives_history_the_whole_budget():
+    history = _history(4)
+    build = _build("q", history, system_prompt=None, budget=100, history_share=0.1)
+    assert build.messages == history + [{"role": "user", "content": "q"}]
+
+
+# --- Test Case 5: Default tokenizer and truncation ---
+def test_approximate_token_count_and_truncation():
+    assert approximate_token_count("Any policy violations?") == 1 + 2 + 3 + 1
+    assert truncate_to_tokens("one two three four", 10, whitespace_tokens) == "one two three four"
+    assert truncate_to_tokens("one two three four", 3, whitespace_tokens) == "one two three..."
+    assert truncate_to_tokens("one two", 0, whitespace_tokens) == ""
@@ -18,11 +18,39 @@ class MockCollection:
         self.metadatas = []
         self.ids = []
 
-    def add(self, documents, metadatas, ids):
+    def add(self, documents, metadatas, ids, embeddings=None):
         self.documents.extend(documents)
         self.metadatas.extend(metadatas)
         self.ids.extend(ids)
 
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            if doc_id in self.ids:
+                index = self.ids.index(doc_id)
+                self.documents[index], self.metadatas[index] = document, metadata
+            else:
+                self.add([document], [metadata], [doc_id])
+
+    @staticmethod
+    def _matches(metadata, where):
+        if not where:
+            return True
+        if "$and" in where:
+            return all(MockCollection._matches(metadata, w) for w in where["$and"])
+        if "$or" in where:
+            return any(MockCollection._matches(metadata, w) for w in where["$or"])
+        return all(metadata.get(k) == v for k, v in where.items())
+
+    def get(self, where=None, include=None, limit=None, offset=None):
+        matches = [i for i, m in enumerate(self.metadatas) if self._matches(m, where)][offset or 0:]
+        matches = matches[:limit] if limit else matches
+        return {"ids": [self.ids[i] for i in matches], "metadatas": [self.metadatas[i] for i in matches]}
+
+    def delete(self, ids):
+        for doc_id in ids:
+            index = self.ids.index(doc_id)
+            del self.ids[index], self.documents[index], self.metadatas[index]
+
     def query(self, query_embeddings, n_results, where):
         # Simplistic mock query for testing purposes
         # In a real test, you'd likely mock based on expected inputs and outputs
@@ -46,7 +74,7 @@ class MockOpenAIClient:
         self.api_key = api_key
     class Chat:
         class Completions:
-            def create(self, model, messages):
+            async def create(self, model, messages):
                 class MockChoice:
                     class MockMessage:
                         def __init__(self, content):
@@ -150,7 +178,7 @@ async def test_query_portfolio_with_context(monkeypatch):
 
     # Set mock OpenAI API key in settings
     monkeypatch.setattr(settings, "OPENAI_API_KEY", "mock_key")
-    monkeypatch.setattr("rag_service.OpenAI", MockOpenAIClient) # Mock the OpenAI client
+    monkeypatch.setattr("rag_service.AsyncOpenAI", MockOpenAIClient) # Mock the OpenAI client
 
     mock_client = MockChromaClient("test_path")
     mock_ef = mock_ef_instance
@@ -182,7 +210,7 @@ async def test_query_portfolio_no_context_with_history(monkeypatch):
 
     # Set mock OpenAI API key in settings
     monkeypatch.setattr(settings, "OPENAI_API_KEY", "mock_key")
-    monkeypatch.setattr("rag_service.OpenAI", MockOpenAIClient) # Mock the OpenAI client
+    monkeypatch.setattr("rag_service.AsyncOpenAI", MockOpenAIClient) # Mock the OpenAI client
 
     mock_client = MockChromaClient("test_path")
     mock_ef = mock_ef_instance
@@ -212,7 +240,7 @@ async def test_query_portfolio_no_context_no_history(monkeypatch):
 
     # Set mock OpenAI API key in settings
     monkeypatch.setattr(settings, "OPENAI_API_KEY", "mock_key")
-    monkeypatch.setattr("rag_service.OpenAI", MockOpenAIClient) # Mock the OpenAI client
+    monkeypatch.setattr("rag_service.AsyncOpenAI", MockOpenAIClient) # Mock the OpenAI client
 
     mock_client = MockChromaClient("test_path")
     mock_ef = mock_ef_instance
@@ -238,6 +266,7 @@ async def test_openai_api_key_missing_in_query(monkeypatch):
 
     # Temporarily unset the OpenAI API key in settings
     monkeypatch.setattr(settings, "OPENAI_API_KEY", "") # Set to empty string
+    monkeypatch.setattr("rag_service._openai_client", None) # Drop any client set by earlier tests
 
     mock_client = MockChromaClient("test_path")
     mock_ef = mock_ef_instance
@@ -245,4 +274,54 @@ async def test_openai_api_key_missing_in_query(monkeypatch):
     set_rag_components(mock_client, mock_ef, mock_collection)
 
     with pytest.raises(Exception, match="OpenAI API key is not configured"):
-        await query_portfolio("test_client", "test_portfolio", "Test question")
\ No newline at end of file
+        await query_portfolio("test_client", "test_portfolio", "Test question")
+
+# --- Test Case 11: Blocking calls run off the event loop, LLM calls respect the concurrency limit ---
+@pytest.mark.asyncio
+async def test_query_portfolio_does_not_block_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    import rag_service
+    from rag_service import query_portfolio, set_rag_components, set_openai_client
+    from core.config import settings
+
+    loop_thread = threading.current_thread()
+    calls = {"embedding_threads": set(), "query_threads": set(), "llm_in_flight": 0, "llm_max_in_flight": 0}
+
+    class ThreadRecordingEmbeddingFunction(MockEmbeddingFunction):
+        def __call__(self, texts):
+            calls["embedding_threads"].add(threading.current_thread())
+            return super().__call__(texts)
+
+    class ThreadRecordingCollection(MockCollection):
+        def query(self, query_embeddings, n_results, where):
+            calls["query_threads"].add(threading.current_thread())
+            return {"documents": [["Some portfolio context"]]}
+
+    class SlowAsyncOpenAIClient:
+        class Chat:
+            class Completions:
+                async def create(self, model, messages):
+                    calls["llm_in_flight"] += 1
+                    calls["llm_max_in_flight"] = max(calls["llm_max_in_flight"], calls["llm_in_flight"])
+                    await asyncio.sleep(0.01)
+                    calls["llm_in_flight"] -= 1
+                    message = type('message', (object,), {'content': "Answer"})()
+                    choice = type('choice', (object,), {'message': message})()
+                    return type('obj', (object,), {'choices': [choice]})()
+            completions = Completions()
+        chat = Chat()
+
+    monkeypatch.setattr(settings, "OPENAI_MAX_CONCURRENT_REQUESTS", 2)
+    monkeypatch.setattr("rag_service._llm_semaphores", {})
+    ef = ThreadRecordingEmbeddingFunction(model_name="test_model_name")
+    set_rag_components(MockChromaClient("test_path"), ef, ThreadRecordingCollection("test_name", ef))
+    set_openai_client(SlowAsyncOpenAIClient())
+
+    answers = await asyncio.gather(*(query_portfolio("C1", "P1", f"Question {i}") for i in range(6)))
+
+    assert answers == ["Answer"] * 6
+    assert calls["embedding_threads"] and loop_thread not in calls["embedding_threads"]
+    assert calls["query_threads"] and loop_thread not in calls["query_threads"]
+    assert calls["llm_max_in_flight"] == 2
+    monkeypatch.setattr("rag_service._openai_client", None)
@@ -0,0 +1,106 @@
+# backend/test/unit/test_rag_streaming.py
+import asyncio
+import json
+import uuid
+import chromadb
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import rag_service
+from rag_service import ingest_portfolio_analysis, query_portfolio, set_rag_components, stream_portfolio_answer
+from routers import rag
+
+
+class FakeStreamingOpenAIClient:
+    """Local fake LLM: streams the given tokens, optionally pausing after the first one until released."""
+    def __init__(self, tokens, release=None, fail_after=None):
+        self.tokens = tokens
+        self.release = release
+        self.fail_after = fail_after
+        self.closed_streams = 0
+        self.chat = type('chat', (object,), {'completions': self})()
+
+    async def create(self, model, messages, stream=False):
+        if not stream:
+            message = type('message', (object,), {'content': "".join(self.tokens)})()
+            return type('obj', (object,), {'choices': [type('choice', (object,), {'message': message})()]})()
+        return _FakeStream(self)
+
+
+class _FakeStream:
+    def __init__(self, llm):
+        self.llm = llm
+
+    async def __aiter__(self):
+        for index, token in enumerate(self.llm.tokens):
+            if index == self.llm.fail_after:
+                raise RuntimeError("LLM connection lost")
+            if index == 1 and self.llm.release is not None:
+                await self.llm.release.wait()
+            delta = type('delta', (object,), {'content': token})()
+            yield type('chunk', (object,), {'choices': [type('choice', (object,), {'delta': delta})()]})()
+
+    async def close(self):
+        self.llm.closed_streams += 1
+
+
+@pytest.fixture
+def portfolio_collection(monkeypatch):
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"test-{uuid.uuid4().hex}", embedding_function=None)
+    set_rag_components(client, lambda texts: [[float(len(t) % 5), 1.0, 0.5] for t in texts], collection)
+    monkeypatch.setattr(rag_service.settings, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr("rag_service._answer_cache", None)
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "compliance_report": "ok", "positions": []}
+    asyncio.run(ingest_portfolio_analysis("C1", portfolio, "No violations.", "P1"))
+    yield collection
+    client.delete_collection(collection.name)
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+# --- Test Case 1: Tokens are yielded as the LLM produces them ---
+@pytest.mark.asyncio
+async def test_first_token_arrives_before_the_answer_is_complete(portfolio_collection, monkeypatch):
+    release = asyncio.Event()
+    llm = FakeStreamingOpenAIClient([" No", " violations", "."], release=release)
+    monkeypatch.setattr("rag_service._openai_client", llm)
+
+    tokens = stream_portfolio_answer("C1", "P1", "Any violations?")
+    assert await asyncio.wait_for(tokens.__anext__(), timeout=5) == "No" # The LLM is still paused
+    release.set()
+    assert [token async for token in tokens] == [" violations", "."]
+    assert llm.closed_streams == 1
+
+    # The streamed answer is cached for the non-streaming endpoint as well
+    assert await query_portfolio("C1", "P1", "any violations") == "No violations."
+
+
+# --- Test Case 2: The SSE endpoint forwards tokens and reports errors ---
+def test_sse_endpoint(portfolio_collection, monkeypatch):
+    app = FastAPI()
+    app.include_router(rag.router, prefix="/rag")
+    client = TestClient(app)
+
+    monkeypatch.setattr("rag_service._openai_client", FakeStreamingOpenAIClient(["All", " clear"]))
+    response = client.post("/rag/ask/C1/P1/stream", json={"question": "Status?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response.text) == [("token", {"token": "All"}), ("token", {"token": " clear"}), ("done", {})]
+
+    # Failure before the first token: HTTP error; after it: an error event ends the stream
+    monkeypatch.setattr("rag_service._openai_client", FakeStreamingOpenAIClient(["x"], fail_after=0))
+    assert client.post("/rag/ask/C1/P1/stream", json={"question": "Other?"}).status_code == 500
+    monkeypatch.setattr("rag_service._openai_client", FakeStreamingOpenAIClient(["Partial", " answer"], fail_after=1))
+    events = _events(client.post("/rag/ask/C1/P1/stream", json={"question": "Third?"}).text)
+    assert events[0] == ("token", {"token": "Partial"})
+    assert events[-1][0] == "error" and "LLM connection lost" in events[-1][1]["detail"]
+
+    assert client.post("/rag/ask/C1/P1/stream", json={"question": ""}).status_code == 400
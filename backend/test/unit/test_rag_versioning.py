@@ -0,0 +1,103 @@
+# backend/test/unit/test_rag_versioning.py
+import uuid
+import chromadb
+import pytest
+
+import rag_service
+from rag_service import compact_rag_collection, ingest_portfolio_analyses, ingest_portfolio_analysis, set_rag_components
+
+
+def _embedding_function(texts):
+    return [[float(len(text) % 7), 1.0, 0.5] for text in texts]
+
+
+@pytest.fixture
+def collection():
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"test-{uuid.uuid4().hex}", embedding_function=None)
+    set_rag_components(client, _embedding_function, collection)
+    yield collection
+    client.delete_collection(collection.name)
+
+
+def _portfolio(client_id, portfolio_id, report, version=None):
+    portfolio = {"client_id": client_id, "portfolio_id": portfolio_id, "compliance_report": report, "positions": []}
+    if version is not None:
+        portfolio["analysis_version"] = version
+    return portfolio
+
+
+def _stored(collection):
+    result = collection.get(include=["metadatas", "documents"])
+    return sorted(
+        (m["client_id"], m["portfolio_id"], m.get("analysis_version"), d)
+        for m, d in zip(result["metadatas"], result["documents"])
+    )
+
+
+# --- Test Case 1: Re-analysis upserts one document per portfolio with a growing version ---
+@pytest.mark.asyncio
+async def test_reingestion_replaces_the_document(collection):
+    for i in range(5):
+        await ingest_portfolio_analysis("C1", _portfolio("C1", "P1", f"report {i}"), f"report {i}", "P1")
+    await ingest_portfolio_analysis("C1", _portfolio("C1", "P2", "other"), "other", "P2")
+
+    stored = _stored(collection)
+    assert [(c, p, v) for c, p, v, _ in stored] == [("C1", "P1", 5), ("C1", "P2", 1)]
+    assert "Compliance Report Summary: report 4" in stored[0][3]
+
+
+@pytest.mark.asyncio
+async def test_stale_version_is_not_written(collection):
+    await ingest_portfolio_analysis("C1", _portfolio("C1", "P1", "new", version=7), "new", "P1")
+    await ingest_portfolio_analysis("C1", _portfolio("C1", "P1", "old", version=6), "old", "P1")
+    [(_, _, version, document)] = _stored(collection)
+    assert version == 7 and "Compliance Report Summary: new" in document
+
+
+@pytest.mark.asyncio
+async def test_reingestion_removes_stale_chunks(collection):
+    positions = [{"symbol": s, "sector": sector, "quantity": 1, "market_price": 10.0} for s, sector in [("A", "Energy"), ("B", "Utilities")]]
+    portfolio = _portfolio("C1", "P1", "two sectors")
+    portfolio["positions"] = positions
+    await ingest_portfolio_analysis("C1", portfolio, "two sectors", "P1")
+    portfolio["positions"] = positions[:1]
+    await ingest_portfolio_analysis("C1", portfolio, "one sector", "P1")
+
+    result = collection.get(include=["metadatas"])
+    assert sorted(result["ids"]) == ["C1|P1#positions-Energy-1", "C1|P1#summary"]
+    assert {m["analysis_version"] for m in result["metadatas"]} == {2}
+
+
+# --- Test Case 2: Batched ingestion follows the same model ---
+@pytest.mark.asyncio
+async def test_batch_ingestion_is_bounded_by_portfolio_count(collection, monkeypatch):
+    monkeypatch.setattr(rag_service.settings, "RAG_INGEST_BATCH_SIZE", 3)
+    for round_number in range(1, 4):
+        portfolios = [_portfolio(f"C{i}", "P1", f"round {round_number}", version=round_number) for i in range(7)]
+        assert await ingest_portfolio_analyses(portfolios) == {}
+    stored = _stored(collection)
+    assert len(stored) == 7
+    assert {v for _, _, v, _ in stored} == {3}
+
+
+# --- Test Case 3: Compaction removes superseded and legacy documents ---
+@pytest.mark.asyncio
+async def test_compaction(collection):
+    # Documents written before versioning: timestamped ids, no analysis_version
+    collection.add(
+        ids=["C1-P1-20240101000000000000", "C1-P1-20240301000000000000", "C2-P1-20240101000000000000", "C2-P1-20240201000000000000"],
+        documents=["p1 jan", "p1 mar", "c2 jan", "c2 feb"],
+        embeddings=[[1.0, 0.0, 0.0]] * 4,
+        metadatas=[{"client_id": "C1", "portfolio_id": "P1"}] * 2 + [{"client_id": "C2", "portfolio_id": "P1"}] * 2,
+    )
+    collection.add(
+        ids=["C1|P1"], documents=["p1 versioned"], embeddings=[[1.0, 0.0, 0.0]],
+        metadatas=[{"client_id": "C1", "portfolio_id": "P1", "analysis_version": 2}],
+    )
+
+    result = await compact_rag_collection()
+
+    assert result == {"portfolios": 2, "documents_before": 5, "deleted": 3}
+    assert sorted(collection.get()["ids"]) == ["C1|P1", "C2-P1-20240201000000000000"]
+    assert (await compact_rag_collection())["deleted"] == 0
@@ -0,0 +1,102 @@
+# backend/test/unit/test_rag_warmup.py
+import asyncio
+import threading
+import uuid
+import chromadb
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+import rag_service
+from rag_service import get_rag_status, ingest_portfolio_analysis, query_portfolio, set_rag_components, set_rag_warmup
+from routers import rag
+from services.rag_warmup import FAILED, LOADING, READY, RagWarmup
+
+
+@pytest.fixture
+def blocked_warmup(monkeypatch):
+    """A warm-up whose loading finishes (setting up an in-memory collection) once `release` is set."""
+    release = threading.Event()
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"test-{uuid.uuid4().hex}", embedding_function=None)
+
+    def load():
+        release.wait(timeout=10)
+        set_rag_components(client, lambda texts: [[1.0, float(len(t) % 3), 0.5] for t in texts], collection)
+
+    monkeypatch.setattr("rag_service._chroma_client", None)
+    monkeypatch.setattr("rag_service._embedding_function", None)
+    monkeypatch.setattr("rag_service._rag_collection", None)
+    monkeypatch.setattr("rag_service._rag_warmup", None)
+    monkeypatch.setattr(rag_service.settings, "RAG_WARMUP_QUERY_WAIT_SECONDS", 0.01)
+    monkeypatch.setattr(rag_service.settings, "ANSWER_CACHE_ENABLED", False)
+    warmup = RagWarmup(load)
+    set_rag_warmup(warmup)
+    yield warmup, release
+    release.set()
+    client.delete_collection(collection.name)
+
+
+# --- Test Case 1: The warm-up runs in the background and reports its state ---
+@pytest.mark.asyncio
+async def test_warmup_states():
+    release = threading.Event()
+    calls = []
+    warmup = RagWarmup(lambda: calls.append(release.wait(timeout=10)))
+    assert warmup.status()["status"] == "not_started"
+
+    task = warmup.start()
+    assert warmup.start() is task # Started once only
+    assert not await warmup.wait(timeout=0.01)
+    assert warmup.status()["status"] == LOADING
+
+    release.set()
+    assert await warmup.wait()
+    assert warmup.status()["status"] == READY and warmup.seconds is not None
+    assert calls == [True]
+
+    def fail():
+        raise OSError("model not found")
+    failing = RagWarmup(fail)
+    failing.start()
+    assert not await failing.wait()
+    assert failing.status() == {"status": FAILED, "seconds": failing.seconds, "error": "model not found"}
+
+
+# --- Test Case 2: Questions get a 503 while loading; ingestion waits for the components ---
+@pytest.mark.asyncio
+async def test_rag_service_during_warmup(blocked_warmup):
+    warmup, release = blocked_warmup
+    warmup.start()
+
+    with pytest.raises(HTTPException) as excinfo:
+        await query_portfolio("C1", "P1", "Summarize the portfolio")
+    assert excinfo.value.status_code == 503
+    assert get_rag_status()["status"] == LOADING
+
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "compliance_report": "ok", "positions": []}
+    ingestion = asyncio.create_task(ingest_portfolio_analysis("C1", portfolio, "No violations.", "P1"))
+    await asyncio.sleep(0.05)
+    assert not ingestion.done()
+    release.set()
+    await asyncio.wait_for(ingestion, timeout=10)
+    assert get_rag_status()["status"] == READY
+    assert rag_service.get_vector_store().get_portfolio_version("C1", "P1") == 1
+
+
+# --- Test Case 3: The ask endpoint returns the 503 instead of wrapping it in a 500 ---
+@pytest.mark.asyncio
+async def test_ask_endpoint_during_warmup(blocked_warmup):
+    warmup, release = blocked_warmup
+    warmup.start()
+    app = FastAPI()
+    app.include_router(rag.router, prefix="/rag")
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for path in ("/rag/ask/C1/P1", "/rag/ask/C1/P1/stream"):
+            response = await client.post(path, json={"question": "Summarize the portfolio"})
+            assert response.status_code == 503
+            assert response.headers["retry-after"] == "5"
+            assert "still loading" in response.json()["detail"]
+    release.set()
+    assert await warmup.wait()
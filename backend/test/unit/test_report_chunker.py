@@ -0,0 +1,59 @@
+# backend/test/unit/test_report_chunker.py
+from services.portfolio_analysis import analyze_positions
+from services.report_chunker import POSITIONS_PER_CHUNK, chunk_portfolio_report
+
+POSITIONS = [
+    {"symbol": "AAPL", "isin": "US0378331005", "sector": "Technology", "quantity": 150, "avg_price": 150.0, "market_price": 170.0},
+    {"symbol": "AMZN", "isin": "US0231351067", "sector": "Consumer Discretionary", "quantity": 50, "avg_price": 3000.0, "market_price": 3250.0},
+    {"symbol": "XOM", "isin": "US30231G1022", "quantity": 10, "market_price": 100.0}, # No sector
+]
+
+
+def _chunks(positions):
+    analysis, report = analyze_positions(positions)
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "positions": positions, "analysis": analysis}
+    return analysis, chunk_portfolio_report("C1", "P1", portfolio, report)
+
+
+# --- Test Case 1: One chunk per violation, risk drift and sector group, summary first ---
+def test_chunks_per_section():
+    analysis, chunks = _chunks(POSITIONS)
+    by_type = {}
+    for chunk in chunks:
+        by_type.setdefault(chunk.metadata["chunk_type"], []).append(chunk)
+
+    assert chunks[0].chunk_id == "summary"
+    assert chunks[0].text.startswith("Client ID: C1\nPortfolio ID: P1\nCompliance Report Summary: ")
+    assert len(by_type["violation"]) == len(analysis["policy_violations"])
+    assert {c.metadata["sector"] for c in by_type["risk_drift"]} == {d["sector"] for d in analysis["risk_drifts"]}
+    assert {c.metadata["sector"] for c in by_type["positions"]} == {"Technology", "Consumer Discretionary", "Unknown"}
+    assert len({c.chunk_id for c in chunks}) == len(chunks)
+    # ChromaDB metadata values must be str/int/float/bool
+    assert all(isinstance(v, (str, int, float, bool)) for c in chunks for v in c.metadata.values())
+
+
+def test_violation_metadata_names_the_position():
+    _, chunks = _chunks(POSITIONS)
+    violations = {c.metadata.get("symbol"): c for c in chunks if c.metadata["chunk_type"] == "violation"}
+    assert violations["XOM"].text.endswith("Missing 'sector' or 'quantity' for position 'XOM' (index 2).")
+    assert "sector" not in violations["XOM"].metadata
+
+
+# --- Test Case 2: Large sectors are split into bounded position groups ---
+def test_positions_are_grouped():
+    positions = [
+        {"symbol": f"T{i:03d}", "sector": "Technology", "quantity": 1, "market_price": 10.0}
+        for i in range(POSITIONS_PER_CHUNK * 2 + 1)
+    ]
+    _, chunks = _chunks(positions)
+    groups = [c for c in chunks if c.metadata["chunk_type"] == "positions"]
+    assert [len(c.metadata["symbols"].split(",")) for c in groups] == [POSITIONS_PER_CHUNK, POSITIONS_PER_CHUNK, 1]
+    assert groups[-1].metadata["symbol"] == f"T{POSITIONS_PER_CHUNK * 2:03d}"
+    assert "symbol" not in groups[0].metadata
+
+
+# --- Test Case 3: Malformed analysis data is skipped ---
+def test_malformed_input():
+    portfolio = {"positions": ["bad", {"symbol": "A"}], "analysis": {"policy_violations": [None, "x"], "risk_drifts": ["bad", {}]}}
+    chunks = chunk_portfolio_report("C1", "P1", portfolio, None)
+    assert [c.chunk_id for c in chunks] == ["summary", "violation-0", "positions-Unknown-1"]
@@ -0,0 +1,87 @@
+# backend/test/unit/test_rule_engine.py
+import pytest
+
+from agents.policy_validator import PolicyValidatorAgent
+from agents.rule_engine import compile_rules, get_default_rule_set
+
+RICH_RULES = [
+    {"sector": "Technology", "quantity_gt": 90, "violation_message": "Overweight in Technology"},
+    {"sector": "Technology", "quantity_gt": 150, "violation_message": "Severely overweight in Technology"},
+    {"sector": "Energy", "quantity_gt": 50, "violation_message": "Overweight in Energy"},
+    {"min_sector_count": 3, "violation_message": "Insufficient sector diversification"},
+    {"asset_class": "Equity", "weight_gt": 0.8, "violation_message": "Equity overweight - too risky"},
+    {"asset_class": "Fixed Income", "weight_lt": 0.1, "violation_message": "Fixed Income underweight - lack of stability"},
+    {"esg_rating_lt": 3, "violation_message": "Position violates ESG threshold"},
+    {"region": "Emerging Markets", "weight_gt": 0.3, "violation_message": "Overexposure to Emerging Markets"},
+    {"instrument": "AAPL", "weight_gt": 0.25, "violation_message": "Single instrument overweight - AAPL concentration"},
+]
+
+POSITIONS = [
+    {"symbol": "AAPL", "sector": "Technology", "quantity": 200, "market_price": 10.0,
+     "asset_class": "Equity", "region": "US", "esg_rating": 5},
+    {"symbol": "XOM", "sector": "Energy", "quantity": 40, "market_price": 10.0,
+     "asset_class": "Equity", "region": "Emerging Markets", "esg_rating": 2},
+]
+
+
+# --- Test Case 1: The default POLICY_RULES keep the original Technology message ---
+def test_default_rules_match_original_behaviour():
+    positions = [
+        {"symbol": "AAPL", "sector": "Technology", "quantity": 100, "market_price": 1.0},
+        {"symbol": "MSFT", "sector": "Technology", "quantity": 90, "market_price": 1.0},
+        {"symbol": "AMZN", "sector": "Consumer Discretionary", "quantity": 500, "market_price": 1.0},
+        "not a dict",
+        {"symbol": "XOM", "quantity": 10},
+    ]
+    violations = PolicyValidatorAgent(positions).run()
+    assert violations == [
+        "Overweight in Technology: AAPL (Quantity: 100)",
+        "Invalid position data at index 3: Expected dict, got <class 'str'>",
+        "Missing 'sector' or 'quantity' for position 'XOM' (index 4).",
+    ]
+
+
+def test_default_rule_set_is_compiled_once():
+    assert get_default_rule_set() is get_default_rule_set()
+
+
+# --- Test Case 2: Position and aggregate rules of every supported shape ---
+def test_rich_rule_set():
+    violations = PolicyValidatorAgent(POSITIONS, rule_set=compile_rules(RICH_RULES)).run()
+    assert violations == [
+        "Overweight in Technology: AAPL (Quantity: 200)",
+        "Severely overweight in Technology: AAPL (Quantity: 200)",
+        "Position violates ESG threshold: XOM (Esg Rating: 2)",
+        "Insufficient sector diversification: 2 distinct sector values (minimum 3)",
+        "Equity overweight - too risky: Equity weight 100.00% (limit 80.00%)",
+        "Fixed Income underweight - lack of stability: Fixed Income weight 0.00% (limit 10.00%)",
+        "Single instrument overweight - AAPL concentration: AAPL weight 83.33% (limit 25.00%)",
+    ]
+
+
+def test_weight_rules_skipped_when_portfolio_has_no_value():
+    rule_set = compile_rules([{"sector": "Technology", "weight_gt": 0.5, "violation_message": "Too much tech"}])
+    positions = [{"symbol": "AAPL", "sector": "Technology", "quantity": 10}]
+    assert PolicyValidatorAgent(positions, rule_set=rule_set).run() == []
+
+
+# --- Test Case 3: Many rules on one field resolve through the threshold index ---
+def test_threshold_index_returns_all_broken_rules():
+    rules = [{"sector": "Technology", "quantity_gt": t, "violation_message": f"gt{t}"} for t in (300, 100, 200)]
+    rules += [{"sector": "Technology", "quantity_lt": t, "violation_message": f"lt{t}"} for t in (100, 300)]
+    evaluation = compile_rules(rules).new_evaluation()
+    messages = evaluation.observe({"symbol": "AAPL", "sector": "Technology", "quantity": 250})
+    assert [m.split(":")[0] for m in messages] == ["gt100", "gt200", "lt300"]
+
+
+# --- Test Case 4: Malformed rules are rejected at compile time ---
+@pytest.mark.parametrize("rule", [
+    {"sector": "Technology", "quantity_gt": 90},
+    {"sector": "Technology", "region": "US", "quantity_gt": 90, "violation_message": "x"},
+    {"sector": "Technology", "quantity_between": 90, "violation_message": "x"},
+    {"weight_gt": 0.5, "violation_message": "x"},
+    {"sector": "Technology", "quantity_gt": "90", "violation_message": "x"},
+])
+def test_malformed_rules_raise(rule):
+    with pytest.raises(ValueError):
+        compile_rules([rule])
@@ -0,0 +1,94 @@
+# backend/test/unit/test_structured_answers.py
+import pytest
+
+from services import structured_answers
+from services.portfolio_analysis import analyze_positions
+from services.portfolio_seeding import new_portfolio_doc
+from services.structured_answers import (
+    DRIFTED_SECTORS, POSITION_COUNT, SECTOR_WEIGHT, VIOLATION_COUNT, VIOLATION_LIST,
+    answer_structured_question, build_structured_answer, classify_question,
+)
+
+POSITIONS = [
+    {"symbol": "AAPL", "sector": "Technology", "quantity": 150, "market_price": 170.0},
+    {"symbol": "AMZN", "sector": "Consumer Discretionary", "quantity": 50, "market_price": 3250.0},
+    {"symbol": "XOM", "quantity": 10, "market_price": 100.0}, # No sector: a policy violation
+]
+
+
+def _portfolio_doc():
+    analysis, report = analyze_positions(POSITIONS)
+    return {"analysis": analysis, "compliance_report": report, "positions": POSITIONS}
+
+
+# --- Test Case 1: Structured questions are recognized, open-ended ones are not ---
+@pytest.mark.parametrize("question, intent", [
+    ("How many violations are there?", VIOLATION_COUNT),
+    ("how many policy violations do I have", VIOLATION_COUNT),
+    ("What are the violations?", VIOLATION_LIST),
+    ("Are there any breaches?", VIOLATION_LIST),
+    ("Which sectors drifted?", DRIFTED_SECTORS),
+    ("What are the risk drifts?", DRIFTED_SECTORS),
+    ("What is my Technology weight?", SECTOR_WEIGHT),
+    ("Weight of consumer discretionary in my portfolio", SECTOR_WEIGHT),
+    ("How many positions do I hold?", POSITION_COUNT),
+    ("Why do I have violations?", None),
+    ("How can I fix the violations?", None),
+    ("What would my Technology weight be if I sold AAPL?", None),
+    ("Summarize the compliance report", None),
+])
+def test_classify_question(question, intent):
+    classified = classify_question(question)
+    assert (classified[0] if classified else None) == intent
+
+
+# --- Test Case 2: Answers come from the stored analysis and positions ---
+def test_build_structured_answers():
+    doc = _portfolio_doc()
+    violations = doc["analysis"]["policy_violations"]
+
+    def answer(question):
+        return build_structured_answer(*classify_question(question), doc)
+
+    assert answer("How many violations?") == f"{len(violations)} policy violation{'s' if len(violations) != 1 else ''} detected."
+    assert all(v in answer("List my violations") for v in violations)
+    assert all(d["sector"] in answer("Which sectors drifted?") for d in doc["analysis"]["risk_drifts"])
+    total = 150 * 170.0 + 50 * 3250.0 + 10 * 100.0
+    assert answer("What is my technology weight?").startswith(f"Your Technology weight is {25500.0 / total:.2%}")
+    assert answer("How many positions?") == "The portfolio holds 3 positions."
+    # Not a sector of this portfolio: left to the LLM
+    assert answer("What is my Utilities weight?") is None
+
+
+def test_empty_analysis():
+    doc = {"analysis": {"policy_violations": [], "risk_drifts": []}, "positions": [], "analysis_version": 1}
+    assert build_structured_answer(*classify_question("Any violations?"), doc) == "No policy violations detected."
+    assert build_structured_answer(*classify_question("Which sectors drifted?"), doc) == "No significant risk drifts detected."
+    assert build_structured_answer(*classify_question("How many violations?"), {}) is None
+
+
+def test_unanalyzed_seed_portfolio_is_left_to_rag():
+    doc = new_portfolio_doc("C1", "P1", "2025-01-01T00:00:00")
+    for question in ("How many violations?", "List my violations", "Which sectors drifted?", "How many positions?"):
+        assert build_structured_answer(*classify_question(question), doc) is None
+
+
+# --- Test Case 3: Only structured questions about known portfolios skip RAG ---
+@pytest.mark.asyncio
+async def test_answer_structured_question_falls_back(monkeypatch):
+    loaded = []
+
+    async def fake_get_portfolio_analysis_doc(client_id, portfolio_id):
+        loaded.append((client_id, portfolio_id))
+        if portfolio_id == "BROKEN":
+            raise RuntimeError("Mongo unavailable")
+        return _portfolio_doc() if portfolio_id == "P1" else None
+
+    monkeypatch.setattr(structured_answers, "get_portfolio_analysis_doc", fake_get_portfolio_analysis_doc)
+
+    structured = await answer_structured_question("C1", "P1", "How many positions?")
+    assert structured == (POSITION_COUNT, "The portfolio holds 3 positions.")
+    assert await answer_structured_question("C1", "P1", "Explain the Technology drift") is None
+    assert loaded == [("C1", "P1")] # Open-ended questions do not touch the database
+    assert await answer_structured_question("C1", "MISSING", "How many positions?") is None
+    assert await answer_structured_question("C1", "BROKEN", "How many positions?") is None
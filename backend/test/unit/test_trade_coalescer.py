@@ -0,0 +1,120 @@
+# backend/test/unit/test_trade_coalescer.py
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import routers.portfolio as portfolio_router
+import services.portfolio_service as portfolio_service
+from core.config import settings
+from services.trade_coalescer import TradeCoalescer
+
+
+class _Recorder:
+    def __init__(self, fail_keys=()):
+        self.batches = []
+        self.fail_keys = fail_keys
+
+    async def __call__(self, key, items):
+        await asyncio.sleep(0.01) # The write takes a while; new items arrive meanwhile
+        if key in self.fail_keys:
+            raise RuntimeError("database unavailable")
+        self.batches.append((key, list(items)))
+
+
+# --- Test Case 1: A burst is applied as one batch and every sequence becomes durable ---
+@pytest.mark.asyncio
+async def test_burst_is_coalesced():
+    apply = _Recorder()
+    coalescer = TradeCoalescer(apply, window_seconds=0.05, max_batch=100)
+    sequences = [coalescer.submit("P1", i) for i in range(50)]
+    assert sequences == list(range(1, 51))
+    assert (await coalescer.wait("P1", 1, timeout=0))["status"] == "pending"
+
+    assert await coalescer.wait("P1", 50, timeout=5) == {"sequence": 50, "status": "durable"}
+    assert apply.batches == [("P1", list(range(50)))]
+    assert coalescer.pending_count() == 0
+    with pytest.raises(KeyError):
+        await coalescer.wait("P1", 51)
+
+
+# --- Test Case 2: Full batches flush early, keys are independent, failures are reported per sequence ---
+@pytest.mark.asyncio
+async def test_batches_and_failures():
+    apply = _Recorder(fail_keys={"BAD"})
+    coalescer = TradeCoalescer(apply, window_seconds=10, max_batch=10)
+    for i in range(25):
+        coalescer.submit("P1", i)
+    coalescer.submit("P2", "x")
+    bad = coalescer.submit("BAD", "y")
+    # The two full batches of P1 do not wait for the 10 s window
+    assert (await coalescer.wait("P1", 20, timeout=2))["status"] == "durable"
+    assert [len(items) for key, items in apply.batches if key == "P1"] == [10, 10]
+
+    # Drain flushes the rest without waiting for the window
+    await asyncio.wait_for(coalescer.drain(), timeout=2)
+    assert [items for key, items in apply.batches if key == "P1"][-1] == list(range(20, 25))
+    assert ("P2", ["x"]) in apply.batches
+    assert await coalescer.wait("BAD", bad) == {"sequence": bad, "status": "failed", "error": "database unavailable"}
+
+
+# --- Test Case 3: Resolved statuses are bounded per portfolio and expire with their idle buffers ---
+@pytest.mark.asyncio
+async def test_statuses_are_bounded_and_expire():
+    coalescer = TradeCoalescer(_Recorder(fail_keys={"BAD"}), window_seconds=0, max_batch=10, retention_seconds=0.2, max_statuses=3)
+    sequences = [coalescer.submit("P1", i) for i in range(5)]
+    failed = coalescer.submit("BAD", "x")
+    await coalescer.drain()
+    # Only the last three statuses of P1 are kept; sequences are not reused across portfolios
+    with pytest.raises(KeyError):
+        await coalescer.wait("P1", sequences[0])
+    assert (await coalescer.wait("P1", sequences[-1]))["status"] == "durable"
+    assert (await coalescer.wait("BAD", failed))["status"] == "failed"
+    with pytest.raises(KeyError):
+        await coalescer.wait("P1", failed)
+
+    await asyncio.sleep(0.25)
+    coalescer.submit("P2", "y")
+    # Statuses older than the retention window are gone, and so are the idle buffers
+    assert len(coalescer) == 1
+    with pytest.raises(KeyError):
+        await coalescer.wait("BAD", failed)
+    await coalescer.drain()
+
+
+# --- Test Case 4: Write-behind add-trade answers 202 with a sequence; one re-analysis per burst ---
+@pytest.mark.asyncio
+async def test_write_behind_endpoints(monkeypatch):
+    batches, ingests = [], []
+
+    async def fake_write_trades(client_id, portfolio_id, trades):
+        batches.append((client_id, portfolio_id, [t["trade_id"] for t in trades]))
+        return {"client_id": client_id}, "report"
+
+    async def failing_ingest(*args, **kwargs):
+        ingests.append(args)
+        raise RuntimeError("RAG components failed to load")
+    monkeypatch.setattr(portfolio_service, "_write_trades", fake_write_trades)
+    monkeypatch.setattr(portfolio_service, "ingest_portfolio_analysis", failing_ingest)
+    monkeypatch.setattr(portfolio_service, "_trade_coalescer", None)
+    monkeypatch.setattr(settings, "ADD_TRADE_WRITE_BEHIND", True)
+    monkeypatch.setattr(settings, "ADD_TRADE_COALESCE_WINDOW_SECONDS", 0.05)
+
+    app = FastAPI()
+    app.include_router(portfolio_router.router)
+    trade = {"symbol": "AAPL", "isin": "US0378331005", "quantity": 1.0, "price": 100.0, "sector": "Technology"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/portfolio/C1/P1/add-trade", json=trade) for _ in range(20)))
+        assert {r.status_code for r in responses} == {202}
+        accepted = [r.json()["data"] for r in responses]
+        assert sorted(a["sequence"] for a in accepted) == list(range(1, 21))
+
+        # Written trades are durable even though the RAG ingest after the write failed
+        durability = await client.get("/portfolio/C1/P1/trades/20/durability", params={"timeout": 5})
+        assert durability.json() == {"sequence": 20, "status": "durable"}
+        assert (await client.get("/portfolio/C1/P1/trades/21/durability")).status_code == 404
+
+    await portfolio_service.drain_trade_queue()
+    assert len(batches) == 1 and sorted(batches[0][2]) == sorted(a["trade_id"] for a in accepted)
+    assert len(ingests) == 1
@@ -0,0 +1,129 @@
+# backend/test/unit/test_trade_collection.py
+from datetime import date
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import crud.portfolio_crud as portfolio_crud
+import routers.portfolio as portfolio_router
+import services.portfolio_service as portfolio_service
+from core.config import settings
+from schemas.portfolio_models import TradeIn
+
+
+def _trade(trade_id: str, trade_date: str) -> dict:
+    return {"trade_id": trade_id, "symbol": "AAPL", "isin": "US0378331005", "quantity": 10.0, "price": 100.0,
+            "trade_date": trade_date, "type": "BUY", "sector": "Technology"}
+
+
+@pytest.fixture
+def collections(monkeypatch, fake_collection):
+    portfolios, trades = fake_collection(), fake_collection()
+    monkeypatch.setattr(portfolio_crud, "portfolio_collection", portfolios)
+    monkeypatch.setattr(portfolio_crud, "trade_collection", trades)
+    monkeypatch.setattr(settings, "PORTFOLIO_CURRENT_COLLECTION_ENABLED", False)
+    monkeypatch.setattr(settings, "TRADE_COLLECTION_ENABLED", True)
+
+    async def fake_ingest(*args, **kwargs):
+        return None
+    monkeypatch.setattr(portfolio_service, "ingest_portfolio_analysis", fake_ingest)
+    return portfolios, trades
+
+
+def _new_trade() -> TradeIn:
+    return TradeIn(symbol="AAPL", isin="US0378331005", quantity=5.0, price=110.0, trade_date=date(2025, 1, 3), type="BUY", sector="Technology")
+
+
+# --- Test Case 1: Stored portfolios keep their trades in the trades collection ---
+@pytest.mark.asyncio
+async def test_create_moves_trades_out_of_the_document(collections):
+    portfolios, trades = collections
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "trades": [_trade("T2", "2025-01-02"), _trade("T1", "2025-01-01")]}
+    await portfolio_crud.create_portfolio_doc(portfolio)
+
+    stored = portfolios.docs[0]
+    assert "trades" not in stored and stored["trades_externalized"] and stored["trade_count"] == 2
+    assert {t["portfolio_id"] for t in trades.docs} == {"P1"}
+    # Trades come back by trade date, paged by the query
+    assert [t["trade_id"] for t in await portfolio_crud.get_trades_page("C1", "P1")] == ["T1", "T2"]
+    assert [t["trade_id"] for t in await portfolio_crud.get_trades_page("C1", "P1", skip=1, limit=1)] == ["T2"]
+    assert await portfolio_crud.get_trades_page("C1", "UNKNOWN") is None
+
+
+# --- Test Case 2: Add-trade inserts one trade and $sets the re-analyzed fields ---
+@pytest.mark.asyncio
+async def test_add_trade_writes_only_the_trade_and_changed_fields(collections):
+    portfolios, trades = collections
+    await portfolio_crud.create_portfolio_doc({"client_id": "C1", "portfolio_id": "P1", "trades": [_trade("T1", "2025-01-01")]})
+    portfolios.writes.clear(), trades.writes.clear()
+
+    result = await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", _new_trade())
+
+    assert trades.writes == ["insert_many"] and portfolios.writes == ["update_one"]
+    stored = portfolios.docs[0]
+    assert stored["trade_count"] == 2 and stored["analysis_version"] == 1
+    assert stored["positions"][0]["quantity"] == 15.0 # Replayed once: the document had no ledger
+    assert "_id" not in result["trade_added"] and result["trade_added"]["trade_date"] == "2025-01-03"
+    assert len(await portfolio_crud.list_portfolio_trades("C1", "P1")) == 2
+
+
+# --- Test Case 3: Embedded trades of older documents are moved on their first add-trade ---
+def test_legacy_document_is_migrated_and_listed(collections):
+    portfolios, trades = collections
+    portfolios.docs.append({"_id": ObjectId(), "client_id": "C1", "portfolio_id": "P1", "trades": [_trade("T1", "2025-01-01")], "positions": []})
+    app = FastAPI()
+    app.include_router(portfolio_router.router)
+    client = TestClient(app)
+    # Before the migration, trades are read from the document
+    assert [t["trade_id"] for t in client.get("/portfolio/C1/P1/transactions").json()] == ["T1"]
+
+    response = client.post("/portfolio/C1/P1/add-trade", json={**_new_trade().model_dump(), "trade_date": "2025-01-03"})
+    assert response.status_code == 200
+
+    assert "trades" not in portfolios.docs[0] and portfolios.docs[0]["trade_count"] == 2
+    assert [t["trade_id"] for t in client.get("/portfolio/C1/P1/transactions").json()][0] == "T1"
+    assert len(client.get("/portfolio/C1/P1/transactions", params={"skip": 1}).json()) == 1
+    assert len(client.get("/portfolio/C1/P1/detail").json()["trades"]) == 2
+
+
+# --- Test Case 4: Positions are replayed in the order trades were added, not by trade date ---
+@pytest.mark.asyncio
+async def test_replay_uses_insertion_order(collections, monkeypatch):
+    portfolios, trades = collections
+    backdated_sell = {**_trade("T2", "2025-01-01"), "type": "SELL", "quantity": 5.0}
+    history = [_trade("T1", "2025-02-01"), backdated_sell]
+    await portfolio_crud.create_portfolio_doc({"client_id": "C1", "portfolio_id": "P1", "trades": history})
+    new_trade = TradeIn(symbol="AAPL", isin="US0378331005", quantity=1.0, price=110.0, trade_date=date(2025, 3, 1), type="BUY", sector="Technology")
+    expected = portfolio_service._calculate_positions_from_trades(history + [portfolio_service._new_trade_data(new_trade)])
+
+    # No ledger stored yet: the first add-trade replays the history
+    await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", new_trade)
+    assert portfolios.docs[0]["positions"] == expected
+    assert portfolios.docs[0]["positions"][0]["avg_price"] == pytest.approx(101.6667, abs=1e-4)
+
+    # The incremental ledger agrees with the replay, so verification keeps it
+    monkeypatch.setattr(settings, "POSITION_LEDGER_VERIFY", True)
+    await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", new_trade)
+    assert [t[portfolio_crud.TRADE_SEQUENCE_FIELD] for t in trades.docs] == [0, 1, 2, 3]
+    assert [t["trade_id"] for t in await portfolio_crud.get_trade_history("C1", "P1")][:2] == ["T1", "T2"]
+    # The listing is still by trade date, without the sequence field
+    listed = await portfolio_crud.list_portfolio_trades("C1", "P1")
+    assert [t["trade_id"] for t in listed][:2] == ["T2", "T1"] and portfolio_crud.TRADE_SEQUENCE_FIELD not in listed[0]
+
+
+# --- Test Case 5: Inserted trades are removed again if the portfolio update raises ---
+@pytest.mark.asyncio
+async def test_failed_update_removes_inserted_trades(collections, monkeypatch):
+    portfolios, trades = collections
+    await portfolio_crud.create_portfolio_doc({"client_id": "C1", "portfolio_id": "P1", "trades": [_trade("T1", "2025-01-01")]})
+
+    async def failing_update(*args, **kwargs):
+        raise TimeoutError("network timeout")
+    monkeypatch.setattr(portfolio_service, "update_portfolio_changes", failing_update)
+
+    with pytest.raises(TimeoutError):
+        await portfolio_service.add_trade_and_reanalyze_portfolio("C1", "P1", _new_trade())
+    assert [t["trade_id"] for t in trades.docs] == ["T1"]
+    assert portfolios.docs[0]["trade_count"] == 1
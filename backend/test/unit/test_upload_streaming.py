@@ -0,0 +1,130 @@
+# backend/test/unit/test_upload_streaming.py
+import copy
+import io
+import json
+import pytest
+
+from services.portfolio_analysis import aggregate_streamed_portfolio, prepare_uploaded_portfolio
+from utils.upload_parsing import iter_portfolio_upload
+
+TRADES = [
+    {"trade_id": f"T{i}", "symbol": symbol, "isin": f"ISIN-{symbol}", "sector": sector, "type": trade_type,
+     "quantity": quantity, "price": price, "trade_date": "2024-01-0%d" % (i + 1)}
+    for i, (symbol, sector, trade_type, quantity, price) in enumerate([
+        ("AAPL", "Technology", "BUY", 100, 150.25),
+        ("MSFT", "Technology", "BUY", 40, 310.0),
+        ("AAPL", "Technology", "SELL", 30, 160.5),
+        ("XOM", "Energy", "BUY", 12345678, 1e-3),
+        ("Café ☕", "Consumer Discretionary", "BUY", 5, 4.5), # Multi-byte characters split across chunks
+    ])
+]
+PORTFOLIO = {"client_id": "C1", "portfolio_id": "P1", "date": "2024-01-31", "trades": TRADES}
+
+
+class AsyncBytesFile:
+    """Minimal stand-in for UploadFile: async read(size) over in-memory bytes."""
+    def __init__(self, content: bytes):
+        self._stream = io.BytesIO(content)
+        self.reads = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        return self._stream.read(size)
+
+
+async def _collect(content: bytes, chunk_size: int) -> list:
+    return [record async for record in iter_portfolio_upload(AsyncBytesFile(content), chunk_size)]
+
+
+def _ndjson(portfolio: dict) -> bytes:
+    header = {k: v for k, v in portfolio.items() if k != "trades"}
+    lines = [json.dumps(header, ensure_ascii=False)] + [json.dumps(t, ensure_ascii=False) for t in portfolio["trades"]]
+    return "\n".join(lines).encode("utf-8")
+
+
+# --- Test Case 1: Both layouts parse to the same records at any chunk size ---
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 1 << 16])
+@pytest.mark.parametrize("encode", [
+    lambda p: json.dumps(p, ensure_ascii=False).encode("utf-8"),
+    lambda p: json.dumps(p, ensure_ascii=False, indent=2).encode("utf-8"),
+    _ndjson,
+])
+async def test_stream_parsing_matches_json_loads(chunk_size, encode):
+    records = await _collect(encode(PORTFOLIO), chunk_size)
+    assert [trade for key, value in records if key == "trades" for trade in value] == TRADES
+    assert {key: value for key, value in records if key != "trades"} == {"client_id": "C1", "portfolio_id": "P1", "date": "2024-01-31"}
+
+
+@pytest.mark.asyncio
+async def test_empty_trades_array_is_reported():
+    records = await _collect(b'{"client_id": "C1", "trades": [], "portfolio_id": "P1"}', 4)
+    assert records == [("client_id", "C1"), ("trades", []), ("portfolio_id", "P1")]
+
+
+@pytest.mark.asyncio
+async def test_file_is_read_in_chunks():
+    content = json.dumps(PORTFOLIO).encode()
+    file = AsyncBytesFile(content)
+    [record async for record in iter_portfolio_upload(file, 16)]
+    assert file.reads >= len(content) // 16
+
+
+# --- Test Case 2: Malformed uploads raise ValueError ---
+@pytest.mark.asyncio
+@pytest.mark.parametrize("content", [
+    b"",
+    b"[1, 2]",
+    b'{"client_id": "C1", "trades": [{"symbol": "AAPL"} {"symbol": "MSFT"}]}',
+    b'{"client_id": "C1", "trades": [{"symbol": "AAPL"',
+    b'{"client_id": "C1"}\n{"symbol": ',
+    b'{"client_id": "C1"}\n{"symbol": "AAPL"} ]',
+    b'{"client_id": "C1"} \xff',
+])
+async def test_malformed_uploads_raise(content):
+    with pytest.raises(ValueError):
+        await _collect(content, 5)
+
+
+# --- Test Case 3: Streamed aggregation matches the regular upload path ---
+async def _records(portfolio: dict):
+    for key, value in portfolio.items():
+        if key == "trades":
+            for trade in value:
+                yield key, [trade]
+        else:
+            yield key, value
+
+
+@pytest.mark.asyncio
+async def test_streamed_aggregation_matches_regular_upload():
+    streamed = await aggregate_streamed_portfolio(_records(copy.deepcopy(PORTFOLIO)))
+    regular = prepare_uploaded_portfolio(copy.deepcopy(PORTFOLIO))
+    for field in ("trades", "positions", "position_ledger", "analysis", "compliance_report"):
+        assert streamed[field] == regular[field]
+
+
+@pytest.mark.asyncio
+async def test_streamed_upload_without_trades_uses_positions():
+    portfolio = {"client_id": "C1", "portfolio_id": "P1",
+                 "positions": [{"symbol": "AAPL", "sector": "Technology", "quantity": 10, "market_price": 1.0}]}
+    streamed = await aggregate_streamed_portfolio(_records(portfolio))
+    assert streamed["positions"] == portfolio["positions"] and "trades" not in streamed
+
+
+@pytest.mark.asyncio
+async def test_streamed_upload_rejects_non_object_trades():
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "trades": [TRADES[0], "not a trade"]}
+    with pytest.raises(ValueError, match="index 1"):
+        await aggregate_streamed_portfolio(_records(portfolio))
+
+
+@pytest.mark.asyncio
+async def test_streamed_upload_with_null_trades_uses_positions():
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "trades": None,
+                 "positions": [{"symbol": "AAPL", "sector": "Technology", "quantity": 10, "market_price": 1.0}]}
+    records = iter_portfolio_upload(AsyncBytesFile(json.dumps(portfolio).encode()), 8)
+    streamed = await aggregate_streamed_portfolio(records)
+    regular = prepare_uploaded_portfolio(copy.deepcopy(portfolio))
+    assert streamed["positions"] == regular["positions"] == portfolio["positions"]
+    assert streamed["trades"] is None
@@ -0,0 +1,95 @@
+# backend/test/unit/test_vector_store.py
+import uuid
+import chromadb
+import numpy as np
+import pytest
+
+import rag_service
+from rag_service import compact_rag_collection, ingest_portfolio_analysis, set_vector_store
+from services.vector_store import ChromaVectorStore, PartitionedVectorStore
+
+
+def _documents(client_id, portfolio_id, count, rng, version=1):
+    ids = [f"{client_id}|{portfolio_id}#{i}" for i in range(count)]
+    return dict(
+        ids=ids,
+        documents=[f"{doc_id} text" for doc_id in ids],
+        embeddings=rng.normal(size=(count, 8)).astype(np.float32).tolist(),
+        metadatas=[{"client_id": client_id, "portfolio_id": portfolio_id, "analysis_version": version}] * count,
+    )
+
+
+# --- Test Case 1: Exact cosine top-k matches ChromaDB's ranking within a portfolio ---
+def test_query_matches_chroma_cosine_ranking():
+    rng = np.random.default_rng(5)
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(name=f"test-{uuid.uuid4().hex}", embedding_function=None, metadata={"hnsw:space": "cosine"})
+    chroma, local = ChromaVectorStore(collection), PartitionedVectorStore()
+    for client_id in ("C1", "C2"):
+        for store in (chroma, local):
+            store.upsert(**_documents(client_id, "P1", 40, np.random.default_rng({"C1": 1, "C2": 2}[client_id])))
+
+    for _ in range(10):
+        query = rng.normal(size=8).tolist()
+        chroma_documents, chroma_distances = chroma.query("C1", "P1", query, 5)
+        local_documents, local_distances = local.query("C1", "P1", query, 5)
+        assert local_documents == chroma_documents
+        assert all(d.startswith("C1|P1#") for d in local_documents)
+        assert local_distances == pytest.approx(chroma_distances, abs=1e-5)
+    assert local.query("C9", "P1", query, 5) == ([], [])
+    client.delete_collection(collection.name)
+
+
+# --- Test Case 2: Upserts replace in place, deletes drop rows and empty partitions ---
+def test_upsert_and_delete():
+    rng = np.random.default_rng(1)
+    store = PartitionedVectorStore()
+    store.upsert(**_documents("C1", "P1", 3, rng))
+    store.upsert(**_documents("C1", "P2", 2, rng))
+
+    replacement = _documents("C1", "P1", 4, rng, version=2) # Replaces #0-#2, adds #3
+    store.upsert(**replacement)
+    assert store.get_portfolio_version("C1", "P1") == 2
+    assert store.get_stored_documents([("C1", "P1"), ("C9", "P9")]) == {("C1", "P1"): [(f"C1|P1#{i}", 2) for i in range(4)]}
+    documents, distances = store.query("C1", "P1", replacement["embeddings"][3], 1)
+    assert documents == ["C1|P1#3 text"] and distances[0] == pytest.approx(0.0, abs=1e-6)
+
+    store.delete(["C1|P1#0", "C1|P2#0", "C1|P2#1", "unknown"])
+    assert [d for d, _ in store.get_stored_documents([("C1", "P1")])[("C1", "P1")]] == ["C1|P1#1", "C1|P1#2", "C1|P1#3"]
+    assert store.get_portfolio_version("C1", "P2") is None
+    assert store.count() == 3
+
+
+def test_partitions_persist(tmp_path):
+    rng = np.random.default_rng(2)
+    writer = PartitionedVectorStore(str(tmp_path))
+    documents = _documents("C1", "P1", 5, rng)
+    writer.upsert(**documents)
+    writer.upsert(**_documents("C2", "P1", 1, rng))
+    writer.delete(["C2|P1#0"])
+
+    reader = PartitionedVectorStore(str(tmp_path))
+    assert reader.count() == 5 and reader.get_portfolio_version("C2", "P1") is None
+    assert reader.query("C1", "P1", documents["embeddings"][2], 1)[0] == ["C1|P1#2 text"]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+# --- Test Case 3: rag_service ingests into and queries the configured store ---
+@pytest.mark.asyncio
+async def test_rag_service_with_partitioned_store(monkeypatch):
+    store = PartitionedVectorStore()
+    monkeypatch.setattr("rag_service._vector_store", None)
+    monkeypatch.setattr("rag_service._embedding_function", lambda texts: [[float(len(t) % 7), 1.0, 0.5] for t in texts])
+    set_vector_store(store)
+
+    positions = [{"symbol": s, "sector": sector, "quantity": 1, "market_price": 10.0} for s, sector in [("A", "Energy"), ("B", "Utilities")]]
+    portfolio = {"client_id": "C1", "portfolio_id": "P1", "compliance_report": "ok", "positions": positions}
+    await ingest_portfolio_analysis("C1", portfolio, "Two sectors.", "P1")
+    portfolio["positions"] = positions[:1]
+    await ingest_portfolio_analysis("C1", portfolio, "One sector.", "P1")
+
+    stored = store.get_stored_documents([("C1", "P1")])[("C1", "P1")]
+    assert sorted(stored) == [("C1|P1#positions-Energy-1", 2), ("C1|P1#summary", 2)]
+    documents, _ = await rag_service._vector_store_call(store.query, "C1", "P1", [1.0, 1.0, 0.5], 5)
+    assert len(documents) == 2
+    assert await compact_rag_collection() == {"portfolios": 1, "documents_before": 2, "deleted": 0}
@@ -1,4 +1,5 @@
 import logging
+from datetime import date, datetime
 from bson import ObjectId
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,19 @@ def serialize_portfolio_summary(portfolio):
         "uploaded_at": portfolio.get("uploaded_at")
     }
 
+def serialize_portfolio_list_item(portfolio: dict) -> dict:
+    """
+    Serializes a portfolio document of the /portfolios listing: _id as str, and dates
+    (if stored as date/datetime) as ISO 8601 strings.
+    """
+    item = dict(portfolio)
+    if "_id" in item:
+        item["_id"] = str(item["_id"])
+    for field in ("date", "uploaded_at"):
+        if isinstance(item.get(field), (date, datetime)):
+            item[field] = item[field].isoformat()
+    return item
+
 def serialize_portfolio_detail(portfolio):
     """
     Serializes a detailed portfolio document, converting ObjectId to str and removing original _id.
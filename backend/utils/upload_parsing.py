@@ -0,0 +1,239 @@
+import codecs
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (portfolio dict, None) for a parsed entry or (None, error message) for an unparseable one
+ParsedEntry = Tuple[Optional[dict], Optional[str]]
+
+
+def parse_portfolio_batch(content: bytes) -> List[ParsedEntry]:
+    """
+    Parses a batch upload containing either a JSON array of portfolio objects
+    or NDJSON (one portfolio object per line).
+    Entries that cannot be parsed are reported individually; a JSON array that is
+    not valid as a whole raises ValueError.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Batch upload is not valid UTF-8: {e}")
+
+    if text.lstrip().startswith("["):
+        try:
+            items = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON array provided: {e}")
+        return [
+            (item, None) if isinstance(item, dict) else (None, f"Expected a portfolio object, got {type(item).__name__}.")
+            for item in items
+        ]
+
+    entries = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Invalid JSON on line {line_number} of NDJSON batch upload: {e}")
+            entries.append((None, f"Invalid JSON on line {line_number}: {e}"))
+            continue
+        if isinstance(item, dict):
+            entries.append((item, None))
+        else:
+            entries.append((None, f"Expected a portfolio object on line {line_number}, got {type(item).__name__}."))
+    return entries
+
+
+_NON_WHITESPACE = re.compile(r"\S")
+# String values up to this length (symbols, ISINs, sectors, trade types, dates) are shared between trades
+_SHARED_VALUE_MAX_LENGTH = 32
+# Returned by _JsonStreamReader._decode_buffered when more input is needed
+_INCOMPLETE = object()
+
+
+class _JsonStreamReader:
+    """
+    Reads JSON values one at a time from an async file-like object (anything with
+    `async read(size)`, such as FastAPI's UploadFile), keeping only the unconsumed
+    part of the current chunk in memory.
+    """
+    def __init__(self, file, chunk_size: int):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        # json.loads shares key strings across the objects of one document; decoding value by
+        # value loses that, so keys and short (typically categorical) values are shared here
+        self._strings = {}
+        self._json_decoder = json.JSONDecoder(object_pairs_hook=self._share_strings)
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _share_strings(self, pairs: list) -> dict:
+        strings = self._strings
+        return {
+            strings.setdefault(key, key): (
+                strings.setdefault(value, value)
+                if value.__class__ is str and len(value) <= _SHARED_VALUE_MAX_LENGTH else value
+            )
+            for key, value in pairs
+        }
+
+    async def _read_more(self) -> bool:
+        if self._eof:
+            return False
+        chunk = await self._file.read(self._chunk_size)
+        try:
+            text = self._decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Upload is not valid UTF-8: {e}")
+        self._eof = not chunk
+        self._buffer = self._buffer[self._pos:] + text # Drop the consumed prefix
+        self._pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it ('' at end of input)."""
+        while True:
+            match = _NON_WHITESPACE.search(self._buffer, self._pos)
+            if match:
+                self._pos = match.start()
+                return self._buffer[self._pos]
+            self._pos = len(self._buffer)
+            if not await self._read_more():
+                return ""
+
+    async def consume(self, char: str):
+        """Consumes the next non-whitespace character, which must be `char`."""
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON in upload: expected '{char}' but found '{found or 'end of input'}'.")
+        self._pos += 1
+
+    async def read_value(self) -> Any:
+        """Decodes the next complete JSON value, reading more chunks until it is complete."""
+        await self.peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                # A value ending exactly at the buffer end may be a number cut by the chunk boundary
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise ValueError(f"Invalid JSON in upload: {e.msg} (at character {e.pos})")
+            await self._read_more()
+
+    def _next_char_buffered(self) -> Optional[str]:
+        """Like peek(), but returns None instead of reading when the buffer holds only whitespace."""
+        match = _NON_WHITESPACE.search(self._buffer, self._pos)
+        if match is None:
+            return None
+        self._pos = match.start()
+        return self._buffer[self._pos]
+
+    def _decode_buffered(self) -> Any:
+        """Like read_value(), but returns _INCOMPLETE instead of reading when the value is not fully buffered."""
+        if self._next_char_buffered() is None:
+            return _INCOMPLETE
+        try:
+            value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return _INCOMPLETE # Incomplete or malformed; read_value() tells them apart
+        if end == len(self._buffer) and not self._eof:
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    async def read_array_batches(self) -> AsyncIterator[list]:
+        """
+        Streams the elements of an array whose '[' has been consumed, as lists of the
+        elements complete in the buffer, so the per-element cost stays synchronous.
+        Consumes the closing ']'; an empty array yields one empty list.
+        """
+        batch = []
+        if await self.peek() == "]":
+            self._pos += 1
+            yield batch
+            return
+        while True:
+            value = self._decode_buffered()
+            if value is _INCOMPLETE:
+                if batch:
+                    yield batch
+                    batch = []
+                value = await self.read_value()
+            batch.append(value)
+            char = self._next_char_buffered()
+            if char is None:
+                yield batch
+                batch = []
+                char = await self.peek()
+            if char == ",":
+                self._pos += 1
+            elif char == "]":
+                self._pos += 1
+                yield batch
+                return
+            else:
+                raise ValueError(f"Invalid JSON in upload: expected ',' or ']' but found '{char or 'end of input'}'.")
+
+    async def read_value_batches(self) -> AsyncIterator[list]:
+        """Streams the remaining top-level values (NDJSON lines) as lists of the values complete in the buffer."""
+        batch = []
+        while True:
+            value = self._decode_buffered()
+            if value is _INCOMPLETE:
+                if batch:
+                    yield batch
+                    batch = []
+                if not await self.peek():
+                    return
+                value = await self.read_value()
+            batch.append(value)
+
+
+async def iter_portfolio_upload(file, chunk_size: int) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Incrementally parses a portfolio upload and yields (field, value) records.
+
+    Two layouts are accepted, and may be combined:
+    - a regular portfolio JSON object, whose "trades" array is streamed;
+    - NDJSON, where the first line is the portfolio object (client_id, portfolio_id, ...)
+      and every following line is one trade.
+    Trades are yielded as ("trades", [trade, ...]) records, one list per parsed chunk;
+    an empty trades array yields ("trades", []). A "trades" value that is not an array
+    (e.g. null) is yielded as is.
+    Raises ValueError on malformed input.
+    """
+    reader = _JsonStreamReader(file, chunk_size)
+    await reader.consume("{")
+    if await reader.peek() == "}":
+        await reader.consume("}")
+    else:
+        while True:
+            key = await reader.read_value()
+            if not isinstance(key, str):
+                raise ValueError("Invalid JSON in upload: object keys must be strings.")
+            await reader.consume(":")
+            if key == "trades" and await reader.peek() == "[":
+                await reader.consume("[")
+                async for trades in reader.read_array_batches():
+                    yield "trades", trades
+            else:
+                yield key, await reader.read_value()
+            if await reader.peek() == ",":
+                await reader.consume(",")
+            else:
+                break
+        await reader.consume("}")
+
+    # NDJSON: every further top-level value is one trade
+    async for trades in reader.read_value_batches():
+        yield "trades", trades